@@ -13,43 +13,189 @@ for a monthly strategy. Calculates various statistics based on the
 backtest simulation to provides an analysis of the strategy over the
 given time period.
 """
+import cProfile
+import os
 import sys
+import time
 
 from src.backtest_stats import BacktestStats
-from src.input_data import InputData
-from src.run_backtest import RunBacktest
-from src.stocks_fetcher import StocksFetcher
+from src.batch_model import BatchModel
+from src.engine_validation import (DEFAULT_FAST_BLOCK_MONTHS, FAST,
+                                   print_validation_report, validate_engines)
+from src.input_data import InputData, get_args
+from src.long_format_ingester import LongFormatIngester
+from src.memory_report import MemoryReport
+from src.metrics import REGISTRY, enable_phase_metrics
+from src.panel_backtest import MONTHLY, PanelBacktest
+from src.parameter_search import (SuccessiveHalving, get_candidates,
+                                  get_candidates_warmup_trading_days,
+                                  parse_grid)
+from src.phase_timer import TIMER, phase
+from src.price_panel import build_price_panel, load_price_panel
+from src.quantile_analysis import QuantileAnalysis
+from src.results_export import export_backtest, get_default_format
+from src.results_store import ResultsStore
+from src.robustness import RobustnessAnalysis
+from src.run_backtest import (RunBacktest, get_warmup_trading_days,
+                              read_checkpoint_date)
+from src.sensitivity_surface import SensitivitySurface
+from src.stocks_fetcher import StocksFetcher, get_fetch_period
+from src.universe_ic import (UNIVERSE_IC, get_universe_ic, join_monthly_ic,
+                             print_universe_ic_summary)
+from src.walk_forward import WalkForward
+from src.work_queue import SweepCoordinator, WorkQueue
 
 sys.path.append("/.../src")
 
 if __name__ == "__main__":
   # Getting user input
   user_input = InputData()
+  options = get_args().parse_args()
 
-  # Initialising and fetching stocks data
-  fetcher = StocksFetcher()
-  stocks_data = fetcher.fetch_stocks_data(
-    ticker_symbols=user_input.get_tickers(),
-    beginning_date=user_input.get_beginning_date(),
-    ending_date=user_input.get_ending_date())
-
-  # Running the backtest simulation
-  backtest = RunBacktest(
-    stocks_data=stocks_data,
-    initial_aum=user_input.get_initial_aum(),
-    beginning_date=user_input.get_beginning_date(),
-    strategy1=user_input.get_strategy1_type(),
-    strategy2=user_input.get_strategy2_type(),
-    days1=user_input.get_days1(),
-    days2=user_input.get_days2(),
-    top_pct=user_input.get_top_pct())
-  backtest.fill_up_portfolio_performance()
-  backtest.calc_ic()
-
-  # Getting the backtest performance and IC information
-  portfolio_perf = backtest.portfolio_performance
-  portfolio_ic = backtest.monthly_ic
-  model_stats = backtest.model_statistics_record
+  # Timing the phases and profiling the run if requested
+  profiler = None
+  if options.profile is not None:
+    TIMER.enable()
+    profiler = cProfile.Profile()
+    profiler.enable()
+  memory_report = None
+  if options.memory_report:
+    TIMER.enable()
+    memory_report = MemoryReport()
+    memory_report.start()
+  metrics_server = None
+  if options.metrics_file is not None or options.metrics_port is not None:
+    enable_phase_metrics()
+  if options.metrics_port is not None:
+    metrics_server = REGISTRY.serve(options.metrics_port)
+
+  # Resumed runs only fetch the days after the checkpointed month end
+  fetch_beginning_date = user_input.get_beginning_date()
+  if options.checkpoint is not None and os.path.exists(options.checkpoint):
+    fetch_beginning_date = read_checkpoint_date(options.checkpoint)
+
+  # The chunked runs and other rebalance frequencies use the fast engine
+  fast_engine = options.engine == FAST or options.chunk_months is not None \
+    or options.rebalance_frequency != MONTHLY
+
+  # The sensitivity surface needs the history of its longest lookback
+  surface_days = options.surface_max_days \
+    if options.sensitivity_surface is not None else None
+
+  # The parameter search needs the history of its longest lookback
+  search_candidates = None
+  if options.search_grid is not None:
+    search_candidates = get_candidates(
+      parse_grid(options.search_grid),
+      {"strategy1": user_input.get_strategy1_type(),
+       "strategy2": user_input.get_strategy2_type(),
+       "days1": user_input.get_days1(),
+       "days2": user_input.get_days2(),
+       "top_pct": user_input.get_top_pct()})
+
+  # The prices cover the warm-up before the beginning date to the ending
+  # date, whether they are fetched or read from a snapshot
+  warmup_trading_days = get_warmup_trading_days(
+    user_input.get_strategy1_type(),
+    surface_days or user_input.get_days1(),
+    user_input.get_strategy2_type(),
+    surface_days or user_input.get_days2(),
+    options.rebalance_frequency)
+  if search_candidates:
+    warmup_trading_days = max(warmup_trading_days,
+                              get_candidates_warmup_trading_days(
+                                search_candidates,
+                                options.rebalance_frequency))
+  _, dt_start, dt_end = get_fetch_period(fetch_beginning_date,
+                                         user_input.get_ending_date(),
+                                         warmup_trading_days)
+
+  # Memory-mapping the price snapshot or fetching stocks data
+  with phase("load_prices"):
+    panel = None
+    if options.long_prices is not None:
+      snapshot_path = options.save_panel or options.long_prices + ".panel"
+      panel = LongFormatIngester().ingest(options.long_prices, snapshot_path)\
+        .slice_dates(dt_start, dt_end)
+    elif options.panel is not None:
+      panel = load_price_panel(options.panel).slice_dates(dt_start, dt_end)
+    else:
+      fetcher = StocksFetcher()
+      stocks_data = fetcher.fetch_stocks_data(
+        ticker_symbols=user_input.get_tickers(),
+        beginning_date=fetch_beginning_date,
+        ending_date=user_input.get_ending_date(),
+        warmup_trading_days=warmup_trading_days)
+      if options.save_panel is not None or fast_engine:
+        panel = build_price_panel(stocks_data)
+      if options.save_panel is not None:
+        panel.save(options.save_panel)
+
+  # Comparing the reference and fast engines on the same input
+  if options.validate_engines:
+    if options.rebalance_frequency != MONTHLY:
+      get_args().error("--validate_engines needs monthly rebalancing")
+    if panel is not None:
+      stocks_data = panel.to_stocks_data(user_input.get_tickers())
+    print_validation_report(validate_engines(
+      stocks_data,
+      {"initial_aum": user_input.get_initial_aum(),
+       "beginning_date": user_input.get_beginning_date(),
+       "strategy1": user_input.get_strategy1_type(),
+       "strategy2": user_input.get_strategy2_type(),
+       "days1": user_input.get_days1(),
+       "days2": user_input.get_days2(),
+       "top_pct": user_input.get_top_pct()},
+      block_months=options.chunk_months or DEFAULT_FAST_BLOCK_MONTHS))
+    sys.exit()
+
+  with phase("backtest"):
+    if fast_engine:
+      if options.checkpoint is not None:
+        get_args().error("--checkpoint is not supported with the fast engine")
+
+      # Running the backtest simulation on the price panel
+      backtest = PanelBacktest(
+        panel=panel,
+        initial_aum=user_input.get_initial_aum(),
+        beginning_date=user_input.get_beginning_date(),
+        strategy1=user_input.get_strategy1_type(),
+        strategy2=user_input.get_strategy2_type(),
+        days1=user_input.get_days1(),
+        days2=user_input.get_days2(),
+        top_pct=user_input.get_top_pct(),
+        tickers=user_input.get_tickers(),
+        block_months=options.chunk_months or DEFAULT_FAST_BLOCK_MONTHS,
+        performance_path=options.performance_file,
+        rebalance_frequency=options.rebalance_frequency)
+      backtest.fill_up_portfolio_performance()
+
+      # Getting the backtest performance and IC information
+      portfolio_perf = backtest.get_portfolio_performance()
+      portfolio_ic = backtest.get_monthly_ic()
+      model_stats = backtest.get_model_statistics_record()
+    else:
+      if panel is not None:
+        stocks_data = panel.to_stocks_data(user_input.get_tickers())
+
+      # Running the backtest simulation
+      backtest = RunBacktest(
+        stocks_data=stocks_data,
+        initial_aum=user_input.get_initial_aum(),
+        beginning_date=user_input.get_beginning_date(),
+        strategy1=user_input.get_strategy1_type(),
+        strategy2=user_input.get_strategy2_type(),
+        days1=user_input.get_days1(),
+        days2=user_input.get_days2(),
+        top_pct=user_input.get_top_pct(),
+        checkpoint_path=options.checkpoint)
+      backtest.fill_up_portfolio_performance()
+      backtest.calc_ic()
+
+      # Getting the backtest performance and IC information
+      portfolio_perf = backtest.portfolio_performance
+      portfolio_ic = backtest.monthly_ic
+      model_stats = backtest.model_statistics_record
 
   # Calculating backtest statistics
   backtest_statistics = BacktestStats(
@@ -59,6 +205,203 @@ if __name__ == "__main__":
 
   # Printing statistics summary and geenrating plots
   backtest_statistics.print_summary()
-  backtest_statistics.plot_daily_aum()
-  backtest_statistics.plot_monthly_cumulative_ic()
+  sys.stdout.flush()
+  plots = None
+  if not options.no_plots:
+    # rendered by a headless background worker while the run finishes up
+    plots = backtest_statistics.plot_in_background(
+      max_points=options.max_plot_points)
+
+  # Computing the model of all rebalance dates for the universe analyses
+  model = None
+  if options.quantiles is not None or options.universe_ic:
+    with phase("batch_model"):
+      if panel is None:
+        panel = build_price_panel(stocks_data)
+      model = BatchModel(panel=panel,
+                         beginning_date=user_input.get_beginning_date(),
+                         strategy1=user_input.get_strategy1_type(),
+                         strategy2=user_input.get_strategy2_type(),
+                         days1=user_input.get_days1(),
+                         days2=user_input.get_days2(),
+                         tickers=user_input.get_tickers(),
+                         rebalance_frequency=options.rebalance_frequency)
+
+  # Simulating the portfolios of every quantile of the predicted returns
+  if options.quantiles is not None:
+    with phase("quantile_analysis"):
+      QuantileAnalysis(
+        model,
+        initial_aum=user_input.get_initial_aum(),
+        beginning_date=user_input.get_beginning_date(),
+        n_quantiles=options.quantiles).print_summary()
+
+  # Calculating the rank and Pearson ICs over the whole universe
+  extra_frames = {}
+  if options.universe_ic:
+    with phase("universe_ic"):
+      universe_ic = get_universe_ic(model)
+      print_universe_ic_summary(universe_ic)
+      extra_frames[UNIVERSE_IC] = join_monthly_ic(portfolio_ic, universe_ic)
+
+  # Running the backtest on bootstrapped price paths
+  if options.robustness is not None:
+    with phase("robustness"):
+      if panel is None:
+        panel = build_price_panel(stocks_data)
+      robustness = RobustnessAnalysis(
+        panel=panel,
+        initial_aum=user_input.get_initial_aum(),
+        beginning_date=user_input.get_beginning_date(),
+        strategy1=user_input.get_strategy1_type(),
+        strategy2=user_input.get_strategy2_type(),
+        days1=user_input.get_days1(),
+        days2=user_input.get_days2(),
+        top_pct=user_input.get_top_pct(),
+        tickers=user_input.get_tickers(),
+        rebalance_frequency=options.rebalance_frequency,
+        block_days=options.block_days)
+      robustness.run(options.robustness)
+      robustness.print_summary()
+
+  # Evaluating the model out of sample window by window
+  if options.walk_forward is not None:
+    with phase("walk_forward"):
+      if panel is None:
+        panel = build_price_panel(stocks_data)
+      walk_forward = WalkForward(
+        panel=panel,
+        initial_aum=user_input.get_initial_aum(),
+        beginning_date=user_input.get_beginning_date(),
+        strategy1=user_input.get_strategy1_type(),
+        strategy2=user_input.get_strategy2_type(),
+        days1=user_input.get_days1(),
+        days2=user_input.get_days2(),
+        top_pct=user_input.get_top_pct(),
+        tickers=user_input.get_tickers(),
+        rebalance_frequency=options.rebalance_frequency,
+        window_periods=options.walk_forward,
+        anchored=options.anchored,
+        n_workers=options.n_workers)
+      walk_forward.run()
+      walk_forward.print_summary()
+
+  # Searching the strategy parameters with successive halving
+  if search_candidates is not None:
+    with phase("parameter_search"):
+      if panel is None:
+        panel = build_price_panel(stocks_data)
+      search = SuccessiveHalving(
+        panel=panel,
+        initial_aum=user_input.get_initial_aum(),
+        beginning_date=user_input.get_beginning_date(),
+        candidates=search_candidates,
+        tickers=user_input.get_tickers(),
+        rebalance_frequency=options.rebalance_frequency,
+        metric=options.search_metric)
+      search.run()
+      search.print_summary()
+
+  # Distributing the sweep of a grid to the workers of a spool directory
+  if options.sweep_grid is not None:
+    if options.sweep_spool is None:
+      get_args().error("--sweep_grid needs --sweep_spool")
+    with phase("sweep"):
+      coordinator = SweepCoordinator(WorkQueue(options.sweep_spool,
+                                               options.lease_seconds,
+                                               options.max_attempts))
+      coordinator.submit(get_candidates(
+        parse_grid(options.sweep_grid),
+        {"tickers": user_input.get_tickers(),
+         "initial_aum": user_input.get_initial_aum(),
+         "beginning_date": user_input.get_beginning_date(),
+         "ending_date": user_input.get_ending_date(),
+         "strategy1": user_input.get_strategy1_type(),
+         "strategy2": user_input.get_strategy2_type(),
+         "days1": user_input.get_days1(),
+         "days2": user_input.get_days2(),
+         "top_pct": user_input.get_top_pct()}))
+      if not coordinator.wait(options.sweep_timeout):
+        print(f"The sweep did not finish within {options.sweep_timeout:g} "
+              "seconds.")
+      coordinator.print_summary()
+      if options.results_db is not None:
+        with ResultsStore(options.results_db) as store:
+          coordinator.store_results(store)
+
+  # Backtesting every pair of lookbacks of the two strategies
+  if options.sensitivity_surface is not None:
+    with phase("sensitivity_surface"):
+      if panel is None:
+        panel = build_price_panel(stocks_data)
+      surface = SensitivitySurface(
+        panel=panel,
+        initial_aum=user_input.get_initial_aum(),
+        beginning_date=user_input.get_beginning_date(),
+        strategy1=user_input.get_strategy1_type(),
+        strategy2=user_input.get_strategy2_type(),
+        top_pct=user_input.get_top_pct(),
+        tickers=user_input.get_tickers(),
+        rebalance_frequency=options.rebalance_frequency,
+        days1=range(1, options.surface_max_days + 1),
+        days2=range(1, options.surface_max_days + 1))
+      surface.run()
+      surface.print_summary()
+      surface.save_table(options.sensitivity_surface + ".csv")
+      if not options.no_plots:
+        surface.plot(options.sensitivity_surface + ".png")
+
+  # Exporting the run tables and summary statistics
+  if options.export_dir is not None:
+    options.export_format = options.export_format or get_default_format()
+    with phase("export"):
+      export_backtest(options.export_dir, backtest,
+                      {**backtest_statistics.get_summary_statistics(),
+                       **vars(options)},
+                      options.export_format, extra_frames)
+
+  # Recording the run in the results store
+  if options.results_db is not None:
+    with ResultsStore(options.results_db) as store:
+      store.add_run(
+        name=os.path.basename(options.export_dir or "") or "run",
+        parameters={"tickers": user_input.get_tickers(),
+                    "beginning_date": user_input.get_beginning_date(),
+                    "ending_date": user_input.get_ending_date(),
+                    "initial_aum": user_input.get_initial_aum(),
+                    "strategy1": user_input.get_strategy1_type(),
+                    "strategy2": user_input.get_strategy2_type(),
+                    "days1": user_input.get_days1(),
+                    "days2": user_input.get_days2(),
+                    "top_pct": user_input.get_top_pct()},
+        metrics=backtest_statistics.get_summary_statistics(),
+        export_dir=options.export_dir,
+        export_format=options.export_format)
+
+  if plots is not None:
+    with phase("plot"):
+      plots.result()
+
+  if profiler is not None:
+    profiler.disable()
+    profiler.dump_stats(options.profile + ".prof")
+    TIMER.write_chrome_trace(options.profile + ".trace.json")
+    TIMER.print_report()
+  if memory_report is not None:
+    memory_report.print_report(backtest)
+    memory_report.stop()
+
+  # Exporting the run metrics
+  if options.metrics_file is not None:
+    REGISTRY.write_text_file(options.metrics_file)
+  if metrics_server is not None:
+    if options.metrics_linger > 0:
+      print(f"Serving metrics on port {options.metrics_port} for "
+            f"{options.metrics_linger:g} seconds.")
+      try:
+        time.sleep(options.metrics_linger)
+      except KeyboardInterrupt:
+        pass
+    metrics_server.shutdown()
+    metrics_server.server_close()
 
@@ -0,0 +1,200 @@
+"""
+This module is responsible for the asyncio facade of the fetcher and the
+reference backtest, for services that serve many backtests from one event
+loop. The fetches of the tickers run concurrently in a thread pool and
+the backtests run in a process pool, so the event loop is never blocked.
+
+Cancelling a call or reaching its timeout cancels the work that has not
+started: the fetches still waiting for a slot and a backtest still queued
+in the executor. A fetch or backtest that already runs cannot be
+interrupted, so it finishes in its worker and its result is dropped.
+Bounding the executor bounds the work a service takes on at once.
+
+The shared process pool spawns its workers, so they do not inherit the
+threads and locks of the event loop process. If a worker dies, the pool is
+broken: it is replaced and the backtest is retried once.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from src.backtest_stats import BacktestStats
+from src.run_backtest import RunBacktest
+from src.stocks_fetcher import (StocksFetcher, get_fetch_period,
+                                warn_if_warmup_too_short)
+
+# Constants
+DEFAULT_MAX_CONCURRENCY = 8
+
+# The process pool shared by the backtests, created on first use
+BACKTEST_EXECUTOR = None
+
+def get_backtest_executor() -> ProcessPoolExecutor:
+  """
+  ProcessPoolExecutor: Returns the shared process pool of the backtests,
+    with one spawned worker per CPU, creating it on first use.
+  """
+  global BACKTEST_EXECUTOR
+  if BACKTEST_EXECUTOR is None:
+    BACKTEST_EXECUTOR = ProcessPoolExecutor(
+      mp_context=multiprocessing.get_context("spawn"))
+  return BACKTEST_EXECUTOR
+
+def reset_backtest_executor(broken: ProcessPoolExecutor) -> None:
+  """
+  Shuts down a broken shared process pool, so that the next call of
+  get_backtest_executor creates a new one. A pool that has already been
+  replaced by another call is only shut down.
+
+  Args:
+    broken (ProcessPoolExecutor): The broken process pool.
+  """
+  global BACKTEST_EXECUTOR
+  if BACKTEST_EXECUTOR is broken:
+    BACKTEST_EXECUTOR = None
+  broken.shutdown(wait=False, cancel_futures=True)
+
+async def fetch_stocks_data_async(ticker_symbols: List[str],
+  beginning_date: str,
+  ending_date: str,
+  warmup_trading_days: Optional[int] = None,
+  fetcher: Optional[StocksFetcher] = None,
+  max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+  executor: Optional[Executor] = None,
+  timeout: Optional[float] = None) -> Dict[str, pd.DataFrame]:
+  """
+  Fetches the stock data of multiple tickers as
+  StocksFetcher.fetch_stocks_data does, fetching the tickers concurrently.
+
+  Args:
+    ticker_symbols (List[str]): The ticker symbols of each stock in the
+      universe.
+    beginning_date (str): The beginning date inputted by the user.
+    ending_date (str): The ending date inputted by the user.
+    warmup_trading_days (Optional[int]): The number of trading days
+      needed before the beginning date.
+    fetcher (Optional[StocksFetcher]): The fetcher, whose provider and
+      cache are used. Defaults to a yFinance fetcher.
+    max_concurrency (int): The maximum number of tickers fetched at once.
+    executor (Optional[Executor]): The executor of the blocking fetches.
+      Defaults to the thread pool of the event loop.
+    timeout (Optional[float]): The maximum number of seconds to wait for
+      all the tickers.
+
+  Raises:
+    asyncio.TimeoutError: If the tickers are not fetched within the timeout.
+
+  Returns:
+    Dict[str, pd.DataFrame]: Returns a dictionary that maps each stock ticker
+      to the dataframe containing the stock data for that stock.
+  """
+  fetcher = StocksFetcher() if fetcher is None else fetcher
+  dt_beginning, dt_start, dt_end = get_fetch_period(beginning_date,
+                                                    ending_date,
+                                                    warmup_trading_days)
+  loop = asyncio.get_running_loop()
+  semaphore = asyncio.Semaphore(max_concurrency)
+
+  async def fetch(ticker_symbol: str) -> pd.DataFrame:
+    async with semaphore:
+      return await loop.run_in_executor(executor, fetcher.fetch_stock_data,
+                                        ticker_symbol, dt_start, dt_end)
+
+  frames = await asyncio.wait_for(
+    asyncio.gather(*[fetch(ticker_symbol)
+                     for ticker_symbol in ticker_symbols]), timeout)
+  res = dict(zip(ticker_symbols, frames))
+  if warmup_trading_days is not None:
+    for ticker_symbol, stock_data in res.items():
+      warn_if_warmup_too_short(ticker_symbol, stock_data, dt_beginning,
+                               warmup_trading_days)
+  return res
+
+def run_backtest(stocks_data: Dict[str, pd.DataFrame],
+  parameters: Dict[str, Any]) -> BacktestStats:
+  """
+  Runs the reference backtest and its statistics in a worker.
+
+  Args:
+    stocks_data (Dict[str, pd.DataFrame]): The dictionary that matches
+      the stock ticker to the price information of the stock.
+    parameters (Dict[str, Any]): The arguments of RunBacktest.
+
+  Returns:
+    BacktestStats: Returns the statistics of the backtest.
+  """
+  backtest = RunBacktest(stocks_data, **parameters)
+  backtest.fill_up_portfolio_performance()
+  backtest.calc_ic()
+  return BacktestStats(backtest.portfolio_performance, backtest.monthly_ic,
+                       backtest.model_statistics_record)
+
+async def run_backtest_async(stocks_data: Dict[str, pd.DataFrame],
+  initial_aum: int,
+  beginning_date: str,
+  strategy1: str,
+  strategy2: str,
+  days1: int,
+  days2: int,
+  top_pct: int,
+  executor: Optional[Executor] = None,
+  timeout: Optional[float] = None) -> BacktestStats:
+  """
+  Runs RunBacktest in an executor and awaits its statistics.
+
+  Args:
+    stocks_data (Dict[str, pd.DataFrame]): The dictionary that matches
+      the stock ticker to the price information of the stock.
+    initial_aum (int): The initial asset under management amount.
+    beginning_date (str): The beginning date of the backtest period.
+    strategy1 (str): The first backtesting strategy, either Momentum
+      or Reversal.
+    strategy2 (str): The second backtesting strategy, either Momentum
+      or Reversal.
+    days1 (int): The number of days to look back during calculation
+      of stock returns for the first strategy.
+    days2 (int): The number of days to look back during calculation
+      of stock returns for the second strategy.
+    top_pct (int): The percentage of stocks to pick for the portfolio.
+    executor (Optional[Executor]): The executor of the backtest. Defaults
+      to a shared process pool with one worker per CPU, which is replaced
+      and retried once if it is broken.
+    timeout (Optional[float]): The maximum number of seconds to wait for
+      the backtest.
+
+  Raises:
+    asyncio.TimeoutError: If the backtest does not finish within the timeout.
+    BrokenProcessPool: If the process pool is broken, or the shared one is
+      broken again after it is replaced.
+
+  Returns:
+    BacktestStats: Returns the statistics of the backtest, with its
+      portfolio performance, monthly IC and model statistics.
+  """
+  parameters = {"initial_aum": initial_aum,
+                "beginning_date": beginning_date,
+                "strategy1": strategy1,
+                "strategy2": strategy2,
+                "days1": days1,
+                "days2": days2,
+                "top_pct": top_pct}
+  loop = asyncio.get_running_loop()
+
+  async def run() -> BacktestStats:
+    if executor is not None:
+      return await loop.run_in_executor(executor, run_backtest, stocks_data,
+                                        parameters)
+    shared = get_backtest_executor()
+    try:
+      return await loop.run_in_executor(shared, run_backtest, stocks_data,
+                                        parameters)
+    except BrokenProcessPool:
+      reset_backtest_executor(shared)
+      return await loop.run_in_executor(get_backtest_executor(),
+                                        run_backtest, stocks_data, parameters)
+
+  return await asyncio.wait_for(run(), timeout)
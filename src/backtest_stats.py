@@ -1,11 +1,17 @@
 """
 This module is responsible for the backtest statistics.
 """
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
 from math import sqrt
-from typing import List
+from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 
+from src.downsample import LTTB, downsample_series
+from src.metrics import ROWS_PROCESSED
+from src.phase_timer import timed
+
 # Constants
 DATETIME_STR_FORMAT = "%d/%m/%Y"
 DATETIME = "datetime"
@@ -22,6 +28,28 @@ STRATEGY2_COEFF_IDX = 1
 STRATEGY1_T_IDX = 2
 STRATEGY2_T_IDX = 3
 
+# Summary Statistics Keys
+TOTAL_STOCK_RETURN = "total_stock_return"
+TOTAL_RETURN = "total_return"
+ANNUALIZED_RETURN = "annualized_return"
+FINAL_AUM = "final_aum"
+PROFIT_LOSS = "profit_loss"
+AVERAGE_DAILY_RETURN = "average_daily_return"
+DAILY_STANDARD_DEVIATION = "daily_standard_deviation"
+DAILY_SHARPE_RATIO = "daily_sharpe_ratio"
+FINAL_CUMULATIVE_IC = "final_cumulative_ic"
+
+# The daily risk-free rate of the Sharpe ratio
+DAILY_RISK_FREE_RATE = 0.0001
+
+# Plotting Constants
+HEADLESS_BACKEND = "Agg"
+DAILY_AUM_PATH = "daily_aum"
+CUMULATIVE_IC_PATH = "cumulative_ic"
+
+# The single background worker shared by all the background plots
+PLOT_EXECUTOR = None
+
 class BacktestStats:
   """
   Defines the BacktestStats class which calculates statistics based
@@ -184,7 +212,7 @@ class BacktestStats:
       formula from the following source:
       https://www.realvantage.co/insights/what-is-sharpe-ratio/
     """
-    return (self.get_average_daily_return() - 0.0001) \
+    return (self.get_average_daily_return() - DAILY_RISK_FREE_RATE) \
       / self.get_daily_standard_deviation()
 
   def get_strategy1_coefficient(self) -> float:
@@ -215,11 +243,37 @@ class BacktestStats:
     """
     return self.latest_model_statistics[STRATEGY2_T_IDX]
 
+  def get_final_cumulative_ic(self) -> float:
+    """
+    float: Returns the cumulative information coefficient at the last
+      month end, or 0 if there is none.
+    """
+    return float(self.monthly_ic[IC].iloc[-1]) if len(self.monthly_ic) else 0.
+
+  def get_summary_statistics(self) -> Dict[str, float]:
+    """
+    Dict[str, float]: Returns the main statistics of the summary by name,
+      for ranking and storing the results of many backtests.
+    """
+    return {
+      TOTAL_STOCK_RETURN: self.get_total_stock_return(),
+      TOTAL_RETURN: self.get_total_return(),
+      ANNUALIZED_RETURN: self.get_annualized_rate_of_return(),
+      FINAL_AUM: self.get_final_aum(),
+      PROFIT_LOSS: self.get_profit_loss(),
+      AVERAGE_DAILY_RETURN: self.get_average_daily_return(),
+      DAILY_STANDARD_DEVIATION: self.get_daily_standard_deviation(),
+      DAILY_SHARPE_RATIO: self.get_daily_sharpe_ratio(),
+      FINAL_CUMULATIVE_IC: self.get_final_cumulative_ic()
+    }
+
+  @timed("backtest_stats.print_summary")
   def print_summary(self) -> None:
     """
     None: Prints the formatted summary of the calculated portfolio
       statistics. 
     """
+    ROWS_PROCESSED.inc(len(self.portfolio_performance), stage="statistics")
     out_str = f"""
     Begin Date: {self.get_beginning_trading_date_str()}
     End Date: {self.get_ending_trading_date_str()}
@@ -242,7 +296,11 @@ class BacktestStats:
     """
     print(out_str)
 
-  def plot_daily_aum(self, path: str = "daily_aum") -> None:
+  @timed("backtest_stats.plot_daily_aum")
+  def plot_daily_aum(self,
+    path: str = DAILY_AUM_PATH,
+    max_points: Optional[int] = None,
+    method: str = LTTB) -> None:
     """
     Plots the daily asset under management amount throughout
     the backtesting period.
@@ -250,21 +308,20 @@ class BacktestStats:
     Args:
       path (str): Specifies the path where the plot is saved.
       Defaults to "daily_aum".
+      max_points (Optional[int]): The maximum number of points to plot.
+        Longer series are downsampled. Defaults to every point.
+      method (str): The downsampling method, "lttb" or "minmax".
 
     Returns:
       None: Generates a plot of the daily AUM and saves it to a file.
     """
-    daily_aum = self.portfolio_performance.set_index(DATETIME)[AUM]
-    fig = daily_aum.plot.line(
-      title= "Daily AUM",
-      grid=True,
-      legend=False,
-      xlabel="Close Date",
-      ylabel="AUM ($)").get_figure()
-    fig.savefig(path)
-    fig.clf()
+    draw_daily_aum(self.portfolio_performance, path, max_points, method)
 
-  def plot_monthly_cumulative_ic(self, path: str = "cumulative_ic") -> None:
+  @timed("backtest_stats.plot_monthly_cumulative_ic")
+  def plot_monthly_cumulative_ic(self,
+    path: str = CUMULATIVE_IC_PATH,
+    max_points: Optional[int] = None,
+    method: str = LTTB) -> None:
     """
     Plots the monthly cumulative information coefficient throughout
     the backtesting period.
@@ -272,17 +329,192 @@ class BacktestStats:
     Args:
       path (str): Specifies the path where the plot is saved.
       Defaults to "cumulative_ic".
+      max_points (Optional[int]): The maximum number of points to plot.
+        Longer series are downsampled. Defaults to every point.
+      method (str): The downsampling method, "lttb" or "minmax".
 
     Returns:
       None: Generates a plot of the monthly IC and saves it to a file.
     """
-    ic = self.monthly_ic.set_index(DATETIME)[IC]
-    fig = ic.plot.line(
-      title= "Monthly Cumulative IC",
-      grid=True,
-      legend=False,
-      xlabel="Close Date",
-      ylabel="Cumulative IC").get_figure()
-    fig.savefig(path)
-    fig.clf()
+    draw_monthly_cumulative_ic(self.monthly_ic, path, max_points, method)
+
+  def plot_in_background(self,
+    daily_aum_path: str = DAILY_AUM_PATH,
+    cumulative_ic_path: str = CUMULATIVE_IC_PATH,
+    executor: Optional[Executor] = None,
+    max_points: Optional[int] = None,
+    method: str = LTTB) -> Future:
+    """
+    Renders both plots in a background worker process with a headless
+    backend, so the caller can carry on (e.g. with the next backtest of a
+    batch) while they are drawn. matplotlib is only imported by the
+    worker.
+
+    Args:
+      daily_aum_path (str): The path where the daily AUM plot is saved.
+      cumulative_ic_path (str): The path where the cumulative IC plot is
+        saved.
+      executor (Optional[Executor]): The executor to render in. Defaults
+        to a shared single-worker process pool.
+      max_points (Optional[int]): The maximum number of points per plot.
+      method (str): The downsampling method, "lttb" or "minmax".
+
+    Returns:
+      Future: Returns the future of the rendering, whose result is the
+        list of saved paths.
+    """
+    executor = get_plot_executor() if executor is None else executor
+    return executor.submit(render_plots,
+                           self.portfolio_performance[[DATETIME, AUM]],
+                           self.monthly_ic[[DATETIME, IC]],
+                           daily_aum_path,
+                           cumulative_ic_path,
+                           max_points,
+                           method)
+
+def get_batch_daily_returns(aum: np.ndarray) -> np.ndarray:
+  """
+  Args:
+    aum (np.ndarray): The daily AUM of many backtests, one per row.
 
+  Returns:
+    np.ndarray: Returns the daily returns of every backtest exactly as
+      BacktestStats.get_daily_returns computes them, each day compared
+      with the AUM two days before and the first day with the last one.
+  """
+  yesterday_aum = np.roll(aum, 1, axis=-1)[..., :-1]
+  return (aum[..., 1:] - yesterday_aum) / yesterday_aum
+
+def get_batch_summary_statistics(aum: np.ndarray,
+  cumulative_dividends: np.ndarray,
+  number_of_days: int,
+  final_cumulative_ic: np.ndarray) -> Dict[str, np.ndarray]:
+  """
+  Computes the summary statistics of many backtests at once, with the
+  same definitions as BacktestStats.get_summary_statistics.
+
+  Args:
+    aum (np.ndarray): The daily AUM of the backtests, one per row.
+    cumulative_dividends (np.ndarray): The daily cumulative dividends.
+    number_of_days (int): The number of calendar days from the beginning
+      date to the ending date.
+    final_cumulative_ic (np.ndarray): The final cumulative IC of every
+      backtest.
+
+  Returns:
+    Dict[str, np.ndarray]: Returns the statistics of every backtest by
+      name.
+  """
+  initial_aum = aum[..., 0]
+  final_aum = aum[..., -1]
+  profit_loss = final_aum - initial_aum + cumulative_dividends[..., -1]
+  daily_returns = get_batch_daily_returns(aum)
+  average_daily_return = daily_returns.mean(axis=-1)
+  daily_standard_deviation = daily_returns.std(axis=-1)
+  return {
+    TOTAL_STOCK_RETURN: (final_aum - initial_aum) / initial_aum,
+    TOTAL_RETURN: profit_loss / initial_aum,
+    ANNUALIZED_RETURN: ((initial_aum + profit_loss) / initial_aum)
+      ** (365 / number_of_days) - 1,
+    FINAL_AUM: final_aum,
+    PROFIT_LOSS: profit_loss,
+    AVERAGE_DAILY_RETURN: average_daily_return,
+    DAILY_STANDARD_DEVIATION: daily_standard_deviation,
+    DAILY_SHARPE_RATIO: (average_daily_return - DAILY_RISK_FREE_RATE)
+      / daily_standard_deviation,
+    FINAL_CUMULATIVE_IC: final_cumulative_ic
+  }
+
+def draw_daily_aum(portfolio_performance: pd.DataFrame,
+  path: str,
+  max_points: Optional[int] = None,
+  method: str = LTTB) -> None:
+  """
+  Plots the daily AUM of a portfolio performance dataframe and saves it.
+
+  Args:
+    portfolio_performance (pd.DataFrame): The portfolio performance.
+    path (str): The path where the plot is saved.
+    max_points (Optional[int]): The maximum number of points to plot.
+    method (str): The downsampling method, "lttb" or "minmax".
+  """
+  daily_aum = downsample_series(portfolio_performance.set_index(DATETIME)[AUM],
+                                max_points, method)
+  fig = daily_aum.plot.line(
+    title= "Daily AUM",
+    grid=True,
+    legend=False,
+    xlabel="Close Date",
+    ylabel="AUM ($)").get_figure()
+  fig.savefig(path)
+  fig.clf()
+
+def draw_monthly_cumulative_ic(monthly_ic: pd.DataFrame,
+  path: str,
+  max_points: Optional[int] = None,
+  method: str = LTTB) -> None:
+  """
+  Plots the monthly cumulative IC of a monthly IC dataframe and saves it.
+
+  Args:
+    monthly_ic (pd.DataFrame): The monthly cumulative IC.
+    path (str): The path where the plot is saved.
+    max_points (Optional[int]): The maximum number of points to plot.
+    method (str): The downsampling method, "lttb" or "minmax".
+  """
+  ic = downsample_series(monthly_ic.set_index(DATETIME)[IC], max_points,
+                         method)
+  fig = ic.plot.line(
+    title= "Monthly Cumulative IC",
+    grid=True,
+    legend=False,
+    xlabel="Close Date",
+    ylabel="Cumulative IC").get_figure()
+  fig.savefig(path)
+  fig.clf()
+
+def use_headless_backend() -> None:
+  """
+  None: Switches matplotlib to the non-interactive Agg backend, which
+    renders straight to files without a display.
+  """
+  import matplotlib
+  matplotlib.use(HEADLESS_BACKEND)
+
+def render_plots(portfolio_performance: pd.DataFrame,
+  monthly_ic: pd.DataFrame,
+  daily_aum_path: str = DAILY_AUM_PATH,
+  cumulative_ic_path: str = CUMULATIVE_IC_PATH,
+  max_points: Optional[int] = None,
+  method: str = LTTB) -> List[str]:
+  """
+  Renders the daily AUM and cumulative IC plots with the headless backend.
+  This is the task run by the background plotting worker.
+
+  Args:
+    portfolio_performance (pd.DataFrame): The portfolio performance.
+    monthly_ic (pd.DataFrame): The monthly cumulative IC.
+    daily_aum_path (str): The path where the daily AUM plot is saved.
+    cumulative_ic_path (str): The path where the cumulative IC plot is
+      saved.
+    max_points (Optional[int]): The maximum number of points per plot.
+    method (str): The downsampling method, "lttb" or "minmax".
+
+  Returns:
+    List[str]: Returns the paths of the saved plots.
+  """
+  use_headless_backend()
+  draw_daily_aum(portfolio_performance, daily_aum_path, max_points, method)
+  draw_monthly_cumulative_ic(monthly_ic, cumulative_ic_path, max_points,
+                             method)
+  return [daily_aum_path, cumulative_ic_path]
+
+def get_plot_executor() -> ProcessPoolExecutor:
+  """
+  ProcessPoolExecutor: Returns the shared single-worker process pool of
+    the background plots, creating it on first use.
+  """
+  global PLOT_EXECUTOR
+  if PLOT_EXECUTOR is None:
+    PLOT_EXECUTOR = ProcessPoolExecutor(max_workers=1)
+  return PLOT_EXECUTOR
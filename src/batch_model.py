@@ -0,0 +1,200 @@
+"""
+This module is responsible for computing the model of the backtest for
+all rebalance dates at once: the strategy features of every stock, the
+realised returns between rebalances, the expanding-window regressions
+and the predicted returns, as matrices of dates by stocks. It is used by
+the analyses that look at the whole universe rather than at the held
+stocks.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.panel_backtest import MONTHLY, get_rebalance_indexes_from_b
+from src.price_panel import PricePanel
+from src.run_backtest import (MOMENTUM, MOMENTUM_GAP, N_PARAMETERS,
+                              get_lookback)
+
+def get_feature_matrix(close: np.ndarray,
+  indexes: np.ndarray,
+  strategy1: str,
+  days1: int,
+  strategy2: str,
+  days2: int) -> np.ndarray:
+  """
+  Args:
+    close (np.ndarray): The close prices of the dates by stocks, with
+      optional leading dimensions such as price paths.
+    indexes (np.ndarray): The rows of the rebalance dates.
+    strategy1 (str): The first strategy, either Momentum or Reversal.
+    days1 (int): The lookback of the first strategy.
+    strategy2 (str): The second strategy, either Momentum or Reversal.
+    days2 (int): The lookback of the second strategy.
+
+  Returns:
+    np.ndarray: Returns the rebalance dates x stocks x 2 strategy
+      returns in percent.
+  """
+  features = []
+  for strategy, days in ((strategy1, days1), (strategy2, days2)):
+    end = indexes - MOMENTUM_GAP * (strategy == MOMENTUM)
+    end_close = np.take(close, end, axis=-2)
+    start_close = np.take(close, end - days, axis=-2)
+    features.append((end_close - start_close) / start_close * 100)
+  return np.stack(features, axis=-1)
+
+def get_label_matrix(close: np.ndarray, indexes: np.ndarray) -> np.ndarray:
+  """
+  Args:
+    close (np.ndarray): The close prices of the dates by stocks, with
+      optional leading dimensions such as price paths.
+    indexes (np.ndarray): The rows of the rebalance dates.
+
+  Returns:
+    np.ndarray: Returns the returns in percent of every stock from each
+      rebalance date to the next, one row fewer than the dates.
+  """
+  end_close = np.take(close, indexes[1:], axis=-2)
+  start_close = np.take(close, indexes[:-1], axis=-2)
+  return (end_close - start_close) / start_close * 100
+
+def fit_expanding_regressions(features: np.ndarray,
+  labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+  """
+  Fits the expanding-window regressions of all the rebalance dates at
+  once. The k-th fit uses the features of the first k periods and the
+  returns that followed them, as PanelBacktest does one date at a time.
+  Leading dimensions, such as price paths, are fitted independently.
+
+  Args:
+    features (np.ndarray): The periods x stocks x 2 features.
+    labels (np.ndarray): The periods x stocks returns that followed the
+      features.
+
+  Returns:
+    Tuple[np.ndarray, np.ndarray]: Returns the periods x 3 intercepts
+      and coefficients, and the periods x 2 t-values of the coefficients.
+  """
+  valid = np.isfinite(labels) & np.isfinite(features).all(axis=-1)
+  design = np.concatenate([np.ones(labels.shape + (1,)), features], axis=-1)
+  design = np.where(valid[..., None], design, 0.)
+  labels = np.where(valid, labels, 0.)
+  gram = np.cumsum(np.einsum("...psi,...psj->...pij", design, design),
+                   axis=-3)
+  moment = np.cumsum(np.einsum("...psi,...ps->...pi", design, labels),
+                     axis=-2)
+  sum_squares = np.cumsum(np.einsum("...ps,...ps->...p", labels, labels),
+                          axis=-1)
+  n_samples = np.cumsum(valid.sum(axis=-1), axis=-1)
+
+  design_matrix_inv = np.linalg.inv(gram)
+  parameters = np.einsum("...pij,...pj->...pi", design_matrix_inv, moment)
+  residual_sum_squares = np.maximum(
+    sum_squares - np.einsum("...pi,...pi->...p", parameters, moment), 0.)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    residual_std_error = np.sqrt(residual_sum_squares
+                                 / (n_samples - N_PARAMETERS))
+    standard_errors = np.sqrt(np.diagonal(design_matrix_inv, axis1=-2,
+                                          axis2=-1)) \
+      * residual_std_error[..., None]
+    t_values = parameters[..., 1:] / standard_errors[..., 1:]
+  return parameters, t_values
+
+def predict_returns(features: np.ndarray,
+  parameters: np.ndarray) -> np.ndarray:
+  """
+  Args:
+    features (np.ndarray): The rebalances x stocks x 2 features.
+    parameters (np.ndarray): The rebalances x 3 intercepts and
+      coefficients fitted before each rebalance.
+
+  Returns:
+    np.ndarray: Returns the rebalances x stocks predicted returns, with
+      the same leading dimensions as the inputs.
+  """
+  return parameters[..., :1] \
+    + np.einsum("...psi,...pi->...ps", features, parameters[..., 1:])
+
+class BatchModel:
+  """
+  Defines the BatchModel class which computes the features, realised
+  returns and predicted returns of every stock at every rebalance date
+  of a price panel with whole-matrix operations.
+  """
+  def __init__(self,
+    panel: PricePanel,
+    beginning_date: str,
+    strategy1: str,
+    strategy2: str,
+    days1: int,
+    days2: int,
+    tickers: Optional[List[str]] = None,
+    rebalance_frequency: str = MONTHLY) -> None:
+    """
+    This method initialises the BatchModel class and computes the model.
+
+    Args:
+      panel (PricePanel): The price panel.
+      beginning_date (str): The beginning date of the backtest period.
+      strategy1 (str): The first backtesting strategy, either Momentum
+        or Reversal.
+      strategy2 (str): The second backtesting strategy, either Momentum
+        or Reversal.
+      days1 (int): The number of days to look back during calculation
+        of stock returns for the first strategy.
+      days2 (int): The number of days to look back during calculation
+        of stock returns for the second strategy.
+      tickers (Optional[List[str]]): The tickers of the universe.
+        Defaults to all the tickers of the panel.
+      rebalance_frequency (str): The rebalance frequency, see
+        PanelBacktest.
+
+    Raises:
+      ValueError: If a ticker is not in the panel or the panel does not
+        contain enough history before the beginning date.
+    """
+    self.panel: PricePanel = panel
+    self.tickers: List[str] = list(panel.tickers) if tickers is None \
+      else list(tickers)
+    panel_columns = {ticker: idx for idx, ticker in enumerate(panel.tickers)}
+    missing = [ticker for ticker in self.tickers
+               if ticker not in panel_columns]
+    if missing:
+      raise ValueError(f"Tickers {missing} are not in the price panel.")
+
+    """
+    columns (np.ndarray): The panel columns of the tickers.
+    indexes (np.ndarray): The panel rows of the rebalance dates, starting
+      with the period end before the first rebalance.
+    start (int): The first panel row kept in memory.
+    close (np.ndarray): The close prices from the start row.
+    features (np.ndarray): The dates x stocks x 2 features.
+    realised_returns (np.ndarray): The returns in percent from each
+      rebalance date to the next.
+    parameters (np.ndarray): The intercept and coefficients fitted at each
+      rebalance, one row per rebalance after the first date.
+    t_values (np.ndarray): The t-values of the coefficients of each fit.
+    predicted_returns (np.ndarray): The predicted returns of every stock
+      at each rebalance, NaN where a feature is missing.
+    """
+    self.columns: np.ndarray = np.array([panel_columns[ticker]
+                                         for ticker in self.tickers])
+    self.indexes: np.ndarray = get_rebalance_indexes_from_b(
+      panel.dates, beginning_date, rebalance_frequency)
+    lookback = max(get_lookback(strategy1, days1),
+                   get_lookback(strategy2, days2))
+    if self.indexes[0] < lookback:
+      raise ValueError(f"The price panel needs at least {lookback} "
+                       "trading days before the rebalance date preceding the "
+                       "beginning date.")
+    self.start: int = int(self.indexes[0]) - lookback
+    self.close: np.ndarray = np.asarray(panel.close[self.start:],
+                                        dtype=np.float64)[:, self.columns]
+    rows = self.indexes - self.start
+    self.features: np.ndarray = get_feature_matrix(
+      self.close, rows, strategy1, days1, strategy2, days2)
+    self.realised_returns: np.ndarray = get_label_matrix(self.close, rows)
+    self.parameters, self.t_values = fit_expanding_regressions(
+      self.features[:-1], self.realised_returns)
+    self.predicted_returns: np.ndarray = predict_returns(
+      self.features[1:], self.parameters)
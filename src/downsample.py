@@ -0,0 +1,113 @@
+"""
+This module is responsible for downsampling long series before plotting
+while preserving their visual shape.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Constants
+LTTB = "lttb"
+MINMAX = "minmax"
+METHODS = [LTTB, MINMAX]
+
+def lttb_indexes(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+  """
+  Selects points with the largest-triangle-three-buckets algorithm. The
+  first and last points are kept, the others are split into n_out - 2
+  buckets, and from each bucket the point forming the largest triangle
+  with the previously selected point and the average of the next bucket
+  is kept.
+
+  Args:
+    x (np.ndarray): The increasing x values.
+    y (np.ndarray): The y values.
+    n_out (int): The number of points to keep, at least 3.
+
+  Returns:
+    np.ndarray: Returns the sorted indexes of the selected points.
+  """
+  n_points = len(x)
+  if n_out >= n_points or n_out < 3:
+    return np.arange(n_points)
+
+  edges = np.linspace(1, n_points - 1, n_out - 1).astype(int)
+  selected = np.empty(n_out, dtype=np.int64)
+  selected[0] = 0
+  selected[-1] = n_points - 1
+  previous = 0
+  for bucket in range(n_out - 2):
+    start, end = edges[bucket], edges[bucket + 1]
+    next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n_points
+    next_x = x[end:next_end].mean()
+    next_y = y[end:next_end].mean()
+    areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                   - (x[previous] - x[start:end]) * (next_y - y[previous]))
+    previous = start + int(np.argmax(areas))
+    selected[bucket + 1] = previous
+  return selected
+
+def minmax_indexes(y: np.ndarray, n_buckets: int) -> np.ndarray:
+  """
+  Selects the minimum and maximum of each bucket (e.g. one bucket per
+  horizontal pixel), which keeps the envelope of the series including
+  every spike. The first and last points are always kept.
+
+  Args:
+    y (np.ndarray): The y values.
+    n_buckets (int): The number of buckets.
+
+  Returns:
+    np.ndarray: Returns the sorted indexes of the selected points.
+  """
+  n_points = len(y)
+  if 2 * n_buckets + 2 >= n_points or n_buckets < 1:
+    return np.arange(n_points)
+
+  edges = np.linspace(0, n_points, n_buckets + 1).astype(int)
+  starts = edges[:-1]
+  lengths = np.diff(edges)
+  # pad the buckets to the longest one so the reduction is vectorised
+  offsets = np.minimum(np.arange(lengths.max()), lengths[:, None] - 1)
+  windows = y[starts[:, None] + offsets]
+  minimums = starts + np.argmin(windows, axis=1)
+  maximums = starts + np.argmax(windows, axis=1)
+  return np.unique(np.concatenate([[0, n_points - 1], minimums, maximums]))
+
+def downsample_series(series: pd.Series,
+  max_points: Optional[int],
+  method: str = LTTB) -> pd.Series:
+  """
+  Downsamples a series for plotting. Series with at most max_points
+  points are returned unchanged.
+
+  Args:
+    series (pd.Series): The series indexed by date.
+    max_points (Optional[int]): The maximum number of points to plot, or
+      None to plot every point.
+    method (str): "lttb" (largest-triangle-three-buckets) or "minmax"
+      (minimum and maximum per bucket).
+
+  Raises:
+    ValueError: If the method is not supported.
+
+  Returns:
+    pd.Series: Returns the selected points of the series.
+  """
+  if method not in METHODS:
+    raise ValueError(f"The downsampling method must be one of {METHODS}.")
+  if max_points is None or len(series) <= max_points:
+    return series
+
+  y = series.to_numpy(dtype=float)
+  if method == LTTB:
+    index = series.index
+    if isinstance(index, pd.DatetimeIndex):
+      x = index.asi8.astype(float)
+    else:
+      x = np.arange(len(series), dtype=float)
+    indexes = lttb_indexes(x, y, max_points)
+  else:
+    indexes = minmax_indexes(y, max(1, (max_points - 2) // 2))
+  return series.iloc[indexes]
@@ -0,0 +1,184 @@
+"""
+This module is responsible for validating the fast backtest engine
+against the reference one. The loop-based RunBacktest is the reference
+engine and PanelBacktest, which simulates with the vectorised or compiled
+kernel, is the fast engine. Both are run on the same input and the
+largest differences of their outputs are reported with the speedup.
+"""
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.panel_backtest import PanelBacktest
+from src.price_panel import build_price_panel, get_wall_clock_dates
+from src.run_backtest import AUM, DATETIME, DIVIDENDS_DF, IC, RunBacktest
+
+# Constants
+REFERENCE = "reference"
+FAST = "fast"
+ENGINES = [REFERENCE, FAST]
+DEFAULT_FAST_BLOCK_MONTHS = 12
+DEFAULT_TOLERANCE = 1e-6
+
+# Report Keys
+PORTFOLIO_PERFORMANCE = "portfolio_performance"
+MONTHLY_IC = "monthly_ic"
+MODEL_STATISTICS_RECORD = "model_statistics_record"
+HOLDINGS = "holdings"
+REFERENCE_SECONDS = "reference_seconds"
+FAST_SECONDS = "fast_seconds"
+PANEL_SECONDS = "panel_seconds"
+SPEEDUP = "speedup"
+PASSED = "passed"
+DIFFERENCE_KEYS = [PORTFOLIO_PERFORMANCE, MONTHLY_IC, MODEL_STATISTICS_RECORD,
+                   HOLDINGS]
+
+def get_max_abs_diff(expected: np.ndarray, actual: np.ndarray) -> float:
+  """
+  Args:
+    expected (np.ndarray): The reference values.
+    actual (np.ndarray): The values to compare.
+
+  Returns:
+    float: Returns the maximum absolute difference, where NaNs only match
+      NaNs. It is infinite if the shapes differ.
+  """
+  expected = np.asarray(expected, dtype=np.float64)
+  actual = np.asarray(actual, dtype=np.float64)
+  if expected.shape != actual.shape:
+    return np.inf
+  if expected.size == 0:
+    return 0.
+  differences = np.abs(expected - actual)
+  both_nan = np.isnan(expected) & np.isnan(actual)
+  differences[both_nan] = 0.
+  differences[np.isnan(differences)] = np.inf
+  return float(differences.max())
+
+def get_frame_diff(expected: pd.DataFrame,
+  actual: pd.DataFrame,
+  columns: List[str]) -> float:
+  """
+  Args:
+    expected (pd.DataFrame): The reference dataframe.
+    actual (pd.DataFrame): The dataframe to compare.
+    columns (List[str]): The numeric columns to compare.
+
+  Returns:
+    float: Returns the maximum absolute difference of the columns. It is
+      infinite if the dataframes have different wall-clock dates.
+  """
+  if len(expected) != len(actual) or not get_wall_clock_dates(
+    pd.Index(expected[DATETIME])).equals(
+      get_wall_clock_dates(pd.Index(actual[DATETIME]))):
+    return np.inf
+  return max([get_max_abs_diff(expected[column].to_numpy(dtype=np.float64),
+                               actual[column].to_numpy(dtype=np.float64))
+              for column in columns], default=0.)
+
+def get_holdings_diff(expected: List[List[Tuple[str, float]]],
+  actual: List[List[Tuple[str, float]]]) -> float:
+  """
+  Args:
+    expected (List[List[Tuple[str, float]]]): The reference portfolios.
+    actual (List[List[Tuple[str, float]]]): The portfolios to compare.
+
+  Returns:
+    float: Returns the maximum absolute difference of the amounts held.
+      It is infinite if different stocks are held.
+  """
+  if [[stock for stock, _ in portfolio] for portfolio in expected] \
+    != [[stock for stock, _ in portfolio] for portfolio in actual]:
+    return np.inf
+  return get_max_abs_diff(
+    [amount for portfolio in expected for _, amount in portfolio],
+    [amount for portfolio in actual for _, amount in portfolio])
+
+def compare_backtests(reference: RunBacktest,
+  fast: PanelBacktest) -> Dict[str, float]:
+  """
+  Args:
+    reference (RunBacktest): The reference backtest after its simulation.
+    fast (PanelBacktest): The fast backtest after its simulation.
+
+  Returns:
+    Dict[str, float]: Returns the maximum absolute difference of the
+      portfolio performance, monthly IC, model statistics and holdings.
+  """
+  return {
+    PORTFOLIO_PERFORMANCE: get_frame_diff(reference.portfolio_performance,
+                                          fast.get_portfolio_performance(),
+                                          [AUM, DIVIDENDS_DF]),
+    MONTHLY_IC: get_frame_diff(reference.monthly_ic, fast.get_monthly_ic(),
+                               [IC]),
+    MODEL_STATISTICS_RECORD: get_max_abs_diff(
+      reference.model_statistics_record.to_numpy(dtype=np.float64),
+      fast.get_model_statistics_record().to_numpy()),
+    HOLDINGS: get_holdings_diff(reference.portfolio_record,
+                                fast.portfolio_record)
+  }
+
+def validate_engines(stocks_data: Dict[str, pd.DataFrame],
+  parameters: Dict[str, Any],
+  block_months: int = DEFAULT_FAST_BLOCK_MONTHS,
+  tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Any]:
+  """
+  Runs the reference and fast engines on the same input and compares
+  their outputs. The fast engine is timed on its second run, so the
+  compilation of its kernel is not counted, and without building its
+  price panel, which production runs load from a snapshot.
+
+  Args:
+    stocks_data (Dict[str, pd.DataFrame]): The stocks data by ticker.
+    parameters (Dict[str, Any]): The initial_aum, beginning_date,
+      strategy1, strategy2, days1, days2 and top_pct of the backtest.
+    block_months (int): The number of months the fast engine simulates
+      at a time.
+    tolerance (float): The largest absolute difference accepted.
+
+  Returns:
+    Dict[str, Any]: Returns the maximum absolute differences, the run
+      times in seconds, the speedup and whether the engines agree within
+      the tolerance.
+  """
+  start = time.perf_counter()
+  reference = RunBacktest(stocks_data, **parameters)
+  reference.fill_up_portfolio_performance()
+  reference.calc_ic()
+  reference_seconds = time.perf_counter() - start
+
+  start = time.perf_counter()
+  panel = build_price_panel(stocks_data)
+  panel_seconds = time.perf_counter() - start
+
+  for _ in range(2):
+    start = time.perf_counter()
+    fast = PanelBacktest(panel, **parameters, block_months=block_months)
+    fast.fill_up_portfolio_performance()
+    fast_seconds = time.perf_counter() - start
+
+  report = compare_backtests(reference, fast)
+  report[PASSED] = all(report[key] <= tolerance for key in DIFFERENCE_KEYS)
+  report[REFERENCE_SECONDS] = reference_seconds
+  report[FAST_SECONDS] = fast_seconds
+  report[PANEL_SECONDS] = panel_seconds
+  report[SPEEDUP] = reference_seconds / fast_seconds
+  return report
+
+def print_validation_report(report: Dict[str, Any]) -> None:
+  """
+  Prints the differences between the engines and their speedup.
+
+  Args:
+    report (Dict[str, Any]): The report of validate_engines.
+  """
+  print("Engine Validation")
+  for key in DIFFERENCE_KEYS:
+    print(f"Max Abs Diff ({key}): {report[key]:.3e}")
+  print(f"Reference Engine: {report[REFERENCE_SECONDS]:.3f}s")
+  print(f"Fast Engine: {report[FAST_SECONDS]:.3f}s "
+        f"(+{report[PANEL_SECONDS]:.3f}s building the panel)")
+  print(f"Speedup: {report[SPEEDUP]:.1f}x")
+  print(f"Result: {'PASSED' if report[PASSED] else 'FAILED'}")
@@ -5,6 +5,8 @@ import argparse
 from datetime import datetime
 from typing import List
 
+from src.run_backtest import get_max_period_trading_days
+
 # Constants
 DATETIME_FORMAT = "%Y%m%d"
 DATE_TODAY = datetime.today().strftime(DATETIME_FORMAT)
@@ -16,6 +18,25 @@ MIN_PCT = 1
 MAX_PCT = 100
 DATE_LENGTH = 8
 
+def get_rebalance_frequency(value: str) -> str:
+  """
+  Validates the rebalance frequency of the command line.
+
+  Args:
+    value (str): The rebalance frequency entered by the user.
+
+  Raises:
+    argparse.ArgumentTypeError: If the frequency is not supported.
+
+  Returns:
+    str: Returns the rebalance frequency if it has been validated.
+  """
+  try:
+    get_max_period_trading_days(value)
+  except ValueError as error:
+    raise argparse.ArgumentTypeError(str(error)) from error
+  return value
+
 def get_args() -> argparse.Namespace:
   """
   argparse.Namespace: Returns the command line arguments entered
@@ -52,6 +73,153 @@ def get_args() -> argparse.Namespace:
   parser.add_argument("--top_pct", type=int,
     help="The percentage of stocks to pick to go long (1 to 100)",
     required=True)
+  parser.add_argument("--checkpoint", type=str,
+    help="The checkpoint file to resume from and update (optional)",
+    required=False)
+  parser.add_argument("--panel", type=str,
+    help="The price panel snapshot to load instead of fetching (optional)",
+    required=False)
+  parser.add_argument("--long_prices", type=str,
+    help="The long-format price file (date,ticker,close,dividend) to "
+    "ingest into a snapshot instead of fetching (optional)",
+    required=False)
+  parser.add_argument("--save_panel", type=str,
+    help="The path to save the fetched prices as a snapshot (optional)",
+    required=False)
+  parser.add_argument("--chunk_months", type=int,
+    help="Runs the backtest in bounded memory, reading this many months "
+    "of prices at a time (optional)",
+    required=False)
+  parser.add_argument("--engine", type=str, choices=["reference", "fast"],
+    default="reference",
+    help="'reference' (the loop-based RunBacktest) or 'fast' (the panel "
+    "engine with the vectorised or compiled kernel), defaulting to "
+    "'reference' (optional)",
+    required=False)
+  parser.add_argument("--rebalance_frequency", type=get_rebalance_frequency,
+    default="M",
+    help="'M' (monthly), 'W' (weekly), '2W' (bi-weekly), 'Q' (quarterly) "
+    "or a number N (every N trading days), defaulting to 'M'. Other "
+    "frequencies than 'M' use the fast engine (optional)",
+    required=False)
+  parser.add_argument("--quantiles", type=int,
+    help="Prints the returns of the portfolios of each quantile of the "
+    "predicted returns, e.g. 10 for deciles, and the top minus bottom "
+    "spread (optional)",
+    required=False)
+  parser.add_argument("--robustness", type=int,
+    help="Runs the backtest on the given number of price paths resampled "
+    "with a block bootstrap of the daily returns and prints the "
+    "distributions of the summary statistics (optional)",
+    required=False)
+  parser.add_argument("--block_days", type=int, default=20,
+    help="The number of consecutive days of each bootstrap block of "
+    "--robustness (default 20)",
+    required=False)
+  parser.add_argument("--walk_forward", type=int,
+    help="Evaluates the model out of sample over consecutive windows of the "
+    "given number of rebalance periods, training on each window and "
+    "trading the next one, and prints the statistics of every window and "
+    "of the pooled windows (optional)",
+    required=False)
+  parser.add_argument("--anchored", action="store_true",
+    help="Trains every walk-forward window on all the periods before its "
+    "test instead of the previous window only (optional)")
+  parser.add_argument("--n_workers", type=int,
+    help="The number of worker processes of the walk-forward evaluation "
+    "(default: the number of CPUs)",
+    required=False)
+  parser.add_argument("--search_grid", type=str,
+    help="Searches the strategy parameters with successive halving over "
+    "the given grid, e.g. \"days1=20,50,100;days2=5,10;strategy2=M,R\", "
+    "the other parameters keeping their values (optional)",
+    required=False)
+  parser.add_argument("--search_metric", type=str,
+    default="daily_sharpe_ratio",
+    help="The summary statistic ranking the candidates of --search_grid "
+    "(default daily_sharpe_ratio)",
+    required=False)
+  parser.add_argument("--sweep_grid", type=str,
+    help="Puts a task for every combination of the given grid, e.g. "
+    "\"days1=20,50,100;days2=5,10\", in the --sweep_spool directory, "
+    "waits for the workers and prints their results (optional)",
+    required=False)
+  parser.add_argument("--sweep_spool", type=str,
+    help="The spool directory on a filesystem shared with the hosts "
+    "running 'python -m src.work_queue' workers (optional)",
+    required=False)
+  parser.add_argument("--lease_seconds", type=float,
+    help="The number of seconds after which the claim of a sweep task "
+    "that was not renewed expires, written to the spool for the workers, "
+    "defaulting to 300 (optional)",
+    required=False)
+  parser.add_argument("--max_attempts", type=int,
+    help="The number of times a sweep task is run before it is given up, "
+    "written to the spool for the workers, defaulting to 3 (optional)",
+    required=False)
+  parser.add_argument("--sweep_timeout", type=float,
+    help="The maximum number of seconds to wait for the workers of the "
+    "sweep, after which the finished results are printed (optional)",
+    required=False)
+  parser.add_argument("--sensitivity_surface", type=str, nargs="?",
+    const="sensitivity_surface",
+    help="Backtests every pair of days1 and days2 lookbacks, prints the "
+    "best pairs and writes <prefix>.csv and the <prefix>.png heatmaps of "
+    "the Sharpe ratio and final AUM, defaulting to 'sensitivity_surface' "
+    "(optional)",
+    required=False)
+  parser.add_argument("--surface_max_days", type=int, default=MAX_DAYS,
+    help="The longest lookback of --sensitivity_surface (default 250)",
+    required=False)
+  parser.add_argument("--universe_ic", action="store_true",
+    help="Prints the Spearman rank IC and Pearson IC between the predicted "
+    "and realised returns of all the stocks at every rebalance, and exports "
+    "them next to monthly_ic with --export_dir (optional)")
+  parser.add_argument("--validate_engines", action="store_true",
+    help="Runs both engines on the same input, prints their largest "
+    "differences and the speedup, and exits (optional)")
+  parser.add_argument("--performance_file", type=str,
+    help="The file to spill the daily performance rows to when running "
+    "with --chunk_months (optional)",
+    required=False)
+  parser.add_argument("--profile", type=str, nargs="?", const="profile",
+    help="Times the phases of the run and writes <profile>.prof (cProfile) "
+    "and <profile>.trace.json (Chrome trace), defaulting to 'profile' "
+    "(optional)",
+    required=False)
+  parser.add_argument("--memory_report", action="store_true",
+    help="Prints the peak and per-phase memory usage and the sizes of the "
+    "main backtest attributes (optional)")
+  parser.add_argument("--no_plots", "--no-plots", action="store_true",
+    help="Skips the plots, so matplotlib is never imported (optional)")
+  parser.add_argument("--max_plot_points", type=int,
+    help="Downsamples the plotted series to at most this many points, "
+    "keeping their shape (optional)",
+    required=False)
+  parser.add_argument("--metrics_file", type=str,
+    help="The Prometheus text file to write the run metrics to (optional)",
+    required=False)
+  parser.add_argument("--metrics_port", type=int,
+    help="Serves the run metrics on this local port at /metrics while the "
+    "run is in progress (optional)",
+    required=False)
+  parser.add_argument("--metrics_linger", type=float, default=0.,
+    help="The number of seconds to keep serving the metrics after the run, "
+    "for a last scrape, defaulting to 0 (optional)",
+    required=False)
+  parser.add_argument("--export_dir", type=str,
+    help="The directory to export the run tables and summary statistics "
+    "to (optional)",
+    required=False)
+  parser.add_argument("--export_format", type=str,
+    choices=["arrow", "parquet", "npz"],
+    help="The export format, defaulting to 'arrow' when pyarrow is "
+    "installed and 'npz' otherwise (optional)",
+    required=False)
+  parser.add_argument("--results_db", type=str,
+    help="The SQLite results store to record the run parameters and "
+    "summary statistics in (optional)",
+    required=False)
 
   return parser
 
@@ -0,0 +1,163 @@
+"""
+This module is responsible for ingesting long-format price files (one row
+per date and ticker) into a price panel snapshot without loading the
+whole file into memory.
+"""
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.price_panel import (ARRAYS, CLOSE_PRICE, DATES, DIVIDENDS, DTYPE,
+                             SHAPE, SNAPSHOT_DTYPE, SNAPSHOT_VERSION, TICKERS,
+                             TIMEZONE, VERSION, PricePanel, load_price_panel,
+                             write_snapshot_header)
+
+# Constants
+DEFAULT_CHUNKSIZE = 1000000
+FILL_ROWS = 4096
+
+# Long-Format Column Constants
+DATE_COLUMN = "date"
+TICKER_COLUMN = "ticker"
+CLOSE_COLUMN = "close"
+DIVIDEND_COLUMN = "dividend"
+
+class LongFormatIngester:
+  """
+  Defines the LongFormatIngester class which streams a long-format price
+  file in chunks and scatters the values directly into a memory-mapped
+  price panel snapshot.
+  """
+  def __init__(self,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    date_column: str = DATE_COLUMN,
+    ticker_column: str = TICKER_COLUMN,
+    close_column: str = CLOSE_COLUMN,
+    dividend_column: str = DIVIDEND_COLUMN) -> None:
+    """
+    This method initialises the LongFormatIngester class.
+
+    Args:
+      chunksize (int): The number of rows read from the file at a time.
+      date_column (str): The name of the date column.
+      ticker_column (str): The name of the ticker column.
+      close_column (str): The name of the close price column.
+      dividend_column (str): The name of the dividend column.
+    """
+    self.chunksize: int = chunksize
+    self.date_column: str = date_column
+    self.ticker_column: str = ticker_column
+    self.close_column: str = close_column
+    self.dividend_column: str = dividend_column
+
+  def read_chunks(self,
+    source_path: str,
+    columns: List[str]) -> Iterator[pd.DataFrame]:
+    """
+    Reads the given columns of the source file in chunks.
+
+    Args:
+      source_path (str): The path of the long-format CSV file.
+      columns (List[str]): The columns to read.
+
+    Returns:
+      Iterator[pd.DataFrame]: Returns an iterator over the chunks.
+    """
+    dtypes = {self.date_column: str,
+              self.ticker_column: str,
+              self.close_column: np.float64,
+              self.dividend_column: np.float64}
+    return pd.read_csv(source_path,
+                       usecols=columns,
+                       dtype={column: dtypes[column] for column in columns},
+                       float_precision="round_trip",
+                       chunksize=self.chunksize)
+
+  def scan(self, source_path: str) -> Tuple[List[str], pd.Index,
+                                            pd.DatetimeIndex]:
+    """
+    Makes a first pass over the source file to collect the tickers and
+    the trading calendar. Only the distinct values are kept in memory.
+
+    Args:
+      source_path (str): The path of the long-format CSV file.
+
+    Returns:
+      Tuple[List[str], pd.Index, pd.DatetimeIndex]: Returns the sorted
+        tickers, the distinct date strings as they appear in the file and
+        the sorted trading calendar.
+    """
+    tickers = set()
+    date_strings = set()
+    for chunk in self.read_chunks(source_path,
+                                  [self.date_column, self.ticker_column]):
+      tickers.update(chunk[self.ticker_column].unique())
+      date_strings.update(chunk[self.date_column].unique())
+
+    date_strings = pd.Index(sorted(date_strings))
+    calendar = pd.DatetimeIndex(pd.to_datetime(date_strings).unique())\
+      .sort_values()
+    return sorted(tickers), date_strings, calendar
+
+  def ingest(self, source_path: str, snapshot_path: str) -> PricePanel:
+    """
+    Ingests the source file into a price panel snapshot. Tickers and
+    dates are mapped to integer column and row ids, and each chunk is
+    scattered into the memory-mapped arrays, so peak memory is bounded
+    by the chunk size rather than the size of the source file. Missing
+    close prices are forward-filled and missing dividends are zero.
+
+    Args:
+      source_path (str): The path of the long-format CSV file.
+      snapshot_path (str): The path of the snapshot file to create.
+
+    Returns:
+      PricePanel: Returns the memory-mapped price panel.
+    """
+    tickers, date_strings, calendar = self.scan(source_path)
+    write_snapshot_header(snapshot_path, {
+      VERSION: SNAPSHOT_VERSION,
+      TICKERS: tickers,
+      DATES: calendar.asi8.tolist(),
+      TIMEZONE: None,
+      SHAPE: [len(calendar), len(tickers)],
+      DTYPE: SNAPSHOT_DTYPE,
+      ARRAYS: [CLOSE_PRICE, DIVIDENDS]
+    })
+    panel = load_price_panel(snapshot_path, mode="r+")
+    panel.close[:] = np.nan
+
+    ticker_ids = pd.Index(tickers)
+    date_ids = pd.Index(date_strings)
+    date_rows = calendar.get_indexer(pd.to_datetime(date_strings))
+    for chunk in self.read_chunks(source_path,
+                                  [self.date_column,
+                                   self.ticker_column,
+                                   self.close_column,
+                                   self.dividend_column]):
+      rows = date_rows[date_ids.get_indexer(chunk[self.date_column])]
+      columns = ticker_ids.get_indexer(chunk[self.ticker_column])
+      panel.close[rows, columns] = chunk[self.close_column].to_numpy()
+      panel.dividends[rows, columns] = \
+        chunk[self.dividend_column].fillna(0).to_numpy()
+
+    forward_fill_close(panel)
+    panel.close.flush()
+    panel.dividends.flush()
+    return load_price_panel(snapshot_path)
+
+def forward_fill_close(panel: PricePanel) -> None:
+  """
+  Forward-fills the missing close prices of a panel in place, one block
+  of rows at a time.
+
+  Args:
+    panel (PricePanel): The price panel to fill.
+  """
+  last_close = np.full(len(panel.tickers), np.nan)
+  for start in range(0, len(panel.dates), FILL_ROWS):
+    block = np.vstack([last_close, panel.close[start:start + FILL_ROWS]])
+    block = pd.DataFrame(block).ffill().to_numpy()[1:]
+    panel.close[start:start + FILL_ROWS] = block
+    last_close = block[-1]
@@ -0,0 +1,257 @@
+"""
+This module is responsible for tracing the memory usage of a backtest
+run. It records the Python allocations of each phase of the phase timer
+with tracemalloc, samples the resident set size of the process and
+measures the size of the main backtest attributes.
+"""
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.phase_timer import TIMER, PhaseTimer
+
+# Constants
+DEFAULT_SAMPLE_INTERVAL = 0.05
+MEGABYTE = 1024 ** 2
+PROC_STATM = "/proc/self/statm"
+RUN_BACKTEST_ATTRIBUTES = ["stocks_data",
+                           "portfolio_performance",
+                           "model_training_data",
+                           "model_statistics_record",
+                           "portfolio_record",
+                           "monthly_ic",
+                           "checkpoint"]
+
+# Report Columns
+PHASE = "phase"
+CALLS = "calls"
+ALLOCATED_MB = "allocated_mb"
+PEAK_MB = "peak_mb"
+RSS_MB = "rss_mb"
+ATTRIBUTE = "attribute"
+SIZE_MB = "size_mb"
+
+def get_rss() -> int:
+  """
+  int: Returns the resident set size of the process in bytes. Where
+    /proc is not available, the peak resident set size is returned.
+  """
+  if os.path.exists(PROC_STATM):
+    with open(PROC_STATM, encoding="utf-8") as file:
+      return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+  return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+def get_size(obj: Any, seen: Optional[set] = None) -> int:
+  """
+  Estimates the memory held by an object, following the containers used
+  by the backtest. Dataframes and arrays count their data buffers, and
+  shared objects are only counted once.
+
+  Args:
+    obj (Any): The object to measure.
+    seen (Optional[set]): The ids of the objects already counted.
+
+  Returns:
+    int: Returns the estimated size in bytes.
+  """
+  seen = set() if seen is None else seen
+  if id(obj) in seen:
+    return 0
+  seen.add(id(obj))
+  if isinstance(obj, (pd.DataFrame, pd.Series)):
+    usage = obj.memory_usage(deep=True)
+    return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+  if isinstance(obj, np.ndarray):
+    return obj.nbytes
+  size = sys.getsizeof(obj)
+  if isinstance(obj, dict):
+    size += sum(get_size(key, seen) + get_size(value, seen)
+                for key, value in obj.items())
+  elif isinstance(obj, (list, tuple, set)):
+    size += sum(get_size(item, seen) for item in obj)
+  return size
+
+def get_attribute_sizes(obj: Any,
+  attributes: Optional[List[str]] = None) -> pd.DataFrame:
+  """
+  Measures the attributes of an object, largest first.
+
+  Args:
+    obj (Any): The object whose attributes are measured.
+    attributes (Optional[List[str]]): The attribute names. Defaults to
+      all the instance attributes.
+
+  Returns:
+    pd.DataFrame: Returns the size in megabytes of each attribute.
+  """
+  if attributes is None:
+    attributes = list(vars(obj).keys())
+  sizes = [[attribute, get_size(getattr(obj, attribute)) / MEGABYTE]
+           for attribute in attributes if hasattr(obj, attribute)]
+  return pd.DataFrame(sizes, columns=[ATTRIBUTE, SIZE_MB])\
+    .sort_values(SIZE_MB, ascending=False).reset_index(drop=True)
+
+class MemoryReport:
+  """
+  Defines the MemoryReport class which observes the phases of a phase
+  timer and records the net allocation and peak allocation of each phase,
+  together with the resident set size sampled in the background.
+  """
+  def __init__(self,
+    timer: PhaseTimer = TIMER,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL) -> None:
+    """
+    This method initialises the MemoryReport class.
+
+    Args:
+      timer (PhaseTimer): The phase timer to observe. Defaults to the
+        global timer.
+      sample_interval (float): The seconds between resident set size
+        samples.
+    """
+    self.timer: PhaseTimer = timer
+    self.sample_interval: float = sample_interval
+
+    """
+    phases (Dict[str, List[float]]): The number of calls, net allocated
+      bytes, peak allocated bytes and resident set size at exit of each
+      phase.
+    stack (List[List[int]]): The traced memory at the start of each open
+      phase and the peak seen before its nested phases reset the peak.
+    peak (int): The peak traced memory of the run.
+    peak_rss (int): The peak sampled resident set size of the run.
+    rss_samples (List[Tuple[float, int]]): The sampled resident set sizes.
+    """
+    self.phases: Dict[str, List[float]] = {}
+    self.stack: List[List[int]] = []
+    self.peak: int = 0
+    self.peak_rss: int = 0
+    self.rss_samples: List[Tuple[float, int]] = []
+    self.stop_event: threading.Event = threading.Event()
+    self.sampler: Optional[threading.Thread] = None
+    self.origin: float = time.perf_counter()
+
+  def start(self) -> None:
+    """
+    None: Starts tracing allocations and sampling the resident set size.
+    """
+    tracemalloc.start()
+    self.origin = time.perf_counter()
+    self.timer.add_observer(self)
+    self.stop_event.clear()
+    self.sampler = threading.Thread(target=self.sample_rss, daemon=True)
+    self.sampler.start()
+
+  def stop(self) -> None:
+    """
+    None: Stops tracing allocations and sampling the resident set size.
+    """
+    self.update_peak()
+    self.stop_event.set()
+    if self.sampler is not None:
+      self.sampler.join()
+    self.timer.remove_observer(self)
+    tracemalloc.stop()
+
+  def sample_rss(self) -> None:
+    """
+    None: Samples the resident set size until the report is stopped.
+    """
+    while True:
+      rss = get_rss()
+      self.rss_samples.append((time.perf_counter() - self.origin, rss))
+      self.peak_rss = max(self.peak_rss, rss)
+      if self.stop_event.wait(self.sample_interval):
+        return
+
+  def update_peak(self) -> int:
+    """
+    int: Updates the peak of the run and returns the traced memory peak
+      since the last reset.
+    """
+    _, peak = tracemalloc.get_traced_memory()
+    self.peak = max(self.peak, peak)
+    return peak
+
+  def enter_phase(self, name: str) -> None:
+    """
+    Starts measuring a phase. The traced peak is reset so the peak of the
+    phase can be read at its exit, and the peak seen so far is kept for
+    the enclosing phase.
+
+    Args:
+      name (str): The name of the phase.
+    """
+    if not tracemalloc.is_tracing():
+      return
+    peak = self.update_peak()
+    if self.stack:
+      self.stack[-1][1] = max(self.stack[-1][1], peak)
+    current, _ = tracemalloc.get_traced_memory()
+    self.stack.append([current, current])
+    tracemalloc.reset_peak()
+
+  def exit_phase(self, name: str) -> None:
+    """
+    Records the net and peak allocation of a phase.
+
+    Args:
+      name (str): The name of the phase.
+    """
+    if not tracemalloc.is_tracing() or not self.stack:
+      return
+    current, _ = tracemalloc.get_traced_memory()
+    start, previous_peak = self.stack.pop()
+    peak = max(previous_peak, self.update_peak())
+    if self.stack:
+      self.stack[-1][1] = max(self.stack[-1][1], peak)
+    stats = self.phases.setdefault(name, [0, 0, 0, 0])
+    stats[0] += 1
+    stats[1] += current - start
+    stats[2] = max(stats[2], peak - start)
+    stats[3] = get_rss()
+
+  def get_phase_report(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the calls, net allocated megabytes, peak
+      allocated megabytes and resident set size in megabytes at exit of
+      each phase, largest peak first.
+    """
+    report = pd.DataFrame(
+      [[name, calls, allocated / MEGABYTE, peak / MEGABYTE, rss / MEGABYTE]
+       for name, (calls, allocated, peak, rss) in self.phases.items()],
+      columns=[PHASE, CALLS, ALLOCATED_MB, PEAK_MB, RSS_MB])
+    return report.sort_values(PEAK_MB, ascending=False)\
+      .reset_index(drop=True)
+
+  def print_report(self, backtest: Optional[Any] = None) -> None:
+    """
+    Prints the memory report, including the sizes of the main attributes
+    of the backtest if it is given.
+
+    Args:
+      backtest (Optional[Any]): The backtest object to measure.
+    """
+    self.update_peak()
+    print("Memory Usage")
+    print(f"Peak Traced Allocation: {self.peak / MEGABYTE:.3f} MB")
+    print(f"Peak Resident Set Size: "
+          f"{max(self.peak_rss, get_rss()) / MEGABYTE:.3f} MB")
+    print(self.get_phase_report().to_string(index=False,
+                                            float_format="{:.3f}".format))
+    if backtest is not None:
+      print("\nBacktest Attribute Sizes")
+      attributes = RUN_BACKTEST_ATTRIBUTES \
+        if all(hasattr(backtest, attribute)
+               for attribute in RUN_BACKTEST_ATTRIBUTES[:3]) else None
+      print(get_attribute_sizes(backtest, attributes)
+            .to_string(index=False, float_format="{:.3f}".format))
@@ -0,0 +1,376 @@
+"""
+This module is responsible for the metrics of backtest runs. It keeps a
+registry of counters and histograms and exports them in the Prometheus
+text format, either to a file for the node exporter textfile collector or
+on a local HTTP endpoint.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Sequence, Tuple
+
+from src.phase_timer import TIMER, PhaseTimer
+
+# Constants
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_PATH = "/metrics"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60, 300)
+
+def format_value(value: float) -> str:
+  """
+  Args:
+    value (float): The sample value.
+
+  Returns:
+    str: Returns the value in the Prometheus text format.
+  """
+  if value == float("inf"):
+    return "+Inf"
+  return repr(float(value)) if not float(value).is_integer() \
+    else str(int(value))
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+  """
+  Args:
+    names (Sequence[str]): The label names.
+    values (Sequence[str]): The label values.
+
+  Returns:
+    str: Returns the label set in the Prometheus text format.
+  """
+  if not names:
+    return ""
+  pairs = []
+  for name, value in zip(names, values):
+    escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n")\
+      .replace('"', '\\"')
+    pairs.append(f'{name}="{escaped}"')
+  return "{" + ",".join(pairs) + "}"
+
+class Counter:
+  """
+  Defines the Counter class which holds a monotonically increasing value
+  for each label set.
+  """
+  kind = "counter"
+
+  def __init__(self,
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = ()) -> None:
+    """
+    This method initialises the Counter class.
+
+    Args:
+      name (str): The metric name.
+      documentation (str): The help text of the metric.
+      labelnames (Sequence[str]): The label names.
+    """
+    self.name: str = name
+    self.documentation: str = documentation
+    self.labelnames: Tuple[str, ...] = tuple(labelnames)
+    self.values: Dict[Tuple[str, ...], float] = {}
+    self.lock: threading.Lock = threading.Lock()
+
+  def inc(self, amount: float = 1, **labels: str) -> None:
+    """
+    Increments the counter of a label set.
+
+    Args:
+      amount (float): The non-negative increment.
+      labels (str): The label values.
+
+    Raises:
+      ValueError: If the increment is negative.
+    """
+    if amount < 0:
+      raise ValueError("Counters can only be incremented.")
+    key = tuple(str(labels[name]) for name in self.labelnames)
+    with self.lock:
+      self.values[key] = self.values.get(key, 0) + amount
+
+  def get(self, **labels: str) -> float:
+    """
+    Args:
+      labels (str): The label values.
+
+    Returns:
+      float: Returns the value of the counter for the label set.
+    """
+    return self.values.get(tuple(str(labels[name])
+                                 for name in self.labelnames), 0)
+
+  def collect(self) -> List[str]:
+    """
+    List[str]: Returns the sample lines of the counter.
+    """
+    with self.lock:
+      return [f"{self.name}_total{format_labels(self.labelnames, key)} "
+              f"{format_value(value)}"
+              for key, value in sorted(self.values.items())]
+
+class Histogram:
+  """
+  Defines the Histogram class which counts observations in cumulative
+  buckets and keeps their sum for each label set.
+  """
+  kind = "histogram"
+
+  def __init__(self,
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+    """
+    This method initialises the Histogram class.
+
+    Args:
+      name (str): The metric name.
+      documentation (str): The help text of the metric.
+      labelnames (Sequence[str]): The label names.
+      buckets (Sequence[float]): The upper bounds of the buckets.
+    """
+    self.name: str = name
+    self.documentation: str = documentation
+    self.labelnames: Tuple[str, ...] = tuple(labelnames)
+    self.buckets: Tuple[float, ...] = tuple(sorted(buckets)) + (float("inf"),)
+
+    """
+    values (Dict[Tuple[str, ...], List[float]]): The bucket counts
+      followed by the sum of the observations of each label set.
+    """
+    self.values: Dict[Tuple[str, ...], List[float]] = {}
+    self.lock: threading.Lock = threading.Lock()
+
+  def observe(self, value: float, **labels: str) -> None:
+    """
+    Records an observation for a label set.
+
+    Args:
+      value (float): The observed value.
+      labels (str): The label values.
+    """
+    key = tuple(str(labels[name]) for name in self.labelnames)
+    with self.lock:
+      if key not in self.values:
+        self.values[key] = [0] * len(self.buckets) + [0.]
+      stats = self.values[key]
+      stats[bisect_left(self.buckets, value)] += 1
+      stats[-1] += value
+
+  def get_count(self, **labels: str) -> int:
+    """
+    Args:
+      labels (str): The label values.
+
+    Returns:
+      int: Returns the number of observations of the label set.
+    """
+    key = tuple(str(labels[name]) for name in self.labelnames)
+    return int(sum(self.values[key][:-1])) if key in self.values else 0
+
+  def collect(self) -> List[str]:
+    """
+    List[str]: Returns the sample lines of the histogram.
+    """
+    lines = []
+    with self.lock:
+      for key, stats in sorted(self.values.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, stats[:-1]):
+          cumulative += bucket_count
+          labels = format_labels(self.labelnames + ("le",),
+                                 key + (format_value(bound),))
+          lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {format_value(stats[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+    return lines
+
+class MetricsRegistry:
+  """
+  Defines the MetricsRegistry class which holds the metrics of a process
+  and renders them in the Prometheus text format.
+  """
+  def __init__(self) -> None:
+    """
+    This method initialises the MetricsRegistry class.
+    """
+    self.metrics: Dict[str, object] = {}
+
+  def counter(self,
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = ()) -> Counter:
+    """
+    Args:
+      name (str): The metric name, without the _total suffix.
+      documentation (str): The help text of the metric.
+      labelnames (Sequence[str]): The label names.
+
+    Returns:
+      Counter: Returns the registered counter, creating it if needed.
+    """
+    if name not in self.metrics:
+      self.metrics[name] = Counter(name, documentation, labelnames)
+    return self.metrics[name]
+
+  def histogram(self,
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """
+    Args:
+      name (str): The metric name.
+      documentation (str): The help text of the metric.
+      labelnames (Sequence[str]): The label names.
+      buckets (Sequence[float]): The upper bounds of the buckets.
+
+    Returns:
+      Histogram: Returns the registered histogram, creating it if needed.
+    """
+    if name not in self.metrics:
+      self.metrics[name] = Histogram(name, documentation, labelnames, buckets)
+    return self.metrics[name]
+
+  def render(self) -> str:
+    """
+    str: Returns all the metrics in the Prometheus text format.
+    """
+    lines = []
+    for name, metric in sorted(self.metrics.items()):
+      exposed_name = name + "_total" if metric.kind == "counter" else name
+      lines.append(f"# HELP {exposed_name} {metric.documentation}")
+      lines.append(f"# TYPE {exposed_name} {metric.kind}")
+      lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+  def write_text_file(self, path: str) -> None:
+    """
+    Writes the metrics to a file. The file is replaced atomically so the
+    node exporter never reads a partial file.
+
+    Args:
+      path (str): The path of the .prom file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+      file.write(self.render())
+    os.replace(tmp_path, path)
+
+  def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serves the metrics on a local HTTP endpoint from a daemon thread.
+
+    Args:
+      port (int): The port to listen on, or 0 for any free port.
+      host (str): The address to listen on.
+
+    Returns:
+      ThreadingHTTPServer: Returns the running server, which can be
+        stopped with shutdown().
+    """
+    registry = self
+    class MetricsHandler(BaseHTTPRequestHandler):
+      """
+      Defines the MetricsHandler class which answers scrapes.
+      """
+      def do_GET(self) -> None:
+        """
+        None: Sends the rendered metrics.
+        """
+        if self.path.split("?")[0] != METRICS_PATH:
+          self.send_error(404)
+          return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, *args) -> None:
+        """
+        None: Silences the request log.
+        """
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class PhaseMetrics:
+  """
+  Defines the PhaseMetrics class which observes the phases of a phase
+  timer and records their durations in a histogram.
+  """
+  def __init__(self, histogram: Histogram) -> None:
+    """
+    This method initialises the PhaseMetrics class.
+
+    Args:
+      histogram (Histogram): The histogram with a "phase" label.
+    """
+    self.histogram: Histogram = histogram
+    self.starts: List[float] = []
+
+  def enter_phase(self, name: str) -> None:
+    """
+    Args:
+      name (str): The name of the phase.
+    """
+    self.starts.append(time.perf_counter())
+
+  def exit_phase(self, name: str) -> None:
+    """
+    Args:
+      name (str): The name of the phase.
+    """
+    if self.starts:
+      self.histogram.observe(time.perf_counter() - self.starts.pop(),
+                             phase=name)
+
+REGISTRY = MetricsRegistry()
+RUNS_COMPLETED = REGISTRY.counter(
+  "backtest_runs_completed", "Backtest simulations completed.", ["engine"])
+FETCH_SECONDS = REGISTRY.histogram(
+  "backtest_fetch_seconds", "Latency of fetching the data of one ticker.")
+CACHE_REQUESTS = REGISTRY.counter(
+  "backtest_cache_requests", "Price cache lookups by result (hit or miss).",
+  ["result"])
+PHASE_SECONDS = REGISTRY.histogram(
+  "backtest_phase_seconds", "Duration of each phase of a backtest run.",
+  ["phase"])
+ROWS_PROCESSED = REGISTRY.counter(
+  "backtest_rows_processed", "Rows processed by each stage.", ["stage"])
+
+def get_cache_hit_ratio() -> float:
+  """
+  float: Returns the share of price cache lookups that were hits, or 0 if
+    there were none.
+  """
+  hits = CACHE_REQUESTS.get(result="hit")
+  total = hits + CACHE_REQUESTS.get(result="miss")
+  return hits / total if total else 0.
+
+def enable_phase_metrics(timer: PhaseTimer = TIMER) -> PhaseMetrics:
+  """
+  Enables the phase timer if needed and records the duration of each of
+  its phases in the phase histogram.
+
+  Args:
+    timer (PhaseTimer): The phase timer to observe. Defaults to the
+      global timer.
+
+  Returns:
+    PhaseMetrics: Returns the observer, which can be removed from the
+      timer with remove_observer().
+  """
+  if not timer.enabled:
+    timer.enable()
+  observer = PhaseMetrics(PHASE_SECONDS)
+  timer.add_observer(observer)
+  return observer
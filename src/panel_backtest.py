@@ -0,0 +1,669 @@
+"""
+This module is responsible for running the backtest simulation directly
+on a price panel. The calendar is walked in blocks of months and only
+the prices required by the longest lookback are kept between blocks, so
+memory use does not grow with the length of the history.
+"""
+from math import ceil
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.metrics import ROWS_PROCESSED, RUNS_COMPLETED
+from src.phase_timer import count, timed
+from src.price_panel import PricePanel, get_wall_clock_dates
+from src.run_backtest import (AUM, BIWEEKLY, DATE_FORMAT, DATETIME,
+                              DIVIDENDS_DF, IC, MOMENTUM, MOMENTUM_GAP,
+                              MONTHLY, QUARTERLY, STRATEGY1_COEFF,
+                              STRATEGY1_T, STRATEGY2_COEFF, STRATEGY2_T,
+                              WEEKLY, RegressionStatistics, get_lookback,
+                              get_max_period_trading_days)
+from src.simulation_kernel import get_simulation_kernel
+
+# Constants
+DEFAULT_BLOCK_MONTHS = 1
+NANOSECONDS_PER_DAY = 86400 * 10 ** 9
+
+# The strategy returns of all the stocks by strategy, lookback and date index
+FeatureCache = Dict[Tuple[str, int, int], np.ndarray]
+
+# Spilled performance record layout
+PERFORMANCE_RECORD_DTYPE = np.dtype([("index", "<i8"),
+                                     (AUM, "<f8"),
+                                     (DIVIDENDS_DF, "<f8")])
+
+def get_period_keys(dates: pd.DatetimeIndex,
+  frequency: str,
+  first_index: int = 0) -> np.ndarray:
+  """
+  Args:
+    dates (pd.DatetimeIndex): The trading calendar.
+    frequency (str): "M" (monthly), "W" (weekly), "2W" (bi-weekly), "Q"
+      (quarterly) or a number N (every N trading days).
+    first_index (int): The index of the first date of a period of N
+      trading days, from which the other periods are counted.
+
+  Raises:
+    ValueError: If the frequency is not supported.
+
+  Returns:
+    np.ndarray: Returns the number of the period of each date, which
+      changes after the last date of each period.
+  """
+  wall_clock_dates = get_wall_clock_dates(dates)
+  if frequency == MONTHLY:
+    return wall_clock_dates.year.to_numpy() * 12 \
+      + wall_clock_dates.month.to_numpy()
+  if frequency == QUARTERLY:
+    return wall_clock_dates.year.to_numpy() * 4 \
+      + (wall_clock_dates.month.to_numpy() - 1) // 3
+  if frequency in (WEEKLY, BIWEEKLY):
+    # the epoch is a Thursday, so the weeks are shifted to start on Monday
+    weeks = (wall_clock_dates.asi8 // NANOSECONDS_PER_DAY + 3) // 7
+    return weeks if frequency == WEEKLY else weeks // 2
+  return (np.arange(len(dates)) - first_index) \
+    // get_max_period_trading_days(frequency)
+
+def get_period_end_indexes(dates: pd.DatetimeIndex,
+  frequency: str = MONTHLY,
+  first_index: int = 0) -> np.ndarray:
+  """
+  Args:
+    dates (pd.DatetimeIndex): The trading calendar.
+    frequency (str): The rebalance frequency, see get_period_keys.
+    first_index (int): The index of the first date of a period of N
+      trading days, see get_period_keys.
+
+  Returns:
+    np.ndarray: Returns the indexes of all the period end dates, i.e. the
+      dates followed by a date in a different period.
+  """
+  keys = get_period_keys(dates, frequency, first_index)
+  return np.flatnonzero(keys[:-1] != keys[1:])
+
+def get_month_end_indexes(dates: pd.DatetimeIndex) -> np.ndarray:
+  """
+  Args:
+    dates (pd.DatetimeIndex): The trading calendar.
+
+  Returns:
+    np.ndarray: Returns the indexes of all the month end dates, i.e. the
+      dates followed by a date in a different month.
+  """
+  return get_period_end_indexes(dates, MONTHLY)
+
+def get_rebalance_indexes_from_b(dates: pd.DatetimeIndex,
+  beginning_date: str,
+  frequency: str = MONTHLY) -> np.ndarray:
+  """
+  Args:
+    dates (pd.DatetimeIndex): The trading calendar.
+    beginning_date (str): The beginning date of the backtest period.
+    frequency (str): The rebalance frequency, see get_period_keys.
+
+  Raises:
+    ValueError: If there is no period end after the beginning date.
+
+  Returns:
+    np.ndarray: Returns the indexes of the period end dates starting from
+      one period before the beginning date, as in RunBacktest. Periods of
+      N trading days start on the first date on or after the beginning
+      date, so they do not move with the length of the warm-up.
+  """
+  wall_clock_dates = get_wall_clock_dates(dates)
+  b_timestamp = pd.to_datetime(beginning_date, format=DATE_FORMAT)
+  period_end_indexes = get_period_end_indexes(
+    dates, frequency, int(wall_clock_dates.searchsorted(b_timestamp)))
+  after_b = np.flatnonzero(wall_clock_dates[period_end_indexes]
+                           > b_timestamp)
+  if len(after_b) == 0:
+    raise ValueError("There is no rebalance date after the beginning date.")
+  return period_end_indexes[max(after_b[0] - 1, 0):]
+
+def get_month_end_indexes_from_b(dates: pd.DatetimeIndex,
+  beginning_date: str) -> np.ndarray:
+  """
+  Args:
+    dates (pd.DatetimeIndex): The trading calendar.
+    beginning_date (str): The beginning date of the backtest period.
+
+  Raises:
+    ValueError: If there is no month end after the beginning date.
+
+  Returns:
+    np.ndarray: Returns the indexes of the month end dates starting from
+      one month before the beginning date, as in RunBacktest.
+  """
+  return get_rebalance_indexes_from_b(dates, beginning_date, MONTHLY)
+
+def select_top(values: np.ndarray, n_top: int) -> np.ndarray:
+  """
+  Selects the largest values in the order of a stable descending sort,
+  i.e. ties are broken by position. Only the candidates found by a
+  partial sort are fully sorted, which matters when a large universe is
+  rebalanced often.
+
+  Args:
+    values (np.ndarray): The values, e.g. the predicted returns.
+    n_top (int): The number of positions to select.
+
+  Returns:
+    np.ndarray: Returns the positions of the n_top largest values,
+      largest first.
+  """
+  if n_top <= 0:
+    return np.array([], dtype=np.int64)
+  if n_top < len(values):
+    threshold = np.partition(values, len(values) - n_top)[len(values) - n_top]
+    # keeping every value tied with the threshold preserves the tie order
+    candidates = np.flatnonzero(values >= threshold)
+  else:
+    candidates = np.arange(len(values))
+  order = np.argsort(-values[candidates], kind="stable")
+  return candidates[order[:n_top]]
+
+class PriceRingBuffer:
+  """
+  Defines the PriceRingBuffer class which keeps the most recent rows of
+  the price panel in a fixed amount of memory.
+  """
+  def __init__(self, capacity: int, n_tickers: int) -> None:
+    """
+    This method initialises the PriceRingBuffer class.
+
+    Args:
+      capacity (int): The number of rows kept.
+      n_tickers (int): The number of tickers per row.
+    """
+    self.capacity: int = capacity
+    self.rows: np.ndarray = np.full((capacity, n_tickers), np.nan)
+    self.end: int = 0
+
+  def set_start(self, index: int) -> None:
+    """
+    Sets the absolute index of the next row to be appended.
+
+    Args:
+      index (int): The absolute index in the calendar.
+    """
+    self.end = index
+
+  def extend(self, rows: np.ndarray) -> None:
+    """
+    Appends rows to the buffer, evicting the oldest rows.
+
+    Args:
+      rows (np.ndarray): The rows to append.
+    """
+    start = self.end
+    self.end += len(rows)
+    if len(rows) > self.capacity:
+      start = self.end - self.capacity
+      rows = rows[-self.capacity:]
+    self.rows[np.arange(start, self.end) % self.capacity] = rows
+
+  def get(self, index: int) -> np.ndarray:
+    """
+    Args:
+      index (int): The absolute index in the calendar.
+
+    Raises:
+      IndexError: If the row has been evicted or not appended yet.
+
+    Returns:
+      np.ndarray: Returns the row at the given index.
+    """
+    if not self.end - self.capacity <= index < self.end:
+      raise IndexError(f"Row {index} is not in the ring buffer.")
+    return self.rows[index % self.capacity]
+
+class PanelBacktest:
+  """
+  Defines the PanelBacktest class which runs the same backtest as
+  RunBacktest on a price panel in bounded memory. Finished performance
+  rows can be spilled to a file instead of being kept in memory.
+  """
+  def __init__(self,
+    panel: PricePanel,
+    initial_aum: int,
+    beginning_date: str,
+    strategy1: str,
+    strategy2: str,
+    days1: int,
+    days2: int,
+    top_pct: int,
+    tickers: Optional[List[str]] = None,
+    block_months: int = DEFAULT_BLOCK_MONTHS,
+    performance_path: Optional[str] = None,
+    use_jit: Optional[bool] = None,
+    rebalance_frequency: str = MONTHLY,
+    feature_cache: Optional[FeatureCache] = None) -> None:
+    """
+    This method initialises the PanelBacktest class.
+
+    Args:
+      panel (PricePanel): The price panel, typically memory-mapped.
+      initial_aum (int): The initial asset under management amount.
+      beginning_date (str): The beginning date of the backtest period.
+      strategy1 (str): The first backtesting strategy, either Momentum
+        or Reversal.
+      strategy2 (str): The second backtesting strategy, either Momentum
+        or Reversal.
+      days1 (int): The number of days to look back during calculation
+        of stock returns for the first strategy.
+      days2 (int): The number of days to look back during calculation
+        of stock returns for the second strategy.
+      top_pct (int): The percentage of stocks to pick for the portfolio.
+      tickers (Optional[List[str]]): The tickers of the universe.
+        Defaults to all the tickers of the panel.
+      block_months (int): The number of months read from the panel at
+        a time.
+      performance_path (Optional[str]): The file to spill the daily
+        performance rows to. Defaults to keeping them in memory.
+      use_jit (Optional[bool]): Whether to simulate with the
+        Numba-compiled kernel. Defaults to using it when Numba is
+        installed.
+      rebalance_frequency (str): "M" (monthly), "W" (weekly), "2W"
+        (bi-weekly), "Q" (quarterly) or a number N (every N trading
+        days). The model is fitted and the portfolio rebalanced at the
+        end of each period, with the returns since the previous
+        rebalance as labels.
+      feature_cache (Optional[FeatureCache]): The strategy returns by
+        strategy, lookback and date index, shared by the backtests of the
+        same panel and tickers so that each is only calculated once.
+        Defaults to no caching.
+
+    Raises:
+      ValueError: If a ticker is not in the panel, the panel does not
+        contain enough history before the beginning date or the
+        rebalance frequency is not supported.
+    """
+    self.panel: PricePanel = panel
+    self.initial_aum: int = initial_aum
+    self.beginning_date: str = beginning_date
+    self.strategy1: str = strategy1
+    self.strategy2: str = strategy2
+    self.days1: int = days1
+    self.days2: int = days2
+    self.top_pct: int = top_pct
+    self.block_months: int = block_months
+    self.performance_path: Optional[str] = performance_path
+    self.rebalance_frequency: str = str(rebalance_frequency)
+    self.kernel: Callable = get_simulation_kernel(use_jit)
+    self.feature_cache: Optional[FeatureCache] = feature_cache
+
+    """
+    tickers (np.ndarray): The tickers of the universe.
+    columns (Optional[np.ndarray]): The panel columns of the tickers, or
+      None when the whole panel is used.
+    lookback (int): The number of rows before a rebalance date that the
+      features need.
+    n_stocks (int): The number of stocks bought at each rebalance.
+    calendar_month_end_indexes (np.ndarray): The indexes of all the
+      month end dates of the panel.
+    rebalance_indexes (List[int]): The indexes of the rebalance dates,
+      starting with the period end before the first rebalance.
+    b_index (int): The index of the first date on or after the
+      beginning date.
+    next_index (int): The index of the next row to be simulated.
+    """
+    if tickers is None:
+      self.tickers: np.ndarray = np.array(panel.tickers, dtype=object)
+      self.columns: Optional[np.ndarray] = None
+    else:
+      panel_columns = {ticker: idx for idx, ticker in enumerate(panel.tickers)}
+      missing = [ticker for ticker in tickers if ticker not in panel_columns]
+      if missing:
+        raise ValueError(f"Tickers {missing} are not in the price panel.")
+      self.tickers: np.ndarray = np.array(tickers, dtype=object)
+      self.columns: Optional[np.ndarray] = \
+        np.array([panel_columns[ticker] for ticker in tickers])
+    self.lookback: int = max(get_lookback(strategy1, days1),
+                             get_lookback(strategy2, days2))
+    self.n_stocks: int = ceil(len(self.tickers) * (top_pct / 100))
+    self.calendar_month_end_indexes: np.ndarray = \
+      get_month_end_indexes(panel.dates)
+    self.rebalance_indexes: List[int] = get_rebalance_indexes_from_b(
+      panel.dates, beginning_date, self.rebalance_frequency).tolist()
+    if self.rebalance_indexes[0] < self.lookback:
+      raise ValueError(f"The price panel needs at least {self.lookback} "
+                       "trading days before the rebalance date preceding the "
+                       "beginning date.")
+    b_timestamp = pd.to_datetime(beginning_date, format=DATE_FORMAT)
+    self.b_index: int = int(np.searchsorted(
+      get_wall_clock_dates(panel.dates), b_timestamp))
+    self.next_index: int = self.rebalance_indexes[0] - self.lookback
+
+    """
+    ring (PriceRingBuffer): The close prices of the rows before the
+      current block that the features may still need.
+    regression (RegressionStatistics): The training statistics.
+    holdings (np.ndarray): The positions of the held stocks.
+    selection (np.ndarray): The positions of the stocks selected at the
+      last rebalance, which the simulation kernel buys at its close.
+    amounts (np.ndarray): The amounts of the held stocks.
+    aum (float): The latest assets under management amount.
+    cumulative_dividends (float): The latest cumulative dividends.
+    cumulative_ic (float): The latest cumulative information coefficient.
+    previous_features (np.ndarray): The features at the last rebalance.
+    previous_close (np.ndarray): The close prices at the last rebalance.
+    previous_index (int): The index of the last rebalance.
+    """
+    self.ring: PriceRingBuffer = \
+      PriceRingBuffer(self.lookback + 1, len(self.tickers))
+    self.ring.set_start(self.next_index)
+    self.regression: RegressionStatistics = RegressionStatistics()
+    self.holdings: np.ndarray = np.array([], dtype=np.int64)
+    self.selection: np.ndarray = np.array([], dtype=np.int64)
+    self.amounts: np.ndarray = np.array([])
+    self.aum: float = initial_aum
+    self.cumulative_dividends: float = 0.0
+    self.cumulative_ic: float = 0.0
+    self.previous_features: Optional[np.ndarray] = None
+    self.previous_close: Optional[np.ndarray] = None
+    self.previous_index: Optional[int] = None
+
+    """
+    portfolio_record (List[List[Tuple[str, float]]]): The list containing
+      a record of previous portfolios.
+    ic_record (List[Tuple[int, float]]): The rebalance indexes and the
+      cumulative information coefficients.
+    statistics_record (List[List[float]]): The coefficients and t-values
+      of each monthly fit.
+    performance_blocks (List[np.ndarray]): The daily performance records
+      when they are not spilled to a file.
+    """
+    self.portfolio_record: List[List[Tuple[str, float]]] = []
+    self.ic_record: List[Tuple[int, float]] = []
+    self.statistics_record: List[List[float]] = []
+    self.performance_blocks: List[np.ndarray] = []
+    if performance_path is not None:
+      open(performance_path, "wb").close()
+
+  @timed("panel_backtest.read_block")
+  def read_block(self, start: int, end: int) -> Tuple[np.ndarray,
+                                                      np.ndarray]:
+    """
+    Reads a block of rows from the panel into memory.
+
+    Args:
+      start (int): The index of the first row.
+      end (int): The index after the last row.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray]: Returns the close prices and the
+        dividends of the block.
+    """
+    close = np.array(self.panel.close[start:end], dtype=np.float64)
+    dividends = np.array(self.panel.dividends[start:end], dtype=np.float64)
+    if self.columns is not None:
+      close = close[:, self.columns]
+      dividends = dividends[:, self.columns]
+    return close, dividends
+
+  def get_block_end(self, start: int, end_index: int) -> int:
+    """
+    Args:
+      start (int): The index of the first row of the block.
+      end_index (int): The index at which the run stops.
+
+    Returns:
+      int: Returns the index after the last row of the block, which ends
+        at the block_months-th month end from the start.
+    """
+    month_end_indexes = self.calendar_month_end_indexes
+    position = np.searchsorted(month_end_indexes, start) \
+      + self.block_months - 1
+    if position >= len(month_end_indexes):
+      return end_index
+    return min(int(month_end_indexes[position]) + 1, end_index)
+
+  def get_close_row(self,
+    index: int,
+    block_start: int,
+    block_close: np.ndarray) -> np.ndarray:
+    """
+    Args:
+      index (int): The absolute index of the row.
+      block_start (int): The index of the first row of the block.
+      block_close (np.ndarray): The close prices of the block.
+
+    Returns:
+      np.ndarray: Returns the close prices at the given index, from the
+        current block or from the ring buffer.
+    """
+    if index >= block_start:
+      return block_close[index - block_start]
+    return self.ring.get(index)
+
+  def get_features(self,
+    index: int,
+    block_start: int,
+    block_close: np.ndarray) -> np.ndarray:
+    """
+    Calculates the features of all the stocks at a given date index.
+
+    Args:
+      index (int): The absolute index of the date.
+      block_start (int): The index of the first row of the block.
+      block_close (np.ndarray): The close prices of the block.
+
+    Returns:
+      np.ndarray: Returns the n x 2 strategy returns.
+    """
+    features = []
+    for strategy, days in ((self.strategy1, self.days1),
+                           (self.strategy2, self.days2)):
+      key = (strategy, days, index)
+      if self.feature_cache is not None and key in self.feature_cache:
+        features.append(self.feature_cache[key])
+        continue
+      end = index - MOMENTUM_GAP * (strategy == MOMENTUM)
+      end_close = self.get_close_row(end, block_start, block_close)
+      start_close = self.get_close_row(end - days, block_start, block_close)
+      features.append((end_close - start_close) / start_close * 100)
+      if self.feature_cache is not None:
+        self.feature_cache[key] = features[-1]
+    return np.column_stack(features)
+
+  @timed("panel_backtest.simulate")
+  def simulate(self,
+    close: np.ndarray,
+    dividends: np.ndarray,
+    rebalance_rows: Optional[List[int]] = None,
+    selections: Optional[List[np.ndarray]] = None) -> Tuple[np.ndarray,
+                                                            np.ndarray]:
+    """
+    Simulates the holdings over consecutive days with the simulation
+    kernel, buying the selected stocks with the AUM of each rebalance day.
+
+    Args:
+      close (np.ndarray): The close prices of the days.
+      dividends (np.ndarray): The dividends of the days.
+      rebalance_rows (Optional[List[int]]): The increasing rows at whose
+        close the portfolio is rebalanced.
+      selections (Optional[List[np.ndarray]]): The stocks bought at each
+        rebalance.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray]: Returns the AUM and the cumulative
+        dividends of each day.
+    """
+    rebalance_rows = rebalance_rows or []
+    selections = selections or []
+    n_selected = np.array([len(selection) for selection in selections],
+                          dtype=np.int64)
+    padded = np.zeros((len(selections), max(self.n_stocks, 1)),
+                      dtype=np.int64)
+    for position, selection in enumerate(selections):
+      padded[position, :len(selection)] = selection
+    aum, cumulative_dividends, amounts_record, self.holdings, self.amounts, \
+      self.aum, self.cumulative_dividends = self.kernel(
+        np.ascontiguousarray(close), np.ascontiguousarray(dividends),
+        np.array(rebalance_rows, dtype=np.int64), padded, n_selected,
+        np.ascontiguousarray(self.holdings, dtype=np.int64),
+        np.ascontiguousarray(self.amounts, dtype=np.float64),
+        float(self.aum), float(self.cumulative_dividends))
+    for position, selection in enumerate(selections):
+      self.portfolio_record.append(list(zip(
+        self.tickers[selection].tolist(),
+        amounts_record[position, :len(selection)].tolist())))
+    return aum, cumulative_dividends
+
+  @timed("panel_backtest.rebalance")
+  def rebalance(self,
+    index: int,
+    block_start: int,
+    block_close: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Updates the training statistics with the period that just ended, fits
+    the model, predicts the returns and selects the top stocks. They are
+    bought by the simulation kernel, which knows the AUM of the day.
+
+    Args:
+      index (int): The absolute index of the rebalance date.
+      block_start (int): The index of the first row of the block.
+      block_close (np.ndarray): The close prices of the block.
+
+    Returns:
+      Optional[np.ndarray]: Returns the stocks to buy, or None at the
+        period end before the first rebalance.
+    """
+    features = self.get_features(index, block_start, block_close)
+    close = self.get_close_row(index, block_start, block_close)
+    if self.previous_index is None:
+      # the period end before the first rebalance only provides features
+      self.previous_features = features
+      self.previous_close = close
+      self.previous_index = index
+      return None
+
+    labels = (close - self.previous_close) / self.previous_close * 100
+    valid = np.isfinite(labels) & np.isfinite(self.previous_features)\
+      .all(axis=1)
+    self.regression.update(self.previous_features[valid], labels[valid])
+    count("regressions_fitted")
+    parameters, t_values = self.regression.fit()
+    self.statistics_record.append(parameters[1:].tolist() + t_values.tolist())
+
+    if len(self.selection) > 0:
+      number_correct = np.sum(close[self.selection]
+                              > self.previous_close[self.selection])
+      prop_correct = number_correct / self.n_stocks
+      self.cumulative_ic += (2 * prop_correct) - 1
+      self.ic_record.append((self.previous_index, self.cumulative_ic))
+
+    # stocks without a prediction are never bought
+    predicted_returns = parameters[0] + features @ parameters[1:]
+    predicted_returns[~np.isfinite(predicted_returns)] = -np.inf
+    self.selection = select_top(predicted_returns,
+                                min(self.n_stocks,
+                                    np.isfinite(predicted_returns).sum()))
+
+    self.previous_features = features
+    self.previous_close = close
+    self.previous_index = index
+    return self.selection
+
+  def process_block(self, start: int, end: int) -> None:
+    """
+    Simulates the rows of a block, rebalancing at the rebalance dates in
+    it.
+
+    Args:
+      start (int): The index of the first row of the block.
+      end (int): The index after the last row of the block.
+    """
+    close, dividends = self.read_block(start, end)
+    ROWS_PROCESSED.inc(end - start, stage="simulate")
+    rebalance_rows = []
+    selections = []
+    first_position = np.searchsorted(self.rebalance_indexes, start)
+    last_position = np.searchsorted(self.rebalance_indexes, end)
+    for index in self.rebalance_indexes[first_position:last_position]:
+      selection = self.rebalance(index, start, close)
+      if selection is not None:
+        rebalance_rows.append(index - start)
+        selections.append(selection)
+    aum, cumulative_dividends = self.simulate(close, dividends,
+                                              rebalance_rows, selections)
+
+    first = max(start, self.b_index)
+    if first < end:
+      records = np.empty(end - first, dtype=PERFORMANCE_RECORD_DTYPE)
+      records["index"] = np.arange(first, end)
+      records[AUM] = aum[first - start:]
+      records[DIVIDENDS_DF] = cumulative_dividends[first - start:]
+      if self.performance_path is None:
+        self.performance_blocks.append(records)
+      else:
+        with open(self.performance_path, "ab") as file:
+          records.tofile(file)
+    self.ring.extend(close)
+
+  def run(self, end_index: Optional[int] = None) -> None:
+    """
+    Simulates the backtest block by block. The run can be continued
+    later by calling this method again with a later end index.
+
+    Args:
+      end_index (Optional[int]): The index at which to stop. Defaults to
+        the end of the panel.
+    """
+    n_dates = len(self.panel.dates)
+    end_index = n_dates if end_index is None else min(end_index, n_dates)
+    while self.next_index < end_index:
+      block_end = self.get_block_end(self.next_index, end_index)
+      self.process_block(self.next_index, block_end)
+      self.next_index = block_end
+
+  def fill_up_portfolio_performance(self) -> None:
+    """
+    None: Simulates the backtest over the whole panel.
+    """
+    self.run()
+    RUNS_COMPLETED.inc(engine="panel")
+
+  def get_portfolio_performance(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the portfolio performance dataframe with the
+      same columns as RunBacktest.portfolio_performance, reading the
+      spilled rows back if necessary.
+    """
+    if self.performance_path is None:
+      records = np.concatenate(self.performance_blocks) \
+        if self.performance_blocks else \
+        np.empty(0, dtype=PERFORMANCE_RECORD_DTYPE)
+    else:
+      records = np.fromfile(self.performance_path,
+                            dtype=PERFORMANCE_RECORD_DTYPE)
+    portfolio_performance = pd.DataFrame()
+    portfolio_performance[DATETIME] = self.panel.dates[records["index"]]
+    portfolio_performance[AUM] = records[AUM]
+    portfolio_performance[DIVIDENDS_DF] = records[DIVIDENDS_DF]
+    return portfolio_performance
+
+  def get_monthly_ic(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the cumulative information coefficient at each
+      rebalance (each month end by default) with the same columns as
+      RunBacktest.monthly_ic.
+    """
+    monthly_ic = pd.DataFrame()
+    monthly_ic[DATETIME] = \
+      self.panel.dates[[index for index, _ in self.ic_record]]
+    monthly_ic[IC] = [ic for _, ic in self.ic_record]
+    return monthly_ic
+
+  def get_model_statistics_record(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the model statistics dataframe with the same
+      columns as RunBacktest.model_statistics_record.
+    """
+    return pd.DataFrame(self.statistics_record,
+                        columns=[STRATEGY1_COEFF,
+                                 STRATEGY2_COEFF,
+                                 STRATEGY1_T,
+                                 STRATEGY2_T],
+                        dtype=np.float64)
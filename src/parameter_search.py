@@ -0,0 +1,327 @@
+"""
+This module is responsible for searching the strategy parameters with
+successive halving. Every candidate is backtested on a short history,
+the best fraction by a summary statistic is promoted to a longer one, and
+so on until the survivors reach the whole history. The backtests of the
+promoted candidates continue from where they stopped rather than
+restarting, and the strategy returns are cached and shared between
+candidates with the same strategy and lookback.
+"""
+import itertools
+from math import ceil
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_stats import DAILY_SHARPE_RATIO, FINAL_AUM
+from src.engine_validation import DEFAULT_FAST_BLOCK_MONTHS
+from src.panel_backtest import (MONTHLY, FeatureCache, PanelBacktest,
+                                get_rebalance_indexes_from_b)
+from src.price_panel import PricePanel
+from src.report_generator import (MODEL_STATISTICS, MONTHLY_IC, NAME,
+                                  PARAMETERS, PORTFOLIO_PERFORMANCE,
+                                  get_statistics)
+from src.run_backtest import (MOMENTUM, REVERSAL, get_lookback,
+                              get_warmup_trading_days)
+
+# Constants
+DEFAULT_ETA = 3
+DEFAULT_MIN_PERIODS = 6
+STRATEGY_PARAMETERS = ["strategy1", "strategy2"]
+INTEGER_PARAMETERS = ["days1", "days2", "top_pct"]
+SEARCH_PARAMETERS = STRATEGY_PARAMETERS + INTEGER_PARAMETERS
+
+# History Columns
+CANDIDATE = "candidate"
+ROUND = "round"
+PERIODS = "periods"
+
+def parse_grid(grid: str) -> Dict[str, List[Any]]:
+  """
+  Args:
+    grid (str): The values of each parameter, e.g.
+      "days1=20,50,100;days2=5,10;strategy1=M,R".
+
+  Raises:
+    ValueError: If a parameter or a strategy type is not supported.
+
+  Returns:
+    Dict[str, List[Any]]: Returns the values of each parameter.
+  """
+  values = {}
+  for item in filter(None, grid.replace(" ", "").split(";")):
+    name, _, text = item.partition("=")
+    if name not in SEARCH_PARAMETERS:
+      raise ValueError(f"The search parameters must be among "
+                       f"{SEARCH_PARAMETERS}.")
+    values[name] = [int(value) if name in INTEGER_PARAMETERS
+                    else value.upper() for value in text.split(",")]
+    if name in STRATEGY_PARAMETERS \
+      and not set(values[name]) <= {MOMENTUM, REVERSAL}:
+      raise ValueError(f"The strategy types must be {MOMENTUM} or "
+                       f"{REVERSAL}.")
+  return values
+
+def get_candidates(grid: Dict[str, List[Any]],
+  defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+  """
+  Args:
+    grid (Dict[str, List[Any]]): The values of the searched parameters.
+    defaults (Dict[str, Any]): The values of the other parameters.
+
+  Returns:
+    List[Dict[str, Any]]: Returns every combination of the values, except
+      those with two identical signals, whose regression is singular.
+  """
+  names = list(grid)
+  candidates = [{**defaults, **dict(zip(names, values))}
+                for values in itertools.product(*[grid[name]
+                                                  for name in names])]
+  return [candidate for candidate in candidates
+          if (candidate["strategy1"], candidate["days1"])
+          != (candidate["strategy2"], candidate["days2"])]
+
+def get_candidates_warmup_trading_days(candidates: List[Dict[str, Any]],
+  rebalance_frequency: str = MONTHLY) -> int:
+  """
+  Args:
+    candidates (List[Dict[str, Any]]): The strategy1, strategy2, days1
+      and days2 of every candidate.
+    rebalance_frequency (str): The rebalance frequency, see
+      get_warmup_trading_days.
+
+  Returns:
+    int: Returns the number of trading days of history needed before the
+      beginning date by the candidate with the longest lookback.
+  """
+  return max(get_warmup_trading_days(candidate["strategy1"],
+                                     candidate["days1"],
+                                     candidate["strategy2"],
+                                     candidate["days2"], rebalance_frequency)
+             for candidate in candidates)
+
+def get_budgets(n_periods: int, min_periods: int, eta: int) -> List[int]:
+  """
+  Args:
+    n_periods (int): The number of rebalance periods of the whole history.
+    min_periods (int): The number of periods of the first round.
+    eta (int): The factor by which the history grows between rounds.
+
+  Returns:
+    List[int]: Returns the number of periods of each round, the last one
+      being the whole history.
+  """
+  budgets = []
+  periods = min_periods
+  while periods < n_periods:
+    budgets.append(periods)
+    periods *= eta
+  return budgets + [n_periods]
+
+class SuccessiveHalving:
+  """
+  Defines the SuccessiveHalving class which searches the strategy
+  parameters, promoting the best candidates of each round to a longer
+  history.
+  """
+  def __init__(self,
+    panel: PricePanel,
+    initial_aum: int,
+    beginning_date: str,
+    candidates: List[Dict[str, Any]],
+    tickers: Optional[List[str]] = None,
+    rebalance_frequency: str = MONTHLY,
+    metric: str = DAILY_SHARPE_RATIO,
+    eta: int = DEFAULT_ETA,
+    min_periods: int = DEFAULT_MIN_PERIODS) -> None:
+    """
+    This method initialises the SuccessiveHalving class.
+
+    Args:
+      panel (PricePanel): The price panel.
+      initial_aum (int): The initial asset under management amount.
+      beginning_date (str): The beginning date of the backtest period.
+      candidates (List[Dict[str, Any]]): The strategy1, strategy2, days1,
+        days2 and top_pct of every candidate.
+      tickers (Optional[List[str]]): The tickers of the universe.
+        Defaults to all the tickers of the panel.
+      rebalance_frequency (str): The rebalance frequency, see
+        PanelBacktest.
+      metric (str): The summary statistic ranking the candidates, the
+        highest being the best.
+      eta (int): The factor by which the number of candidates shrinks
+        and the history grows between rounds.
+      min_periods (int): The number of rebalance periods of the first
+        round.
+
+    Raises:
+      ValueError: If there are no candidates, eta is less than 2, the
+        first round has less than 2 periods or the panel is too short for
+        the longest lookback of the candidates.
+    """
+    if not candidates:
+      raise ValueError("There must be at least one candidate.")
+    if eta < 2:
+      raise ValueError("eta must be at least 2.")
+    if min_periods < 2:
+      raise ValueError("The first round needs at least 2 periods.")
+    self.panel: PricePanel = panel
+    self.initial_aum: int = initial_aum
+    self.beginning_date: str = beginning_date
+    self.candidates: List[Dict[str, Any]] = candidates
+    self.tickers: Optional[List[str]] = tickers
+    self.rebalance_frequency: str = rebalance_frequency
+    self.metric: str = metric
+    self.eta: int = eta
+
+    """
+    rebalance_indexes (np.ndarray): The panel indexes of the rebalance
+      dates, starting with the period end before the first rebalance.
+    budgets (List[int]): The number of rebalance periods of each round.
+    feature_cache (FeatureCache): The strategy returns shared by the
+      backtests.
+    backtests (Dict[int, PanelBacktest]): The backtest of every candidate
+      that has been run, by candidate number.
+    survivors (List[int]): The candidates of the next round, best first.
+    history (List[Dict[str, Any]]): The metric of every candidate at each
+      round it took part in.
+    """
+    self.rebalance_indexes: np.ndarray = get_rebalance_indexes_from_b(
+      panel.dates, beginning_date, rebalance_frequency)
+    lookback = max(max(get_lookback(candidate["strategy1"],
+                                    candidate["days1"]),
+                       get_lookback(candidate["strategy2"],
+                                    candidate["days2"]))
+                   for candidate in candidates)
+    if self.rebalance_indexes[0] < lookback:
+      raise ValueError(f"The price panel needs at least {lookback} trading "
+                       "days before the rebalance date preceding the "
+                       "beginning date for the longest lookback of the "
+                       "candidates.")
+    self.budgets: List[int] = get_budgets(len(self.rebalance_indexes) - 1,
+                                          min_periods, eta)
+    self.feature_cache: FeatureCache = {}
+    self.backtests: Dict[int, PanelBacktest] = {}
+    self.survivors: List[int] = list(range(len(candidates)))
+    self.history: List[Dict[str, Any]] = []
+
+  def get_end_index(self, periods: int) -> Optional[int]:
+    """
+    Args:
+      periods (int): The number of rebalance periods of a round.
+
+    Returns:
+      Optional[int]: Returns the panel index after the last rebalance of
+        the round, or None for the whole history.
+    """
+    if periods >= len(self.rebalance_indexes) - 1:
+      return None
+    return int(self.rebalance_indexes[periods]) + 1
+
+  def get_backtest(self, candidate: int) -> PanelBacktest:
+    """
+    Args:
+      candidate (int): The candidate number.
+
+    Returns:
+      PanelBacktest: Returns the backtest of the candidate, creating it on
+        first use.
+    """
+    if candidate not in self.backtests:
+      self.backtests[candidate] = PanelBacktest(
+        self.panel, self.initial_aum, self.beginning_date,
+        **self.candidates[candidate], tickers=self.tickers,
+        block_months=DEFAULT_FAST_BLOCK_MONTHS,
+        rebalance_frequency=self.rebalance_frequency,
+        feature_cache=self.feature_cache)
+    return self.backtests[candidate]
+
+  def get_result(self, candidate: int) -> Dict[str, Any]:
+    """
+    Args:
+      candidate (int): The candidate number.
+
+    Returns:
+      Dict[str, Any]: Returns the name, parameters, portfolio performance,
+        monthly IC and model statistics of the candidate's backtest so
+        far, as ReportGenerator takes them.
+    """
+    backtest = self.backtests[candidate]
+    return {NAME: f"candidate_{candidate}",
+            PARAMETERS: self.candidates[candidate],
+            PORTFOLIO_PERFORMANCE: backtest.get_portfolio_performance(),
+            MONTHLY_IC: backtest.get_monthly_ic(),
+            MODEL_STATISTICS: backtest.get_model_statistics_record()}
+
+  def run_round(self, round_number: int) -> None:
+    """
+    Continues the backtests of the survivors to the history of a round,
+    ranks them and promotes the best ones.
+
+    Args:
+      round_number (int): The round number.
+    """
+    periods = self.budgets[round_number]
+    end_index = self.get_end_index(periods)
+    scores = {}
+    for candidate in self.survivors:
+      backtest = self.get_backtest(candidate)
+      backtest.run(end_index)
+      statistics = get_statistics(self.get_result(candidate))
+      scores[candidate] = statistics[self.metric]
+      self.history.append({CANDIDATE: candidate,
+                           ROUND: round_number,
+                           PERIODS: periods,
+                           **self.candidates[candidate],
+                           self.metric: statistics[self.metric],
+                           FINAL_AUM: statistics[FINAL_AUM]})
+    ranked = sorted(self.survivors, key=lambda candidate: -np.nan_to_num(
+      scores[candidate], nan=-np.inf))
+    if round_number < len(self.budgets) - 1:
+      ranked = ranked[:max(1, ceil(len(ranked) / self.eta))]
+      # the backtests of eliminated candidates are not continued
+      for candidate in set(self.survivors) - set(ranked):
+        del self.backtests[candidate]
+    self.survivors = ranked
+
+  def run(self) -> pd.DataFrame:
+    """
+    Runs all the rounds.
+
+    Returns:
+      pd.DataFrame: Returns the ranking of the candidates.
+    """
+    for round_number in range(len(self.budgets)):
+      self.run_round(round_number)
+    return self.get_ranking()
+
+  def get_ranking(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the last round and metric of every candidate,
+      best first: the candidates that went further rank higher, then the
+      higher metrics.
+    """
+    history = pd.DataFrame(self.history)
+    ranking = history.drop_duplicates(CANDIDATE, keep="last")
+    return ranking.sort_values([ROUND, self.metric], ascending=False,
+                               na_position="last").reset_index(drop=True)
+
+  def get_best(self) -> Dict[str, Any]:
+    """
+    Dict[str, Any]: Returns the result of the best candidate over the
+      whole history, as ReportGenerator takes them.
+    """
+    return self.get_result(self.survivors[0])
+
+  def print_summary(self) -> None:
+    """
+    None: Prints the rounds of the search and the ranking of the
+      candidates.
+    """
+    ranking = self.get_ranking()
+    print(f"Successive Halving Search ({len(self.candidates)} candidates, "
+          f"rounds of {self.budgets} periods, ranked by {self.metric})")
+    print(f"Backtested periods: {ranking[PERIODS].sum()} instead of "
+          f"{len(self.candidates) * self.budgets[-1]} for the whole grid")
+    print(ranking.to_string(index=False, float_format="{:.5f}".format))
@@ -0,0 +1,232 @@
+"""
+This module is responsible for timing the phases of a backtest run. The
+timers are disabled by default, in which case phase() returns a shared
+no-op context manager and count() returns immediately.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List
+
+import pandas as pd
+
+# Constants
+NULL_CONTEXT = nullcontext()
+MICROSECONDS = 1e6
+
+# Report Columns
+PHASE = "phase"
+CALLS = "calls"
+WALL_SECONDS = "wall_seconds"
+CPU_SECONDS = "cpu_seconds"
+COUNTER = "counter"
+COUNT = "count"
+
+class PhaseTimer:
+  """
+  Defines the PhaseTimer class which accumulates the wall-clock time, CPU
+  time and number of calls of named phases, named event counters and the
+  trace events of each phase.
+  """
+  def __init__(self) -> None:
+    """
+    This method initialises the PhaseTimer class.
+    """
+    self.enabled: bool = False
+
+    """
+    phases (Dict[str, List[float]]): The number of calls, wall-clock
+      seconds and CPU seconds of each phase.
+    counters (Dict[str, int]): The value of each counter.
+    events (List[Dict]): The Chrome trace events of each phase call.
+    origin (float): The wall-clock time at which the timer was reset.
+    observers (List[Any]): The objects notified through enter_phase(name)
+      and exit_phase(name) around each phase, e.g. the memory report.
+    """
+    self.phases: Dict[str, List[float]] = {}
+    self.counters: Dict[str, int] = {}
+    self.events: List[Dict] = []
+    self.origin: float = time.perf_counter()
+    self.observers: List[Any] = []
+
+  def enable(self) -> None:
+    """
+    None: Clears the recorded phases and starts recording.
+    """
+    self.reset()
+    self.enabled = True
+
+  def disable(self) -> None:
+    """
+    None: Stops recording, keeping the recorded phases.
+    """
+    self.enabled = False
+
+  def reset(self) -> None:
+    """
+    None: Clears the recorded phases, counters and events.
+    """
+    self.phases = {}
+    self.counters = {}
+    self.events = []
+    self.origin = time.perf_counter()
+
+  def add_observer(self, observer: Any) -> None:
+    """
+    Registers an object to be notified around each phase.
+
+    Args:
+      observer (Any): An object with enter_phase(name) and
+        exit_phase(name) methods.
+    """
+    self.observers.append(observer)
+
+  def remove_observer(self, observer: Any) -> None:
+    """
+    Unregisters an observer added with add_observer.
+
+    Args:
+      observer (Any): The observer to remove.
+    """
+    self.observers.remove(observer)
+
+  def phase(self, name: str):
+    """
+    Args:
+      name (str): The name of the phase.
+
+    Returns:
+      ContextManager: Returns a context manager which times the phase, or
+        a no-op context manager if the timer is disabled.
+    """
+    if not self.enabled:
+      return NULL_CONTEXT
+    return self.record(name)
+
+  @contextmanager
+  def record(self, name: str) -> Iterator[None]:
+    """
+    Times the wrapped block and records it under the given phase name.
+
+    Args:
+      name (str): The name of the phase.
+    """
+    for observer in self.observers:
+      observer.enter_phase(name)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+      yield
+    finally:
+      wall = time.perf_counter() - wall_start
+      cpu = time.process_time() - cpu_start
+      for observer in reversed(self.observers):
+        observer.exit_phase(name)
+      stats = self.phases.setdefault(name, [0, 0., 0.])
+      stats[0] += 1
+      stats[1] += wall
+      stats[2] += cpu
+      self.events.append({"name": name,
+                          "ph": "X",
+                          "ts": (wall_start - self.origin) * MICROSECONDS,
+                          "dur": wall * MICROSECONDS,
+                          "pid": os.getpid(),
+                          "tid": threading.get_ident()})
+
+  def count(self, name: str, n: int = 1) -> None:
+    """
+    Increments a counter if the timer is enabled.
+
+    Args:
+      name (str): The name of the counter.
+      n (int): The increment.
+    """
+    if self.enabled:
+      self.counters[name] = self.counters.get(name, 0) + n
+
+  def get_phase_report(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the calls, wall-clock and CPU seconds of each
+      phase, slowest first.
+    """
+    report = pd.DataFrame(
+      [[name, *stats] for name, stats in self.phases.items()],
+      columns=[PHASE, CALLS, WALL_SECONDS, CPU_SECONDS])
+    return report.sort_values(WALL_SECONDS, ascending=False)\
+      .reset_index(drop=True)
+
+  def get_counter_report(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the value of each counter.
+    """
+    return pd.DataFrame(sorted(self.counters.items()),
+                        columns=[COUNTER, COUNT])
+
+  def print_report(self) -> None:
+    """
+    None: Prints the phase and counter reports.
+    """
+    print("Phase Timings")
+    print(self.get_phase_report().to_string(index=False,
+                                            float_format="{:.4f}".format))
+    if self.counters:
+      print("\nCounters")
+      print(self.get_counter_report().to_string(index=False))
+
+  def write_chrome_trace(self, path: str) -> None:
+    """
+    Writes the recorded phase calls in the Chrome trace event format,
+    which can be opened in chrome://tracing or Perfetto.
+
+    Args:
+      path (str): The path of the trace file.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+      json.dump({"traceEvents": self.events,
+                 "displayTimeUnit": "ms",
+                 "otherData": {"counters": self.counters}}, file)
+
+TIMER = PhaseTimer()
+
+def phase(name: str):
+  """
+  Args:
+    name (str): The name of the phase.
+
+  Returns:
+    ContextManager: Returns a context manager which times the phase on
+      the global timer.
+  """
+  return TIMER.phase(name)
+
+def count(name: str, n: int = 1) -> None:
+  """
+  Increments a counter of the global timer.
+
+  Args:
+    name (str): The name of the counter.
+    n (int): The increment.
+  """
+  TIMER.count(name, n)
+
+def timed(name: str) -> Callable:
+  """
+  Args:
+    name (str): The name of the phase.
+
+  Returns:
+    Callable: Returns a decorator which times each call of the decorated
+      function as the given phase on the global timer.
+  """
+  def decorator(function: Callable) -> Callable:
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+      if not TIMER.enabled:
+        return function(*args, **kwargs)
+      with TIMER.record(name):
+        return function(*args, **kwargs)
+    return wrapper
+  return decorator
@@ -0,0 +1,304 @@
+"""
+This module is responsible for the aligned price panel and its
+memory-mapped binary snapshot format.
+
+A snapshot file consists of the magic bytes, the little-endian length of
+a JSON header, the JSON header itself (tickers, calendar and layout) and
+zero padding up to a 64-byte boundary, followed by the raw little-endian
+float64 close price and dividends arrays in dates x tickers order.
+"""
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Constants
+SNAPSHOT_MAGIC = b"DSQFPNL1"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ALIGNMENT = 64
+SNAPSHOT_WRITE_ROWS = 4096
+SNAPSHOT_DTYPE = "<f8"
+HEADER_LENGTH_DTYPE = "<u8"
+HEADER_LENGTH_SIZE = 8
+
+# Header Keys
+VERSION = "version"
+TICKERS = "tickers"
+DATES = "dates"
+TIMEZONE = "timezone"
+SHAPE = "shape"
+DTYPE = "dtype"
+ARRAYS = "arrays"
+
+# Yahoo Finance Constants
+CLOSE_PRICE = "Close"
+DIVIDENDS = "Dividends"
+
+def get_wall_clock_dates(index: pd.Index) -> pd.DatetimeIndex:
+  """
+  Converts a (possibly timezone-aware) date index to naive wall-clock
+  dates, which is what the backtest compares against the user dates.
+
+  Args:
+    index (pd.Index): The date index of a stock dataframe.
+
+  Returns:
+    pd.DatetimeIndex: Returns the naive wall-clock dates.
+  """
+  if isinstance(index, pd.DatetimeIndex):
+    return index.tz_localize(None) if index.tz is not None else index
+  return pd.DatetimeIndex([pd.Timestamp(date).tz_localize(None)
+                           for date in index])
+
+def get_timezone(index: pd.Index) -> Optional[str]:
+  """
+  Args:
+    index (pd.Index): The date index of a stock dataframe.
+
+  Returns:
+    Optional[str]: Returns the name of the timezone of the index, or None
+      if the index does not have a single named timezone.
+  """
+  if isinstance(index, pd.DatetimeIndex) and index.tz is not None:
+    return str(index.tz)
+  return None
+
+class PricePanel:
+  """
+  Defines the PricePanel class which holds the close prices and dividends
+  of a stock universe aligned on a common calendar as dense
+  dates x tickers arrays.
+  """
+  def __init__(self,
+    tickers: List[str],
+    dates: pd.DatetimeIndex,
+    close: np.ndarray,
+    dividends: np.ndarray) -> None:
+    """
+    This method initialises the PricePanel class.
+
+    Args:
+      tickers (List[str]): The ticker symbols, one per column.
+      dates (pd.DatetimeIndex): The trading calendar, one date per row.
+      close (np.ndarray): The dates x tickers close prices.
+      dividends (np.ndarray): The dates x tickers dividends.
+
+    Raises:
+      ValueError: If the array shapes do not match the tickers and dates.
+    """
+    shape = (len(dates), len(tickers))
+    if close.shape != shape or dividends.shape != shape:
+      raise ValueError("The close and dividends arrays must have the shape "
+                       f"{shape}.")
+    self.tickers: List[str] = list(tickers)
+    self.dates: pd.DatetimeIndex = dates
+    self.close: np.ndarray = close
+    self.dividends: np.ndarray = dividends
+
+  def to_stocks_data(self,
+    tickers: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Creates the dictionary of stock dataframes used by RunBacktest. The
+    dataframes are views on the panel arrays, so no price data is copied
+    when the panel is memory-mapped.
+
+    Args:
+      tickers (Optional[List[str]]): The tickers to include, in order.
+        Defaults to all the tickers of the panel.
+
+    Raises:
+      ValueError: If a ticker is not in the panel.
+
+    Returns:
+      Dict[str, pd.DataFrame]: Returns a dictionary that maps each stock
+        ticker to the dataframe containing the stock data for that stock.
+    """
+    columns = {ticker: idx for idx, ticker in enumerate(self.tickers)}
+    stocks_data = {}
+    for ticker in self.tickers if tickers is None else tickers:
+      if ticker not in columns:
+        raise ValueError(f"Ticker {ticker} is not in the price panel.")
+      column = columns[ticker]
+      stocks_data[ticker] = pd.DataFrame(
+        {CLOSE_PRICE: self.close[:, column],
+         DIVIDENDS: self.dividends[:, column]},
+        index=self.dates,
+        copy=False)
+    return stocks_data
+
+  def slice_dates(self,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None) -> "PricePanel":
+    """
+    Selects the rows from a start date to before an end date, as a fetch
+    of the same period would. The arrays of the returned panel are views,
+    so a memory-mapped panel is not copied.
+
+    Args:
+      start (Optional[datetime]): The first date. Defaults to the first
+        date of the panel.
+      end (Optional[datetime]): The date after the last date. Defaults to
+        after the last date of the panel.
+
+    Returns:
+      PricePanel: Returns the panel of the selected rows.
+    """
+    wall_clock_dates = get_wall_clock_dates(self.dates)
+    first = 0 if start is None \
+      else int(wall_clock_dates.searchsorted(pd.Timestamp(start)))
+    last = len(self.dates) if end is None \
+      else int(wall_clock_dates.searchsorted(pd.Timestamp(end)))
+    return PricePanel(self.tickers, self.dates[first:last],
+                      self.close[first:last], self.dividends[first:last])
+
+  def get_header(self) -> Dict:
+    """
+    Dict: Returns the snapshot header describing the panel.
+    """
+    return {
+      VERSION: SNAPSHOT_VERSION,
+      TICKERS: self.tickers,
+      DATES: get_wall_clock_dates(self.dates).asi8.tolist(),
+      TIMEZONE: get_timezone(self.dates),
+      SHAPE: [len(self.dates), len(self.tickers)],
+      DTYPE: SNAPSHOT_DTYPE,
+      ARRAYS: [CLOSE_PRICE, DIVIDENDS]
+    }
+
+  def save(self, path: str) -> None:
+    """
+    Writes the panel to a binary snapshot file.
+
+    Args:
+      path (str): The path of the snapshot file.
+    """
+    data_offset = write_snapshot_header(path, self.get_header())
+    with open(path, "r+b") as file:
+      file.seek(data_offset)
+      for values in (self.close, self.dividends):
+        # write in row blocks to avoid a full in-memory copy
+        for start in range(0, len(self.dates), SNAPSHOT_WRITE_ROWS):
+          block = values[start:start + SNAPSHOT_WRITE_ROWS]
+          file.write(np.ascontiguousarray(block, dtype=SNAPSHOT_DTYPE)
+                     .tobytes())
+
+def write_snapshot_header(path: str, header: Dict) -> int:
+  """
+  Creates a snapshot file containing the header and zeroed arrays of the
+  shape given in the header.
+
+  Args:
+    path (str): The path of the snapshot file.
+    header (Dict): The snapshot header.
+
+  Returns:
+    int: Returns the byte offset of the first array.
+  """
+  header_bytes = json.dumps(header).encode("utf-8")
+  data_offset = len(SNAPSHOT_MAGIC) + HEADER_LENGTH_SIZE + len(header_bytes)
+  data_offset += -data_offset % SNAPSHOT_ALIGNMENT
+  n_dates, n_tickers = header[SHAPE]
+  array_size = n_dates * n_tickers * np.dtype(SNAPSHOT_DTYPE).itemsize
+
+  with open(path, "wb") as file:
+    file.write(SNAPSHOT_MAGIC)
+    file.write(np.array(len(header_bytes), dtype=HEADER_LENGTH_DTYPE)
+               .tobytes())
+    file.write(header_bytes)
+    file.truncate(data_offset + len(header[ARRAYS]) * array_size)
+  return data_offset
+
+def read_snapshot_header(path: str) -> Dict:
+  """
+  Reads the header of a snapshot file.
+
+  Args:
+    path (str): The path of the snapshot file.
+
+  Raises:
+    ValueError: If the file is not a snapshot of a supported version.
+
+  Returns:
+    Dict: Returns the snapshot header with the byte offset of the first
+      array stored under "offset".
+  """
+  with open(path, "rb") as file:
+    if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+      raise ValueError(f"{path} is not a price panel snapshot.")
+    header_length = int(np.frombuffer(file.read(HEADER_LENGTH_SIZE),
+                                      dtype=HEADER_LENGTH_DTYPE)[0])
+    header = json.loads(file.read(header_length).decode("utf-8"))
+  if header.get(VERSION) != SNAPSHOT_VERSION:
+    raise ValueError(f"{path} has an unsupported snapshot version.")
+  data_offset = len(SNAPSHOT_MAGIC) + HEADER_LENGTH_SIZE + header_length
+  header["offset"] = data_offset + (-data_offset % SNAPSHOT_ALIGNMENT)
+  return header
+
+def load_price_panel(path: str, mode: str = "r") -> PricePanel:
+  """
+  Opens a snapshot file as a memory-mapped price panel. Only the header
+  is read; the price arrays are paged in on access and shared between
+  processes through the page cache.
+
+  Args:
+    path (str): The path of the snapshot file.
+    mode (str): The numpy.memmap mode, "r" (read-only) or "r+"
+      (read-write). Defaults to "r".
+
+  Returns:
+    PricePanel: Returns the memory-mapped price panel.
+  """
+  header = read_snapshot_header(path)
+  shape = tuple(header[SHAPE])
+  array_size = shape[0] * shape[1] * np.dtype(header[DTYPE]).itemsize
+  arrays = {}
+  for idx, name in enumerate(header[ARRAYS]):
+    if array_size == 0:
+      arrays[name] = np.zeros(shape, dtype=header[DTYPE])
+      continue
+    arrays[name] = np.memmap(path,
+                             dtype=header[DTYPE],
+                             mode=mode,
+                             offset=header["offset"] + idx * array_size,
+                             shape=shape)
+
+  dates = pd.DatetimeIndex(np.array(header[DATES], dtype="datetime64[ns]"))
+  if header[TIMEZONE] is not None:
+    dates = dates.tz_localize(header[TIMEZONE])
+  return PricePanel(header[TICKERS], dates, arrays[CLOSE_PRICE],
+                    arrays[DIVIDENDS])
+
+def build_price_panel(stocks_data: Dict[str, pd.DataFrame]) -> PricePanel:
+  """
+  Aligns the stock dataframes on the union of their calendars. Missing
+  close prices are forward-filled and missing dividends are zero.
+
+  Args:
+    stocks_data (Dict[str, pd.DataFrame]): The dictionary that matches
+      the stock ticker to the price information of the stock.
+
+  Returns:
+    PricePanel: Returns the aligned price panel.
+  """
+  tickers = list(stocks_data.keys())
+  wall_clock_dates = {ticker: get_wall_clock_dates(data.index)
+                      for ticker, data in stocks_data.items()}
+  calendar = pd.DatetimeIndex([])
+  for dates in wall_clock_dates.values():
+    calendar = calendar.union(dates)
+
+  close = np.full((len(calendar), len(tickers)), np.nan)
+  dividends = np.zeros((len(calendar), len(tickers)))
+  for column, ticker in enumerate(tickers):
+    rows = calendar.get_indexer(wall_clock_dates[ticker])
+    close[rows, column] = stocks_data[ticker][CLOSE_PRICE].to_numpy()
+    dividends[rows, column] = stocks_data[ticker][DIVIDENDS].to_numpy()
+  close = pd.DataFrame(close).ffill().to_numpy()
+
+  timezone = get_timezone(next(iter(stocks_data.values())).index) \
+    if stocks_data else None
+  if timezone is not None:
+    calendar = calendar.tz_localize(timezone)
+  return PricePanel(tickers, calendar, close, dividends)
@@ -0,0 +1,187 @@
+"""
+This module is responsible for the quantile analysis of the signal. At
+every rebalance the stocks are split into buckets by predicted return,
+and the equal-weighted portfolios of all the buckets are simulated
+together from one holdings tensor, which is much cheaper than running a
+backtest per bucket.
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.batch_model import BatchModel
+from src.price_panel import get_wall_clock_dates
+from src.run_backtest import DATE_FORMAT, DATETIME
+
+# Constants
+DEFAULT_N_QUANTILES = 10
+SPREAD = "spread"
+
+# Summary Columns
+MEAN_RETURN = "mean_return"
+STD_RETURN = "std_return"
+TOTAL_RETURN = "total_return"
+
+def get_buckets(predicted_returns: np.ndarray, n_quantiles: int) -> np.ndarray:
+  """
+  Assigns every stock to a quantile bucket by its rank among the stocks
+  with a prediction on the same date.
+
+  Args:
+    predicted_returns (np.ndarray): The dates x stocks predicted returns,
+      NaN where there is no prediction.
+    n_quantiles (int): The number of buckets.
+
+  Returns:
+    np.ndarray: Returns the dates x stocks buckets, from 0 for the lowest
+      predictions to n_quantiles - 1 for the highest, and -1 for the
+      stocks without a prediction.
+  """
+  valid = np.isfinite(predicted_returns)
+  order = np.argsort(np.where(valid, predicted_returns, np.inf), axis=1,
+                     kind="stable")
+  ranks = np.empty_like(order)
+  np.put_along_axis(ranks, order,
+                    np.broadcast_to(np.arange(order.shape[1]), order.shape),
+                    axis=1)
+  n_valid = np.maximum(valid.sum(axis=1, keepdims=True), 1)
+  return np.where(valid, ranks * n_quantiles // n_valid, -1)
+
+def get_holdings_tensor(buckets: np.ndarray, n_quantiles: int) -> np.ndarray:
+  """
+  Args:
+    buckets (np.ndarray): The dates x stocks buckets.
+    n_quantiles (int): The number of buckets.
+
+  Returns:
+    np.ndarray: Returns the dates x buckets x stocks weights of the
+      equal-weighted bucket portfolios, all zero for a bucket without
+      stocks.
+  """
+  holdings = (buckets[:, None, :] == np.arange(n_quantiles)[None, :, None])\
+    .astype(np.float64)
+  counts = holdings.sum(axis=2, keepdims=True)
+  return np.divide(holdings, counts, out=np.zeros_like(holdings),
+                   where=counts > 0)
+
+class QuantileAnalysis:
+  """
+  Defines the QuantileAnalysis class which simulates the bucket
+  portfolios of the predicted returns at every rebalance date.
+  """
+  def __init__(self,
+    model: BatchModel,
+    initial_aum: int,
+    beginning_date: str,
+    n_quantiles: int = DEFAULT_N_QUANTILES) -> None:
+    """
+    This method initialises the QuantileAnalysis class and simulates the
+    bucket portfolios.
+
+    Args:
+      model (BatchModel): The model of the backtest.
+      initial_aum (int): The initial asset under management of each
+        bucket portfolio.
+      beginning_date (str): The beginning date of the backtest period.
+      n_quantiles (int): The number of buckets, e.g. 10 for deciles.
+
+    Raises:
+      ValueError: If the number of buckets is less than 2 or more than the
+        number of stocks.
+    """
+    if n_quantiles < 2:
+      raise ValueError("The number of quantiles must be at least 2.")
+    if n_quantiles > len(model.tickers):
+      raise ValueError("The number of quantiles must be at most the number "
+                       "of stocks.")
+    self.model: BatchModel = model
+    self.initial_aum: int = initial_aum
+    self.n_quantiles: int = n_quantiles
+    self.columns: List[str] = [f"q{bucket}"
+                               for bucket in range(1, n_quantiles + 1)]
+
+    """
+    buckets (np.ndarray): The bucket of every stock at each rebalance.
+    holdings (np.ndarray): The rebalances x buckets x stocks weights.
+    aum (np.ndarray): The AUM of every bucket portfolio on each day kept
+      by the model.
+    period_returns (np.ndarray): The return of every bucket portfolio
+      over each period between rebalances, NaN when the bucket has no
+      stock.
+    """
+    self.buckets: np.ndarray = get_buckets(model.predicted_returns,
+                                           n_quantiles)
+    self.holdings: np.ndarray = get_holdings_tensor(self.buckets, n_quantiles)
+    self.aum: np.ndarray = np.full((len(model.close), n_quantiles),
+                                   float(initial_aum))
+    self.period_returns: np.ndarray = np.empty((len(self.holdings),
+                                                n_quantiles))
+    self.simulate()
+    b_timestamp = pd.to_datetime(beginning_date, format=DATE_FORMAT)
+    self.b_row: int = int(np.searchsorted(
+      get_wall_clock_dates(model.panel.dates), b_timestamp)) - model.start
+
+  def simulate(self) -> None:
+    """
+    None: Simulates all the bucket portfolios together, one matrix product
+      of the price relatives and the holdings per period. A bucket without
+      stocks, when fewer stocks than buckets have a prediction, stays in
+      cash for the period.
+    """
+    close = self.model.close
+    rows = self.model.indexes[1:] - self.model.start
+    ends = np.append(rows[1:], len(close) - 1)
+    for period, (start, end) in enumerate(zip(rows, ends)):
+      weights = self.holdings[period]
+      held = weights.any(axis=0)
+      filled = weights.any(axis=1)
+      relatives = close[start + 1:end + 1, held] / close[start, held]
+      self.aum[start + 1:end + 1] = self.aum[start] \
+        * np.where(filled, relatives @ weights[:, held].T, 1.)
+      self.period_returns[period] = np.where(
+        filled, self.aum[end] / self.aum[start] - 1, np.nan)
+
+  def get_performance(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the daily AUM of every bucket portfolio from the
+      beginning date, from q1 (lowest predictions) to the highest.
+    """
+    performance = pd.DataFrame(self.aum[self.b_row:], columns=self.columns)
+    performance.insert(0, DATETIME, self.model.panel.dates[
+      self.model.start + self.b_row:])
+    return performance
+
+  def get_period_returns(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the return of every bucket portfolio over each
+      period, dated by the rebalance starting it, and the spread of the
+      highest bucket over the lowest.
+    """
+    period_returns = pd.DataFrame(self.period_returns, columns=self.columns)
+    period_returns[SPREAD] = self.period_returns[:, -1] \
+      - self.period_returns[:, 0]
+    period_returns.insert(0, DATETIME,
+                          self.model.panel.dates[self.model.indexes[1:]])
+    return period_returns
+
+  def get_summary(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the mean, standard deviation and compounded
+      total of the period returns of every bucket and of the spread,
+      skipping the periods in which a bucket has no stock.
+    """
+    period_returns = self.get_period_returns().drop(columns=[DATETIME])
+    return pd.DataFrame({
+      MEAN_RETURN: period_returns.mean(),
+      STD_RETURN: period_returns.std(),
+      TOTAL_RETURN: (1 + period_returns).prod() - 1
+    })
+
+  def print_summary(self) -> None:
+    """
+    None: Prints the summary of the bucket portfolios.
+    """
+    print(f"Quantile Analysis ({self.n_quantiles} buckets, q1 = lowest "
+          "predicted return)")
+    print(self.get_summary().to_string(float_format="{:.5f}".format))
@@ -0,0 +1,305 @@
+"""
+This module is responsible for generating the report of a parameter
+sweep: the AUM and cumulative IC charts of the best configurations,
+rendered in parallel, and an index page in HTML and Markdown.
+"""
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_stats import (AUM, DAILY_SHARPE_RATIO, DATETIME, IC,
+                                BacktestStats, use_headless_backend)
+from src.downsample import LTTB, downsample_series
+
+# Constants
+DEFAULT_TOP_N = 10
+DEFAULT_MAX_POINTS = 2000
+DEFAULT_IMAGE_FORMAT = "png"
+FIGURE_SIZE = (8, 4)
+FIGURE_DPI = 100
+INDEX_HTML = "index.html"
+INDEX_MARKDOWN = "index.md"
+N_MODEL_STATISTICS = 4
+
+# Result Keys
+NAME = "name"
+PARAMETERS = "parameters"
+PORTFOLIO_PERFORMANCE = "portfolio_performance"
+MONTHLY_IC = "monthly_ic"
+MODEL_STATISTICS = "model_statistics"
+STATISTICS = "statistics"
+CHARTS = "charts"
+
+# Chart Kinds
+AUM_CHART = "aum"
+IC_CHART = "ic"
+
+# The figure reused by every chart rendered in a worker process
+WORKER_FIGURE = None
+
+def init_worker() -> None:
+  """
+  None: Creates the figure of a worker process once, with the headless
+    backend, its axes labels and a date-unit line whose data is replaced
+    for each chart.
+  """
+  global WORKER_FIGURE
+  use_headless_backend()
+  from matplotlib.figure import Figure
+  WORKER_FIGURE = Figure(figsize=FIGURE_SIZE, dpi=FIGURE_DPI)
+  axes = WORKER_FIGURE.add_subplot()
+  axes.plot(np.array(["2000-01-01"], dtype="datetime64[ns]"), [0.])
+  axes.set_xlabel("Close Date")
+  axes.grid(True)
+  WORKER_FIGURE.autofmt_xdate()
+
+def render_chart(task: Tuple[np.ndarray, np.ndarray, str, str, str]) -> str:
+  """
+  Draws a line chart on the reused figure of the worker and saves it.
+  Only the line data, limits and labels change between charts, which
+  avoids rebuilding the axes.
+
+  Args:
+    task (Tuple[np.ndarray, np.ndarray, str, str, str]): The dates, the
+      values, the title, the y axis label and the path of the chart.
+
+  Returns:
+    str: Returns the path of the saved chart.
+  """
+  if WORKER_FIGURE is None:
+    init_worker()
+  dates, values, title, ylabel, path = task
+  axes = WORKER_FIGURE.axes[0]
+  axes.lines[0].set_data(dates, values)
+  axes.relim()
+  axes.autoscale_view()
+  axes.set_title(title)
+  axes.set_ylabel(ylabel)
+  WORKER_FIGURE.savefig(path)
+  return path
+
+def get_statistics(result: Dict[str, Any]) -> Dict[str, float]:
+  """
+  Args:
+    result (Dict[str, Any]): A sweep result with its portfolio performance,
+      monthly IC and optionally its model statistics.
+
+  Returns:
+    Dict[str, float]: Returns the summary statistics of the result.
+  """
+  model_statistics = result.get(MODEL_STATISTICS)
+  if model_statistics is None:
+    model_statistics = pd.DataFrame([[np.nan] * N_MODEL_STATISTICS])
+  return BacktestStats(result[PORTFOLIO_PERFORMANCE],
+                       result[MONTHLY_IC],
+                       model_statistics).get_summary_statistics()
+
+def format_parameters(parameters: Dict[str, Any]) -> str:
+  """
+  Args:
+    parameters (Dict[str, Any]): The parameters of a configuration.
+
+  Returns:
+    str: Returns the parameters as "key=value" pairs.
+  """
+  return ", ".join(f"{key}={value}" for key, value in parameters.items())
+
+class ReportGenerator:
+  """
+  Defines the ReportGenerator class which ranks the results of a sweep,
+  renders the charts of the best configurations in a process pool and
+  writes the index pages.
+  """
+  def __init__(self,
+    output_dir: str,
+    top_n: int = DEFAULT_TOP_N,
+    metric: str = DAILY_SHARPE_RATIO,
+    n_workers: Optional[int] = None,
+    max_points: Optional[int] = DEFAULT_MAX_POINTS,
+    image_format: str = DEFAULT_IMAGE_FORMAT) -> None:
+    """
+    This method initialises the ReportGenerator class.
+
+    Args:
+      output_dir (str): The directory of the report.
+      top_n (int): The number of best configurations to report.
+      metric (str): The summary statistic to rank by, higher is better.
+      n_workers (Optional[int]): The number of rendering processes.
+        Defaults to the number of CPUs.
+      max_points (Optional[int]): The maximum number of points per chart.
+        Longer series are downsampled.
+      image_format (str): The image format of the charts, e.g. "png".
+    """
+    self.output_dir: str = output_dir
+    self.top_n: int = top_n
+    self.metric: str = metric
+    self.n_workers: Optional[int] = n_workers
+    self.max_points: Optional[int] = max_points
+    self.image_format: str = image_format
+
+  def rank_results(self,
+    results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Computes the summary statistics of each result and keeps the top N by
+    the ranking metric.
+
+    Args:
+      results (List[Dict[str, Any]]): The sweep results, each with a name,
+        its parameters, its portfolio performance and its monthly IC.
+
+    Returns:
+      List[Dict[str, Any]]: Returns the best results, best first, with
+        their statistics.
+    """
+    ranked = [{**result, STATISTICS: get_statistics(result)}
+              for result in results]
+    ranked.sort(key=lambda result: -np.nan_to_num(
+      result[STATISTICS][self.metric], nan=-np.inf))
+    return ranked[:self.top_n]
+
+  def get_chart_tasks(self,
+    ranked: List[Dict[str, Any]]) -> List[Tuple[np.ndarray, np.ndarray,
+                                                str, str, str]]:
+    """
+    Prepares the downsampled series of every chart and assigns the chart
+    paths to the results.
+
+    Args:
+      ranked (List[Dict[str, Any]]): The ranked results.
+
+    Returns:
+      List[Tuple[np.ndarray, np.ndarray, str, str, str]]: Returns the
+        rendering tasks.
+    """
+    tasks = []
+    for rank, result in enumerate(ranked, start=1):
+      result[CHARTS] = {}
+      for kind, data, column, title, ylabel in [
+        (AUM_CHART, result[PORTFOLIO_PERFORMANCE], AUM, "Daily AUM",
+         "AUM ($)"),
+        (IC_CHART, result[MONTHLY_IC], IC, "Monthly Cumulative IC",
+         "Cumulative IC")]:
+        series = downsample_series(data.set_index(DATETIME)[column],
+                                   self.max_points, LTTB)
+        filename = f"{rank:03d}_{kind}.{self.image_format}"
+        result[CHARTS][kind] = filename
+        tasks.append((series.index.to_numpy(), series.to_numpy(),
+                      f"{title} - {result[NAME]}", ylabel,
+                      os.path.join(self.output_dir, filename)))
+    return tasks
+
+  def render_charts(self, ranked: List[Dict[str, Any]]) -> List[str]:
+    """
+    Renders the charts of the ranked results in a process pool. Each
+    worker creates one figure and reuses it for all its charts.
+
+    Args:
+      ranked (List[Dict[str, Any]]): The ranked results.
+
+    Returns:
+      List[str]: Returns the paths of the rendered charts.
+    """
+    tasks = self.get_chart_tasks(ranked)
+    if not tasks:
+      return []
+    n_workers = self.n_workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (4 * n_workers))
+    with ProcessPoolExecutor(max_workers=n_workers,
+                             initializer=init_worker) as executor:
+      return list(executor.map(render_chart, tasks, chunksize=chunksize))
+
+  def get_table(self, ranked: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Args:
+      ranked (List[Dict[str, Any]]): The ranked results.
+
+    Returns:
+      pd.DataFrame: Returns the rank, name, parameters and statistics of
+        each result.
+    """
+    rows = [{"rank": rank,
+             NAME: result[NAME],
+             PARAMETERS: format_parameters(result.get(PARAMETERS, {})),
+             **result[STATISTICS]}
+            for rank, result in enumerate(ranked, start=1)]
+    return pd.DataFrame(rows)
+
+  def write_index(self, ranked: List[Dict[str, Any]]) -> List[str]:
+    """
+    Writes the index pages listing the ranked results and their charts.
+
+    Args:
+      ranked (List[Dict[str, Any]]): The ranked results with their charts.
+
+    Returns:
+      List[str]: Returns the paths of the HTML and Markdown pages.
+    """
+    table = self.get_table(ranked)
+    title = f"Top {len(ranked)} Configurations by {self.metric}"
+
+    html_lines = ["<!DOCTYPE html>",
+                  "<html><head><meta charset=\"utf-8\">",
+                  f"<title>{html.escape(title)}</title></head><body>",
+                  f"<h1>{html.escape(title)}</h1>",
+                  table.to_html(index=False, float_format="{:.5f}".format)]
+    markdown_lines = [f"# {title}", "", to_markdown_table(table), ""]
+    for rank, result in enumerate(ranked, start=1):
+      heading = f"{rank}. {result[NAME]}"
+      html_lines.append(f"<h2>{html.escape(heading)}</h2>")
+      html_lines.append(
+        f"<p>{html.escape(format_parameters(result.get(PARAMETERS, {})))}</p>")
+      markdown_lines.append(f"## {heading}")
+      markdown_lines.append("")
+      for kind in [AUM_CHART, IC_CHART]:
+        filename = result[CHARTS][kind]
+        html_lines.append(f"<img src=\"{html.escape(filename)}\" "
+                          f"alt=\"{kind}\">")
+        markdown_lines.append(f"![{kind}]({filename})")
+      markdown_lines.append("")
+    html_lines.append("</body></html>")
+
+    html_path = os.path.join(self.output_dir, INDEX_HTML)
+    markdown_path = os.path.join(self.output_dir, INDEX_MARKDOWN)
+    with open(html_path, "w", encoding="utf-8") as file:
+      file.write("\n".join(html_lines) + "\n")
+    with open(markdown_path, "w", encoding="utf-8") as file:
+      file.write("\n".join(markdown_lines))
+    return [html_path, markdown_path]
+
+  def generate(self, results: List[Dict[str, Any]]) -> List[str]:
+    """
+    Generates the report of a sweep.
+
+    Args:
+      results (List[Dict[str, Any]]): The sweep results, each with a name,
+        its parameters, its portfolio performance and its monthly IC.
+
+    Returns:
+      List[str]: Returns the paths of the HTML and Markdown index pages.
+    """
+    os.makedirs(self.output_dir, exist_ok=True)
+    ranked = self.rank_results(results)
+    self.render_charts(ranked)
+    return self.write_index(ranked)
+
+def to_markdown_table(table: pd.DataFrame) -> str:
+  """
+  Args:
+    table (pd.DataFrame): The table to format.
+
+  Returns:
+    str: Returns the table in the Markdown pipe format.
+  """
+  def format_cell(value: Any) -> str:
+    text = f"{value:.5f}" if isinstance(value, float) else str(value)
+    return text.replace("|", "\\|")
+  lines = ["| " + " | ".join(table.columns) + " |",
+           "|" + "---|" * len(table.columns)]
+  for row in table.itertuples(index=False):
+    lines.append("| " + " | ".join(format_cell(value) for value in row)
+                 + " |")
+  return "\n".join(lines)
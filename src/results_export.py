@@ -0,0 +1,340 @@
+"""
+This module is responsible for exporting the artifacts of a backtest run
+(its dataframes and summary statistics) in machine-readable formats and
+loading them back. Tables are written as Arrow IPC or Parquet files when
+pyarrow is installed, and as compressed .npz files otherwise.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+except ImportError:
+  pa = None
+  pq = None
+
+# Constants
+FORMAT_ARROW = "arrow"
+FORMAT_PARQUET = "parquet"
+FORMAT_NPZ = "npz"
+FORMATS = [FORMAT_ARROW, FORMAT_PARQUET, FORMAT_NPZ]
+EXPORT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+METRICS_FILE = "metrics.json"
+
+# Table Names
+PORTFOLIO_PERFORMANCE = "portfolio_performance"
+MONTHLY_IC = "monthly_ic"
+MODEL_STATISTICS_RECORD = "model_statistics_record"
+PORTFOLIO_RECORD = "portfolio_record"
+MODEL_TRAINING_DATA = "model_training_data"
+
+# Portfolio Record Columns
+REBALANCE = "rebalance"
+STOCK = "stock"
+AMOUNT = "amount"
+
+# Manifest Keys
+VERSION = "version"
+FORMAT = "format"
+TABLES = "tables"
+TIMEZONES = "timezones"
+
+def get_default_format() -> str:
+  """
+  str: Returns "arrow" if pyarrow is installed, otherwise "npz".
+  """
+  return FORMAT_ARROW if pa is not None else FORMAT_NPZ
+
+def get_portfolio_record_frame(
+  portfolio_record: List[List[Tuple[str, float]]]) -> pd.DataFrame:
+  """
+  Args:
+    portfolio_record (List[List[Tuple[str, float]]]): The portfolio of
+      each rebalance, as lists of stock tickers and amounts.
+
+  Returns:
+    pd.DataFrame: Returns the portfolios in long format with the
+      rebalance number, stock ticker and amount.
+  """
+  rows = [(rebalance, stock, amount)
+          for rebalance, portfolio in enumerate(portfolio_record)
+          for stock, amount in portfolio]
+  return pd.DataFrame(rows, columns=[REBALANCE, STOCK, AMOUNT])\
+    .astype({REBALANCE: np.int64, STOCK: str, AMOUNT: np.float64})
+
+def get_backtest_frames(backtest: Any) -> Dict[str, pd.DataFrame]:
+  """
+  Collects the dataframes of a RunBacktest or PanelBacktest. The training
+  data is only included if the backtest keeps it.
+
+  Args:
+    backtest (Any): The backtest after its simulation.
+
+  Returns:
+    Dict[str, pd.DataFrame]: Returns the dataframes by table name.
+  """
+  if hasattr(backtest, "get_portfolio_performance"):
+    frames = {
+      PORTFOLIO_PERFORMANCE: backtest.get_portfolio_performance(),
+      MONTHLY_IC: backtest.get_monthly_ic(),
+      MODEL_STATISTICS_RECORD: backtest.get_model_statistics_record()
+    }
+  else:
+    frames = {
+      PORTFOLIO_PERFORMANCE: backtest.portfolio_performance,
+      MONTHLY_IC: backtest.monthly_ic,
+      MODEL_STATISTICS_RECORD: backtest.model_statistics_record
+    }
+  frames[PORTFOLIO_RECORD] = \
+    get_portfolio_record_frame(backtest.portfolio_record)
+  if getattr(backtest, MODEL_TRAINING_DATA, None) is not None:
+    frames[MODEL_TRAINING_DATA] = backtest.model_training_data
+  return frames
+
+def normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+  """
+  Converts the object columns of a dataframe to numbers where possible
+  and to strings otherwise, so that every column has a columnar type.
+
+  Args:
+    frame (pd.DataFrame): The dataframe to normalize.
+
+  Returns:
+    pd.DataFrame: Returns the normalized dataframe with a default index.
+  """
+  frame = frame.reset_index(drop=True)
+  columns = {}
+  for column in frame.columns:
+    values = frame[column]
+    if values.dtype == object:
+      values = normalize_object_column(values)
+    columns[str(column)] = values
+  return pd.DataFrame(columns, index=frame.index)
+
+def normalize_object_column(values: pd.Series) -> pd.Series:
+  """
+  Converts an object column to timestamps, numbers or strings. Timestamps
+  with a common timezone keep it, and timestamps with mixed UTC offsets
+  (e.g. across daylight saving time) are converted to UTC.
+
+  Args:
+    values (pd.Series): The object column.
+
+  Returns:
+    pd.Series: Returns the converted column.
+  """
+  if len(values) and all(isinstance(value, pd.Timestamp) for value in values):
+    timezones = {str(value.tz) for value in values}
+    if timezones == {"None"}:
+      return pd.to_datetime(values)
+    converted = pd.to_datetime(values, utc=True)
+    if len(timezones) == 1:
+      converted = converted.dt.tz_convert(values.iloc[0].tz)
+    return converted
+  try:
+    return pd.to_numeric(values)
+  except (TypeError, ValueError):
+    return values.astype(str)
+
+def get_timezone_name(values: pd.Series) -> str:
+  """
+  Args:
+    values (pd.Series): The timezone-aware datetimes.
+
+  Returns:
+    str: Returns the name of the timezone, or its UTC offset as "+HH:MM"
+      for fixed offsets.
+  """
+  timezone = values.dt.tz
+  name = getattr(timezone, "zone", None) or getattr(timezone, "key", None)
+  if name is not None or not len(values):
+    return name or str(timezone)
+  offset = values.iloc[0].strftime("%z")
+  return f"{offset[:3]}:{offset[3:]}"
+
+def write_npz(frame: pd.DataFrame, path: str) -> Dict[str, str]:
+  """
+  Writes a dataframe as a compressed .npz file with one array per column.
+  Timezone-aware datetimes are stored in UTC.
+
+  Args:
+    frame (pd.DataFrame): The normalized dataframe.
+    path (str): The path of the .npz file.
+
+  Returns:
+    Dict[str, str]: Returns the timezone of each timezone-aware column.
+  """
+  arrays = {}
+  timezones = {}
+  for column in frame.columns:
+    values = frame[column]
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+      timezones[column] = get_timezone_name(values)
+      values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+    # strings are stored as fixed-width unicode, which loads without pickle
+    arrays[column] = values.to_numpy(dtype=str) if values.dtype == object \
+      else values.to_numpy()
+  with open(path, "wb") as file:
+    np.savez_compressed(file, **arrays)
+  return timezones
+
+def read_npz(path: str, timezones: Dict[str, str]) -> pd.DataFrame:
+  """
+  Reads a dataframe written by write_npz.
+
+  Args:
+    path (str): The path of the .npz file.
+    timezones (Dict[str, str]): The timezone of each timezone-aware column.
+
+  Returns:
+    pd.DataFrame: Returns the dataframe.
+  """
+  with np.load(path, allow_pickle=False) as arrays:
+    frame = pd.DataFrame({column: arrays[column] for column in arrays.files})
+  for column, timezone in timezones.items():
+    frame[column] = frame[column].dt.tz_localize("UTC").dt.tz_convert(timezone)
+  return frame
+
+def export_results(output_dir: str,
+  frames: Dict[str, pd.DataFrame],
+  metrics: Optional[Dict[str, Any]] = None,
+  export_format: Optional[str] = None) -> str:
+  """
+  Writes the dataframes of a run, one file per table, and the metrics as
+  JSON, with a manifest describing the files.
+
+  Args:
+    output_dir (str): The directory to write to.
+    frames (Dict[str, pd.DataFrame]): The dataframes by table name.
+    metrics (Optional[Dict[str, Any]]): The summary statistics and
+      parameters of the run.
+    export_format (Optional[str]): "arrow", "parquet" or "npz". Defaults
+      to "arrow" when pyarrow is installed and "npz" otherwise.
+
+  Raises:
+    ValueError: If the format is not supported or needs pyarrow.
+
+  Returns:
+    str: Returns the path of the manifest.
+  """
+  export_format = export_format or get_default_format()
+  if export_format not in FORMATS:
+    raise ValueError(f"The export format must be one of {FORMATS}.")
+  if export_format != FORMAT_NPZ and pa is None:
+    raise ValueError(f"The {export_format} format needs pyarrow.")
+
+  os.makedirs(output_dir, exist_ok=True)
+  tables = {}
+  timezones = {}
+  for name, frame in frames.items():
+    frame = normalize_frame(frame)
+    filename = f"{name}.{export_format}"
+    path = os.path.join(output_dir, filename)
+    if export_format == FORMAT_NPZ:
+      timezones[name] = write_npz(frame, path)
+    else:
+      table = pa.Table.from_pandas(frame, preserve_index=False)
+      if export_format == FORMAT_PARQUET:
+        pq.write_table(table, path)
+      else:
+        # uncompressed IPC files can be memory-mapped when loaded
+        with pa.OSFile(path, "wb") as sink:
+          with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    tables[name] = filename
+
+  if metrics is not None:
+    with open(os.path.join(output_dir, METRICS_FILE), "w",
+              encoding="utf-8") as file:
+      json.dump(metrics, file, indent=2, default=str)
+
+  manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+  with open(manifest_path, "w", encoding="utf-8") as file:
+    json.dump({VERSION: EXPORT_VERSION,
+               FORMAT: export_format,
+               TABLES: tables,
+               TIMEZONES: timezones}, file, indent=2)
+  return manifest_path
+
+def export_backtest(output_dir: str,
+  backtest: Any,
+  metrics: Optional[Dict[str, Any]] = None,
+  export_format: Optional[str] = None,
+  extra_frames: Optional[Dict[str, pd.DataFrame]] = None) -> str:
+  """
+  Writes the dataframes of a RunBacktest or PanelBacktest and the metrics
+  of the run.
+
+  Args:
+    output_dir (str): The directory to write to.
+    backtest (Any): The backtest after its simulation.
+    metrics (Optional[Dict[str, Any]]): The summary statistics and
+      parameters of the run.
+    export_format (Optional[str]): "arrow", "parquet" or "npz".
+    extra_frames (Optional[Dict[str, pd.DataFrame]]): Further dataframes
+      of the run by table name, e.g. from the universe analyses.
+
+  Returns:
+    str: Returns the path of the manifest.
+  """
+  return export_results(output_dir,
+                        {**get_backtest_frames(backtest),
+                         **(extra_frames or {})},
+                        metrics, export_format)
+
+def load_results(output_dir: str,
+  tables: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+  """
+  Loads the dataframes of an exported run. Arrow files are memory-mapped,
+  so their numeric columns are not copied into memory.
+
+  Args:
+    output_dir (str): The directory of the exported run.
+    tables (Optional[List[str]]): The tables to load. Defaults to all.
+
+  Raises:
+    ValueError: If the export is of an unsupported version or needs
+      pyarrow.
+
+  Returns:
+    Dict[str, pd.DataFrame]: Returns the dataframes by table name.
+  """
+  with open(os.path.join(output_dir, MANIFEST_FILE), encoding="utf-8") \
+    as file:
+    manifest = json.load(file)
+  if manifest[VERSION] != EXPORT_VERSION:
+    raise ValueError(f"{output_dir} has an unsupported export version.")
+  if manifest[FORMAT] != FORMAT_NPZ and pa is None:
+    raise ValueError(f"Loading {manifest[FORMAT]} files needs pyarrow.")
+
+  frames = {}
+  for name, filename in manifest[TABLES].items():
+    if tables is not None and name not in tables:
+      continue
+    path = os.path.join(output_dir, filename)
+    if manifest[FORMAT] == FORMAT_NPZ:
+      frames[name] = read_npz(path, manifest[TIMEZONES].get(name, {}))
+    elif manifest[FORMAT] == FORMAT_PARQUET:
+      frames[name] = pq.read_table(path, memory_map=True).to_pandas()
+    else:
+      # the buffers of the table keep the memory map open
+      table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+      frames[name] = table.to_pandas(split_blocks=True, self_destruct=True)
+  return frames
+
+def load_metrics(output_dir: str) -> Dict[str, Any]:
+  """
+  Args:
+    output_dir (str): The directory of the exported run.
+
+  Returns:
+    Dict[str, Any]: Returns the exported metrics of the run.
+  """
+  with open(os.path.join(output_dir, METRICS_FILE), encoding="utf-8") as file:
+    return json.load(file)
@@ -0,0 +1,280 @@
+"""
+This module is responsible for storing the results of many backtests in a
+local SQLite database. Each run is one row with its configuration
+parameters, its summary statistics and a pointer to its exported tables,
+so large sweeps can be queried without reading their files.
+"""
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from src.backtest_stats import (ANNUALIZED_RETURN, AVERAGE_DAILY_RETURN,
+                                DAILY_SHARPE_RATIO, DAILY_STANDARD_DEVIATION,
+                                FINAL_AUM, FINAL_CUMULATIVE_IC, PROFIT_LOSS,
+                                TOTAL_RETURN, TOTAL_STOCK_RETURN)
+from src.results_export import load_results
+
+# Constants
+DEFAULT_BATCH_SIZE = 500
+BUSY_TIMEOUT = 60
+RUNS_TABLE = "runs"
+
+# Run Columns
+RUN_ID = "run_id"
+NAME = "name"
+EXTRA_PARAMETERS = "extra_parameters"
+EXPORT_DIR = "export_dir"
+EXPORT_FORMAT = "export_format"
+CREATED_AT = "created_at"
+
+# Parameter Columns
+TICKERS = "tickers"
+BEGINNING_DATE = "beginning_date"
+ENDING_DATE = "ending_date"
+INITIAL_AUM = "initial_aum"
+STRATEGY1 = "strategy1"
+STRATEGY2 = "strategy2"
+DAYS1 = "days1"
+DAYS2 = "days2"
+TOP_PCT = "top_pct"
+PARAMETER_COLUMNS = {TICKERS: "TEXT",
+                     BEGINNING_DATE: "TEXT",
+                     ENDING_DATE: "TEXT",
+                     INITIAL_AUM: "REAL",
+                     STRATEGY1: "TEXT",
+                     STRATEGY2: "TEXT",
+                     DAYS1: "INTEGER",
+                     DAYS2: "INTEGER",
+                     TOP_PCT: "INTEGER"}
+
+# Metric Columns
+METRIC_COLUMNS = [TOTAL_STOCK_RETURN,
+                  TOTAL_RETURN,
+                  ANNUALIZED_RETURN,
+                  FINAL_AUM,
+                  PROFIT_LOSS,
+                  AVERAGE_DAILY_RETURN,
+                  DAILY_STANDARD_DEVIATION,
+                  DAILY_SHARPE_RATIO,
+                  FINAL_CUMULATIVE_IC]
+
+INSERT_COLUMNS = [NAME, *PARAMETER_COLUMNS, EXTRA_PARAMETERS, *METRIC_COLUMNS,
+                  EXPORT_DIR, EXPORT_FORMAT, CREATED_AT]
+COLUMNS = [RUN_ID, *INSERT_COLUMNS]
+
+def get_parameter_value(value: Any) -> Any:
+  """
+  Args:
+    value (Any): A parameter value.
+
+  Returns:
+    Any: Returns the value as stored, with lists of tickers joined by
+      commas.
+  """
+  if isinstance(value, (list, tuple)):
+    return ",".join(str(item) for item in value)
+  return value
+
+class ResultsStore:
+  """
+  Defines the ResultsStore class which writes runs to a SQLite database in
+  batches and queries them. The database uses write-ahead logging, so
+  several sweep workers can append to it while it is being read.
+  """
+  def __init__(self,
+    path: str,
+    batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+    """
+    This method initialises the ResultsStore class.
+
+    Args:
+      path (str): The path of the database file, created if needed.
+      batch_size (int): The number of buffered runs written per
+        transaction.
+    """
+    self.path: str = path
+    self.batch_size: int = batch_size
+
+    """
+    pending (List[tuple]): The buffered rows not yet written.
+    """
+    self.pending: List[tuple] = []
+    self.connection: sqlite3.Connection = sqlite3.connect(
+      path, timeout=BUSY_TIMEOUT)
+    self.connection.execute("PRAGMA journal_mode=WAL")
+    self.connection.execute("PRAGMA synchronous=NORMAL")
+    self.create_schema()
+
+  def __enter__(self) -> "ResultsStore":
+    """
+    ResultsStore: Returns the store.
+    """
+    return self
+
+  def __exit__(self, *args) -> None:
+    """
+    None: Writes the buffered runs and closes the database.
+    """
+    self.close()
+
+  def create_schema(self) -> None:
+    """
+    None: Creates the runs table and the indexes on its parameter columns
+      if they do not exist.
+    """
+    columns = [f"{RUN_ID} INTEGER PRIMARY KEY", f"{NAME} TEXT"]
+    columns += [f"{column} {sql_type}"
+                for column, sql_type in PARAMETER_COLUMNS.items()]
+    columns += [f"{EXTRA_PARAMETERS} TEXT"]
+    columns += [f"{column} REAL" for column in METRIC_COLUMNS]
+    columns += [f"{EXPORT_DIR} TEXT", f"{EXPORT_FORMAT} TEXT",
+                f"{CREATED_AT} REAL"]
+    with self.connection:
+      self.connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {RUNS_TABLE} ({', '.join(columns)})")
+      for column in [NAME, *PARAMETER_COLUMNS]:
+        self.connection.execute(
+          f"CREATE INDEX IF NOT EXISTS {RUNS_TABLE}_{column} "
+          f"ON {RUNS_TABLE} ({column})")
+
+  def add_run(self,
+    name: str,
+    parameters: Dict[str, Any],
+    metrics: Dict[str, float],
+    export_dir: Optional[str] = None,
+    export_format: Optional[str] = None) -> None:
+    """
+    Buffers a run, writing the buffer once it holds a full batch.
+    Parameters without a column are kept as JSON.
+
+    Args:
+      name (str): The name of the run.
+      parameters (Dict[str, Any]): The configuration parameters.
+      metrics (Dict[str, float]): The summary statistics of the run.
+      export_dir (Optional[str]): The directory of the exported tables.
+      export_format (Optional[str]): The format of the exported tables.
+    """
+    extra = {key: value for key, value in parameters.items()
+             if key not in PARAMETER_COLUMNS}
+    row = [name]
+    row += [get_parameter_value(parameters.get(column))
+            for column in PARAMETER_COLUMNS]
+    row += [json.dumps(extra, default=str) if extra else None]
+    row += [None if metrics.get(column) is None else float(metrics[column])
+            for column in METRIC_COLUMNS]
+    row += [None if export_dir is None else os.path.abspath(export_dir),
+            export_format, time.time()]
+    self.pending.append(tuple(row))
+    if len(self.pending) >= self.batch_size:
+      self.flush()
+
+  def flush(self) -> int:
+    """
+    int: Writes the buffered runs in one transaction and returns their
+      number.
+    """
+    if not self.pending:
+      return 0
+    placeholders = ", ".join("?" * len(INSERT_COLUMNS))
+    with self.connection:
+      self.connection.executemany(
+        f"INSERT INTO {RUNS_TABLE} ({', '.join(INSERT_COLUMNS)}) "
+        f"VALUES ({placeholders})", self.pending)
+    n_rows = len(self.pending)
+    self.pending = []
+    return n_rows
+
+  def close(self) -> None:
+    """
+    None: Writes the buffered runs and closes the database.
+    """
+    self.flush()
+    self.connection.close()
+
+  def query(self,
+    where: str = "",
+    parameters: Sequence[Any] = (),
+    order_by: Optional[str] = None,
+    descending: bool = True,
+    limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Queries the runs, e.g. the best Sharpe ratio with days1 < 60 and
+    top_pct = 10 is query("days1 < ? AND top_pct = ?", (60, 10),
+    order_by="daily_sharpe_ratio", limit=1).
+
+    Args:
+      where (str): The SQL condition, with ? placeholders.
+      parameters (Sequence[Any]): The values of the placeholders.
+      order_by (Optional[str]): The column to sort by.
+      descending (bool): Whether to sort the largest values first.
+      limit (Optional[int]): The maximum number of runs.
+
+    Raises:
+      ValueError: If the sort column does not exist.
+
+    Returns:
+      pd.DataFrame: Returns the matching runs.
+    """
+    self.flush()
+    sql = f"SELECT * FROM {RUNS_TABLE}"
+    if where:
+      sql += f" WHERE {where}"
+    if order_by is not None:
+      if order_by not in COLUMNS:
+        raise ValueError(f"{order_by} is not a column of the runs table.")
+      sql += f" ORDER BY {order_by} IS NULL, {order_by} " \
+        + ("DESC" if descending else "ASC")
+    if limit is not None:
+      sql += f" LIMIT {int(limit)}"
+    return pd.read_sql_query(sql, self.connection, params=list(parameters))
+
+  def get_best_run(self,
+    metric: str = DAILY_SHARPE_RATIO,
+    where: str = "",
+    parameters: Sequence[Any] = ()) -> Optional[Dict[str, Any]]:
+    """
+    Args:
+      metric (str): The summary statistic to maximise.
+      where (str): The SQL condition, with ? placeholders.
+      parameters (Sequence[Any]): The values of the placeholders.
+
+    Returns:
+      Optional[Dict[str, Any]]: Returns the matching run with the largest
+        metric, or None if no run matches.
+    """
+    runs = self.query(where, parameters, order_by=metric, limit=1)
+    return runs.iloc[0].to_dict() if len(runs) else None
+
+  def count(self) -> int:
+    """
+    int: Returns the number of stored runs, including the buffered ones.
+    """
+    (n_rows,) = self.connection.execute(
+      f"SELECT COUNT(*) FROM {RUNS_TABLE}").fetchone()
+    return n_rows + len(self.pending)
+
+  def load_curves(self,
+    run_id: int,
+    tables: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Args:
+      run_id (int): The id of the run.
+      tables (Optional[List[str]]): The tables to load. Defaults to all.
+
+    Raises:
+      ValueError: If the run does not exist or has no exported tables.
+
+    Returns:
+      Dict[str, pd.DataFrame]: Returns the exported tables of the run.
+    """
+    self.flush()
+    row = self.connection.execute(
+      f"SELECT {EXPORT_DIR} FROM {RUNS_TABLE} WHERE {RUN_ID} = ?",
+      (int(run_id),)).fetchone()
+    if row is None or row[0] is None:
+      raise ValueError(f"Run {run_id} has no exported tables.")
+    return load_results(row[0], tables)
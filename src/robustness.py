@@ -0,0 +1,344 @@
+"""
+This module is responsible for the robustness analysis of a backtest
+configuration. Price histories are resampled with a block bootstrap of
+the daily returns of the whole panel, which keeps the correlation between
+the stocks, and the full two-signal backtest is run on all the paths at
+once as paths x dates x stocks arrays. The paths are processed in chunks
+so that the memory stays bounded, and the result is the distribution of
+the summary statistics of BacktestStats.
+"""
+from math import ceil
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_stats import get_batch_summary_statistics
+from src.batch_model import (BatchModel, fit_expanding_regressions,
+                             get_feature_matrix, get_label_matrix,
+                             predict_returns)
+from src.panel_backtest import MONTHLY
+from src.price_panel import PricePanel, get_wall_clock_dates
+from src.run_backtest import DATE_FORMAT
+
+# Constants
+DEFAULT_N_PATHS = 1000
+DEFAULT_BLOCK_DAYS = 20
+DEFAULT_MEMORY_MB = 512
+DEFAULT_SEED = 4228
+PERCENTILES = [5, 50, 95]
+# the path arrays held at once by a chunk: log prices, close and dividends
+PATH_ARRAYS = 3
+
+# Summary Columns
+ACTUAL = "actual"
+MEAN = "mean"
+STD = "std"
+
+def get_bootstrap_rows(generator: np.random.Generator,
+  n_paths: int,
+  n_returns: int,
+  block_days: int) -> np.ndarray:
+  """
+  Draws the rows of a moving block bootstrap: every path is made of
+  blocks of consecutive days starting at random rows.
+
+  Args:
+    generator (np.random.Generator): The random generator.
+    n_paths (int): The number of paths.
+    n_returns (int): The number of daily returns of each path.
+    block_days (int): The number of consecutive days of each block.
+
+  Returns:
+    np.ndarray: Returns the paths x returns rows of the daily returns
+      to use.
+  """
+  block_days = max(1, min(block_days, n_returns))
+  n_blocks = ceil(n_returns / block_days)
+  starts = generator.integers(0, n_returns - block_days + 1,
+                              size=(n_paths, n_blocks))
+  rows = starts[:, :, None] + np.arange(block_days)
+  return rows.reshape(n_paths, -1)[:, :n_returns]
+
+def get_chunk_paths(n_dates: int, n_tickers: int, memory_mb: int) -> int:
+  """
+  Args:
+    n_dates (int): The number of dates of each path.
+    n_tickers (int): The number of stocks.
+    memory_mb (int): The memory budget of a chunk in megabytes.
+
+  Returns:
+    int: Returns the number of paths simulated at a time.
+  """
+  path_bytes = PATH_ARRAYS * n_dates * n_tickers * np.dtype(np.float64).itemsize
+  return max(1, memory_mb * 2 ** 20 // path_bytes)
+
+def simulate_paths(close: np.ndarray,
+  dividends: np.ndarray,
+  rows: np.ndarray,
+  predicted_returns: np.ndarray,
+  n_stocks: int,
+  initial_aum: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+  """
+  Simulates the portfolios of many paths at once with the rules of the
+  simulation kernel: at each rebalance the top predicted stocks are
+  bought in equal amounts with the AUM of the day, and held until the
+  next one.
+
+  Args:
+    close (np.ndarray): The paths x dates x stocks close prices.
+    dividends (np.ndarray): The paths x dates x stocks dividends.
+    rows (np.ndarray): The rows of the rebalance dates, starting with
+      the period end before the first rebalance.
+    predicted_returns (np.ndarray): The paths x rebalances x stocks
+      predicted returns of the rebalances after the first row.
+    n_stocks (int): The number of stocks bought at each rebalance.
+    initial_aum (float): The initial asset under management amount.
+
+  Returns:
+    Tuple[np.ndarray, np.ndarray, np.ndarray]: Returns the paths x dates
+      AUM and cumulative dividends, and the cumulative IC of every path
+      at each rebalance whose period ends with another rebalance.
+  """
+  n_paths, n_dates, n_tickers = close.shape
+  aum = np.full((n_paths, n_dates), float(initial_aum))
+  cumulative_dividends = np.zeros((n_paths, n_dates))
+  ic_record = np.zeros((n_paths, max(len(rows) - 2, 0)))
+  n_top = min(n_stocks, n_tickers)
+  if n_top == 0:
+    return aum, cumulative_dividends, ic_record
+
+  for period, row in enumerate(rows[1:]):
+    end = rows[period + 2] if period + 2 < len(rows) else n_dates - 1
+    # stocks without a prediction are never bought
+    predictions = np.where(np.isfinite(predicted_returns[:, period]),
+                           predicted_returns[:, period], -np.inf)
+    top = np.argpartition(-predictions, n_top - 1, axis=1)[:, :n_top]
+    held = np.isfinite(np.take_along_axis(predictions, top, axis=1))
+    n_selected = held.sum(axis=1)
+    buy_close = np.take_along_axis(close[:, row], top, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+      amounts = np.where(held, (aum[:, row] / np.maximum(n_selected, 1))
+                         [:, None] / buy_close, 0.)
+
+    if end > row:
+      held_close = np.take_along_axis(close[:, row + 1:end + 1],
+                                      top[:, None], axis=2)
+      held_dividends = np.take_along_axis(dividends[:, row + 1:end + 1],
+                                          top[:, None], axis=2)
+      value = np.einsum("pdn,pn->pd",
+                        np.where(held[:, None], held_close, 0.), amounts)
+      paid = np.einsum("pdn,pn->pd",
+                       np.where(held[:, None], held_dividends, 0.), amounts)
+      aum[:, row + 1:end + 1] = np.where(n_selected[:, None] > 0, value,
+                                         aum[:, row, None])
+      cumulative_dividends[:, row + 1:end + 1] = \
+        cumulative_dividends[:, row, None] + np.cumsum(paid, axis=1)
+
+    if period + 2 < len(rows):
+      number_correct = np.sum(held & (held_close[:, -1] > buy_close), axis=1)
+      ic_record[:, period] = ic_record[:, period - 1] if period else 0.
+      ic_record[:, period] += np.where(n_selected > 0,
+                                       2 * number_correct / n_stocks - 1, 0.)
+  return aum, cumulative_dividends, ic_record
+
+class RobustnessAnalysis:
+  """
+  Defines the RobustnessAnalysis class which runs a backtest
+  configuration on bootstrapped price paths and collects the
+  distributions of its summary statistics.
+  """
+  def __init__(self,
+    panel: PricePanel,
+    initial_aum: int,
+    beginning_date: str,
+    strategy1: str,
+    strategy2: str,
+    days1: int,
+    days2: int,
+    top_pct: int,
+    tickers: Optional[List[str]] = None,
+    rebalance_frequency: str = MONTHLY,
+    block_days: int = DEFAULT_BLOCK_DAYS,
+    seed: int = DEFAULT_SEED,
+    memory_mb: int = DEFAULT_MEMORY_MB) -> None:
+    """
+    This method initialises the RobustnessAnalysis class and runs the
+    backtest on the actual prices.
+
+    Args:
+      panel (PricePanel): The price panel.
+      initial_aum (int): The initial asset under management amount.
+      beginning_date (str): The beginning date of the backtest period.
+      strategy1 (str): The first backtesting strategy, either Momentum
+        or Reversal.
+      strategy2 (str): The second backtesting strategy, either Momentum
+        or Reversal.
+      days1 (int): The number of days to look back during calculation
+        of stock returns for the first strategy.
+      days2 (int): The number of days to look back during calculation
+        of stock returns for the second strategy.
+      top_pct (int): The percentage of stocks to pick for the portfolio.
+      tickers (Optional[List[str]]): The tickers of the universe.
+        Defaults to all the tickers of the panel.
+      rebalance_frequency (str): The rebalance frequency, see
+        PanelBacktest.
+      block_days (int): The number of consecutive days of each bootstrap
+        block, which keeps the short-term dependence of the returns.
+      seed (int): The seed of the bootstrap.
+      memory_mb (int): The memory budget of a chunk of paths in
+        megabytes.
+
+    Raises:
+      ValueError: If a ticker is not in the panel or the panel does not
+        contain enough history before the beginning date.
+    """
+    self.model: BatchModel = BatchModel(panel, beginning_date, strategy1,
+                                        strategy2, days1, days2, tickers,
+                                        rebalance_frequency)
+    self.initial_aum: int = initial_aum
+    self.strategy1: str = strategy1
+    self.strategy2: str = strategy2
+    self.days1: int = days1
+    self.days2: int = days2
+    self.block_days: int = block_days
+    self.generator: np.random.Generator = np.random.default_rng(seed)
+
+    """
+    n_stocks (int): The number of stocks bought at each rebalance.
+    rows (np.ndarray): The rebalance rows from the first row in memory.
+    b_row (int): The row of the first date on or after the beginning
+      date.
+    number_of_days (int): The number of calendar days of the backtest.
+    dividends (np.ndarray): The dividends from the first row in memory.
+    log_returns (np.ndarray): The daily log returns that are resampled,
+      zero where a price is missing.
+    dividend_yields (np.ndarray): The dividend yield of every day, which
+      is resampled with the returns that end on that day.
+    chunk_paths (int): The number of paths simulated at a time.
+    actual_statistics (Dict[str, float]): The summary statistics of the
+      backtest on the actual prices.
+    statistics (Optional[pd.DataFrame]): The summary statistics of every
+      bootstrapped path, once run.
+    """
+    self.n_stocks: int = ceil(len(self.model.tickers) * (top_pct / 100))
+    self.rows: np.ndarray = self.model.indexes - self.model.start
+    dates = panel.dates[self.model.start:]
+    b_timestamp = pd.to_datetime(beginning_date, format=DATE_FORMAT)
+    self.b_row: int = int(np.searchsorted(get_wall_clock_dates(dates),
+                                          b_timestamp))
+    self.number_of_days: int = (dates[-1] - dates[self.b_row])\
+      .round("1d").days
+    close = self.model.close
+    self.dividends: np.ndarray = np.asarray(
+      panel.dividends[self.model.start:],
+      dtype=np.float64)[:, self.model.columns]
+    with np.errstate(divide="ignore", invalid="ignore"):
+      self.log_returns: np.ndarray = np.nan_to_num(
+        np.log(close[1:] / close[:-1]), nan=0., posinf=0., neginf=0.)
+      self.dividend_yields: np.ndarray = np.nan_to_num(
+        self.dividends / close, nan=0., posinf=0., neginf=0.)
+    self.chunk_paths: int = get_chunk_paths(len(close), close.shape[1],
+                                            memory_mb)
+    self.actual_statistics: Dict[str, float] = {
+      key: float(value[0]) for key, value in self.get_statistics(
+        close[None], self.dividends[None]).items()}
+    self.statistics: Optional[pd.DataFrame] = None
+
+  def get_paths(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Builds the price paths of bootstrap rows. Every path starts from the
+    first price of each stock and keeps the stocks missing on the same
+    dates as the actual prices.
+
+    Args:
+      rows (np.ndarray): The paths x returns rows of the daily returns.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray]: Returns the paths x dates x stocks
+        close prices and dividends.
+    """
+    close = self.model.close
+    missing = ~np.isfinite(close)
+    first_close = close[np.argmax(~missing, axis=0), np.arange(close.shape[1])]
+    paths = np.empty((len(rows),) + close.shape)
+    paths[:, 0] = 0.
+    np.cumsum(self.log_returns[rows], axis=1, out=paths[:, 1:])
+    np.exp(paths, out=paths)
+    paths *= first_close
+    paths[:, missing] = np.nan
+    dividends = np.empty_like(paths)
+    dividends[:, 0] = self.dividends[0]
+    np.multiply(self.dividend_yields[rows + 1], paths[:, 1:],
+                out=dividends[:, 1:])
+    dividends[:, missing] = 0.
+    return paths, dividends
+
+  def get_statistics(self,
+    close: np.ndarray,
+    dividends: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Runs the backtest on price paths, fitting the model of every path
+    and simulating all the portfolios together.
+
+    Args:
+      close (np.ndarray): The paths x dates x stocks close prices.
+      dividends (np.ndarray): The paths x dates x stocks dividends.
+
+    Returns:
+      Dict[str, np.ndarray]: Returns the summary statistics of every path.
+    """
+    features = get_feature_matrix(close, self.rows, self.strategy1,
+                                  self.days1, self.strategy2, self.days2)
+    parameters, _ = fit_expanding_regressions(
+      features[:, :-1], get_label_matrix(close, self.rows))
+    predicted_returns = predict_returns(features[:, 1:], parameters)
+    aum, cumulative_dividends, ic_record = simulate_paths(
+      close, dividends, self.rows, predicted_returns, self.n_stocks,
+      self.initial_aum)
+    final_cumulative_ic = ic_record[:, -1] if ic_record.shape[1] \
+      else np.zeros(len(close))
+    return get_batch_summary_statistics(aum[:, self.b_row:],
+                                        cumulative_dividends[:, self.b_row:],
+                                        self.number_of_days,
+                                        final_cumulative_ic)
+
+  def run(self, n_paths: int = DEFAULT_N_PATHS) -> pd.DataFrame:
+    """
+    Runs the backtest on bootstrapped paths, a chunk of paths at a time.
+
+    Args:
+      n_paths (int): The number of paths.
+
+    Returns:
+      pd.DataFrame: Returns the summary statistics of every path.
+    """
+    chunks = []
+    for first in range(0, n_paths, self.chunk_paths):
+      rows = get_bootstrap_rows(self.generator,
+                                min(self.chunk_paths, n_paths - first),
+                                len(self.log_returns), self.block_days)
+      chunks.append(pd.DataFrame(self.get_statistics(*self.get_paths(rows))))
+    self.statistics = pd.concat(chunks, ignore_index=True)
+    return self.statistics
+
+  def get_summary(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the statistics of the actual prices next to the
+      mean, standard deviation and percentiles of their distribution over
+      the paths.
+    """
+    summary = pd.DataFrame({ACTUAL: pd.Series(self.actual_statistics),
+                            MEAN: self.statistics.mean(),
+                            STD: self.statistics.std()})
+    for percentile in PERCENTILES:
+      summary[f"p{percentile}"] = self.statistics.quantile(percentile / 100)
+    return summary
+
+  def print_summary(self) -> None:
+    """
+    None: Prints the summary of the distributions.
+    """
+    print(f"Robustness Analysis ({len(self.statistics)} bootstrapped paths, "
+          f"{self.block_days}-day blocks)")
+    print(self.get_summary().to_string(float_format="{:.5f}".format))
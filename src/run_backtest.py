@@ -1,22 +1,40 @@
 """
 This module is responsible for running the backtest simulation.
 """
+import os
+import pickle
+import warnings
 from math import ceil
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+
+from src.metrics import ROWS_PROCESSED, RUNS_COMPLETED
+from src.phase_timer import count, phase, timed
 
 # Constants
 MOMENTUM = "M"
 REVERSAL = "R"
 MOMENTUM_GAP = 20
+MAX_TRADING_DAYS_PER_MONTH = 23
 DATE_FORMAT = "%Y%m%d"
 AUM = "aum"
 IC = "ic"
 DATETIME = "datetime"
 DIVIDENDS_DF = "dividends"
+N_PARAMETERS = 3
+
+# Rebalance Frequencies
+MONTHLY = "M"
+WEEKLY = "W"
+BIWEEKLY = "2W"
+QUARTERLY = "Q"
+REBALANCE_FREQUENCIES = [MONTHLY, WEEKLY, BIWEEKLY, QUARTERLY]
+MAX_TRADING_DAYS_PER_PERIOD = {MONTHLY: MAX_TRADING_DAYS_PER_MONTH,
+                               WEEKLY: 5,
+                               BIWEEKLY: 10,
+                               QUARTERLY: 3 * MAX_TRADING_DAYS_PER_MONTH}
 
 # Yahoo Finance Constants
 CLOSE_PRICE = "Close"
@@ -35,6 +53,150 @@ STRATEGY2_COEFF = "strategy2_coeff"
 STRATEGY1_T = "strategy1_t"
 STRATEGY2_T = "strategy2_t"
 
+# Checkpoint Constants
+CHECKPOINT_VERSION = 2
+CHECKPOINT_VERSION_KEY = "version"
+CHECKPOINT_PARAMETERS = "parameters"
+CHECKPOINT_DATE = "checkpoint_date"
+CHECKPOINT_PORTFOLIO = "portfolio"
+CHECKPOINT_AUM = "aum"
+CHECKPOINT_DIVIDENDS = "dividends"
+CHECKPOINT_IC = "ic"
+CHECKPOINT_REGRESSION = "regression"
+
+def get_lookback(strategy: str, days: int) -> int:
+  """
+  Args:
+    strategy (str): The backtesting strategy, either Momentum or Reversal.
+    days (int): The number of days to look back.
+
+  Returns:
+    int: Returns the number of trading days before a rebalance date that
+      the feature of the strategy needs.
+  """
+  return days + MOMENTUM_GAP * (strategy == MOMENTUM)
+
+def get_max_period_trading_days(frequency: str) -> int:
+  """
+  Args:
+    frequency (str): "M" (monthly), "W" (weekly), "2W" (bi-weekly), "Q"
+      (quarterly) or a number N (every N trading days).
+
+  Raises:
+    ValueError: If the frequency is not supported.
+
+  Returns:
+    int: Returns the maximum number of trading days of a rebalance period.
+  """
+  if frequency in MAX_TRADING_DAYS_PER_PERIOD:
+    return MAX_TRADING_DAYS_PER_PERIOD[frequency]
+  if str(frequency).isdigit() and int(frequency) > 0:
+    return int(frequency)
+  raise ValueError(f"The rebalance frequency must be one of "
+                   f"{REBALANCE_FREQUENCIES} or a number of trading days.")
+
+def get_warmup_trading_days(strategy1: str,
+  days1: int,
+  strategy2: str,
+  days2: int,
+  rebalance_frequency: str = MONTHLY) -> int:
+  """
+  Args:
+    strategy1 (str): The first backtesting strategy.
+    days1 (int): The number of days to look back for the first strategy.
+    strategy2 (str): The second backtesting strategy.
+    days2 (int): The number of days to look back for the second strategy.
+    rebalance_frequency (str): The rebalance frequency, see
+      get_max_period_trading_days.
+
+  Returns:
+    int: Returns the number of trading days of history needed before
+      the beginning date: the longest lookback before the rebalance date
+      preceding the beginning date, plus the longest period.
+  """
+  return max(get_lookback(strategy1, days1), get_lookback(strategy2, days2))\
+    + get_max_period_trading_days(rebalance_frequency)
+
+def read_checkpoint(path: str) -> Dict[str, Any]:
+  """
+  Reads a checkpoint written by RunBacktest.save_checkpoint.
+
+  Args:
+    path (str): The path of the checkpoint file.
+
+  Raises:
+    ValueError: If the file is not a checkpoint of a supported version.
+
+  Returns:
+    Dict[str, Any]: Returns the dictionary containing the checkpointed state.
+  """
+  with open(path, "rb") as file:
+    checkpoint = pickle.load(file)
+  if not isinstance(checkpoint, dict) or \
+    checkpoint.get(CHECKPOINT_VERSION_KEY) != CHECKPOINT_VERSION:
+    raise ValueError(f"{path} is not a supported backtest checkpoint.")
+  return checkpoint
+
+def read_checkpoint_date(path: str) -> str:
+  """
+  Reads the month end date at which a checkpoint was taken. Resumed runs
+  only need price data from this date onwards (plus the lookback).
+
+  Args:
+    path (str): The path of the checkpoint file.
+
+  Returns:
+    str: Returns the checkpoint date in the format YYYYMMDD.
+  """
+  return read_checkpoint(path)[CHECKPOINT_DATE].strftime(DATE_FORMAT)
+
+class RegressionStatistics:
+  """
+  Defines the RegressionStatistics class which accumulates the sufficient
+  statistics of the expanding-window linear regression, so the training
+  data does not have to be kept.
+  """
+  def __init__(self) -> None:
+    """
+    This method initialises the RegressionStatistics class.
+    """
+    self.gram: np.ndarray = np.zeros((N_PARAMETERS, N_PARAMETERS))
+    self.moment: np.ndarray = np.zeros(N_PARAMETERS)
+    self.sum_squares: float = 0.0
+    self.n_samples: int = 0
+
+  def update(self, x: np.ndarray, y: np.ndarray) -> None:
+    """
+    Adds training samples to the statistics.
+
+    Args:
+      x (np.ndarray): The n x 2 strategy returns.
+      y (np.ndarray): The n actual returns.
+    """
+    design = np.column_stack([np.ones(len(y)), x])
+    self.gram += design.T @ design
+    self.moment += design.T @ y
+    self.sum_squares += y @ y
+    self.n_samples += len(y)
+
+  def fit(self) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fits the linear regression on all the samples added so far.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray]: Returns the intercept and the two
+        coefficients, and the t-values of the two coefficients.
+    """
+    design_matrix_inv = np.linalg.inv(self.gram)
+    parameters = design_matrix_inv @ self.moment
+    residual_sum_squares = max(self.sum_squares - parameters @ self.moment,
+                               0.0)
+    residual_std_error = np.sqrt(residual_sum_squares
+                                 / (self.n_samples - N_PARAMETERS))
+    standard_errors = np.sqrt(np.diagonal(design_matrix_inv)) \
+      * residual_std_error
+    return parameters, parameters[1:] / standard_errors[1:]
+
 class RunBacktest:
   """
   Defines the RunBacktest class which runs the backtest based on 
@@ -49,7 +211,8 @@ class RunBacktest:
     strategy2: str,
     days1: int,
     days2: int,
-    top_pct: int):
+    top_pct: int,
+    checkpoint_path: Optional[str] = None):
     """
     This method initialises the RunBacktest class.
 
@@ -67,6 +230,10 @@ class RunBacktest:
       days2 (int): The number of days to look back during calculation
         of stock returns for the second strategy.
       top_pct (int): The percentage of stocks to pick for the portfolio.
+      checkpoint_path (Optional[str]): The path of the checkpoint file.
+        If the file exists, the simulation resumes from the checkpointed
+        month end instead of the beginning date. The checkpoint is
+        rewritten at every month end of the simulation.
     """
     self.stocks_data: Dict[str, pd.DataFrame] = stocks_data
     self.initial_aum: int = initial_aum
@@ -76,6 +243,7 @@ class RunBacktest:
     self.days1: int = days1
     self.days2: int = days2
     self.top_pct: int = top_pct
+    self.checkpoint_path: Optional[str] = checkpoint_path
 
     """
     portfolio_performance (pd.DataFrame): The dataframe to store the 
@@ -88,10 +256,23 @@ class RunBacktest:
     monthly_ic (pd.DataFrame): The dataframe to store the monthly 
       cumulative information coefficient of the portfolio.
     model_training_data (pd.DataFrame): The dataframe to store the
-      training data for the linear regression model.
+      training data of this run for the linear regression model.
+    regression_statistics (RegressionStatistics): The sufficient
+      statistics of all the training data, including the months before
+      a resumed checkpoint, from which the model is fitted.
+    cumulative_ic (float): The cumulative information coefficient of
+      the portfolios held until the last rebalance.
+    last_rebalance (Dict[str, Any]): The date, AUM and cumulative
+      dividends of the last rebalance, empty before the first one.
     model_statistics_record (pd.DataFrame): The dataframe to store
       the record of the statistics of the linear regression model.
     month_end_indexes (List[int]): The list of indexes of the month
+      end dates used for rebalancing, starting with the month end
+      before the first rebalance.
+    resume_index (Optional[int]): The index of the checkpointed month
+      end when resuming from a checkpoint, None otherwise.
+    checkpoint (Dict[str, Any]): The loaded checkpoint state, empty
+      when not resuming.
     """
     self.portfolio_performance: pd.DataFrame = self.init_portfolio_performance()
     self.portfolio: List[Tuple[str, float]] = []
@@ -107,7 +288,17 @@ class RunBacktest:
                             STRATEGY2_COEFF,
                             STRATEGY1_T,
                             STRATEGY2_T])
-    self.month_end_indexes: List[int] = self.get_month_end_indexes_from_b()
+    self.regression_statistics: RegressionStatistics = RegressionStatistics()
+    self.cumulative_ic: float = 0
+    self.last_rebalance: Dict[str, Any] = {}
+    self.resume_index: Optional[int] = None
+    self.checkpoint: Dict[str, Any] = {}
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+      self.month_end_indexes: List[int] = \
+        self.load_checkpoint(checkpoint_path)
+    else:
+      self.month_end_indexes: List[int] = self.get_month_end_indexes_from_b()
+    self.warn_if_history_too_short()
 
   def init_portfolio_performance(self) -> None:
     """
@@ -124,6 +315,18 @@ class RunBacktest:
       [0 for _ in range(len(datetime_indexes))]
     return portfolio_performance
 
+  def get_month_end_indexes(self) -> List[int]:
+    """
+    List[int]: Returns the indexes of all the month end dates in the
+      stock data.
+    """
+    datetime_indexes = list(self.stocks_data.values())[0].index.to_list()
+    month_end_indexes = []
+    for idx, datetime in enumerate(datetime_indexes[:-1]):
+      if datetime.month != datetime_indexes[idx + 1].month:
+        month_end_indexes.append(idx)
+    return month_end_indexes
+
   def get_month_end_indexes_from_b(self) -> List[int]:
     """
     List[int]: Returns the indexes of the month end dates starting
@@ -131,19 +334,30 @@ class RunBacktest:
     """
     datetime_indexes = list(self.stocks_data.values())[0].index.to_list()
     b_timestamp = pd.to_datetime(self.beginning_date, format=DATE_FORMAT)
-    month_end_indexes = []
+    month_end_indexes = self.get_month_end_indexes()
     first_index_after_b = None
 
-    for idx, datetime in enumerate(datetime_indexes[:-1]):
-      if datetime.month != datetime_indexes[idx + 1].month:
-        month_end_indexes.append(idx)
-        if first_index_after_b is None and\
-          datetime_indexes[idx].tz_localize(None) > b_timestamp:
-          first_index_after_b = idx
+    for idx in month_end_indexes:
+      if datetime_indexes[idx].tz_localize(None) > b_timestamp:
+        first_index_after_b = idx
+        break
 
     first_index_after_b = month_end_indexes.index(first_index_after_b)
     return month_end_indexes[first_index_after_b - 1:]
 
+  def warn_if_history_too_short(self) -> None:
+    """
+    Warns if the stock data does not contain enough days before the
+    first month end for the lookbacks of the strategies, in which case
+    the features of the first months would be wrong.
+    """
+    lookback = max(get_lookback(self.strategy1, self.days1),
+                   get_lookback(self.strategy2, self.days2))
+    if self.month_end_indexes[0] < lookback:
+      warnings.warn(f"The stock data has {self.month_end_indexes[0]} trading "
+                    f"days before the first month end but the strategies "
+                    f"need {lookback}.")
+
   def get_feature(self,
     stock: str,
     strategy: str,
@@ -165,6 +379,7 @@ class RunBacktest:
     is_momentum = strategy == MOMENTUM
     date_index -= MOMENTUM_GAP * is_momentum
 
+    count("price_lookups", 2)
     history = self.stocks_data[stock]
     end_close = history.iloc[date_index][CLOSE_PRICE]
     start_close = history.iloc[date_index - days][CLOSE_PRICE]
@@ -187,11 +402,13 @@ class RunBacktest:
     previous_month_index = \
       self.month_end_indexes[self.month_end_indexes.index(date_index) - 1]
 
+    count("price_lookups", 2)
     history = self.stocks_data[stock]
     end_close = history.iloc[date_index][CLOSE_PRICE]
     start_close = history.iloc[previous_month_index][CLOSE_PRICE]
     return (end_close - start_close) / start_close * 100
 
+  @timed("run_backtest.build_training_data")
   def update_monthly_training_data(self,
     date_index: int) -> None:
     """
@@ -230,33 +447,21 @@ class RunBacktest:
     self.model_training_data = \
       pd.concat([self.model_training_data, training_data_df],
                 ignore_index=True)
+    self.regression_statistics.update(
+      training_data_df[[STRATEGY1_RETURN, STRATEGY2_RETURN]].to_numpy(float),
+      training_data_df[ACTUAL_RETURN].to_numpy(float))
 
   def store_model_statistics(self,
-    x: pd.DataFrame,
-    y: pd.Series,
-    model: LinearRegression) -> None:
+    coefficients: np.ndarray,
+    t_values: np.ndarray) -> None:
     """
-    Calculates and stores the model coefficients and t-values 
-    in the model statistics record dataframe.
+    Stores the model coefficients and t-values in the model statistics
+    record dataframe.
 
     Args:
-      x (pd.DataFrame): The training data for the model.
-      y (pd.Series): The training labels for the model.
-      model (LinearRegression): The linear regression model.
+      coefficients (np.ndarray): The coefficients of the two strategies.
+      t_values (np.ndarray): The t-values of the two coefficients.
     """
-    coefficients = model.coef_
-
-    n_samples, n_predictors = x.shape
-    residuals = y - model.predict(x)
-    residual_std_error = np.sqrt(np.sum(residuals ** 2) / \
-                                 (n_samples - n_predictors - 1))
-
-    x_design = np.concatenate([np.ones((n_samples, 1)), x], axis=1)
-    design_matrix_inv = np.linalg.inv(np.dot(x_design.T, x_design))
-    standard_errors = np.sqrt(np.diagonal(design_matrix_inv))\
-      * residual_std_error
-    t_values = coefficients / standard_errors[1:]
-
     statistics = np.concatenate((coefficients, t_values))
     statistics_df = \
       pd.DataFrame(statistics.reshape(1, -1),
@@ -268,20 +473,19 @@ class RunBacktest:
       pd.concat([self.model_statistics_record, statistics_df],
                 ignore_index=True)
 
-  def fit_model_and_store_statistics(self) -> LinearRegression:
+  @timed("run_backtest.fit_model")
+  def fit_model_and_store_statistics(self) -> np.ndarray:
     """
-    Fits the linear regression model and stores the model statistics.
+    Fits the linear regression model on the regression statistics of all
+    the training data and stores the model statistics.
 
     Returns:
-      LinearRegression: The fitted linear regression model.
+      np.ndarray: The intercept and the two coefficients of the model.
     """
-    x = self.model_training_data[[STRATEGY1_RETURN, STRATEGY2_RETURN]]
-    y = self.model_training_data[ACTUAL_RETURN]
-
-    model = LinearRegression()
-    model.fit(x, y)
-    self.store_model_statistics(x, y, model)
-    return model
+    count("regressions_fitted")
+    parameters, t_values = self.regression_statistics.fit()
+    self.store_model_statistics(parameters[1:], t_values)
+    return parameters
 
   def predict_returns(self,
     date_index: int) -> pd.DataFrame:
@@ -299,18 +503,20 @@ class RunBacktest:
     """
     prediction_features = []
     stock_list = list(self.stocks_data.keys())
-    for stock in stock_list:
-      strategy1_return = self.get_feature(
-        stock,
-        self.strategy1,
-        self.days1,
-        date_index)
-      strategy2_return = self.get_feature(
-        stock,
-        self.strategy2,
-        self.days2,
-        date_index)
-      prediction_features.append([stock, strategy1_return, strategy2_return])
+    with phase("run_backtest.build_features"):
+      for stock in stock_list:
+        strategy1_return = self.get_feature(
+          stock,
+          self.strategy1,
+          self.days1,
+          date_index)
+        strategy2_return = self.get_feature(
+          stock,
+          self.strategy2,
+          self.days2,
+          date_index)
+        prediction_features.append([stock, strategy1_return,
+                                    strategy2_return])
 
     prediction_features_df = pd.DataFrame(prediction_features,
                                           columns=[STOCK,
@@ -318,13 +524,15 @@ class RunBacktest:
                                                    STRATEGY2_RETURN])
 
     self.update_monthly_training_data(date_index)
-    model = self.fit_model_and_store_statistics()
+    parameters = self.fit_model_and_store_statistics()
     x_new = prediction_features_df[[STRATEGY1_RETURN, STRATEGY2_RETURN]]
-    y_pred = pd.Series(model.predict(x_new), name=PREDICTED_RETURN)
+    y_pred = pd.Series(parameters[0] + x_new.to_numpy(float) @ parameters[1:],
+                       name=PREDICTED_RETURN)
     predicted_returns = \
       pd.concat([prediction_features_df[STOCK], y_pred], axis=1)
     return predicted_returns
 
+  @timed("run_backtest.rebalance")
   def select_stocks_to_buy(self,
     date_index: int) -> List[str]:
     """
@@ -365,6 +573,7 @@ class RunBacktest:
         Each element is a tuple of the stock ticker and the amount of 
         the stock.
     """
+    count("price_lookups", len(stocks_to_buy))
     aum_per_stock = aum / len(stocks_to_buy)
     stocks_amount = []
     for stock in stocks_to_buy:
@@ -385,6 +594,7 @@ class RunBacktest:
     Returns:
       float: Returns the AUM amount.
     """
+    count("price_lookups", len(self.portfolio))
     total_aum = 0
     for stock, amount in self.portfolio:
       end_close = self.stocks_data[stock].iloc[date_index][CLOSE_PRICE]
@@ -402,40 +612,78 @@ class RunBacktest:
     Returns:
       float: Returns the dividends amount.
     """
+    count("price_lookups", len(self.portfolio))
     total_dividends = 0
     for stock, amount in self.portfolio:
       dividends = self.stocks_data[stock].iloc[date_index][DIVIDENDS]
       total_dividends += amount * dividends
     return total_dividends
 
+  @timed("run_backtest.fill_up_portfolio_performance")
   def fill_up_portfolio_performance(self) -> None:
     """
     None: Simulates backtesting based on the user-defined strategies and
       fills up the dataframe of portfolio performance with the calculated
-      AUM and dividends for each day in the specified time period.
+      AUM and dividends for each day in the specified time period. With a
+      checkpoint path, the checkpoint is rewritten at every month end.
+      When resuming from a checkpoint, only the days after the
+      checkpointed month end are simulated and the dataframe starts at
+      the checkpointed month end.
     """
     month_end_idx = self.month_end_indexes[1:]
-    for date_index in range(month_end_idx[0], \
-                            len(list(self.stocks_data.values())[0].index)):
+    if self.resume_index is None:
+      start_index = month_end_idx[0]
+    else:
+      start_index = self.resume_index + 1
+      self.portfolio_performance.at[self.resume_index, AUM] = \
+        self.checkpoint[CHECKPOINT_AUM]
+      self.portfolio_performance.at[self.resume_index, DIVIDENDS_DF] = \
+        self.checkpoint[CHECKPOINT_DIVIDENDS]
+
+    datetime_indexes = list(self.stocks_data.values())[0].index
+    for date_index in range(start_index, len(datetime_indexes)):
       # updating portfolio performance by each row
-      if date_index == month_end_idx[0]:
-        self.portfolio_performance.at[date_index, AUM] = self.initial_aum
-      else:
-        self.portfolio_performance.at[date_index, AUM] = \
-          self.calc_aum(date_index)
+      with phase("run_backtest.simulate_day"):
+        if self.resume_index is None and date_index == month_end_idx[0]:
+          self.portfolio_performance.at[date_index, AUM] = self.initial_aum
+        else:
+          self.portfolio_performance.at[date_index, AUM] = \
+            self.calc_aum(date_index)
 
-      self.portfolio_performance.at[date_index, DIVIDENDS_DF] = \
-        self.portfolio_performance.at[date_index - 1, DIVIDENDS_DF] \
-          + self.calc_dividends(date_index)
+        self.portfolio_performance.at[date_index, DIVIDENDS_DF] = \
+          self.portfolio_performance.at[date_index - 1, DIVIDENDS_DF] \
+            + self.calc_dividends(date_index)
 
       # rebalance and store new portfolio
       if date_index in month_end_idx:
+        if self.portfolio:
+          previous_month_index = self.month_end_indexes[
+            self.month_end_indexes.index(date_index) - 1]
+          self.cumulative_ic += self.get_information_coefficient(
+            self.portfolio, previous_month_index, date_index)
+
         stocks_to_buy = self.select_stocks_to_buy(date_index)
         self.portfolio = self.calc_portfolio(
           stocks_to_buy,
           self.portfolio_performance.iloc[date_index][AUM],
           date_index)
         self.portfolio_record.append(self.portfolio)
+        self.last_rebalance = {
+          CHECKPOINT_DATE: datetime_indexes[date_index],
+          CHECKPOINT_AUM: self.portfolio_performance.at[date_index, AUM],
+          CHECKPOINT_DIVIDENDS:
+            self.portfolio_performance.at[date_index, DIVIDENDS_DF]
+        }
+        if self.checkpoint_path is not None:
+          self.save_checkpoint(self.checkpoint_path)
+
+    ROWS_PROCESSED.inc(len(self.portfolio_performance) - start_index,
+                       stage="simulate")
+    RUNS_COMPLETED.inc(engine="reference")
+    if self.resume_index is not None:
+      self.portfolio_performance = \
+        self.portfolio_performance[self.resume_index:].reset_index(drop=True)
+      return
 
     # cut portfolio performance to only start from beginning date
     datetime_indexes = self.portfolio_performance[DATETIME].to_list()
@@ -448,34 +696,158 @@ class RunBacktest:
     self.portfolio_performance = \
       self.portfolio_performance[b_idx:].reset_index(drop=True)
 
+  def get_information_coefficient(self,
+    portfolio: List[Tuple[str, float]],
+    start_index: int,
+    end_index: int) -> float:
+    """
+    Calculates the information coefficient of a portfolio held between
+    two month ends.
+
+    Args:
+      portfolio (List[Tuple[str, float]]): The portfolio bought at the
+        start date.
+      start_index (int): The index of the month end the portfolio was
+        bought at.
+      end_index (int): The index of the next month end.
+
+    Returns:
+      float: Returns the information coefficient, twice the proportion
+        of the stocks bought whose close rose minus one.
+    """
+    number_stocks_bought = ceil(len(self.stocks_data) * (self.top_pct / 100))
+    count("price_lookups", 2 * len(portfolio))
+    number_correct = 0
+    for stock, _ in portfolio:
+      closes = self.stocks_data[stock][CLOSE_PRICE]
+      if closes.iloc[end_index] > closes.iloc[start_index]:
+        number_correct += 1
+
+    prop_correct = number_correct / number_stocks_bought
+    return (2 * prop_correct) - 1
+
+  @timed("run_backtest.calc_ic")
   def calc_ic(self) -> None:
     """
     None: Simulates backtesting based on the user-defined information
       and strategy and fills up the dataframe of monthly cumulative 
       information coefficient for each month end day in the specified 
-      period.
-    """
-    month_end_idx = self.month_end_indexes[1:]
+      period. When resuming from a checkpoint, the dataframe starts at
+      the checkpointed month end and continues from its cumulative
+      information coefficient.
+    """
+    if self.resume_index is None:
+      month_end_idx = self.month_end_indexes[1:]
+      previous_ic = 0
+    else:
+      # the checkpointed month end is the first rebalance of this run
+      month_end_idx = self.month_end_indexes
+      previous_ic = self.checkpoint[CHECKPOINT_IC]
+
+    self.monthly_ic = pd.DataFrame()
     self.monthly_ic[DATETIME] = \
       list(self.stocks_data.values())[0].index[month_end_idx[:-1]]
     self.monthly_ic[IC] = [0 for _ in range(len(month_end_idx[:-1]))]
 
-    number_stocks_bought = ceil(len(self.stocks_data) * (self.top_pct / 100))
+    ROWS_PROCESSED.inc(len(month_end_idx[:-1]), stage="ic")
     for i in range(len(month_end_idx[:-1])):
-      number_correct = 0
-
-      for stock, _ in self.portfolio_record[i]:
-        current_close = \
-          list(self.stocks_data[stock][CLOSE_PRICE])[month_end_idx[i]]
-        next_close = \
-          list(self.stocks_data[stock][CLOSE_PRICE])[month_end_idx[i + 1]]
-        if next_close > current_close:
-          number_correct += 1
-
-      prop_correct = number_correct / number_stocks_bought
-      information_coeff = (2 * prop_correct) - 1
+      information_coeff = self.get_information_coefficient(
+        self.portfolio_record[i], month_end_idx[i], month_end_idx[i + 1])
       if i == 0:
-        self.monthly_ic.at[i, IC] = information_coeff
+        self.monthly_ic.at[i, IC] = previous_ic + information_coeff
       else:
         self.monthly_ic.at[i, IC] = self.monthly_ic.at[i - 1, IC] \
           + information_coeff
+
+  def get_parameters(self) -> Dict[str, Any]:
+    """
+    Dict[str, Any]: Returns the parameters that define the backtest. A
+      checkpoint can only be resumed by a backtest with equal parameters.
+    """
+    return {
+      "tickers": list(self.stocks_data.keys()),
+      "initial_aum": self.initial_aum,
+      "beginning_date": self.beginning_date,
+      "strategy1": self.strategy1,
+      "strategy2": self.strategy2,
+      "days1": self.days1,
+      "days2": self.days2,
+      "top_pct": self.top_pct
+    }
+
+  def save_checkpoint(self, path: str) -> None:
+    """
+    Saves the simulation state at the last rebalanced month end so that
+    a later run can resume from it: the portfolio, the AUM, cumulative
+    dividends and cumulative information coefficient, and the regression
+    statistics of the training data. Days after the last month end are
+    not checkpointed because the month they belong to is incomplete.
+
+    Args:
+      path (str): The path of the checkpoint file.
+
+    Raises:
+      ValueError: If no month end has been rebalanced yet.
+    """
+    if not self.last_rebalance:
+      raise ValueError("There is no rebalanced month end to checkpoint.")
+
+    checkpoint = {
+      CHECKPOINT_VERSION_KEY: CHECKPOINT_VERSION,
+      CHECKPOINT_PARAMETERS: self.get_parameters(),
+      CHECKPOINT_PORTFOLIO: self.portfolio,
+      CHECKPOINT_IC: self.cumulative_ic,
+      CHECKPOINT_REGRESSION: self.regression_statistics,
+      **self.last_rebalance
+    }
+
+    # write to a temporary file first so a crash never leaves a
+    # truncated checkpoint behind
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+      pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+  def load_checkpoint(self, path: str) -> List[int]:
+    """
+    Restores the simulation state from a checkpoint.
+
+    Args:
+      path (str): The path of the checkpoint file.
+
+    Raises:
+      ValueError: If the checkpoint was written by a backtest with
+        different parameters or the stock data does not contain the
+        checkpointed month end.
+
+    Returns:
+      List[int]: The month end indexes to rebalance at, starting with
+        the checkpointed month end.
+    """
+    checkpoint = read_checkpoint(path)
+    if checkpoint[CHECKPOINT_PARAMETERS] != self.get_parameters():
+      raise ValueError("The checkpoint was written by a backtest with "
+                       "different parameters.")
+
+    checkpoint_date = checkpoint[CHECKPOINT_DATE].tz_localize(None)
+    datetime_indexes = list(self.stocks_data.values())[0].index.to_list()
+    resume_index = None
+    for idx, datetime in enumerate(datetime_indexes):
+      if datetime.tz_localize(None) == checkpoint_date:
+        resume_index = idx
+        break
+    if resume_index is None:
+      raise ValueError("The stock data does not contain the checkpoint "
+                       f"date {checkpoint_date.strftime(DATE_FORMAT)}.")
+
+    self.resume_index = resume_index
+    self.checkpoint = checkpoint
+    self.portfolio = checkpoint[CHECKPOINT_PORTFOLIO]
+    self.portfolio_record = [self.portfolio]
+    self.regression_statistics = checkpoint[CHECKPOINT_REGRESSION]
+    self.cumulative_ic = checkpoint[CHECKPOINT_IC]
+    self.last_rebalance = {key: checkpoint[key] for key in
+                           [CHECKPOINT_DATE, CHECKPOINT_AUM,
+                            CHECKPOINT_DIVIDENDS]}
+    return [resume_index] + [idx for idx in self.get_month_end_indexes()
+                             if idx > resume_index]
@@ -0,0 +1,346 @@
+"""
+This module is responsible for the sensitivity surface of a backtest
+configuration: its summary statistics as a function of the lookbacks of
+the two strategies. The log close prices are taken once, so the return of
+every lookback is the exponential of a difference of two rows, the
+expanding-window regressions of all the pairs of lookbacks are fitted
+with matrix products of the per-lookback sums, and the portfolios of many
+pairs are simulated at once, a block of days1 values at a time.
+"""
+from math import ceil
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_stats import (DAILY_SHARPE_RATIO, FINAL_AUM,
+                                get_batch_summary_statistics,
+                                use_headless_backend)
+from src.batch_model import get_label_matrix
+from src.input_data import MAX_DAYS, MIN_DAYS
+from src.panel_backtest import MONTHLY, get_rebalance_indexes_from_b
+from src.price_panel import PricePanel, get_wall_clock_dates
+from src.report_generator import FIGURE_DPI
+from src.robustness import DEFAULT_MEMORY_MB, simulate_paths
+from src.run_backtest import DATE_FORMAT, MOMENTUM, MOMENTUM_GAP, \
+  get_lookback
+
+# Constants
+DEFAULT_DAYS = list(range(MIN_DAYS, MAX_DAYS + 1))
+HEATMAP_METRICS = [DAILY_SHARPE_RATIO, FINAL_AUM]
+SURFACE_PLOT_PATH = "sensitivity_surface.png"
+SURFACE_TABLE_PATH = "sensitivity_surface.csv"
+# the pairs x rebalances x stocks arrays held at once by a block
+BLOCK_ARRAYS = 3
+# the rows and columns of the regression sums making the normal equations
+GRAM_ROWS = [[0, 1, 0], [1, 2, 1], [0, 1, 0]]
+GRAM_COLUMNS = [[0, 0, 1], [0, 0, 1], [1, 1, 2]]
+MOMENT_ROWS = [3, 4, 3]
+MOMENT_COLUMNS = [0, 0, 1]
+
+# Table Columns
+DAYS1 = "days1"
+DAYS2 = "days2"
+
+def get_lookback_features(log_close: np.ndarray,
+  rows: np.ndarray,
+  strategy: str,
+  days: Sequence[int]) -> np.ndarray:
+  """
+  Args:
+    log_close (np.ndarray): The log close prices of the dates by stocks.
+    rows (np.ndarray): The rows of the rebalance dates.
+    strategy (str): The strategy, either Momentum or Reversal.
+    days (Sequence[int]): The lookbacks.
+
+  Returns:
+    np.ndarray: Returns the lookbacks x rebalance dates x stocks strategy
+      returns in percent.
+  """
+  end = rows - MOMENTUM_GAP * (strategy == MOMENTUM)
+  start = end[None, :] - np.asarray(days)[:, None]
+  return np.expm1(log_close[end][None] - log_close[start]) * 100
+
+def fit_pair_regressions(features1: np.ndarray,
+  features2: np.ndarray,
+  labels: np.ndarray) -> np.ndarray:
+  """
+  Fits the expanding-window regressions of every pair of a lookback of
+  the first strategy and one of the second. The sums of the normal
+  equations of a pair are products of a sum over the stocks of the first
+  lookback and one of the second, so they are computed for all the pairs
+  with one matrix product per rebalance.
+
+  Args:
+    features1 (np.ndarray): The lookbacks x periods x stocks returns of
+      the first strategy.
+    features2 (np.ndarray): The lookbacks x periods x stocks returns of
+      the second strategy.
+    labels (np.ndarray): The periods x stocks returns that followed the
+      features.
+
+  Returns:
+    np.ndarray: Returns the lookbacks1 x lookbacks2 x periods x 3
+      intercepts and coefficients, NaN for the pairs whose regression is
+      singular.
+  """
+  valid1 = np.isfinite(features1)
+  valid2 = np.isfinite(features2)
+  valid_labels = np.isfinite(labels)
+  x = np.where(valid1, features1, 0.)
+  y = np.where(valid2, features2, 0.)
+  label = np.where(valid_labels, labels, 0.)
+  left = np.stack([valid1 & valid_labels, x * valid_labels,
+                   x * x * valid_labels, valid1 * label, x * label])
+  right = np.stack([valid2, y, y * y]).astype(np.float64)
+  n_left, n_days1, n_periods, n_tickers = left.shape
+  n_right, n_days2 = right.shape[:2]
+  sums = np.matmul(
+    left.transpose(2, 0, 1, 3).reshape(n_periods, -1, n_tickers),
+    right.transpose(2, 3, 0, 1).reshape(n_periods, n_tickers, -1))
+  sums = np.cumsum(sums.reshape(n_periods, n_left, n_days1, n_right,
+                                n_days2).transpose(2, 4, 0, 1, 3), axis=2)
+  gram = sums[..., GRAM_ROWS, GRAM_COLUMNS]
+  moment = sums[..., MOMENT_ROWS, MOMENT_COLUMNS]
+
+  singular = np.linalg.matrix_rank(gram) < gram.shape[-1]
+  gram[singular] = np.eye(gram.shape[-1])
+  parameters = np.einsum("...ij,...j->...i", np.linalg.inv(gram), moment)
+  parameters[singular] = np.nan
+  return parameters
+
+class SensitivitySurface:
+  """
+  Defines the SensitivitySurface class which runs a backtest
+  configuration for every pair of lookbacks of its two strategies.
+  """
+  def __init__(self,
+    panel: PricePanel,
+    initial_aum: int,
+    beginning_date: str,
+    strategy1: str,
+    strategy2: str,
+    top_pct: int,
+    tickers: Optional[List[str]] = None,
+    rebalance_frequency: str = MONTHLY,
+    days1: Sequence[int] = DEFAULT_DAYS,
+    days2: Sequence[int] = DEFAULT_DAYS,
+    memory_mb: int = DEFAULT_MEMORY_MB) -> None:
+    """
+    This method initialises the SensitivitySurface class and computes the
+    strategy returns of every lookback.
+
+    Args:
+      panel (PricePanel): The price panel.
+      initial_aum (int): The initial asset under management amount.
+      beginning_date (str): The beginning date of the backtest period.
+      strategy1 (str): The first backtesting strategy, either Momentum
+        or Reversal.
+      strategy2 (str): The second backtesting strategy, either Momentum
+        or Reversal.
+      top_pct (int): The percentage of stocks to pick for the portfolio.
+      tickers (Optional[List[str]]): The tickers of the universe.
+        Defaults to all the tickers of the panel.
+      rebalance_frequency (str): The rebalance frequency, see
+        PanelBacktest.
+      days1 (Sequence[int]): The lookbacks of the first strategy.
+        Defaults to all the allowed lookbacks.
+      days2 (Sequence[int]): The lookbacks of the second strategy.
+        Defaults to all the allowed lookbacks.
+      memory_mb (int): The memory budget of a block of pairs in
+        megabytes.
+
+    Raises:
+      ValueError: If a ticker is not in the panel, a lookback is not
+        allowed or the panel does not contain enough history before the
+        beginning date.
+    """
+    self.tickers: List[str] = list(panel.tickers) if tickers is None \
+      else list(tickers)
+    panel_columns = {ticker: idx for idx, ticker in enumerate(panel.tickers)}
+    missing = [ticker for ticker in self.tickers
+               if ticker not in panel_columns]
+    if missing:
+      raise ValueError(f"Tickers {missing} are not in the price panel.")
+    if not all(MIN_DAYS <= days <= MAX_DAYS
+               for days in list(days1) + list(days2)):
+      raise ValueError(f"The lookbacks must be between {MIN_DAYS} to "
+                       f"{MAX_DAYS}.")
+    self.initial_aum: int = initial_aum
+    self.strategy1: str = strategy1
+    self.strategy2: str = strategy2
+    self.days1: List[int] = list(days1)
+    self.days2: List[int] = list(days2)
+
+    """
+    n_stocks (int): The number of stocks bought at each rebalance.
+    indexes (np.ndarray): The panel rows of the rebalance dates, starting
+      with the period end before the first rebalance.
+    start (int): The first panel row kept in memory.
+    rows (np.ndarray): The rebalance rows from the start row.
+    b_row (int): The row of the first date on or after the beginning
+      date.
+    number_of_days (int): The number of calendar days of the backtest.
+    close (np.ndarray): The close prices from the start row.
+    dividends (np.ndarray): The dividends from the start row.
+    features1 (np.ndarray): The days1 x rebalance dates x stocks returns
+      of the first strategy.
+    features2 (np.ndarray): The days2 x rebalance dates x stocks returns
+      of the second strategy.
+    realised_returns (np.ndarray): The returns in percent from each
+      rebalance date to the next.
+    block_days1 (int): The number of days1 values simulated at a time.
+    table (Optional[pd.DataFrame]): The summary statistics of every pair
+      of lookbacks, once run.
+    """
+    self.n_stocks: int = ceil(len(self.tickers) * (top_pct / 100))
+    self.indexes: np.ndarray = get_rebalance_indexes_from_b(
+      panel.dates, beginning_date, rebalance_frequency)
+    lookback = max(get_lookback(strategy1, max(self.days1)),
+                   get_lookback(strategy2, max(self.days2)))
+    if self.indexes[0] < lookback:
+      raise ValueError(f"The price panel needs at least {lookback} "
+                       "trading days before the rebalance date preceding the "
+                       "beginning date.")
+    self.start: int = int(self.indexes[0]) - lookback
+    self.rows: np.ndarray = self.indexes - self.start
+    dates = panel.dates[self.start:]
+    b_timestamp = pd.to_datetime(beginning_date, format=DATE_FORMAT)
+    self.b_row: int = int(np.searchsorted(get_wall_clock_dates(dates),
+                                          b_timestamp))
+    self.number_of_days: int = (dates[-1] - dates[self.b_row])\
+      .round("1d").days
+    columns = [panel_columns[ticker] for ticker in self.tickers]
+    self.close: np.ndarray = np.asarray(panel.close[self.start:],
+                                        dtype=np.float64)[:, columns]
+    self.dividends: np.ndarray = np.asarray(panel.dividends[self.start:],
+                                            dtype=np.float64)[:, columns]
+    with np.errstate(divide="ignore", invalid="ignore"):
+      log_close = np.log(self.close)
+    self.features1: np.ndarray = get_lookback_features(
+      log_close, self.rows, strategy1, self.days1)
+    self.features2: np.ndarray = get_lookback_features(
+      log_close, self.rows, strategy2, self.days2)
+    self.realised_returns: np.ndarray = get_label_matrix(self.close,
+                                                         self.rows)
+    pair_bytes = BLOCK_ARRAYS * len(self.days2) * self.features2[0].size \
+      * np.dtype(np.float64).itemsize
+    self.block_days1: int = max(1, memory_mb * 2 ** 20 // pair_bytes)
+    self.table: Optional[pd.DataFrame] = None
+
+  def get_block_statistics(self, first: int, last: int) -> pd.DataFrame:
+    """
+    Runs the backtests of a block of days1 values with every days2 value.
+
+    Args:
+      first (int): The position of the first days1 value of the block.
+      last (int): The position after the last days1 value of the block.
+
+    Returns:
+      pd.DataFrame: Returns the lookbacks and summary statistics of every
+        pair of the block with a regular regression.
+    """
+    features1 = self.features1[first:last]
+    parameters = fit_pair_regressions(features1[:, :-1],
+                                      self.features2[:, :-1],
+                                      self.realised_returns)
+    predicted_returns = parameters[..., :1] \
+      + parameters[..., 1:2] * features1[:, None, 1:] \
+      + parameters[..., 2:] * self.features2[None, :, 1:]
+    pairs = np.isfinite(parameters).all(axis=(-2, -1))
+    predicted_returns = predicted_returns[pairs]
+    n_pairs = len(predicted_returns)
+
+    # every pair trades the same prices, which are broadcast, not copied
+    aum, cumulative_dividends, ic_record = simulate_paths(
+      np.broadcast_to(self.close, (n_pairs,) + self.close.shape),
+      np.broadcast_to(self.dividends, (n_pairs,) + self.dividends.shape),
+      self.rows, predicted_returns, self.n_stocks, self.initial_aum)
+    final_cumulative_ic = ic_record[:, -1] if ic_record.shape[1] \
+      else np.zeros(n_pairs)
+    days1, days2 = np.meshgrid(self.days1[first:last], self.days2,
+                               indexing="ij")
+    return pd.DataFrame({
+      DAYS1: days1[pairs], DAYS2: days2[pairs],
+      **get_batch_summary_statistics(aum[:, self.b_row:],
+                                     cumulative_dividends[:, self.b_row:],
+                                     self.number_of_days,
+                                     final_cumulative_ic)})
+
+  def run(self) -> pd.DataFrame:
+    """
+    Runs the backtests of all the pairs of lookbacks, a block of days1
+    values at a time.
+
+    Returns:
+      pd.DataFrame: Returns the lookbacks and summary statistics of every
+        pair, without the pairs of two identical signals.
+    """
+    self.table = pd.concat(
+      [self.get_block_statistics(first, first + self.block_days1)
+       for first in range(0, len(self.days1), self.block_days1)],
+      ignore_index=True)
+    return self.table
+
+  def get_surface(self, metric: str = DAILY_SHARPE_RATIO) -> pd.DataFrame:
+    """
+    Args:
+      metric (str): The summary statistic.
+
+    Returns:
+      pd.DataFrame: Returns the statistic of every pair, days1 by days2,
+        NaN for the pairs that were not run.
+    """
+    return self.table.pivot(index=DAYS1, columns=DAYS2, values=metric)\
+      .reindex(index=self.days1, columns=self.days2)
+
+  def save_table(self, path: str = SURFACE_TABLE_PATH) -> None:
+    """
+    Saves the table of the statistics of every pair.
+
+    Args:
+      path (str): The path of the CSV file.
+    """
+    self.table.to_csv(path, index=False)
+
+  def plot(self,
+    path: str = SURFACE_PLOT_PATH,
+    metrics: Sequence[str] = HEATMAP_METRICS) -> None:
+    """
+    Draws a heatmap of each statistic over the lookbacks and saves them
+    side by side.
+
+    Args:
+      path (str): The path where the plot is saved.
+      metrics (Sequence[str]): The summary statistics to draw.
+    """
+    use_headless_backend()
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(6 * len(metrics), 5), dpi=FIGURE_DPI)
+    for position, metric in enumerate(metrics):
+      surface = self.get_surface(metric)
+      axes = figure.add_subplot(1, len(metrics), position + 1)
+      image = axes.pcolormesh(surface.columns, surface.index,
+                              np.ma.masked_invalid(surface.to_numpy()),
+                              shading="nearest")
+      figure.colorbar(image, ax=axes)
+      axes.set_title(metric)
+      axes.set_xlabel(f"{DAYS2} ({self.strategy2})")
+      axes.set_ylabel(f"{DAYS1} ({self.strategy1})")
+    figure.tight_layout()
+    figure.savefig(path)
+
+  def print_summary(self, n_best: int = 10) -> None:
+    """
+    Prints the pairs of lookbacks with the highest Sharpe ratios.
+
+    Args:
+      n_best (int): The number of pairs to print.
+    """
+    best = self.table.sort_values(DAILY_SHARPE_RATIO, ascending=False,
+                                  na_position="last").head(n_best)
+    print(f"Sensitivity Surface ({len(self.table)} pairs of lookbacks, "
+          f"{self.strategy1} {min(self.days1)}-{max(self.days1)} days by "
+          f"{self.strategy2} {min(self.days2)}-{max(self.days2)} days)")
+    print(best[[DAYS1, DAYS2, DAILY_SHARPE_RATIO, FINAL_AUM]]
+          .to_string(index=False, float_format="{:.5f}".format))
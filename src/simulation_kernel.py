@@ -0,0 +1,176 @@
+"""
+This module is responsible for the simulation kernel of the backtest: the
+loop over days that values the holdings, accumulates the dividends and
+sizes the new holdings at each rebalance with the AUM of that day. The
+loop is compiled with Numba when it is installed, and a NumPy version
+that gives exactly the same results is used otherwise. Numba is only
+imported when the compiled kernel is first requested, as importing it
+takes a noticeable part of a short run.
+"""
+from importlib.util import find_spec
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+# Whether Numba is installed, checked without importing it
+HAS_NUMBA = find_spec("numba") is not None
+
+# The compiled kernel, created on first use
+COMPILED_KERNEL = None
+
+def simulate_kernel(close: np.ndarray,
+  dividends: np.ndarray,
+  rebalance_rows: np.ndarray,
+  selections: np.ndarray,
+  n_selected: np.ndarray,
+  holdings: np.ndarray,
+  amounts: np.ndarray,
+  aum: float,
+  cumulative_dividends: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                                        np.ndarray, np.ndarray, float,
+                                        float]:
+  """
+  Simulates the holdings day by day with scalar loops, which Numba
+  compiles. The holdings are valued in order and each sum starts from
+  zero, so the NumPy kernel can reproduce every rounding.
+
+  Args:
+    close (np.ndarray): The close prices of the days.
+    dividends (np.ndarray): The dividends of the days.
+    rebalance_rows (np.ndarray): The increasing rows at whose close the
+      portfolio is rebalanced.
+    selections (np.ndarray): The stocks bought at each rebalance, padded
+      to the same length.
+    n_selected (np.ndarray): The number of stocks bought at each
+      rebalance.
+    holdings (np.ndarray): The stocks held before the first day.
+    amounts (np.ndarray): The amounts held before the first day.
+    aum (float): The AUM before the first day.
+    cumulative_dividends (float): The cumulative dividends before the
+      first day.
+
+  Returns:
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray,
+      float, float]: Returns the AUM and cumulative dividends of each day,
+      the amounts bought at each rebalance, and the holdings, amounts,
+      AUM and cumulative dividends after the last day.
+  """
+  n_days = close.shape[0]
+  aum_record = np.empty(n_days)
+  dividends_record = np.empty(n_days)
+  amounts_record = np.zeros(selections.shape)
+  position = 0
+  for day in range(n_days):
+    if len(holdings) > 0:
+      value = 0.0
+      paid = 0.0
+      for stock in range(len(holdings)):
+        value += close[day, holdings[stock]] * amounts[stock]
+        paid += dividends[day, holdings[stock]] * amounts[stock]
+      aum = value
+      cumulative_dividends += paid
+    aum_record[day] = aum
+    dividends_record[day] = cumulative_dividends
+    if position < len(rebalance_rows) and rebalance_rows[position] == day:
+      n_stocks = n_selected[position]
+      holdings = selections[position, :n_stocks].copy()
+      amounts = np.empty(n_stocks)
+      for stock in range(n_stocks):
+        amounts[stock] = (aum / n_stocks) / close[day, holdings[stock]]
+        amounts_record[position, stock] = amounts[stock]
+      position += 1
+  return (aum_record, dividends_record, amounts_record, holdings, amounts,
+          aum, cumulative_dividends)
+
+def simulate_vectorized(close: np.ndarray,
+  dividends: np.ndarray,
+  rebalance_rows: np.ndarray,
+  selections: np.ndarray,
+  n_selected: np.ndarray,
+  holdings: np.ndarray,
+  amounts: np.ndarray,
+  aum: float,
+  cumulative_dividends: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                                        np.ndarray, np.ndarray, float,
+                                        float]:
+  """
+  Simulates the holdings with NumPy, vectorised over the days between
+  rebalances. It gives exactly the same results as simulate_kernel.
+
+  Args:
+    close (np.ndarray): The close prices of the days.
+    dividends (np.ndarray): The dividends of the days.
+    rebalance_rows (np.ndarray): The increasing rows at whose close the
+      portfolio is rebalanced.
+    selections (np.ndarray): The stocks bought at each rebalance, padded
+      to the same length.
+    n_selected (np.ndarray): The number of stocks bought at each
+      rebalance.
+    holdings (np.ndarray): The stocks held before the first day.
+    amounts (np.ndarray): The amounts held before the first day.
+    aum (float): The AUM before the first day.
+    cumulative_dividends (float): The cumulative dividends before the
+      first day.
+
+  Returns:
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray,
+      float, float]: Returns the AUM and cumulative dividends of each day,
+      the amounts bought at each rebalance, and the holdings, amounts,
+      AUM and cumulative dividends after the last day.
+  """
+  n_days = close.shape[0]
+  aum_record = np.empty(n_days)
+  dividends_record = np.empty(n_days)
+  amounts_record = np.zeros(selections.shape)
+  start = 0
+  for position, end in enumerate(np.append(rebalance_rows + 1, n_days)):
+    if end > start:
+      if len(holdings) > 0:
+        value = np.zeros(end - start)
+        paid = np.zeros(end - start)
+        # accumulated stock by stock, in the order of the scalar kernel
+        for holding, amount in zip(holdings, amounts):
+          value += close[start:end, holding] * amount
+          paid += dividends[start:end, holding] * amount
+        aum_record[start:end] = value
+        dividends_record[start:end] = np.cumsum(
+          np.concatenate([[cumulative_dividends], paid]))[1:]
+        aum = value[-1]
+        cumulative_dividends = dividends_record[end - 1]
+      else:
+        aum_record[start:end] = aum
+        dividends_record[start:end] = cumulative_dividends
+    if position < len(rebalance_rows):
+      n_stocks = n_selected[position]
+      holdings = selections[position, :n_stocks].copy()
+      amounts = (aum / n_stocks) / close[end - 1, holdings] \
+        if n_stocks > 0 else np.empty(0)
+      amounts_record[position, :n_stocks] = amounts
+    start = end
+  return (aum_record, dividends_record, amounts_record, holdings, amounts,
+          aum, cumulative_dividends)
+
+def get_simulation_kernel(use_jit: Optional[bool] = None) -> Callable:
+  """
+  Args:
+    use_jit (Optional[bool]): Whether to use the Numba-compiled kernel.
+      Defaults to using it when Numba is installed.
+
+  Raises:
+    ValueError: If the compiled kernel is requested but Numba is not
+      installed.
+
+  Returns:
+    Callable: Returns the compiled kernel or the NumPy kernel.
+  """
+  global COMPILED_KERNEL
+  if use_jit is None:
+    use_jit = HAS_NUMBA
+  if not use_jit:
+    return simulate_vectorized
+  if not HAS_NUMBA:
+    raise ValueError("The compiled simulation kernel needs numba.")
+  if COMPILED_KERNEL is None:
+    from numba import njit
+    COMPILED_KERNEL = njit(cache=True)(simulate_kernel)
+  return COMPILED_KERNEL
@@ -1,23 +1,94 @@
 """
 This module is responsible for fetching the stocks data.
 """
+import time
+import warnings
 from datetime import datetime, timedelta
-from typing import Dict, List
+from math import ceil
+from typing import Callable, Dict, List, Optional, Tuple
 
 import pandas as pd
 import yfinance as yf
 
+from src.metrics import CACHE_REQUESTS, FETCH_SECONDS, ROWS_PROCESSED
+from src.price_panel import get_wall_clock_dates
+
 # Constants
 DATE_FORMAT = "%Y%m%d"
+DEFAULT_WARMUP_CALENDAR_DAYS = 430
+CALENDAR_DAYS_PER_YEAR = 365
+TRADING_DAYS_PER_YEAR = 252
+WARMUP_SAFETY_FACTOR = 1.1
+WARMUP_SAFETY_DAYS = 10
+
+def get_warmup_calendar_days(warmup_trading_days: int) -> int:
+  """
+  Maps a number of trading days onto calendar days, with a safety margin
+  for holidays and market closures.
+
+  Args:
+    warmup_trading_days (int): The number of trading days needed.
+
+  Returns:
+    int: Returns the number of calendar days to fetch.
+  """
+  return ceil(warmup_trading_days * CALENDAR_DAYS_PER_YEAR
+              / TRADING_DAYS_PER_YEAR * WARMUP_SAFETY_FACTOR) \
+    + WARMUP_SAFETY_DAYS
+
+def get_fetch_period(beginning_date: str,
+  ending_date: str,
+  warmup_trading_days: Optional[int] = None) -> Tuple[datetime, datetime,
+                                                      datetime]:
+  """
+  Args:
+    beginning_date (str): The beginning date inputted by the user.
+    ending_date (str): The ending date inputted by the user.
+    warmup_trading_days (Optional[int]): The number of trading days
+      needed before the beginning date, or None for 1 year 2 months.
+
+  Returns:
+    Tuple[datetime, datetime, datetime]: Returns the beginning date, the
+      first date to fetch with the warm-up and the date after the last
+      date to fetch.
+  """
+  dt_beginning = datetime.strptime(beginning_date, DATE_FORMAT)
+  if warmup_trading_days is None:
+    warmup_calendar_days = DEFAULT_WARMUP_CALENDAR_DAYS
+  else:
+    warmup_calendar_days = get_warmup_calendar_days(warmup_trading_days)
+  dt_start = dt_beginning - timedelta(days=warmup_calendar_days)
+  dt_end = datetime.strptime(ending_date, DATE_FORMAT) + timedelta(days=1)
+  return dt_beginning, dt_start, dt_end
 
 class StocksFetcher:
   """
-  Defines the StocksFether class which fetches stocks data from yFinance.
+  Defines the StocksFether class which fetches stocks data from yFinance,
+  or from a local provider.
   """
-  def __init__(self) -> None:
+  def __init__(self,
+    provider: Optional[Callable[[str, datetime, datetime],
+                                pd.DataFrame]] = None,
+    use_cache: bool = False) -> None:
     """
     This method initialises the StockFetcher class.
+
+    Args:
+      provider (Optional[Callable[[str, datetime, datetime], pd.DataFrame]]):
+        A function which returns the stock data of a ticker between two
+        dates in the yFinance layout. Defaults to yFinance.
+      use_cache (bool): Whether to keep the fetched data in memory and
+        reuse it for repeated requests, e.g. across the runs of a batch.
+    """
+    self.provider: Optional[Callable[[str, datetime, datetime],
+                                     pd.DataFrame]] = provider
+    self.use_cache: bool = use_cache
+
+    """
+    cache (Dict[Tuple[str, datetime, datetime], pd.DataFrame]): The
+      fetched data of each ticker and period.
     """
+    self.cache: Dict[Tuple[str, datetime, datetime], pd.DataFrame] = {}
 
   def fetch_stock_data(self,
     ticker_symbol: str,
@@ -37,33 +108,78 @@ class StocksFetcher:
     Returns:
       pd.Dataframe: Returns a dataframe containing the stock data.
     """
-    res = yf.Ticker(ticker_symbol).history(start=dt_start, end=dt_end)
+    key = (ticker_symbol, dt_start, dt_end)
+    if self.use_cache:
+      if key in self.cache:
+        CACHE_REQUESTS.inc(result="hit")
+        return self.cache[key]
+      CACHE_REQUESTS.inc(result="miss")
+
+    start = time.perf_counter()
+    if self.provider is None:
+      res = yf.Ticker(ticker_symbol).history(start=dt_start, end=dt_end)
+    else:
+      res = self.provider(ticker_symbol, dt_start, dt_end)
+    FETCH_SECONDS.observe(time.perf_counter() - start)
     assert not res.empty
+    ROWS_PROCESSED.inc(len(res), stage="fetch")
+    if self.use_cache:
+      self.cache[key] = res
     return res
 
   def fetch_stocks_data(self,
     ticker_symbols: List[str],
     beginning_date: str,
-    ending_date: str) -> Dict[str, pd.DataFrame]:
+    ending_date: str,
+    warmup_trading_days: Optional[int] = None) -> Dict[str, pd.DataFrame]:
     """
-    Fetches the stock data of multiple tickers from yFinance 
-    with an additional 1 year 2 months from the expected begin to end date.
+    Fetches the stock data of multiple tickers from yFinance from before
+    the beginning date to the ending date. The warm-up before the
+    beginning date covers the given number of trading days, or 1 year
+    2 months if it is not given.
 
     Args:
       ticker_symbol (List[str]): The ticker symbols of each stock in the
         universe.
       beginning_date (str): The beginning date inputted by the user.
       ending_date (str): The ending date inputted by the user.
+      warmup_trading_days (Optional[int]): The number of trading days
+        needed before the beginning date.
 
     Returns:
       Dict[str, pd.DataFrame]: Returns a dictionary that maps each stock ticker
         to the dataframe containing the stock data for that stock.
     """
-    dt_start = datetime.strptime(beginning_date, DATE_FORMAT) \
-      - timedelta(days=430)
-    dt_end = datetime.strptime(ending_date, DATE_FORMAT) + timedelta(days=1)
+    dt_beginning, dt_start, dt_end = get_fetch_period(beginning_date,
+                                                      ending_date,
+                                                      warmup_trading_days)
     res = {}
     for ticker_symbol in ticker_symbols:
       res[ticker_symbol] = \
         self.fetch_stock_data(ticker_symbol, dt_start, dt_end)
+      if warmup_trading_days is not None:
+        warn_if_warmup_too_short(ticker_symbol, res[ticker_symbol],
+                                 dt_beginning, warmup_trading_days)
     return res
+
+def warn_if_warmup_too_short(ticker_symbol: str,
+  stock_data: pd.DataFrame,
+  dt_beginning: datetime,
+  warmup_trading_days: int) -> None:
+  """
+  Warns if the fetched stock data has fewer trading days before the
+  beginning date than needed, e.g. because the stock was listed later.
+
+  Args:
+    ticker_symbol (str): The ticker symbol of the stock.
+    stock_data (pd.DataFrame): The fetched stock data.
+    dt_beginning (datetime): The beginning date.
+    warmup_trading_days (int): The number of trading days needed before
+      the beginning date.
+  """
+  n_warmup_days = \
+    (get_wall_clock_dates(stock_data.index) < dt_beginning).sum()
+  if n_warmup_days < warmup_trading_days:
+    warnings.warn(f"{ticker_symbol} has {n_warmup_days} trading days before "
+                  f"{dt_beginning.strftime(DATE_FORMAT)} but "
+                  f"{warmup_trading_days} are needed.")
@@ -0,0 +1,150 @@
+"""
+This module is responsible for generating deterministic synthetic stock
+prices. It provides a local data provider for StocksFetcher so tests and
+benchmarks can run without network access.
+"""
+import zlib
+from datetime import datetime
+from string import ascii_uppercase
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.price_panel import CLOSE_PRICE, DIVIDENDS, PricePanel
+
+# Constants
+DATE_FORMAT = "%Y%m%d"
+DEFAULT_SEED = 4228
+TIMEZONE = "America/New_York"
+TRADING_DAYS_PER_YEAR = 252
+ANNUAL_DRIFT = 0.07
+ANNUAL_VOLATILITY = 0.3
+MIN_START_PRICE = 10
+MAX_START_PRICE = 500
+DIVIDEND_PERIOD = 63
+DIVIDEND_YIELD = 0.005
+DIVIDEND_PAYER_RATIO = 0.5
+TICKER_LENGTH = 5
+
+def get_synthetic_tickers(n_tickers: int) -> List[str]:
+  """
+  Args:
+    n_tickers (int): The number of tickers.
+
+  Returns:
+    List[str]: Returns distinct five-letter ticker symbols (AAAAA, AAAAB,
+      ...), which pass the validation of InputData.
+  """
+  tickers = []
+  for idx in range(n_tickers):
+    letters = []
+    for _ in range(TICKER_LENGTH):
+      idx, remainder = divmod(idx, len(ascii_uppercase))
+      letters.append(ascii_uppercase[remainder])
+    tickers.append("".join(reversed(letters)))
+  return tickers
+
+def get_calendar(dt_start: datetime, dt_end: datetime) -> pd.DatetimeIndex:
+  """
+  Args:
+    dt_start (datetime): The first date.
+    dt_end (datetime): The date after the last date, as in yFinance.
+
+  Returns:
+    pd.DatetimeIndex: Returns the business days in the period, localised
+      to the exchange timezone like the yFinance data.
+  """
+  return pd.bdate_range(dt_start, dt_end, inclusive="left", tz=TIMEZONE)
+
+def generate_prices(generator: np.random.Generator,
+  n_dates: int,
+  n_tickers: int) -> Tuple[np.ndarray, np.ndarray]:
+  """
+  Generates geometric Brownian motion close prices and quarterly
+  dividends for half of the tickers.
+
+  Args:
+    generator (np.random.Generator): The seeded random generator.
+    n_dates (int): The number of dates.
+    n_tickers (int): The number of tickers.
+
+  Returns:
+    Tuple[np.ndarray, np.ndarray]: Returns the dates x tickers close
+      prices and dividends.
+  """
+  daily_volatility = ANNUAL_VOLATILITY / np.sqrt(TRADING_DAYS_PER_YEAR)
+  daily_drift = ANNUAL_DRIFT / TRADING_DAYS_PER_YEAR \
+    - daily_volatility ** 2 / 2
+  start_prices = generator.uniform(MIN_START_PRICE, MAX_START_PRICE,
+                                   n_tickers)
+  log_returns = generator.normal(daily_drift, daily_volatility,
+                                 (n_dates, n_tickers))
+  close = start_prices * np.exp(np.cumsum(log_returns, axis=0))
+
+  payers = generator.random(n_tickers) < DIVIDEND_PAYER_RATIO
+  payment_days = np.arange(n_dates) % DIVIDEND_PERIOD == DIVIDEND_PERIOD - 1
+  dividends = np.zeros((n_dates, n_tickers))
+  dividends[np.ix_(payment_days, payers)] = \
+    close[np.ix_(payment_days, payers)] * DIVIDEND_YIELD
+  return close, dividends
+
+class SyntheticPriceProvider:
+  """
+  Defines the SyntheticPriceProvider class which can be passed to
+  StocksFetcher as a local provider. The prices of a ticker only depend
+  on the seed, the ticker and the requested period.
+  """
+  def __init__(self, seed: int = DEFAULT_SEED) -> None:
+    """
+    This method initialises the SyntheticPriceProvider class.
+
+    Args:
+      seed (int): The seed of the random generator.
+    """
+    self.seed: int = seed
+
+  def __call__(self,
+    ticker_symbol: str,
+    dt_start: datetime,
+    dt_end: datetime) -> pd.DataFrame:
+    """
+    Generates the stock data of a ticker in the same layout as yFinance.
+
+    Args:
+      ticker_symbol (str): The ticker symbol of the stock.
+      dt_start (datetime): The first date.
+      dt_end (datetime): The date after the last date.
+
+    Returns:
+      pd.DataFrame: Returns a dataframe containing the stock data.
+    """
+    dates = get_calendar(dt_start, dt_end)
+    generator = np.random.default_rng(
+      [self.seed, zlib.crc32(ticker_symbol.encode("utf-8"))])
+    close, dividends = generate_prices(generator, len(dates), 1)
+    return pd.DataFrame({CLOSE_PRICE: close[:, 0], DIVIDENDS: dividends[:, 0]},
+                        index=dates)
+
+def generate_price_panel(n_tickers: int,
+  beginning_date: str,
+  ending_date: str,
+  seed: int = DEFAULT_SEED) -> PricePanel:
+  """
+  Generates a synthetic price panel in one vectorised pass.
+
+  Args:
+    n_tickers (int): The number of tickers.
+    beginning_date (str): The first date in the format YYYYMMDD.
+    ending_date (str): The last date in the format YYYYMMDD.
+    seed (int): The seed of the random generator.
+
+  Returns:
+    PricePanel: Returns the synthetic price panel.
+  """
+  dates = pd.bdate_range(datetime.strptime(beginning_date, DATE_FORMAT),
+                         datetime.strptime(ending_date, DATE_FORMAT),
+                         tz=TIMEZONE)
+  close, dividends = generate_prices(np.random.default_rng(seed),
+                                     len(dates), n_tickers)
+  return PricePanel(get_synthetic_tickers(n_tickers), dates, close, dividends)
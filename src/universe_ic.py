@@ -0,0 +1,152 @@
+"""
+This module is responsible for the information coefficients of the model
+over the whole universe: the Spearman rank IC and the Pearson IC between
+the predicted and realised returns of every stock at each rebalance. They
+complement the hit rate of the held stocks in monthly_ic, and all dates
+are computed at once from the date-by-stock matrices of the batched
+model.
+"""
+import numpy as np
+import pandas as pd
+
+from src.batch_model import BatchModel
+from src.price_panel import get_wall_clock_dates
+from src.run_backtest import DATETIME
+
+# Constants
+UNIVERSE_IC = "universe_ic"
+
+# Universe IC Columns
+RANK_IC = "rank_ic"
+CUMULATIVE_RANK_IC = "cumulative_rank_ic"
+PEARSON_IC = "pearson_ic"
+CUMULATIVE_PEARSON_IC = "cumulative_pearson_ic"
+N_STOCKS = "n_stocks"
+
+def get_ranks(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+  """
+  Ranks every row of a matrix among its valid entries, giving tied values
+  their average rank as in the Spearman correlation.
+
+  Args:
+    values (np.ndarray): The dates x stocks values.
+    valid (np.ndarray): Whether each value takes part in the ranking.
+
+  Returns:
+    np.ndarray: Returns the ranks from 1 of the valid values, and NaN
+      elsewhere.
+  """
+  n_rows, n_columns = values.shape
+  # invalid values are sorted last, after every valid value
+  order = np.lexsort((np.where(valid, values, 0.), ~valid), axis=1) \
+    if n_columns else np.empty(values.shape, dtype=np.int64)
+  sorted_values = np.take_along_axis(values, order, axis=1)
+  sorted_valid = np.take_along_axis(valid, order, axis=1)
+
+  # tied values form groups whose positions are averaged
+  group_starts = np.ones(values.shape, dtype=bool)
+  group_starts[:, 1:] = (sorted_values[:, 1:] != sorted_values[:, :-1]) \
+    | ~sorted_valid[:, 1:]
+  groups = np.cumsum(group_starts.ravel()) - 1
+  positions = np.tile(np.arange(1., n_columns + 1), n_rows)
+  average_ranks = np.bincount(groups, weights=positions) \
+    / np.bincount(groups)
+  ranks = np.empty(values.shape)
+  np.put_along_axis(ranks, order, average_ranks[groups].reshape(values.shape),
+                    axis=1)
+  return np.where(valid, ranks, np.nan)
+
+def get_row_correlations(x: np.ndarray,
+  y: np.ndarray,
+  valid: np.ndarray) -> np.ndarray:
+  """
+  Args:
+    x (np.ndarray): The dates x stocks first variable.
+    y (np.ndarray): The dates x stocks second variable.
+    valid (np.ndarray): Whether each pair takes part in the correlation.
+
+  Returns:
+    np.ndarray: Returns the Pearson correlation of every row over its
+      valid pairs, NaN for rows with fewer than 2 pairs or no variance.
+  """
+  n_valid = valid.sum(axis=1)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    x_centred = np.where(valid, x - np.where(valid, x, 0.).sum(axis=1,
+                         keepdims=True) / n_valid[:, None], 0.)
+    y_centred = np.where(valid, y - np.where(valid, y, 0.).sum(axis=1,
+                         keepdims=True) / n_valid[:, None], 0.)
+    covariances = np.einsum("ps,ps->p", x_centred, y_centred)
+    norms = np.sqrt(np.einsum("ps,ps->p", x_centred, x_centred)
+                    * np.einsum("ps,ps->p", y_centred, y_centred))
+    correlations = covariances / norms
+  correlations[(n_valid < 2) | (norms == 0)] = np.nan
+  return correlations
+
+def get_universe_ic(model: BatchModel) -> pd.DataFrame:
+  """
+  Computes the rank and Pearson ICs between the predicted returns at each
+  rebalance and the realised returns until the next one, over all the
+  stocks with both.
+
+  Args:
+    model (BatchModel): The model of the backtest.
+
+  Returns:
+    pd.DataFrame: Returns the ICs and their cumulative sums, dated by the
+      rebalance of the prediction as in monthly_ic, with the number of
+      stocks of each date.
+  """
+  predicted_returns = model.predicted_returns[:-1]
+  realised_returns = model.realised_returns[1:]
+  valid = np.isfinite(predicted_returns) & np.isfinite(realised_returns)
+  rank_ic = get_row_correlations(get_ranks(predicted_returns, valid),
+                                 get_ranks(realised_returns, valid), valid)
+  pearson_ic = get_row_correlations(predicted_returns, realised_returns,
+                                    valid)
+  universe_ic = pd.DataFrame()
+  universe_ic[DATETIME] = model.panel.dates[model.indexes[1:-1]]
+  universe_ic[RANK_IC] = rank_ic
+  universe_ic[CUMULATIVE_RANK_IC] = np.nancumsum(rank_ic)
+  universe_ic[PEARSON_IC] = pearson_ic
+  universe_ic[CUMULATIVE_PEARSON_IC] = np.nancumsum(pearson_ic)
+  universe_ic[N_STOCKS] = valid.sum(axis=1)
+  return universe_ic
+
+def join_monthly_ic(monthly_ic: pd.DataFrame,
+  universe_ic: pd.DataFrame) -> pd.DataFrame:
+  """
+  Args:
+    monthly_ic (pd.DataFrame): The monthly_ic of a RunBacktest or
+      PanelBacktest.
+    universe_ic (pd.DataFrame): The output of get_universe_ic.
+
+  Returns:
+    pd.DataFrame: Returns monthly_ic with the universe IC columns of the
+      same wall-clock dates next to its hit-rate IC.
+  """
+  universe_ic = universe_ic.set_index(
+    get_wall_clock_dates(pd.Index(universe_ic[DATETIME])))\
+    .drop(columns=[DATETIME])
+  joined = monthly_ic.reset_index(drop=True)
+  rows = get_wall_clock_dates(pd.Index(joined[DATETIME]))
+  return pd.concat([joined, universe_ic.reindex(rows).reset_index(drop=True)],
+                   axis=1)
+
+def print_universe_ic_summary(universe_ic: pd.DataFrame) -> None:
+  """
+  Prints the mean, information ratio and final cumulative value of the
+  rank and Pearson ICs.
+
+  Args:
+    universe_ic (pd.DataFrame): The output of get_universe_ic.
+  """
+  print("Universe Information Coefficients")
+  for name, column, cumulative_column in [
+    ("Rank IC", RANK_IC, CUMULATIVE_RANK_IC),
+    ("Pearson IC", PEARSON_IC, CUMULATIVE_PEARSON_IC)]:
+    values = universe_ic[column]
+    final = universe_ic[cumulative_column].iloc[-1] if len(universe_ic) \
+      else 0.
+    print(f"Mean {name}: {values.mean():.5f}")
+    print(f"{name} Information Ratio: {values.mean() / values.std():.5f}")
+    print(f"Cumulative {name}: {final:.5f}")
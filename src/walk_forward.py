@@ -0,0 +1,364 @@
+"""
+This module is responsible for the walk-forward evaluation of the model.
+The rebalance periods are split into consecutive windows, the model is
+fitted on window k and traded out of sample on window k + 1 with the
+fitted parameters, and the statistics of every window and of the chained
+out-of-sample performance are reported. The calendar, the features and
+the realised returns are computed once and shared with the worker
+processes that evaluate the windows in parallel.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_stats import (AUM, DATETIME, IC, STRATEGY1_COEFF_IDX,
+                                STRATEGY1_T_IDX, STRATEGY2_COEFF_IDX,
+                                STRATEGY2_T_IDX, BacktestStats)
+from src.batch_model import (BatchModel, fit_expanding_regressions,
+                             predict_returns)
+from src.panel_backtest import MONTHLY
+from src.price_panel import PricePanel
+from src.robustness import simulate_paths
+from src.run_backtest import (DIVIDENDS_DF, STRATEGY1_COEFF, STRATEGY1_T,
+                              STRATEGY2_COEFF, STRATEGY2_T)
+
+# Constants
+DEFAULT_WINDOW_PERIODS = 12
+
+# Window Keys
+WINDOW = "window"
+TRAIN_START = "train_start"
+TEST_START = "test_start"
+TEST_END = "test_end"
+FIRST_ROW = "first_row"
+LAST_ROW = "last_row"
+PARAMETERS = "parameters"
+T_VALUES = "t_values"
+CUMULATIVE_DIVIDENDS = "cumulative_dividends"
+IC_RECORD = "ic_record"
+IC_ROWS = "ic_rows"
+
+# The shared data of a worker process, set once by init_worker
+WORKER_DATA = None
+
+def init_worker(data: Dict[str, Any]) -> None:
+  """
+  Stores the shared calendar, prices and features in a worker process,
+  so that they are sent once per worker rather than once per window.
+
+  Args:
+    data (Dict[str, Any]): The shared data of WalkForward.get_shared_data.
+  """
+  global WORKER_DATA
+  WORKER_DATA = data
+
+def evaluate_window(window: Dict[str, int]) -> Dict[str, Any]:
+  """
+  Fits the model on the training periods of a window and trades its test
+  periods with the fitted parameters.
+
+  Args:
+    window (Dict[str, int]): The first training period, the first test
+      period and the period after the last test period.
+
+  Returns:
+    Dict[str, Any]: Returns the window with the fitted parameters and
+      t-values, the first and last rows of the test, the daily AUM and
+      cumulative dividends, and the cumulative IC at each test rebalance.
+  """
+  data = WORKER_DATA
+  rows = data["rows"]
+  features = data["features"]
+  train_start, test_start, test_end = \
+    window[TRAIN_START], window[TEST_START], window[TEST_END]
+  parameters, t_values = fit_expanding_regressions(
+    features[train_start:test_start],
+    data["realised_returns"][train_start:test_start])
+
+  first_row = int(rows[test_start])
+  # the last test period ends at the next rebalance or the panel end
+  ends_with_rebalance = test_end < len(rows)
+  last_row = int(rows[test_end]) if ends_with_rebalance \
+    else len(data["close"]) - 1
+  local_rows = np.concatenate([[first_row], rows[test_start:test_end],
+                               [last_row] if ends_with_rebalance else []])\
+    .astype(np.int64) - first_row
+  predicted_returns = predict_returns(
+    features[test_start:test_end],
+    np.broadcast_to(parameters[-1], (test_end - test_start, 3)))
+  if ends_with_rebalance:
+    # nothing is bought at the close of the last day, only the IC is kept
+    predicted_returns = np.vstack([predicted_returns,
+                                   np.full(predicted_returns.shape[1:],
+                                           np.nan)])
+  aum, cumulative_dividends, ic_record = simulate_paths(
+    data["close"][None, first_row:last_row + 1],
+    data["dividends"][None, first_row:last_row + 1], local_rows,
+    predicted_returns[None], data["n_stocks"], data["initial_aum"])
+  return {**window,
+          PARAMETERS: parameters[-1],
+          T_VALUES: t_values[-1],
+          FIRST_ROW: first_row,
+          LAST_ROW: last_row,
+          AUM: aum[0],
+          CUMULATIVE_DIVIDENDS: cumulative_dividends[0],
+          IC_RECORD: ic_record[0],
+          IC_ROWS: local_rows[1:1 + ic_record.shape[1]] + first_row}
+
+def get_windows(n_rows: int,
+  window_periods: int,
+  anchored: bool = False) -> List[Dict[str, int]]:
+  """
+  Args:
+    n_rows (int): The number of rebalance rows, starting with the period
+      end before the first rebalance.
+    window_periods (int): The number of rebalance periods of a window.
+    anchored (bool): Whether every window trains on all the periods
+      before its test rather than on the previous window only.
+
+  Returns:
+    List[Dict[str, int]]: Returns the first training period, the first
+      test period and the period after the last test period of every
+      window, the periods being counted from the first rebalance row.
+  """
+  windows = []
+  for test_start in range(window_periods, n_rows, window_periods):
+    windows.append({WINDOW: len(windows),
+                    TRAIN_START: 0 if anchored
+                    else test_start - window_periods,
+                    TEST_START: test_start,
+                    TEST_END: min(test_start + window_periods, n_rows)})
+  return windows
+
+class WalkForward:
+  """
+  Defines the WalkForward class which evaluates the model out of sample
+  over consecutive windows of rebalance periods.
+  """
+  def __init__(self,
+    panel: PricePanel,
+    initial_aum: int,
+    beginning_date: str,
+    strategy1: str,
+    strategy2: str,
+    days1: int,
+    days2: int,
+    top_pct: int,
+    tickers: Optional[List[str]] = None,
+    rebalance_frequency: str = MONTHLY,
+    window_periods: int = DEFAULT_WINDOW_PERIODS,
+    anchored: bool = False,
+    n_workers: Optional[int] = None) -> None:
+    """
+    This method initialises the WalkForward class and computes the shared
+    calendar and features.
+
+    Args:
+      panel (PricePanel): The price panel.
+      initial_aum (int): The initial asset under management amount of
+        every test window.
+      beginning_date (str): The beginning date of the first training
+        window.
+      strategy1 (str): The first backtesting strategy, either Momentum
+        or Reversal.
+      strategy2 (str): The second backtesting strategy, either Momentum
+        or Reversal.
+      days1 (int): The number of days to look back during calculation
+        of stock returns for the first strategy.
+      days2 (int): The number of days to look back during calculation
+        of stock returns for the second strategy.
+      top_pct (int): The percentage of stocks to pick for the portfolio.
+      tickers (Optional[List[str]]): The tickers of the universe.
+        Defaults to all the tickers of the panel.
+      rebalance_frequency (str): The rebalance frequency, see
+        PanelBacktest.
+      window_periods (int): The number of rebalance periods of a window,
+        e.g. 12 for yearly windows of monthly rebalances.
+      anchored (bool): Whether every window trains on all the periods
+        before its test rather than on the previous window only.
+      n_workers (Optional[int]): The number of worker processes. Defaults
+        to the number of CPUs, and 1 evaluates the windows in this
+        process.
+
+    Raises:
+      ValueError: If a window has less than one period, or there are not
+        enough periods for a test window.
+    """
+    if window_periods < 1:
+      raise ValueError("A window must have at least one period.")
+    self.model: BatchModel = BatchModel(panel, beginning_date, strategy1,
+                                        strategy2, days1, days2, tickers,
+                                        rebalance_frequency)
+    self.initial_aum: int = initial_aum
+    self.window_periods: int = window_periods
+    self.anchored: bool = anchored
+    self.n_workers: Optional[int] = n_workers
+
+    """
+    n_stocks (int): The number of stocks bought at each rebalance.
+    windows (List[Dict[str, int]]): The periods of every window.
+    results (List[Dict[str, Any]]): The evaluation of every window, once
+      run.
+    """
+    self.n_stocks: int = ceil(len(self.model.tickers) * (top_pct / 100))
+    last_row = len(self.model.close) - 1
+    # a test needs at least one day after its first rebalance
+    self.windows: List[Dict[str, int]] = [
+      window for window in get_windows(len(self.model.indexes),
+                                       window_periods, anchored)
+      if self.model.indexes[window[TEST_START]] - self.model.start < last_row]
+    if not self.windows:
+      raise ValueError(f"Walk-forward evaluation needs more than "
+                       f"{window_periods} rebalance periods.")
+    self.results: List[Dict[str, Any]] = []
+
+  def get_shared_data(self) -> Dict[str, Any]:
+    """
+    Dict[str, Any]: Returns the calendar rows, prices, features and
+      realised returns that every window reads.
+    """
+    panel = self.model.panel
+    return {
+      "rows": self.model.indexes - self.model.start,
+      "close": self.model.close,
+      "dividends": np.asarray(panel.dividends[self.model.start:],
+                              dtype=np.float64)[:, self.model.columns],
+      "features": self.model.features,
+      "realised_returns": self.model.realised_returns,
+      "n_stocks": self.n_stocks,
+      "initial_aum": float(self.initial_aum)
+    }
+
+  def run(self) -> pd.DataFrame:
+    """
+    Evaluates all the windows, in parallel worker processes unless a
+    single worker is requested.
+
+    Returns:
+      pd.DataFrame: Returns the statistics of every window.
+    """
+    data = self.get_shared_data()
+    n_workers = min(self.n_workers or os.cpu_count() or 1, len(self.windows))
+    if n_workers == 1:
+      init_worker(data)
+      try:
+        self.results = [evaluate_window(window) for window in self.windows]
+      finally:
+        init_worker(None)
+    else:
+      with ProcessPoolExecutor(max_workers=n_workers,
+                               initializer=init_worker,
+                               initargs=(data,)) as executor:
+        self.results = list(executor.map(evaluate_window, self.windows))
+    return self.get_window_statistics()
+
+  def get_backtest_stats(self,
+    result: Dict[str, Any],
+    aum: np.ndarray,
+    cumulative_dividends: np.ndarray,
+    ic_record: np.ndarray,
+    ic_rows: np.ndarray,
+    first_row: int) -> BacktestStats:
+    """
+    Args:
+      result (Dict[str, Any]): The evaluation of the window whose fit is
+        reported.
+      aum (np.ndarray): The daily AUM.
+      cumulative_dividends (np.ndarray): The daily cumulative dividends.
+      ic_record (np.ndarray): The cumulative IC at each rebalance.
+      ic_rows (np.ndarray): The rows of the rebalances of the IC.
+      first_row (int): The row of the first day.
+
+    Returns:
+      BacktestStats: Returns the statistics of the performance.
+    """
+    dates = self.model.panel.dates[self.model.start:]
+    portfolio_performance = pd.DataFrame({
+      DATETIME: dates[first_row:first_row + len(aum)],
+      AUM: aum,
+      DIVIDENDS_DF: cumulative_dividends})
+    monthly_ic = pd.DataFrame({DATETIME: dates[ic_rows], IC: ic_record})
+    model_statistics = np.empty(4)
+    model_statistics[[STRATEGY1_COEFF_IDX, STRATEGY2_COEFF_IDX]] = \
+      result[PARAMETERS][1:]
+    model_statistics[[STRATEGY1_T_IDX, STRATEGY2_T_IDX]] = result[T_VALUES]
+    return BacktestStats(
+      portfolio_performance, monthly_ic,
+      pd.DataFrame([model_statistics], columns=[STRATEGY1_COEFF,
+                                                STRATEGY2_COEFF, STRATEGY1_T,
+                                                STRATEGY2_T]))
+
+  def get_window_statistics(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the training and test dates, the summary
+      statistics and the fitted model of every window.
+    """
+    dates = self.model.panel.dates[self.model.start:]
+    rows = self.model.indexes - self.model.start
+    records = []
+    for result in self.results:
+      backtest_stats = self.get_backtest_stats(
+        result, result[AUM], result[CUMULATIVE_DIVIDENDS], result[IC_RECORD],
+        result[IC_ROWS], result[FIRST_ROW])
+      records.append({WINDOW: result[WINDOW],
+                      TRAIN_START: dates[rows[result[TRAIN_START]]],
+                      TEST_START: dates[result[FIRST_ROW]],
+                      TEST_END: dates[result[LAST_ROW]],
+                      **backtest_stats.get_summary_statistics(),
+                      **get_model_statistics(backtest_stats)})
+    return pd.DataFrame(records)
+
+  def get_pooled_stats(self) -> BacktestStats:
+    """
+    BacktestStats: Returns the statistics of the out-of-sample windows
+      chained together, each window investing the final AUM of the
+      previous one, with the model of the last window.
+    """
+    aum = [np.array([float(self.initial_aum)])]
+    cumulative_dividends = [np.zeros(1)]
+    ic_record = [np.zeros(0)]
+    ic_rows = [np.zeros(0, dtype=np.int64)]
+    for result in self.results:
+      scale = aum[-1][-1] / result[AUM][0]
+      aum.append(result[AUM][1:] * scale)
+      cumulative_dividends.append(cumulative_dividends[-1][-1]
+                                  + result[CUMULATIVE_DIVIDENDS][1:] * scale)
+      ic_record.append((ic_record[-1][-1] if len(ic_record[-1]) else 0.)
+                       + result[IC_RECORD])
+      ic_rows.append(result[IC_ROWS])
+    return self.get_backtest_stats(
+      self.results[-1], np.concatenate(aum),
+      np.concatenate(cumulative_dividends), np.concatenate(ic_record),
+      np.concatenate(ic_rows), self.results[0][FIRST_ROW])
+
+  def print_summary(self) -> None:
+    """
+    None: Prints the statistics of every window and of the pooled
+      out-of-sample performance.
+    """
+    window_statistics = self.get_window_statistics()
+    pooled_stats = self.get_pooled_stats()
+    print(f"Walk-Forward Evaluation ({len(self.results)} windows of "
+          f"{self.window_periods} periods, "
+          f"{'anchored' if self.anchored else 'rolling'} training)")
+    print(window_statistics.to_string(index=False,
+                                      float_format="{:.5f}".format))
+    print("Pooled Out-of-Sample Statistics")
+    pooled_stats.print_summary()
+
+def get_model_statistics(backtest_stats: BacktestStats) -> Dict[str, float]:
+  """
+  Args:
+    backtest_stats (BacktestStats): The statistics of a backtest.
+
+  Returns:
+    Dict[str, float]: Returns the coefficients and t-values of its model.
+  """
+  return {STRATEGY1_COEFF: backtest_stats.get_strategy1_coefficient(),
+          STRATEGY2_COEFF: backtest_stats.get_strategy2_coefficient(),
+          STRATEGY1_T: backtest_stats.get_strategy1_t_value(),
+          STRATEGY2_T: backtest_stats.get_strategy2_t_value()}
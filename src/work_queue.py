@@ -0,0 +1,688 @@
+"""
+This module is responsible for distributing a sweep of backtest
+configurations over several hosts. The coordinator puts one task per
+configuration in a spool directory on a shared filesystem, and workers on
+any host claim them, run RunBacktest and BacktestStats on a local price
+panel snapshot and publish the summary statistics. A claim is a lease:
+the worker renews it while the backtest runs, and the lease of a worker
+that died or stalled expires and is taken over by an idle worker. Failed
+tasks are retried up to a maximum number of attempts, and a configuration
+has a single result however many times it is submitted or run.
+
+Every state change is an atomic rename or hard link within the spool, so
+no lock or server is needed. The hosts' clocks should agree to well
+within the lease duration. The coordinator writes the lease duration and
+the maximum number of attempts to the spool, and workers started without
+them use the same.
+
+Workers are started with:
+  python -m src.work_queue --spool <dir> --panel <snapshot>
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from src.backtest_stats import BacktestStats
+from src.price_panel import PricePanel, load_price_panel
+from src.results_store import TICKERS, ResultsStore
+from src.run_backtest import RunBacktest, get_warmup_trading_days
+from src.stocks_fetcher import get_fetch_period
+
+# Constants
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_SECONDS = 1.
+DEFAULT_IDLE_SECONDS = 60.
+# the fraction of the lease after which a running task renews it
+HEARTBEAT_FRACTION = 1 / 3
+TASK_EXTENSION = ".json"
+SPOOL_CONFIG = "spool.json"
+
+# Spool Config Keys
+LEASE_SECONDS = "lease_seconds"
+MAX_ATTEMPTS = "max_attempts"
+
+# Spool Directories
+TASKS = "tasks"
+LEASES = "leases"
+RESULTS = "results"
+FAILED = "failed"
+SPOOL_DIRECTORIES = [TASKS, LEASES, RESULTS, FAILED]
+
+# Task Keys
+TASK_ID = "task_id"
+PARAMETERS = "parameters"
+ATTEMPTS = "attempts"
+WORKER = "worker"
+ERROR = "error"
+STATISTICS = "statistics"
+FINISHED_AT = "finished_at"
+
+# Backtest Parameters
+BACKTEST_PARAMETERS = ["initial_aum", "beginning_date", "strategy1",
+                       "strategy2", "days1", "days2", "top_pct"]
+ENDING_DATE = "ending_date"
+
+def get_task_id(parameters: Dict[str, Any]) -> str:
+  """
+  Args:
+    parameters (Dict[str, Any]): The configuration of a backtest.
+
+  Returns:
+    str: Returns the identifier of the configuration, the same for equal
+      configurations on every host.
+  """
+  text = json.dumps(parameters, sort_keys=True, default=str)
+  return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+def get_worker_id() -> str:
+  """
+  str: Returns the identifier of this process, unique across the hosts.
+  """
+  return f"{socket.gethostname()}-{os.getpid()}"
+
+def read_task(path: str) -> Optional[Dict[str, Any]]:
+  """
+  Args:
+    path (str): The path of a task, lease or result file.
+
+  Returns:
+    Optional[Dict[str, Any]]: Returns the content of the file, or None if
+      another process moved it away.
+  """
+  try:
+    with open(path, encoding="utf-8") as file:
+      return json.load(file)
+  except (FileNotFoundError, json.JSONDecodeError):
+    return None
+
+def write_task(path: str, task: Dict[str, Any]) -> None:
+  """
+  Writes a file through a hidden temporary file in the same directory and
+  renames it, so readers never see a partial file.
+
+  Args:
+    path (str): The path of the file.
+    task (Dict[str, Any]): The content of the file.
+  """
+  directory, name = os.path.split(path)
+  temporary = os.path.join(directory, f".{name}.{get_worker_id()}")
+  with open(temporary, "w", encoding="utf-8") as file:
+    json.dump(task, file, default=str)
+  os.replace(temporary, path)
+
+class WorkQueue:
+  """
+  Defines the WorkQueue class which keeps the tasks of a sweep in a spool
+  directory: pending tasks in tasks/, claimed ones in leases/, and the
+  outcomes in results/ and failed/.
+  """
+  def __init__(self,
+    spool_dir: str,
+    lease_seconds: Optional[float] = None,
+    max_attempts: Optional[int] = None) -> None:
+    """
+    This method initialises the WorkQueue class and creates the spool
+    directories if needed.
+
+    Args:
+      spool_dir (str): The spool directory, shared by all the hosts.
+      lease_seconds (Optional[float]): The number of seconds after which
+        the claim of a task that was not renewed expires. Defaults to the
+        spool config, or 300 seconds.
+      max_attempts (Optional[int]): The number of times a task is run
+        before it is given up. Defaults to the spool config, or 3.
+    """
+    self.spool_dir: str = spool_dir
+    self.lease_seconds: Optional[float] = lease_seconds
+    self.max_attempts: Optional[int] = max_attempts
+    for directory in SPOOL_DIRECTORIES:
+      os.makedirs(os.path.join(spool_dir, directory), exist_ok=True)
+
+  def get_config(self) -> Dict[str, Any]:
+    """
+    Dict[str, Any]: Returns the lease duration and maximum number of
+      attempts of the queue: the ones it was given, else the ones of the
+      spool config, which is read on every call so that a worker started
+      before the coordinator follows it, else the defaults.
+    """
+    config = read_task(os.path.join(self.spool_dir, SPOOL_CONFIG)) or {}
+    return {
+      LEASE_SECONDS: self.lease_seconds if self.lease_seconds is not None
+      else config.get(LEASE_SECONDS, DEFAULT_LEASE_SECONDS),
+      MAX_ATTEMPTS: self.max_attempts if self.max_attempts is not None
+      else config.get(MAX_ATTEMPTS, DEFAULT_MAX_ATTEMPTS)}
+
+  def get_lease_seconds(self) -> float:
+    """
+    float: Returns the number of seconds after which an unrenewed claim
+      expires.
+    """
+    return self.get_config()[LEASE_SECONDS]
+
+  def get_max_attempts(self) -> int:
+    """
+    int: Returns the number of times a task is run before it is given up.
+    """
+    return self.get_config()[MAX_ATTEMPTS]
+
+  def save_config(self) -> None:
+    """
+    Writes the lease duration and maximum number of attempts of the queue
+    to the spool config, for the workers started without them.
+    """
+    write_task(os.path.join(self.spool_dir, SPOOL_CONFIG), self.get_config())
+
+  def get_path(self, directory: str, task_id: str) -> str:
+    """
+    Args:
+      directory (str): The spool directory of the task's state.
+      task_id (str): The task identifier.
+
+    Returns:
+      str: Returns the path of the task's file in that state.
+    """
+    return os.path.join(self.spool_dir, directory, task_id + TASK_EXTENSION)
+
+  def get_task_ids(self, directory: str) -> List[str]:
+    """
+    Args:
+      directory (str): The spool directory.
+
+    Returns:
+      List[str]: Returns the sorted identifiers of the tasks in the
+        directory.
+    """
+    names = [name for name in os.listdir(os.path.join(self.spool_dir,
+                                                      directory))
+             if name.endswith(TASK_EXTENSION) and not name.startswith(".")]
+    return sorted(name[:-len(TASK_EXTENSION)] for name in names)
+
+  def put(self, parameters: Dict[str, Any]) -> str:
+    """
+    Adds a task, unless the same configuration is already queued, running
+    or done.
+
+    Args:
+      parameters (Dict[str, Any]): The configuration of a backtest.
+
+    Returns:
+      str: Returns the task identifier.
+    """
+    task_id = get_task_id(parameters)
+    if not any(os.path.exists(self.get_path(directory, task_id))
+               for directory in SPOOL_DIRECTORIES):
+      write_task(self.get_path(TASKS, task_id),
+                 {TASK_ID: task_id, PARAMETERS: parameters, ATTEMPTS: 0})
+    return task_id
+
+  def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+    """
+    Claims a pending task by moving it to the leases. When no task
+    is pending, the expired leases of other workers are put back first.
+
+    Args:
+      worker (str): The worker identifier.
+
+    Returns:
+      Optional[Dict[str, Any]]: Returns the claimed task, or None if there
+        is no task to run.
+    """
+    for first_pass in (True, False):
+      for task_id in self.get_task_ids(TASKS):
+        lease = self.get_path(LEASES, task_id)
+        try:
+          os.rename(self.get_path(TASKS, task_id), lease)
+          os.utime(lease)
+        except FileNotFoundError:
+          # claimed by another worker in the meantime
+          continue
+        task = read_task(lease)
+        if os.path.exists(self.get_path(RESULTS, task_id)):
+          # a stolen task whose first run finished after all
+          os.remove(lease)
+          continue
+        task[WORKER] = worker
+        write_task(lease, task)
+        return task
+      if not first_pass or not self.reclaim_expired():
+        break
+    return None
+
+  def renew(self, task: Dict[str, Any], worker: str) -> bool:
+    """
+    Args:
+      task (Dict[str, Any]): A claimed task.
+      worker (str): The worker identifier.
+
+    Returns:
+      bool: Returns whether the worker still holds the lease, which is then
+        renewed.
+    """
+    lease = self.get_path(LEASES, task[TASK_ID])
+    holder = read_task(lease)
+    if holder is None or holder.get(WORKER) != worker:
+      return False
+    try:
+      os.utime(lease)
+    except FileNotFoundError:
+      return False
+    return True
+
+  def release(self, task: Dict[str, Any], worker: str) -> bool:
+    """
+    Removes the lease of a task if the worker still holds it.
+
+    Args:
+      task (Dict[str, Any]): A claimed task.
+      worker (str): The worker identifier.
+
+    Returns:
+      bool: Returns whether the worker held the lease.
+    """
+    lease = self.get_path(LEASES, task[TASK_ID])
+    holder = read_task(lease)
+    if holder is None or holder.get(WORKER) != worker:
+      return False
+    try:
+      os.remove(lease)
+    except FileNotFoundError:
+      return False
+    return True
+
+  def complete(self,
+    task: Dict[str, Any],
+    worker: str,
+    statistics: Dict[str, float]) -> bool:
+    """
+    Publishes the result of a task. The result file is hard linked into
+    place, which fails if another run of the task got there first, so the
+    first result is kept and the duplicates are dropped.
+
+    Args:
+      task (Dict[str, Any]): A claimed task.
+      worker (str): The worker identifier.
+      statistics (Dict[str, float]): The summary statistics of the
+        backtest.
+
+    Returns:
+      bool: Returns whether this result was kept.
+    """
+    task_id = task[TASK_ID]
+    result = self.get_path(RESULTS, task_id)
+    temporary = os.path.join(self.spool_dir, RESULTS, f".{task_id}.{worker}")
+    write_task(temporary, {**task, WORKER: worker, STATISTICS: statistics,
+                           FINISHED_AT: time.time()})
+    try:
+      os.link(temporary, result)
+      kept = True
+    except FileExistsError:
+      kept = False
+    os.remove(temporary)
+    self.release(task, worker)
+    return kept
+
+  def fail(self, task: Dict[str, Any], worker: str, error: str) -> bool:
+    """
+    Puts a task that raised back in the queue, or gives it up once it has
+    been run the maximum number of times. Nothing is done if the lease
+    expired in the meantime, as the task was already put back.
+
+    Args:
+      task (Dict[str, Any]): A claimed task.
+      worker (str): The worker identifier.
+      error (str): The error raised by the backtest.
+
+    Returns:
+      bool: Returns whether the task will be retried.
+    """
+    if not self.release(task, worker):
+      return False
+    task = {key: value for key, value in task.items() if key != WORKER}
+    task.update({ATTEMPTS: task[ATTEMPTS] + 1, ERROR: error})
+    retried = task[ATTEMPTS] < self.get_max_attempts()
+    write_task(self.get_path(TASKS if retried else FAILED, task[TASK_ID]),
+               task)
+    return retried
+
+  def reclaim_expired(self) -> int:
+    """
+    Puts back the tasks whose lease was not renewed in time, counting an
+    attempt, so that idle workers take over the work of dead or stalled
+    ones. A stalled worker that finishes later still publishes its result,
+    which is de-duplicated.
+
+    Returns:
+      int: Returns the number of tasks put back.
+    """
+    n_tasks = 0
+    config = self.get_config()
+    deadline = time.time() - config[LEASE_SECONDS]
+    for task_id in self.get_task_ids(LEASES):
+      lease = self.get_path(LEASES, task_id)
+      stolen = os.path.join(self.spool_dir, TASKS,
+                            f".{task_id}.{get_worker_id()}")
+      try:
+        if os.path.getmtime(lease) > deadline:
+          continue
+        # only one process can move the lease away
+        os.rename(lease, stolen)
+      except FileNotFoundError:
+        continue
+      task = read_task(stolen)
+      holder = task.pop(WORKER, None)
+      task.update({ATTEMPTS: task[ATTEMPTS] + 1,
+                   ERROR: f"lease of {holder} expired"})
+      write_task(self.get_path(TASKS if task[ATTEMPTS]
+                               < config[MAX_ATTEMPTS] else FAILED, task_id),
+                 task)
+      os.remove(stolen)
+      n_tasks += 1
+    return n_tasks
+
+  def get_status(self) -> Dict[str, int]:
+    """
+    Dict[str, int]: Returns the number of pending, leased, finished and
+      failed tasks.
+    """
+    return {directory: len(self.get_task_ids(directory))
+            for directory in SPOOL_DIRECTORIES}
+
+  def is_done(self) -> bool:
+    """
+    bool: Returns whether no task is pending or running.
+    """
+    status = self.get_status()
+    return status[TASKS] == 0 and status[LEASES] == 0
+
+  def get_results(self) -> List[Dict[str, Any]]:
+    """
+    List[Dict[str, Any]]: Returns the finished tasks with their statistics.
+    """
+    return [read_task(self.get_path(RESULTS, task_id))
+            for task_id in self.get_task_ids(RESULTS)]
+
+  def get_failures(self) -> List[Dict[str, Any]]:
+    """
+    List[Dict[str, Any]]: Returns the given-up tasks with their last error.
+    """
+    return [read_task(self.get_path(FAILED, task_id))
+            for task_id in self.get_task_ids(FAILED)]
+
+class SweepWorker:
+  """
+  Defines the SweepWorker class which runs the tasks of a work queue on a
+  local price panel snapshot until the queue is done.
+  """
+  def __init__(self,
+    queue: WorkQueue,
+    panel_path: str,
+    worker_id: Optional[str] = None,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    idle_seconds: float = DEFAULT_IDLE_SECONDS) -> None:
+    """
+    This method initialises the SweepWorker class.
+
+    Args:
+      queue (WorkQueue): The work queue.
+      panel_path (str): The price panel snapshot on the worker's host.
+      worker_id (Optional[str]): The worker identifier. Defaults to the
+        host name and process id.
+      poll_seconds (float): The number of seconds between claims when
+        there is no task to run.
+      idle_seconds (float): The number of seconds the worker waits for
+        new tasks once the queue is done, so that it can be started before
+        the coordinator or between sweeps.
+    """
+    self.queue: WorkQueue = queue
+    self.panel_path: str = panel_path
+    self.worker_id: str = worker_id or get_worker_id()
+    self.poll_seconds: float = poll_seconds
+    self.idle_seconds: float = idle_seconds
+
+    """
+    panel (Optional[PricePanel]): The memory-mapped price panel, loaded
+      with the first task.
+    """
+    self.panel: Optional[PricePanel] = None
+
+  def run_backtest(self, parameters: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Args:
+      parameters (Dict[str, Any]): The tickers and backtest parameters of
+        a task. With an ending date, the backtest runs on the rows of the
+        snapshot from its warm-up to that date.
+
+    Returns:
+      Dict[str, float]: Returns the summary statistics of the backtest.
+    """
+    if self.panel is None:
+      self.panel = load_price_panel(self.panel_path)
+    panel = self.panel
+    if parameters.get(ENDING_DATE) is not None:
+      _, dt_start, dt_end = get_fetch_period(
+        str(parameters["beginning_date"]), str(parameters[ENDING_DATE]),
+        get_warmup_trading_days(parameters["strategy1"], parameters["days1"],
+                                parameters["strategy2"], parameters["days2"]))
+      panel = panel.slice_dates(dt_start, dt_end)
+    backtest = RunBacktest(
+      panel.to_stocks_data(parameters.get("tickers")),
+      **{key: parameters[key] for key in BACKTEST_PARAMETERS})
+    backtest.fill_up_portfolio_performance()
+    backtest.calc_ic()
+    return BacktestStats(backtest.portfolio_performance, backtest.monthly_ic,
+                         backtest.model_statistics_record)\
+      .get_summary_statistics()
+
+  def run_task(self, task: Dict[str, Any]) -> bool:
+    """
+    Runs a claimed task, renewing its lease in the background.
+
+    Args:
+      task (Dict[str, Any]): The claimed task.
+
+    Returns:
+      bool: Returns whether the task succeeded.
+    """
+    stop = threading.Event()
+    interval = self.queue.get_lease_seconds() * HEARTBEAT_FRACTION
+
+    def renew_lease() -> None:
+      while not stop.wait(interval):
+        if not self.queue.renew(task, self.worker_id):
+          return
+
+    heartbeat = threading.Thread(target=renew_lease, daemon=True)
+    heartbeat.start()
+    try:
+      statistics = self.run_backtest(task[PARAMETERS])
+    except Exception as error:  # pylint: disable=broad-except
+      # any error of the backtest is recorded instead of stopping the worker
+      self.queue.fail(task, self.worker_id, f"{type(error).__name__}: "
+                                            f"{error}")
+      return False
+    finally:
+      stop.set()
+      heartbeat.join()
+    self.queue.complete(task, self.worker_id, statistics)
+    return True
+
+  def run(self, max_tasks: Optional[int] = None) -> int:
+    """
+    Claims and runs tasks until the queue has been done for the idle
+    duration. While other workers hold leases, the worker waits so that it
+    can take over the tasks of those that die.
+
+    Args:
+      max_tasks (Optional[int]): The maximum number of tasks to run.
+
+    Returns:
+      int: Returns the number of tasks run.
+    """
+    n_tasks = 0
+    idle_since = None
+    while max_tasks is None or n_tasks < max_tasks:
+      task = self.queue.claim(self.worker_id)
+      if task is None:
+        if not self.queue.is_done():
+          idle_since = None
+        elif idle_since is None:
+          idle_since = time.time()
+        if idle_since is not None \
+          and time.time() - idle_since >= self.idle_seconds:
+          break
+        time.sleep(self.poll_seconds)
+        continue
+      idle_since = None
+      self.run_task(task)
+      n_tasks += 1
+    return n_tasks
+
+class SweepCoordinator:
+  """
+  Defines the SweepCoordinator class which submits the configurations of
+  a sweep to a work queue and collects their results.
+  """
+  def __init__(self,
+    queue: WorkQueue,
+    poll_seconds: float = DEFAULT_POLL_SECONDS) -> None:
+    """
+    This method initialises the SweepCoordinator class and writes the
+    config of the queue to the spool.
+
+    Args:
+      queue (WorkQueue): The work queue.
+      poll_seconds (float): The number of seconds between checks of the
+        queue.
+    """
+    self.queue: WorkQueue = queue
+    self.poll_seconds: float = poll_seconds
+    queue.save_config()
+
+    """
+    task_ids (List[str]): The identifiers of the submitted tasks.
+    """
+    self.task_ids: List[str] = []
+
+  def submit(self, configurations: List[Dict[str, Any]]) -> List[str]:
+    """
+    Args:
+      configurations (List[Dict[str, Any]]): The tickers and backtest
+        parameters of every configuration.
+
+    Returns:
+      List[str]: Returns the task identifiers, the configurations already
+        submitted or done not being queued again.
+    """
+    self.task_ids = list(dict.fromkeys(
+      self.queue.put(configuration) for configuration in configurations))
+    return self.task_ids
+
+  def wait(self, timeout: Optional[float] = None) -> bool:
+    """
+    Waits for the workers to finish the queue, putting back the tasks of
+    expired leases.
+
+    Args:
+      timeout (Optional[float]): The maximum number of seconds to wait.
+
+    Returns:
+      bool: Returns whether the queue is done.
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    while not self.queue.is_done():
+      if deadline is not None and time.time() > deadline:
+        return False
+      self.queue.reclaim_expired()
+      time.sleep(self.poll_seconds)
+    return True
+
+  def get_results(self) -> pd.DataFrame:
+    """
+    pd.DataFrame: Returns the parameters, statistics and worker of every
+      finished task that was submitted.
+    """
+    submitted = set(self.task_ids)
+    return pd.DataFrame([
+      {TASK_ID: result[TASK_ID], **result[PARAMETERS],
+       **result[STATISTICS], WORKER: result[WORKER],
+       ATTEMPTS: result[ATTEMPTS]}
+      for result in self.queue.get_results()
+      if result[TASK_ID] in submitted])
+
+  def store_results(self, store: ResultsStore) -> int:
+    """
+    Args:
+      store (ResultsStore): The results store.
+
+    Returns:
+      int: Returns the number of finished tasks added to the store, one
+        run each named by its task identifier.
+    """
+    results = [result for result in self.queue.get_results()
+               if result[TASK_ID] in set(self.task_ids)]
+    for result in results:
+      store.add_run(name=result[TASK_ID], parameters=result[PARAMETERS],
+                    metrics=result[STATISTICS])
+    store.flush()
+    return len(results)
+
+  def print_summary(self) -> None:
+    """
+    None: Prints the state of the queue, the failed tasks and the results
+      without their tickers.
+    """
+    status = self.queue.get_status()
+    print(f"Sweep ({len(self.task_ids)} tasks): {status[RESULTS]} finished, "
+          f"{status[TASKS]} pending, {status[LEASES]} running, "
+          f"{status[FAILED]} failed")
+    for failure in self.queue.get_failures():
+      print(f"  {failure[TASK_ID]} {failure[PARAMETERS]}: {failure[ERROR]}")
+    results = self.get_results()
+    if not results.empty:
+      print(results.drop(columns=[TICKERS], errors="ignore")
+            .to_string(index=False, float_format="{:.5f}".format))
+
+def main(argv: Optional[List[str]] = None) -> int:
+  """
+  Runs a worker until the queue is done.
+
+  Args:
+    argv (Optional[List[str]]): The command line arguments.
+
+  Returns:
+    int: Returns the exit code.
+  """
+  parser = argparse.ArgumentParser(
+    description="Runs the backtests of a sweep spool directory.")
+  parser.add_argument("--spool", type=str, required=True,
+    help="The spool directory shared with the coordinator")
+  parser.add_argument("--panel", type=str, required=True,
+    help="The price panel snapshot on this host")
+  parser.add_argument("--lease_seconds", type=float,
+    help="The number of seconds after which an unrenewed claim expires, "
+    "defaulting to the coordinator's")
+  parser.add_argument("--idle_seconds", type=float,
+    default=DEFAULT_IDLE_SECONDS,
+    help="The number of seconds to wait for new tasks once the queue is "
+    "done")
+  parser.add_argument("--max_attempts", type=int,
+    help="The number of times a task is run before it is given up, "
+    "defaulting to the coordinator's")
+  args = parser.parse_args(argv)
+  worker = SweepWorker(WorkQueue(args.spool, args.lease_seconds,
+                                 args.max_attempts), args.panel,
+                       idle_seconds=args.idle_seconds)
+  print(f"{worker.worker_id} ran {worker.run()} tasks")
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
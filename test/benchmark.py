@@ -0,0 +1,278 @@
+"""
+This module is responsible for benchmarking the backtest pipeline on
+deterministic synthetic prices across universe sizes and horizons.
+
+Run it from the repository root, e.g.
+
+  python -m test.benchmark --output bench.json --baseline baseline.json
+
+By default only the nightly grid runs (10 and 100 tickers over 1 and 3
+years, about 20 seconds). --full runs the full grid (10 to 10,000 tickers
+over 1 to 30 years, about 3 minutes), in which the cells larger than
+REFERENCE_MAX_TICKER_YEARS run on a generated price panel with
+PanelBacktest, as RunBacktest would take hours on them.
+
+It exits with status 1 if a case is slower than its baseline time by more
+than the regression threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.backtest_stats import BacktestStats
+from src.panel_backtest import PanelBacktest
+from src.run_backtest import (MOMENTUM, REVERSAL, RunBacktest,
+                              get_warmup_trading_days)
+from src.stocks_fetcher import StocksFetcher
+from src.synthetic_prices import (DEFAULT_SEED, SyntheticPriceProvider,
+                                  generate_price_panel, get_synthetic_tickers)
+
+# Constants
+BENCHMARK_VERSION = 1
+DATE_FORMAT = "%Y%m%d"
+ENDING_DATE = "20231229"
+INITIAL_AUM = 10000
+STRATEGY1 = MOMENTUM
+STRATEGY2 = REVERSAL
+DAYS1 = 50
+DAYS2 = 5
+TOP_PCT = 10
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+FULL_TICKERS = [10, 100, 1000, 10000]
+FULL_YEARS = [1, 5, 10, 30]
+NIGHTLY_TICKERS = [10, 100]
+NIGHTLY_YEARS = [1, 3]
+# Largest tickers x years cell simulated by the reference engine
+REFERENCE_MAX_TICKER_YEARS = 1000
+
+# Benchmark Cases
+FETCH = "stocks_fetcher.fetch_stocks_data"
+FILL_UP = "run_backtest.fill_up_portfolio_performance"
+CALC_IC = "run_backtest.calc_ic"
+GENERATE_PANEL = "synthetic_prices.generate_price_panel"
+PANEL_FILL_UP = "panel_backtest.fill_up_portfolio_performance"
+SUMMARY = "backtest_stats.print_summary"
+
+# Result Keys
+VERSION = "version"
+PYTHON = "python"
+PLATFORM = "platform"
+SEED = "seed"
+RESULTS = "results"
+CASE = "case"
+N_TICKERS = "n_tickers"
+N_YEARS = "n_years"
+SECONDS = "seconds"
+BASELINE_SECONDS = "baseline_seconds"
+RATIO = "ratio"
+
+def get_beginning_date(n_years: int) -> str:
+  """
+  Args:
+    n_years (int): The length of the backtest in years.
+
+  Returns:
+    str: Returns the beginning date n_years before the ending date.
+  """
+  dt_ending = datetime.strptime(ENDING_DATE, DATE_FORMAT)
+  return dt_ending.replace(year=dt_ending.year - n_years).strftime(DATE_FORMAT)
+
+def time_call(function: Callable[[], object]) -> float:
+  """
+  Args:
+    function (Callable[[], object]): The function to time.
+
+  Returns:
+    float: Returns the wall-clock seconds taken by the function.
+  """
+  start = time.perf_counter()
+  function()
+  return time.perf_counter() - start
+
+def run_case(n_tickers: int,
+  n_years: int,
+  seed: int,
+  use_panel: bool = False) -> Dict[str, float]:
+  """
+  Times each stage of the pipeline once on a synthetic universe.
+
+  Args:
+    n_tickers (int): The number of tickers in the universe.
+    n_years (int): The length of the backtest in years.
+    seed (int): The seed of the synthetic prices.
+    use_panel (bool): Whether to generate a price panel with a year of
+      warm-up and simulate with PanelBacktest instead of fetching the
+      stock data and simulating with RunBacktest.
+
+  Returns:
+    Dict[str, float]: Returns the seconds taken by each benchmark case.
+  """
+  beginning_date = get_beginning_date(n_years)
+  timings = {}
+  if use_panel:
+    panels = []
+    def generate():
+      panels.append(generate_price_panel(n_tickers,
+                                         get_beginning_date(n_years + 1),
+                                         ENDING_DATE, seed))
+    timings[GENERATE_PANEL] = time_call(generate)
+
+    backtest = PanelBacktest(panels[0], INITIAL_AUM, beginning_date,
+                             STRATEGY1, STRATEGY2, DAYS1, DAYS2, TOP_PCT)
+    timings[PANEL_FILL_UP] = time_call(backtest.fill_up_portfolio_performance)
+    performance = backtest.get_portfolio_performance()
+    monthly_ic = backtest.get_monthly_ic()
+    model_statistics = backtest.get_model_statistics_record()
+  else:
+    fetcher = StocksFetcher(provider=SyntheticPriceProvider(seed))
+    stocks_data = {}
+    def fetch():
+      stocks_data.update(fetcher.fetch_stocks_data(
+        get_synthetic_tickers(n_tickers), beginning_date, ENDING_DATE,
+        warmup_trading_days=get_warmup_trading_days(STRATEGY1, DAYS1,
+                                                    STRATEGY2, DAYS2)))
+    timings[FETCH] = time_call(fetch)
+
+    backtest = RunBacktest(stocks_data, INITIAL_AUM, beginning_date,
+                           STRATEGY1, STRATEGY2, DAYS1, DAYS2, TOP_PCT)
+    timings[FILL_UP] = time_call(backtest.fill_up_portfolio_performance)
+    timings[CALC_IC] = time_call(backtest.calc_ic)
+    performance = backtest.portfolio_performance
+    monthly_ic = backtest.monthly_ic
+    model_statistics = backtest.model_statistics_record
+
+  def summarise():
+    stats = BacktestStats(performance, monthly_ic, model_statistics)
+    with contextlib.redirect_stdout(io.StringIO()):
+      stats.print_summary()
+  timings[SUMMARY] = time_call(summarise)
+  return timings
+
+def run_benchmarks(ticker_counts: List[int],
+  year_counts: List[int],
+  repeat: int = DEFAULT_REPEAT,
+  seed: int = DEFAULT_SEED,
+  reference_max_ticker_years: int = REFERENCE_MAX_TICKER_YEARS) -> Dict:
+  """
+  Runs every benchmark case over the grid of universe sizes and horizons.
+  The fastest of the repeated runs is kept, as it is the least affected by
+  noise from other processes.
+
+  Args:
+    ticker_counts (List[int]): The universe sizes.
+    year_counts (List[int]): The backtest lengths in years.
+    repeat (int): The number of runs of each case.
+    seed (int): The seed of the synthetic prices.
+    reference_max_ticker_years (int): The largest number of tickers times
+      years simulated by RunBacktest. Larger cells run on PanelBacktest.
+
+  Returns:
+    Dict: Returns the benchmark results.
+  """
+  results = []
+  for n_tickers in ticker_counts:
+    for n_years in year_counts:
+      use_panel = n_tickers * n_years > reference_max_ticker_years
+      runs = [run_case(n_tickers, n_years, seed, use_panel)
+              for _ in range(repeat)]
+      for case in runs[0]:
+        results.append({CASE: case,
+                        N_TICKERS: n_tickers,
+                        N_YEARS: n_years,
+                        SECONDS: min(run[case] for run in runs)})
+  return {VERSION: BENCHMARK_VERSION,
+          PYTHON: platform.python_version(),
+          PLATFORM: platform.platform(),
+          SEED: seed,
+          RESULTS: results}
+
+def find_regressions(results: Dict,
+  baseline: Dict,
+  threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+  """
+  Compares the benchmark results against a baseline. Cases missing from
+  the baseline are ignored.
+
+  Args:
+    results (Dict): The benchmark results.
+    baseline (Dict): The baseline benchmark results.
+    threshold (float): The tolerated relative slowdown, e.g. 0.25 for 25%.
+
+  Returns:
+    List[Dict]: Returns the cases slower than the baseline by more than
+      the threshold.
+  """
+  baseline_seconds = {(result[CASE], result[N_TICKERS], result[N_YEARS]):
+                      result[SECONDS] for result in baseline[RESULTS]}
+  regressions = []
+  for result in results[RESULTS]:
+    key = (result[CASE], result[N_TICKERS], result[N_YEARS])
+    if key not in baseline_seconds or baseline_seconds[key] <= 0:
+      continue
+    ratio = result[SECONDS] / baseline_seconds[key]
+    if ratio > 1 + threshold:
+      regressions.append({**result,
+                          BASELINE_SECONDS: baseline_seconds[key],
+                          RATIO: ratio})
+  return regressions
+
+def get_args() -> argparse.ArgumentParser:
+  """
+  argparse.ArgumentParser: Returns the benchmark argument parser.
+  """
+  parser = argparse.ArgumentParser(description="Benchmarks the backtest "
+                                   "pipeline on synthetic prices.")
+  parser.add_argument("--tickers", type=int, nargs="+")
+  parser.add_argument("--years", type=int, nargs="+")
+  parser.add_argument("--full", action="store_true",
+                      help="Run the full grid instead of the nightly grid.")
+  parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+  parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+  parser.add_argument("--output", default="benchmark.json")
+  parser.add_argument("--baseline")
+  parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+  return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+  """
+  Runs the benchmarks, writes the results and checks them against the
+  baseline.
+
+  Args:
+    argv (Optional[List[str]]): The command line arguments.
+
+  Returns:
+    int: Returns 1 if a regression was found, otherwise 0.
+  """
+  args = get_args().parse_args(argv)
+  ticker_counts = args.tickers or \
+    (FULL_TICKERS if args.full else NIGHTLY_TICKERS)
+  year_counts = args.years or (FULL_YEARS if args.full else NIGHTLY_YEARS)
+  results = run_benchmarks(ticker_counts, year_counts, args.repeat, args.seed)
+  with open(args.output, "w", encoding="utf-8") as file:
+    json.dump(results, file, indent=2)
+
+  for result in results[RESULTS]:
+    print(f"{result[CASE]:45} {result[N_TICKERS]:>6} tickers "
+          f"{result[N_YEARS]:>3} years {result[SECONDS]:10.4f}s")
+  if args.baseline is None:
+    return 0
+
+  with open(args.baseline, encoding="utf-8") as file:
+    regressions = find_regressions(results, json.load(file), args.threshold)
+  for regression in regressions:
+    print(f"Regression: {regression[CASE]} with {regression[N_TICKERS]} "
+          f"tickers over {regression[N_YEARS]} years took "
+          f"{regression[SECONDS]:.4f}s against "
+          f"{regression[BASELINE_SECONDS]:.4f}s ({regression[RATIO]:.2f}x)")
+  return 1 if regressions else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
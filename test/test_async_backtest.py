@@ -0,0 +1,166 @@
+"""
+This module is responsible for testing the asyncio facade of the fetcher
+and the backtest.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pandas as pd
+
+from src.async_backtest import (fetch_stocks_data_async,
+                                get_backtest_executor,
+                                reset_backtest_executor, run_backtest,
+                                run_backtest_async)
+from src.run_backtest import MOMENTUM, REVERSAL
+from src.stocks_fetcher import StocksFetcher
+from src.synthetic_prices import SyntheticPriceProvider
+
+sys.path.append("/.../src")
+
+class SlowProvider(SyntheticPriceProvider):
+  """
+  Defines the SlowProvider class which answers like a remote provider,
+  after a delay, and counts its calls.
+  """
+  def __init__(self, delay: float) -> None:
+    """
+    This method initialises the SlowProvider class.
+
+    Args:
+      delay (float): The number of seconds of each call.
+    """
+    super().__init__()
+    self.delay: float = delay
+    self.calls: int = 0
+    self.lock: threading.Lock = threading.Lock()
+
+  def __call__(self,
+    ticker_symbol: str,
+    dt_start: datetime,
+    dt_end: datetime) -> pd.DataFrame:
+    """
+    Args:
+      ticker_symbol (str): The ticker symbol of the stock.
+      dt_start (datetime): The first date.
+      dt_end (datetime): The date after the last date.
+
+    Returns:
+      pd.DataFrame: Returns the synthetic stock data after the delay.
+    """
+    with self.lock:
+      self.calls += 1
+    time.sleep(self.delay)
+    return super().__call__(ticker_symbol, dt_start, dt_end)
+
+class TestAsyncBacktest(unittest.IsolatedAsyncioTestCase):
+  """
+  Defines the TestAsyncBacktest class which tests the asyncio facade.
+  """
+  tickers = ["AAA", "BBB", "CCC", "DDD"]
+  parameters = [10000, "20200101", MOMENTUM, REVERSAL, 50, 5, 50]
+
+  async def test_fetch_stocks_data_async(self):
+    """
+    Tests that the tickers are fetched concurrently and match the
+    synchronous fetch.
+    """
+    provider = SlowProvider(0.2)
+    start = time.perf_counter()
+    res = await fetch_stocks_data_async(
+      self.tickers, "20200101", "20200301", 60,
+      fetcher=StocksFetcher(provider=provider))
+    self.assertLess(time.perf_counter() - start, 0.6)
+    expected = StocksFetcher(provider=SyntheticPriceProvider())\
+      .fetch_stocks_data(self.tickers, "20200101", "20200301", 60)
+    self.assertEqual(list(res), self.tickers)
+    for ticker in self.tickers:
+      pd.testing.assert_frame_equal(res[ticker], expected[ticker])
+
+  async def test_fetch_timeout(self):
+    """
+    Tests that a timeout cancels the fetches that have not started.
+    """
+    provider = SlowProvider(0.3)
+    with self.assertRaises(asyncio.TimeoutError):
+      await fetch_stocks_data_async(self.tickers, "20200101", "20200301",
+                                    fetcher=StocksFetcher(provider=provider),
+                                    max_concurrency=1, timeout=0.1)
+    await asyncio.sleep(0.4)
+    self.assertEqual(provider.calls, 1)
+
+  async def test_run_backtest_async(self):
+    """
+    Tests concurrent backtests in a process pool against the synchronous
+    backtest, while the event loop keeps running.
+    """
+    stocks_data = StocksFetcher(provider=SyntheticPriceProvider())\
+      .fetch_stocks_data(self.tickers, "20200101", "20201231")
+    ticks = 0
+
+    async def tick() -> None:
+      nonlocal ticks
+      while True:
+        await asyncio.sleep(0.01)
+        ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    with ProcessPoolExecutor(max_workers=2) as executor:
+      results = await asyncio.gather(
+        run_backtest_async(stocks_data, *self.parameters, executor=executor),
+        run_backtest_async(stocks_data, *self.parameters[:-1], 25,
+                           executor=executor))
+    ticker.cancel()
+    self.assertGreater(ticks, 0)
+    expected = run_backtest(stocks_data, dict(zip(
+      ["initial_aum", "beginning_date", "strategy1", "strategy2", "days1",
+       "days2", "top_pct"], self.parameters)))
+    self.assertEqual(results[0].get_summary_statistics(),
+                     expected.get_summary_statistics())
+    self.assertNotEqual(results[1].get_final_aum(), expected.get_final_aum())
+
+  async def test_run_backtest_cancellation(self):
+    """
+    Tests the cancellation of a backtest queued behind another task, and
+    the timeout of a backtest.
+    """
+    stocks_data = StocksFetcher(provider=SyntheticPriceProvider())\
+      .fetch_stocks_data(self.tickers, "20200101", "20201231")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+      blocker = executor.submit(time.sleep, 0.3)
+      queued = asyncio.create_task(
+        run_backtest_async(stocks_data, *self.parameters, executor=executor))
+      await asyncio.sleep(0.05)
+      queued.cancel()
+      with self.assertRaises(asyncio.CancelledError):
+        await queued
+      with self.assertRaises(asyncio.TimeoutError):
+        await run_backtest_async(stocks_data, *self.parameters,
+                                 executor=executor, timeout=0.05)
+      blocker.result()
+
+  async def test_broken_shared_executor(self):
+    """
+    Tests that the shared process pool is replaced after a worker dies.
+    """
+    stocks_data = StocksFetcher(provider=SyntheticPriceProvider())\
+      .fetch_stocks_data(self.tickers, "20200101", "20201231")
+    broken = get_backtest_executor()
+    with self.assertRaises(BrokenProcessPool):
+      broken.submit(os._exit, 1).result()
+    try:
+      result = await run_backtest_async(stocks_data, *self.parameters)
+      self.assertIsNot(get_backtest_executor(), broken)
+    finally:
+      reset_backtest_executor(get_backtest_executor())
+    expected = run_backtest(stocks_data, dict(zip(
+      ["initial_aum", "beginning_date", "strategy1", "strategy2", "days1",
+       "days2", "top_pct"], self.parameters)))
+    self.assertEqual(result.get_summary_statistics(),
+                     expected.get_summary_statistics())
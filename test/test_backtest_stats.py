@@ -3,7 +3,9 @@ This module is responsible for testing the functions that calculate
 backtest statistics.
 """
 import os.path
+import subprocess
 import sys
+import tempfile
 import unittest
 from datetime import date
 
@@ -305,3 +307,41 @@ class TestBacktestStats(unittest.TestCase):
     parent_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
     expected_path = os.path.join(parent_dir, "cumulative_ic.png")
     self.assertTrue(os.path.isfile(expected_path))
+
+  def test_plot_in_background(self):
+    """
+    Tests that the background worker renders both plots.
+    """
+    bts = self.init_backtest_stats()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      daily_aum_path = os.path.join(tmp_dir, "daily_aum.png")
+      cumulative_ic_path = os.path.join(tmp_dir, "cumulative_ic.png")
+      plots = bts.plot_in_background(daily_aum_path, cumulative_ic_path)
+      self.assertEqual(plots.result(), [daily_aum_path, cumulative_ic_path])
+      self.assertTrue(os.path.isfile(daily_aum_path))
+      self.assertTrue(os.path.isfile(cumulative_ic_path))
+
+  def test_print_summary_without_matplotlib(self):
+    """
+    Tests that the summary does not import matplotlib.
+    """
+    script = ("import sys\n"
+              "from test.test_backtest_stats import TestBacktestStats\n"
+              "TestBacktestStats().init_backtest_stats().print_summary()\n"
+              "assert 'matplotlib' not in sys.modules\n")
+    parent_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+    result = subprocess.run([sys.executable, "-c", script], cwd=parent_dir,
+                            capture_output=True, check=False)
+    self.assertEqual(result.returncode, 0, result.stderr)
+
+  def test_get_summary_statistics(self):
+    """
+    Tests that the summary statistics match the getters.
+    """
+    bts = self.init_backtest_stats()
+    statistics = bts.get_summary_statistics()
+    self.assertAlmostEqual(statistics["total_return"], 0.01071, places=5)
+    self.assertAlmostEqual(statistics["daily_sharpe_ratio"],
+                           bts.get_daily_sharpe_ratio())
+    self.assertEqual(statistics["final_cumulative_ic"],
+                     bts.monthly_ic["ic"].iloc[-1])
@@ -0,0 +1,78 @@
+"""
+This module is responsible for testing the benchmark suite.
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from test.benchmark import (CASE, FILL_UP, N_TICKERS, N_YEARS,
+                            NIGHTLY_TICKERS, NIGHTLY_YEARS, PANEL_FILL_UP,
+                            RATIO, RESULTS, SECONDS, find_regressions,
+                            get_beginning_date, main, run_benchmarks)
+
+sys.path.append("/.../src")
+
+class TestBenchmark(unittest.TestCase):
+  """
+  Defines the TestBenchmark class which tests the benchmark suite.
+  """
+  def make_results(self, seconds: float) -> dict:
+    """
+    Creates benchmark results with a single case.
+    """
+    return {RESULTS: [{CASE: FILL_UP, N_TICKERS: 10, N_YEARS: 1,
+                       SECONDS: seconds}]}
+
+  def test_get_beginning_date(self):
+    """
+    Tests the get_beginning_date function.
+    """
+    self.assertEqual(get_beginning_date(1), "20221229")
+    self.assertEqual(get_beginning_date(30), "19931229")
+
+  def test_find_regressions(self):
+    """
+    Tests that only slowdowns above the threshold are reported.
+    """
+    baseline = self.make_results(1.0)
+    self.assertEqual(find_regressions(self.make_results(1.2), baseline), [])
+    regressions = find_regressions(self.make_results(1.5), baseline)
+    self.assertEqual(len(regressions), 1)
+    self.assertAlmostEqual(regressions[0][RATIO], 1.5)
+    self.assertEqual(find_regressions(self.make_results(1.5),
+                                      {RESULTS: []}), [])
+
+  def test_run_benchmarks(self):
+    """
+    Tests that every case is timed on a small universe.
+    """
+    results = run_benchmarks([10], [1], repeat=1)
+    self.assertEqual(len(results[RESULTS]), 4)
+    self.assertTrue(all(result[SECONDS] > 0 for result in results[RESULTS]))
+
+  def test_run_benchmarks_panel(self):
+    """
+    Tests that the cells above the reference limit run on PanelBacktest.
+    """
+    results = run_benchmarks([10], [1], repeat=1,
+                             reference_max_ticker_years=0)
+    cases = [result[CASE] for result in results[RESULTS]]
+    self.assertEqual(len(cases), 3)
+    self.assertIn(PANEL_FILL_UP, cases)
+    self.assertNotIn(FILL_UP, cases)
+
+  def test_main_nightly_grid(self):
+    """
+    Tests that the nightly grid runs by default.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      output = os.path.join(tmp_dir, "benchmark.json")
+      self.assertEqual(main(["--repeat", "1", "--output", output]), 0)
+      with open(output, encoding="utf-8") as file:
+        results = json.load(file)
+    self.assertEqual({(result[N_TICKERS], result[N_YEARS])
+                      for result in results[RESULTS]},
+                     {(n_tickers, n_years) for n_tickers in NIGHTLY_TICKERS
+                      for n_years in NIGHTLY_YEARS})
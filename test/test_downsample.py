@@ -0,0 +1,60 @@
+"""
+This module is responsible for testing the functions that downsample
+series before plotting.
+"""
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.downsample import (LTTB, MINMAX, downsample_series, lttb_indexes,
+                            minmax_indexes)
+
+sys.path.append("/.../src")
+
+class TestDownsample(unittest.TestCase):
+  """
+  Defines the TestDownsample class which tests the downsampling functions.
+  """
+  generator = np.random.default_rng(7)
+  y = np.cumsum(generator.normal(size=10000))
+  y[4321] += 100
+
+  def test_lttb_indexes(self):
+    """
+    Tests that LTTB keeps the end points, the size and a large spike.
+    """
+    indexes = lttb_indexes(np.arange(len(self.y), dtype=float), self.y, 500)
+    self.assertEqual(len(indexes), 500)
+    self.assertEqual(indexes[0], 0)
+    self.assertEqual(indexes[-1], len(self.y) - 1)
+    self.assertTrue(np.all(np.diff(indexes) > 0))
+    self.assertIn(4321, indexes)
+
+  def test_minmax_indexes(self):
+    """
+    Tests that the min/max envelope keeps the extremes of each bucket.
+    """
+    indexes = minmax_indexes(self.y, 250)
+    self.assertLessEqual(len(indexes), 502)
+    self.assertIn(int(np.argmax(self.y)), indexes)
+    self.assertIn(int(np.argmin(self.y)), indexes)
+    self.assertTrue(np.all(np.diff(indexes) > 0))
+    np.testing.assert_array_equal(minmax_indexes(self.y[:10], 5),
+                                  np.arange(10))
+
+  def test_downsample_series(self):
+    """
+    Tests downsampling a date-indexed series.
+    """
+    series = pd.Series(self.y, index=pd.bdate_range("1990-01-01",
+                                                    periods=len(self.y)))
+    self.assertIs(downsample_series(series, None), series)
+    self.assertIs(downsample_series(series, 20000), series)
+    self.assertEqual(len(downsample_series(series, 1000, LTTB)), 1000)
+    self.assertLessEqual(len(downsample_series(series, 1000, MINMAX)), 1000)
+    self.assertEqual(downsample_series(series, 1000, MINMAX).max(),
+                     series.max())
+    with self.assertRaises(ValueError):
+      downsample_series(series, 1000, "mean")
@@ -0,0 +1,71 @@
+"""
+This module is responsible for testing the validation of the fast engine
+against the reference engine.
+"""
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.engine_validation import (HOLDINGS, MODEL_STATISTICS_RECORD,
+                                   MONTHLY_IC, PASSED, PORTFOLIO_PERFORMANCE,
+                                   SPEEDUP, get_holdings_diff,
+                                   get_max_abs_diff, validate_engines)
+from src.run_backtest import MOMENTUM, REVERSAL
+
+sys.path.append("/.../src")
+
+class TestEngineValidation(unittest.TestCase):
+  """
+  Defines the TestEngineValidation class which tests the engine
+  validation functions.
+  """
+  tickers = ["AMZN", "NFLX", "SPY", "WMT"]
+  path = "./test/data/run_backtest/"
+  stocks_data = {}
+  for ticker in tickers:
+    stock_data = pd.read_csv(path + ticker + ".csv",
+                             parse_dates=["Date"],
+                             index_col="Date")
+    stock_data.index = stock_data.index.map(pd.Timestamp)
+    stocks_data[ticker] = stock_data
+
+  def test_get_max_abs_diff(self):
+    """
+    Tests the maximum absolute difference of arrays.
+    """
+    self.assertEqual(get_max_abs_diff([1., np.nan, 3.], [1.5, np.nan, 2.]),
+                     1.)
+    self.assertEqual(get_max_abs_diff([1., 2.], [1., np.nan]), np.inf)
+    self.assertEqual(get_max_abs_diff([1., 2.], [1.]), np.inf)
+    self.assertEqual(get_max_abs_diff([], []), 0.)
+
+  def test_get_holdings_diff(self):
+    """
+    Tests the difference of portfolio records.
+    """
+    expected = [[("AMZN", 2.), ("WMT", 3.)], [("SPY", 1.)]]
+    self.assertEqual(get_holdings_diff(
+      expected, [[("AMZN", 2.5), ("WMT", 3.)], [("SPY", 1.)]]), 0.5)
+    self.assertEqual(get_holdings_diff(
+      expected, [[("AMZN", 2.), ("WMT", 3.)], [("NFLX", 1.)]]), np.inf)
+
+  def test_validate_engines(self):
+    """
+    Tests that the reference and fast engines agree.
+    """
+    report = validate_engines(self.stocks_data,
+                              {"initial_aum": 10000,
+                               "beginning_date": "20220301",
+                               "strategy1": REVERSAL,
+                               "strategy2": MOMENTUM,
+                               "days1": 10,
+                               "days2": 40,
+                               "top_pct": 25},
+                              block_months=3)
+    self.assertTrue(report[PASSED])
+    for key in [PORTFOLIO_PERFORMANCE, MONTHLY_IC, MODEL_STATISTICS_RECORD,
+                HOLDINGS]:
+      self.assertLess(report[key], 1e-8)
+    self.assertGreater(report[SPEEDUP], 0)
@@ -51,6 +51,23 @@ class TestInputData(unittest.TestCase):
       "--strategy2_type", "R", "--days1", "100", "--days2", "150", 
       "--top_pct", "l12i2s", "--wrong-stuff"])
 
+  def test_rebalance_frequency_args(self) -> None:
+    """
+    Tests that the rebalance frequency is validated by get_args.
+    """
+    parser = get_args()
+    required = ["--tickers", "AAPL,TSLA", "--b", "20220101",
+      "--initial_aum", "10000", "--strategy1_type", "M",
+      "--strategy2_type", "R", "--days1", "100", "--days2", "150",
+      "--top_pct", "20"]
+    for frequency in ["M", "2W", "126"]:
+      args = parser.parse_args(required + ["--rebalance_frequency",
+                                           frequency])
+      self.assertEqual(args.rebalance_frequency, frequency)
+    for frequency in ["D", "0", "-5"]:
+      with self.assertRaises(SystemExit):
+        parser.parse_args(required + ["--rebalance_frequency", frequency])
+
   def test_get_args_optional_end_date(self) -> None:
     """
     Tests the get_args method when the optional end date is not provided.
@@ -0,0 +1,117 @@
+"""
+This module is responsible for testing the streaming ingestion of
+long-format price files.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.long_format_ingester import (CLOSE_COLUMN, DATE_COLUMN,
+                                      DIVIDEND_COLUMN, TICKER_COLUMN,
+                                      LongFormatIngester)
+from src.price_panel import CLOSE_PRICE, DIVIDENDS, build_price_panel
+from src.results_export import load_results
+from src.run_backtest import DATETIME
+
+sys.path.append("/.../src")
+
+class TestLongFormatIngester(unittest.TestCase):
+  """
+  Defines the TestLongFormatIngester class which tests the
+  LongFormatIngester class.
+  """
+  tickers = ["AMZN", "NFLX", "SPY", "WMT"]
+  path = "./test/data/run_backtest/"
+  stocks_data = {}
+  for ticker in tickers:
+    stock_data = pd.read_csv(path + ticker + ".csv",
+                             parse_dates=["Date"],
+                             index_col="Date")
+    stock_data.index = stock_data.index.map(pd.Timestamp)
+    stocks_data[ticker] = stock_data
+
+  def write_long_format(self, path: str, drop_rows: int = 0) -> None:
+    """
+    Writes the test stock data as a shuffled long-format file.
+    """
+    frames = []
+    for ticker, data in self.stocks_data.items():
+      frames.append(pd.DataFrame({
+        DATE_COLUMN: [date.strftime("%Y-%m-%d") for date in data.index],
+        TICKER_COLUMN: ticker,
+        CLOSE_COLUMN: data[CLOSE_PRICE].to_numpy(),
+        DIVIDEND_COLUMN: data[DIVIDENDS].to_numpy()}))
+    long_format = pd.concat(frames).sample(frac=1, random_state=0)
+    long_format.iloc[drop_rows:].to_csv(path, index=False)
+
+  def test_scan(self):
+    """
+    Tests the scan method.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      source_path = os.path.join(tmp_dir, "prices.csv")
+      self.write_long_format(source_path)
+      tickers, _, calendar = LongFormatIngester(chunksize=100)\
+        .scan(source_path)
+    self.assertListEqual(tickers, self.tickers)
+    self.assertEqual(len(calendar), 469)
+    self.assertTrue(calendar.is_monotonic_increasing)
+
+  def test_ingest(self):
+    """
+    Tests that the ingested panel matches the panel built from the
+    stock dataframes.
+    """
+    expected = build_price_panel(self.stocks_data)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      source_path = os.path.join(tmp_dir, "prices.csv")
+      self.write_long_format(source_path)
+      panel = LongFormatIngester(chunksize=100)\
+        .ingest(source_path, os.path.join(tmp_dir, "prices.panel"))
+      self.assertListEqual(panel.tickers, self.tickers)
+      self.assertTrue(panel.dates.equals(expected.dates))
+      np.testing.assert_array_equal(panel.close, expected.close)
+      np.testing.assert_array_equal(panel.dividends, expected.dividends)
+      del panel
+
+  def test_ingest_missing_rows(self):
+    """
+    Tests that missing rows are forward-filled.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      source_path = os.path.join(tmp_dir, "prices.csv")
+      self.write_long_format(source_path, drop_rows=10)
+      panel = LongFormatIngester(chunksize=64)\
+        .ingest(source_path, os.path.join(tmp_dir, "prices.panel"))
+      self.assertFalse(np.isnan(panel.close[1:]).any())
+      self.assertTrue((panel.dividends >= 0).all())
+      del panel
+
+  def test_cli_ending_date(self):
+    """
+    Tests that a run on a long-format file ends at the ending date, not at
+    the last date of the file.
+    """
+    parent_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      source_path = os.path.join(tmp_dir, "prices.csv")
+      export_dir = os.path.join(tmp_dir, "export")
+      self.write_long_format(source_path)
+      result = subprocess.run(
+        [sys.executable, "backtest_two_signal_strategy.py",
+         "--tickers", ",".join(self.tickers), "--b", "20230101", "--e",
+         "20230301", "--initial_aum", "10000", "--strategy1_type", "M",
+         "--strategy2_type", "R", "--days1", "50", "--days2", "5",
+         "--top_pct", "50", "--long_prices", source_path, "--export_dir",
+         export_dir, "--no_plots"],
+        cwd=parent_dir, capture_output=True, check=False)
+      self.assertEqual(result.returncode, 0, result.stderr)
+      last_date = load_results(export_dir, ["portfolio_performance"])\
+        ["portfolio_performance"][DATETIME].iloc[-1].strftime("%Y%m%d")
+    self.assertLessEqual(last_date, "20230301")
+    self.assertGreaterEqual(last_date, "20230222")
@@ -0,0 +1,75 @@
+"""
+This module is responsible for testing the functions that trace the
+memory usage of a backtest run.
+"""
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.memory_report import (ATTRIBUTE, MEGABYTE, PEAK_MB, PHASE,
+                               MemoryReport, get_attribute_sizes, get_rss,
+                               get_size)
+from src.phase_timer import PhaseTimer
+
+sys.path.append("/.../src")
+
+class TestMemoryReport(unittest.TestCase):
+  """
+  Defines the TestMemoryReport class which tests the MemoryReport class.
+  """
+  def test_get_size(self):
+    """
+    Tests that arrays and dataframes count their buffers once.
+    """
+    values = np.zeros(1000)
+    self.assertEqual(get_size(values), 8000)
+    self.assertGreaterEqual(get_size(pd.DataFrame({"a": values})), 8000)
+    self.assertGreater(get_size({"a": values, "b": values}), 8000)
+    self.assertLess(get_size({"a": values, "b": values}), 16000)
+
+  def test_get_attribute_sizes(self):
+    """
+    Tests that attributes are listed largest first.
+    """
+    class Holder:
+      """
+      Holds two arrays.
+      """
+      def __init__(self):
+        self.small = np.zeros(10)
+        self.large = np.zeros(100000)
+    sizes = get_attribute_sizes(Holder())
+    self.assertEqual(sizes[ATTRIBUTE].tolist(), ["large", "small"])
+
+  def test_phase_peaks(self):
+    """
+    Tests that a phase reports the peak of its nested phases even though
+    the nested phases reset the traced peak.
+    """
+    timer = PhaseTimer()
+    timer.enable()
+    report = MemoryReport(timer, sample_interval=0.01)
+    report.start()
+    try:
+      with timer.phase("outer"):
+        with timer.phase("inner"):
+          buffer = np.ones(MEGABYTE)
+          del buffer
+        kept = np.ones(MEGABYTE // 8)
+    finally:
+      report.stop()
+    peaks = report.get_phase_report().set_index(PHASE)[PEAK_MB]
+    self.assertGreaterEqual(peaks["inner"], 7.9)
+    self.assertGreaterEqual(peaks["outer"], peaks["inner"])
+    self.assertGreater(report.phases["outer"][1], 0.9 * MEGABYTE)
+    self.assertGreater(report.peak_rss, 0)
+    self.assertEqual(len(kept), MEGABYTE // 8)
+    self.assertEqual(timer.observers, [])
+
+  def test_get_rss(self):
+    """
+    Tests that the resident set size is positive.
+    """
+    self.assertGreater(get_rss(), 0)
@@ -0,0 +1,134 @@
+"""
+This module is responsible for testing the metrics registry and its
+Prometheus export.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+from src.metrics import (CACHE_REQUESTS, FETCH_SECONDS, Histogram,
+                         MetricsRegistry, PhaseMetrics, get_cache_hit_ratio)
+from src.phase_timer import PhaseTimer
+from src.stocks_fetcher import StocksFetcher
+from src.synthetic_prices import SyntheticPriceProvider, generate_price_panel
+
+sys.path.append("/.../src")
+
+class TestMetrics(unittest.TestCase):
+  """
+  Defines the TestMetrics class which tests the metrics registry.
+  """
+  def make_registry(self) -> MetricsRegistry:
+    """
+    Creates a registry with a counter and a histogram.
+    """
+    registry = MetricsRegistry()
+    registry.counter("runs", "Runs.", ["engine"]).inc(engine="reference")
+    histogram = registry.histogram("latency", "Latency.", buckets=[0.1, 1])
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    return registry
+
+  def test_render(self):
+    """
+    Tests the Prometheus text format of counters and histograms.
+    """
+    lines = self.make_registry().render().splitlines()
+    self.assertIn("# TYPE runs_total counter", lines)
+    self.assertIn('runs_total{engine="reference"} 1', lines)
+    self.assertIn("# TYPE latency histogram", lines)
+    self.assertIn('latency_bucket{le="0.1"} 1', lines)
+    self.assertIn('latency_bucket{le="1"} 2', lines)
+    self.assertIn('latency_bucket{le="+Inf"} 3', lines)
+    self.assertIn("latency_sum 5.55", lines)
+    self.assertIn("latency_count 3", lines)
+
+  def test_counter_rejects_decrement(self):
+    """
+    Tests that counters cannot be decremented.
+    """
+    with self.assertRaises(ValueError):
+      MetricsRegistry().counter("runs", "Runs.").inc(-1)
+
+  def test_write_text_file(self):
+    """
+    Tests that the metrics file is written without a leftover temp file.
+    """
+    registry = self.make_registry()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      path = os.path.join(tmp_dir, "backtest.prom")
+      registry.write_text_file(path)
+      with open(path, encoding="utf-8") as file:
+        self.assertEqual(file.read(), registry.render())
+      self.assertEqual(os.listdir(tmp_dir), ["backtest.prom"])
+
+  def test_serve(self):
+    """
+    Tests that the metrics are served on the local endpoint.
+    """
+    registry = self.make_registry()
+    server = registry.serve(0)
+    try:
+      url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+      with urllib.request.urlopen(url) as response:
+        self.assertEqual(response.read().decode("utf-8"), registry.render())
+    finally:
+      server.shutdown()
+      server.server_close()
+
+  def test_cli_stops_serving(self):
+    """
+    Tests that a run serving its metrics exits at the end of the run.
+    """
+    parent_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      snapshot_path = os.path.join(tmp_dir, "prices.panel")
+      panel = generate_price_panel(4, "20220101", "20230601", seed=5)
+      panel.save(snapshot_path)
+      result = subprocess.run(
+        [sys.executable, "backtest_two_signal_strategy.py",
+         "--tickers", ",".join(panel.tickers), "--b", "20230101", "--e",
+         "20230601", "--initial_aum", "10000", "--strategy1_type", "M",
+         "--strategy2_type", "R", "--days1", "50", "--days2", "5",
+         "--top_pct", "50", "--panel", snapshot_path, "--no_plots",
+         "--metrics_port", "0", "--metrics_linger", "0.1"],
+        cwd=parent_dir, capture_output=True, check=False, timeout=120)
+    self.assertEqual(result.returncode, 0, result.stderr)
+    self.assertIn(b"Serving metrics", result.stdout)
+
+  def test_phase_metrics(self):
+    """
+    Tests that phase durations are observed per phase.
+    """
+    timer = PhaseTimer()
+    timer.enable()
+    histogram = Histogram("phase_seconds", "Phases.", ["phase"])
+    timer.add_observer(PhaseMetrics(histogram))
+    for _ in range(2):
+      with timer.phase("backtest"):
+        with timer.phase("fit"):
+          pass
+    self.assertEqual(histogram.get_count(phase="backtest"), 2)
+    self.assertEqual(histogram.get_count(phase="fit"), 2)
+
+  def test_fetcher_cache(self):
+    """
+    Tests the fetch latency and cache hit ratio of a caching fetcher.
+    """
+    hits = CACHE_REQUESTS.get(result="hit")
+    misses = CACHE_REQUESTS.get(result="miss")
+    fetches = FETCH_SECONDS.get_count()
+    fetcher = StocksFetcher(provider=SyntheticPriceProvider(),
+                            use_cache=True)
+    first = fetcher.fetch_stocks_data(["AAPL", "MSFT"], "20230301",
+                                      "20230331")
+    second = fetcher.fetch_stocks_data(["AAPL"], "20230301", "20230331")
+    self.assertIs(first["AAPL"], second["AAPL"])
+    self.assertEqual(CACHE_REQUESTS.get(result="hit") - hits, 1)
+    self.assertEqual(CACHE_REQUESTS.get(result="miss") - misses, 2)
+    self.assertEqual(FETCH_SECONDS.get_count() - fetches, 2)
+    self.assertGreater(get_cache_hit_ratio(), 0)
@@ -0,0 +1,241 @@
+"""
+This module is responsible for testing the functions that simulate
+the backtest on a price panel in bounded memory.
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from src.panel_backtest import (PanelBacktest, PriceRingBuffer,
+                                RegressionStatistics, get_lookback,
+                                get_month_end_indexes_from_b,
+                                get_period_end_indexes,
+                                get_rebalance_indexes_from_b, select_top)
+from src.price_panel import build_price_panel
+from src.run_backtest import (AUM, DATETIME, DIVIDENDS_DF, IC, MOMENTUM,
+                              REVERSAL, RunBacktest)
+
+sys.path.append("/.../src")
+
+class TestPanelBacktest(unittest.TestCase):
+  """
+  Defines the TestPanelBacktest class which tests the PanelBacktest class.
+  """
+  tickers = ["AMZN", "NFLX", "SPY", "WMT"]
+  path = "./test/data/run_backtest/"
+  stocks_data = {}
+  for ticker in tickers:
+    stock_data = pd.read_csv(path + ticker + ".csv",
+                             parse_dates=["Date"],
+                             index_col="Date")
+    stock_data.index = stock_data.index.map(pd.Timestamp)
+    stocks_data[ticker] = stock_data
+  panel = build_price_panel(stocks_data)
+
+  # Backtest parameters
+  parameters = [10000, "20230101", MOMENTUM, REVERSAL, 50, 5, 50]
+
+  def assert_matches_run_backtest(self, pbt: PanelBacktest,
+    parameters: list) -> None:
+    """
+    Asserts that the panel backtest matches RunBacktest.
+    """
+    rbt = RunBacktest(self.stocks_data, *parameters)
+    rbt.fill_up_portfolio_performance()
+    rbt.calc_ic()
+    portfolio_performance = pbt.get_portfolio_performance()
+    self.assertEqual(len(portfolio_performance),
+                     len(rbt.portfolio_performance))
+    np.testing.assert_allclose(portfolio_performance[AUM],
+                               rbt.portfolio_performance[AUM])
+    np.testing.assert_allclose(
+      portfolio_performance[DIVIDENDS_DF],
+      rbt.portfolio_performance[DIVIDENDS_DF].astype(float))
+    np.testing.assert_allclose(pbt.get_monthly_ic()[IC], rbt.monthly_ic[IC])
+    np.testing.assert_allclose(
+      pbt.get_model_statistics_record().to_numpy(),
+      rbt.model_statistics_record.to_numpy(dtype=float))
+    self.assertEqual([[stock for stock, _ in portfolio]
+                      for portfolio in pbt.portfolio_record],
+                     [[stock for stock, _ in portfolio]
+                      for portfolio in rbt.portfolio_record])
+
+  def test_get_lookback(self):
+    """
+    Tests the get_lookback function.
+    """
+    self.assertEqual(get_lookback(MOMENTUM, 50), 70)
+    self.assertEqual(get_lookback(REVERSAL, 5), 5)
+
+  def test_get_month_end_indexes_from_b(self):
+    """
+    Tests that the month end indexes match RunBacktest.
+    """
+    rbt = RunBacktest(self.stocks_data, *self.parameters)
+    self.assertListEqual(
+      get_month_end_indexes_from_b(self.panel.dates, "20230101").tolist(),
+      rbt.month_end_indexes)
+
+  def test_get_period_end_indexes(self):
+    """
+    Tests the period end dates of each rebalance frequency.
+    """
+    dates = self.panel.dates
+    weekly = get_period_end_indexes(dates, "W")
+    # the next trading day is in a later week
+    self.assertTrue(((dates[weekly + 1].dayofweek <= dates[weekly].dayofweek)
+                     | ((dates[weekly + 1] - dates[weekly]).days >= 7)).all())
+    self.assertEqual(len(weekly), len(set(dates.to_period("W"))) - 1)
+    biweekly = get_period_end_indexes(dates, "2W")
+    self.assertTrue(set(biweekly) <= set(weekly))
+    self.assertAlmostEqual(len(biweekly) / len(weekly), 0.5, delta=0.02)
+    quarterly = get_period_end_indexes(dates, "Q")
+    self.assertTrue(set(dates[quarterly].month) <= {3, 6, 9, 12})
+    self.assertListEqual(get_period_end_indexes(dates, "5")[:3].tolist(),
+                         [4, 9, 14])
+    with self.assertRaises(ValueError):
+      get_period_end_indexes(dates, "D")
+    with self.assertRaises(ValueError):
+      get_period_end_indexes(dates, "0")
+
+  def test_trading_day_periods_from_b(self):
+    """
+    Tests that the periods of N trading days start on the beginning date,
+    whatever the first date of the panel.
+    """
+    rebalance_dates = []
+    for start in [None, datetime(2022, 6, 1), datetime(2022, 9, 15)]:
+      dates = self.panel.slice_dates(start).dates
+      indexes = get_rebalance_indexes_from_b(dates, "20230101", "10")
+      rebalance_dates.append(dates[indexes].tolist())
+      self.assertEqual(dates[indexes[0] + 1], pd.Timestamp("2023-01-03",
+                                                           tz=dates.tz))
+      self.assertTrue((np.diff(indexes) == 10).all())
+    self.assertEqual(rebalance_dates[0], rebalance_dates[1])
+    self.assertEqual(rebalance_dates[0], rebalance_dates[2])
+
+  def test_select_top(self):
+    """
+    Tests that the partial selection matches a stable sort.
+    """
+    values = np.array([1., 3., -np.inf, 3., 2., 3., 0.])
+    for n_top in range(7):
+      np.testing.assert_array_equal(
+        select_top(values, n_top),
+        np.argsort(-values, kind="stable")[:n_top])
+
+  def test_run_weekly(self):
+    """
+    Tests a weekly rebalanced run against the monthly one.
+    """
+    monthly = PanelBacktest(self.panel, *self.parameters,
+                            rebalance_frequency="M")
+    monthly.fill_up_portfolio_performance()
+    weekly = PanelBacktest(self.panel, *self.parameters,
+                           rebalance_frequency="W")
+    weekly.fill_up_portfolio_performance()
+    self.assertEqual(len(weekly.portfolio_record),
+                     len(weekly.rebalance_indexes) - 1)
+    self.assertGreater(len(weekly.portfolio_record),
+                       3 * len(monthly.portfolio_record))
+    self.assertEqual(len(weekly.get_model_statistics_record()),
+                     len(weekly.portfolio_record))
+    self.assertTrue(weekly.get_portfolio_performance()[DATETIME]
+                    .equals(monthly.get_portfolio_performance()[DATETIME]))
+    self.assertNotEqual(weekly.aum, monthly.aum)
+
+  def test_price_ring_buffer(self):
+    """
+    Tests that the ring buffer keeps only the latest rows.
+    """
+    ring = PriceRingBuffer(3, 2)
+    ring.set_start(10)
+    ring.extend(np.arange(8.).reshape(4, 2))
+    ring.extend(np.array([[8., 9.]]))
+    np.testing.assert_array_equal(ring.get(14), [8., 9.])
+    np.testing.assert_array_equal(ring.get(12), [4., 5.])
+    with self.assertRaises(IndexError):
+      ring.get(11)
+    with self.assertRaises(IndexError):
+      ring.get(15)
+
+  def test_regression_statistics(self):
+    """
+    Tests that the accumulated regression matches scikit-learn.
+    """
+    generator = np.random.default_rng(0)
+    x = generator.normal(size=(40, 2))
+    y = x @ [0.5, -1.5] + 2 + generator.normal(size=40)
+    regression = RegressionStatistics()
+    regression.update(x[:25], y[:25])
+    regression.update(x[25:], y[25:])
+    parameters, _ = regression.fit()
+    model = LinearRegression().fit(x, y)
+    self.assertAlmostEqual(parameters[0], model.intercept_)
+    np.testing.assert_allclose(parameters[1:], model.coef_)
+
+  def test_run_matches_run_backtest(self):
+    """
+    Tests that the panel backtest matches RunBacktest.
+    """
+    pbt = PanelBacktest(self.panel, *self.parameters)
+    pbt.fill_up_portfolio_performance()
+    self.assert_matches_run_backtest(pbt, self.parameters)
+
+  def test_run_long_history(self):
+    """
+    Tests the panel backtest over a longer history with larger blocks.
+    """
+    parameters = [10000, "20220301", REVERSAL, MOMENTUM, 10, 40, 25]
+    pbt = PanelBacktest(self.panel, *parameters, block_months=5)
+    pbt.fill_up_portfolio_performance()
+    self.assert_matches_run_backtest(pbt, parameters)
+
+  def test_run_incrementally(self):
+    """
+    Tests that a run continued later matches a single run.
+    """
+    pbt = PanelBacktest(self.panel, *self.parameters)
+    pbt.run(430)
+    pbt.run()
+    self.assert_matches_run_backtest(pbt, self.parameters)
+
+  def test_run_with_performance_file(self):
+    """
+    Tests that spilled performance rows are read back.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      performance_path = os.path.join(tmp_dir, "performance.bin")
+      pbt = PanelBacktest(self.panel, *self.parameters,
+                          performance_path=performance_path)
+      pbt.fill_up_portfolio_performance()
+      self.assertEqual(pbt.performance_blocks, [])
+      self.assertGreater(os.path.getsize(performance_path), 0)
+      self.assert_matches_run_backtest(pbt, self.parameters)
+
+  def test_run_ticker_subset(self):
+    """
+    Tests the panel backtest on a subset of the panel tickers.
+    """
+    pbt = PanelBacktest(self.panel, *self.parameters,
+                        tickers=["WMT", "SPY", "NFLX"])
+    pbt.fill_up_portfolio_performance()
+    self.assertEqual(pbt.n_stocks, 2)
+    for stock, _ in pbt.portfolio_record[0]:
+      self.assertIn(stock, ["WMT", "SPY", "NFLX"])
+    with self.assertRaises(ValueError):
+      PanelBacktest(self.panel, *self.parameters, tickers=["MSFT"])
+
+  def test_not_enough_history(self):
+    """
+    Tests that a panel without enough history is rejected.
+    """
+    with self.assertRaises(ValueError):
+      PanelBacktest(self.panel, 10000, "20210701", MOMENTUM, REVERSAL,
+                    250, 5, 50)
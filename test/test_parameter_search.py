@@ -0,0 +1,133 @@
+"""
+This module is responsible for testing the successive halving search of
+the strategy parameters.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_stats import DAILY_SHARPE_RATIO, BacktestStats
+from src.panel_backtest import PanelBacktest
+from src.parameter_search import (CANDIDATE, PERIODS, ROUND,
+                                  SuccessiveHalving, get_budgets,
+                                  get_candidates,
+                                  get_candidates_warmup_trading_days,
+                                  parse_grid)
+from src.report_generator import PARAMETERS, PORTFOLIO_PERFORMANCE
+from src.run_backtest import (AUM, MOMENTUM, REVERSAL,
+                              get_warmup_trading_days)
+from src.stocks_fetcher import get_fetch_period
+from src.synthetic_prices import generate_price_panel
+
+sys.path.append("/.../src")
+
+class TestParameterSearch(unittest.TestCase):
+  """
+  Defines the TestParameterSearch class which tests the SuccessiveHalving
+  class.
+  """
+  panel = generate_price_panel(30, "20170101", "20201231", seed=8)
+
+  def test_parse_grid(self):
+    """
+    Tests the parsing of the parameter grid.
+    """
+    self.assertEqual(parse_grid("days1=20,50; strategy1=m,R;top_pct=10"),
+                     {"days1": [20, 50], "strategy1": [MOMENTUM, REVERSAL],
+                      "top_pct": [10]})
+    with self.assertRaises(ValueError):
+      parse_grid("days3=20")
+    with self.assertRaises(ValueError):
+      parse_grid("strategy2=X")
+
+  def test_get_budgets(self):
+    """
+    Tests the number of periods of each round.
+    """
+    self.assertEqual(get_budgets(40, 4, 3), [4, 12, 36, 40])
+    self.assertEqual(get_budgets(36, 4, 3), [4, 12, 36])
+    self.assertEqual(get_budgets(3, 4, 3), [3])
+
+  def test_run(self):
+    """
+    Tests the promotions and that the continued backtests match backtests
+    of the whole history.
+    """
+    candidates = get_candidates(
+      {"days1": [20, 60], "days2": [5, 10], "strategy2": [MOMENTUM,
+                                                          REVERSAL]},
+      {"strategy1": REVERSAL, "top_pct": 20})
+    self.assertEqual(len(candidates), 8)
+    search = SuccessiveHalving(self.panel, 10000, "20180101", candidates,
+                               eta=2, min_periods=4)
+    ranking = search.run()
+    self.assertEqual(search.budgets, [4, 8, 16, 32, 35])
+    self.assertEqual(len(ranking), 8)
+    self.assertEqual(ranking[ROUND].tolist(), [4, 2, 1, 1, 0, 0, 0, 0])
+    history = pd.DataFrame(search.history)
+    self.assertEqual(history.groupby(ROUND).size().tolist(),
+                     [8, 4, 2, 1, 1])
+    self.assertTrue(ranking[DAILY_SHARPE_RATIO].iloc[2]
+                    >= ranking[DAILY_SHARPE_RATIO].iloc[3])
+    self.assertEqual(ranking[PERIODS].iloc[0], 35)
+
+    best = search.get_best()
+    self.assertEqual(best[PARAMETERS], candidates[ranking[CANDIDATE][0]])
+    expected = PanelBacktest(self.panel, 10000, "20180101",
+                             **best[PARAMETERS])
+    expected.fill_up_portfolio_performance()
+    performance = expected.get_portfolio_performance()
+    np.testing.assert_allclose(best[PORTFOLIO_PERFORMANCE][AUM],
+                               performance[AUM], rtol=1e-12)
+    self.assertAlmostEqual(
+      ranking[DAILY_SHARPE_RATIO].iloc[0],
+      BacktestStats(performance, expected.get_monthly_ic(),
+                    expected.get_model_statistics_record())
+      .get_daily_sharpe_ratio())
+
+  def test_longest_lookback(self):
+    """
+    Tests that the warm-up covers the longest lookback of the candidates,
+    and that a panel too short for it is rejected before any round.
+    """
+    candidates = get_candidates({"days1": [20, 250]},
+                                {"strategy1": MOMENTUM, "days1": 20,
+                                 "strategy2": REVERSAL, "days2": 5,
+                                 "top_pct": 20})
+    self.assertEqual(get_candidates_warmup_trading_days(candidates),
+                     get_warmup_trading_days(MOMENTUM, 250, REVERSAL, 5))
+    for warmup_trading_days, valid in [
+      (get_warmup_trading_days(MOMENTUM, 20, REVERSAL, 5), False),
+      (get_candidates_warmup_trading_days(candidates), True)]:
+      _, dt_start, dt_end = get_fetch_period("20190101", "20201231",
+                                             warmup_trading_days)
+      panel = self.panel.slice_dates(dt_start, dt_end)
+      if valid:
+        SuccessiveHalving(panel, 10000, "20190101", candidates)
+      else:
+        with self.assertRaises(ValueError):
+          SuccessiveHalving(panel, 10000, "20190101", candidates)
+
+  def test_cli_longest_lookback(self):
+    """
+    Tests a search from the command line whose grid has a longer lookback
+    than the command line.
+    """
+    parent_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      snapshot_path = os.path.join(tmp_dir, "prices.panel")
+      self.panel.save(snapshot_path)
+      result = subprocess.run(
+        [sys.executable, "backtest_two_signal_strategy.py",
+         "--tickers", ",".join(self.panel.tickers[:8]), "--b", "20190101",
+         "--e", "20201231", "--initial_aum", "10000", "--strategy1_type",
+         "M", "--strategy2_type", "R", "--days1", "20", "--days2", "5",
+         "--top_pct", "50", "--panel", snapshot_path, "--no_plots",
+         "--search_grid", "days1=20,250"],
+        cwd=parent_dir, capture_output=True, check=False)
+    self.assertEqual(result.returncode, 0, result.stderr)
@@ -0,0 +1,87 @@
+"""
+This module is responsible for testing the functions that time the
+phases of a backtest run.
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from src.phase_timer import (CALLS, NULL_CONTEXT, PHASE, TIMER, PhaseTimer,
+                             timed)
+
+sys.path.append("/.../src")
+
+class TestPhaseTimer(unittest.TestCase):
+  """
+  Defines the TestPhaseTimer class which tests the PhaseTimer class.
+  """
+  def tearDown(self):
+    """
+    Disables the global timer after each test.
+    """
+    TIMER.disable()
+    TIMER.reset()
+
+  def test_disabled(self):
+    """
+    Tests that a disabled timer records nothing.
+    """
+    timer = PhaseTimer()
+    self.assertIs(timer.phase("fetch"), NULL_CONTEXT)
+    with timer.phase("fetch"):
+      timer.count("price_lookups")
+    self.assertEqual(timer.phases, {})
+    self.assertEqual(timer.counters, {})
+
+  def test_phases_and_counters(self):
+    """
+    Tests that nested phases and counters are recorded.
+    """
+    timer = PhaseTimer()
+    timer.enable()
+    for _ in range(3):
+      with timer.phase("backtest"):
+        with timer.phase("fit"):
+          timer.count("regressions_fitted")
+        timer.count("price_lookups", 4)
+    report = timer.get_phase_report().set_index(PHASE)
+    self.assertEqual(report.at["backtest", CALLS], 3)
+    self.assertEqual(report.at["fit", CALLS], 3)
+    self.assertGreaterEqual(timer.phases["backtest"][1],
+                            timer.phases["fit"][1])
+    self.assertEqual(timer.counters, {"regressions_fitted": 3,
+                                      "price_lookups": 12})
+    self.assertEqual(len(timer.events), 6)
+
+  def test_timed(self):
+    """
+    Tests that the timed decorator records calls on the global timer
+    only while it is enabled.
+    """
+    @timed("add")
+    def add(a, b):
+      return a + b
+    self.assertEqual(add(1, 2), 3)
+    self.assertNotIn("add", TIMER.phases)
+    TIMER.enable()
+    self.assertEqual(add(1, 2), 3)
+    self.assertEqual(TIMER.phases["add"][0], 1)
+
+  def test_write_chrome_trace(self):
+    """
+    Tests that the Chrome trace contains one complete event per call.
+    """
+    timer = PhaseTimer()
+    timer.enable()
+    with timer.phase("plot"):
+      pass
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      path = os.path.join(tmp_dir, "trace.json")
+      timer.write_chrome_trace(path)
+      with open(path, encoding="utf-8") as file:
+        trace = json.load(file)
+    self.assertEqual(len(trace["traceEvents"]), 1)
+    self.assertEqual(trace["traceEvents"][0]["name"], "plot")
+    self.assertEqual(trace["traceEvents"][0]["ph"], "X")
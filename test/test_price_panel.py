@@ -0,0 +1,169 @@
+"""
+This module is responsible for testing the aligned price panel and its
+snapshot format.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.price_panel import (CLOSE_PRICE, DIVIDENDS, PricePanel,
+                             build_price_panel, load_price_panel)
+from src.results_export import load_results
+from src.run_backtest import AUM, DATETIME, MOMENTUM, REVERSAL, RunBacktest
+from src.synthetic_prices import generate_price_panel
+
+sys.path.append("/.../src")
+
+class TestPricePanel(unittest.TestCase):
+  """
+  Defines the TestPricePanel class which tests the PricePanel class.
+  """
+  tickers = ["AMZN", "NFLX", "SPY", "WMT"]
+  path = "./test/data/run_backtest/"
+  stocks_data = {}
+  for ticker in tickers:
+    stock_data = pd.read_csv(path + ticker + ".csv",
+                             parse_dates=["Date"],
+                             index_col="Date")
+    stock_data.index = stock_data.index.map(pd.Timestamp)
+    stocks_data[ticker] = stock_data
+
+  def test_build_price_panel(self):
+    """
+    Tests the build_price_panel function.
+    """
+    panel = build_price_panel(self.stocks_data)
+    self.assertListEqual(panel.tickers, self.tickers)
+    self.assertEqual(panel.close.shape, (469, 4))
+    self.assertEqual(panel.dates[0], pd.Timestamp("2021-05-28"))
+    self.assertAlmostEqual(panel.close[0, 0], 161.15350341796875)
+    np.testing.assert_array_equal(panel.dividends[:, 2],
+                                  self.stocks_data["SPY"][DIVIDENDS])
+
+  def test_build_price_panel_unaligned(self):
+    """
+    Tests that missing close prices are forward-filled and missing
+    dividends are zero.
+    """
+    stocks_data = {
+      "AMZN": self.stocks_data["AMZN"],
+      "SPY": self.stocks_data["SPY"].drop(self.stocks_data["SPY"].index[5])
+    }
+    panel = build_price_panel(stocks_data)
+    self.assertEqual(len(panel.dates), 469)
+    self.assertEqual(panel.close[5, 1], panel.close[4, 1])
+    self.assertEqual(panel.dividends[5, 1], 0)
+
+  def test_save_and_load_price_panel(self):
+    """
+    Tests the round trip through the snapshot format.
+    """
+    panel = build_price_panel(self.stocks_data)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      snapshot_path = os.path.join(tmp_dir, "prices.panel")
+      panel.save(snapshot_path)
+      loaded = load_price_panel(snapshot_path)
+      self.assertIsInstance(loaded.close, np.memmap)
+      self.assertListEqual(loaded.tickers, panel.tickers)
+      self.assertTrue(loaded.dates.equals(panel.dates))
+      np.testing.assert_array_equal(loaded.close, panel.close)
+      np.testing.assert_array_equal(loaded.dividends, panel.dividends)
+      del loaded
+
+  def test_save_and_load_price_panel_timezone(self):
+    """
+    Tests that the timezone of the calendar survives the round trip.
+    """
+    dates = pd.date_range("2023-01-02", periods=3, tz="America/New_York")
+    panel = PricePanel(["AAPL"], dates, np.ones((3, 1)), np.zeros((3, 1)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      snapshot_path = os.path.join(tmp_dir, "prices.panel")
+      panel.save(snapshot_path)
+      loaded = load_price_panel(snapshot_path)
+      self.assertTrue(loaded.dates.equals(dates))
+      del loaded
+
+  def test_load_price_panel_invalid(self):
+    """
+    Tests that loading a file which is not a snapshot fails.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      snapshot_path = os.path.join(tmp_dir, "prices.panel")
+      with open(snapshot_path, "wb") as file:
+        file.write(b"not a snapshot")
+      with self.assertRaises(ValueError):
+        load_price_panel(snapshot_path)
+
+  def test_to_stocks_data(self):
+    """
+    Tests that the stock dataframes are views on the panel arrays.
+    """
+    panel = build_price_panel(self.stocks_data)
+    stocks_data = panel.to_stocks_data(["WMT", "AMZN"])
+    self.assertListEqual(list(stocks_data.keys()), ["WMT", "AMZN"])
+    self.assertTrue(np.shares_memory(stocks_data["WMT"][CLOSE_PRICE].values,
+                                     panel.close))
+    with self.assertRaises(ValueError):
+      panel.to_stocks_data(["MSFT"])
+
+  def test_slice_dates(self):
+    """
+    Tests that the selected rows are views from the start date to before
+    the end date.
+    """
+    panel = build_price_panel(self.stocks_data)
+    sliced = panel.slice_dates(datetime(2023, 2, 1), datetime(2023, 3, 1))
+    dates = pd.DatetimeIndex(sliced.dates)
+    self.assertEqual(dates[0], pd.Timestamp("2023-02-01"))
+    self.assertEqual(dates[-1], pd.Timestamp("2023-02-28"))
+    self.assertTrue(np.shares_memory(sliced.close, panel.close))
+    self.assertEqual(len(panel.slice_dates().dates), len(panel.dates))
+
+  def test_cli_ending_date(self):
+    """
+    Tests that a run on a snapshot ends at the ending date, not at the
+    last date of the snapshot.
+    """
+    parent_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      snapshot_path = os.path.join(tmp_dir, "prices.panel")
+      export_dir = os.path.join(tmp_dir, "export")
+      panel = generate_price_panel(4, "20220101", "20231231", seed=3)
+      panel.save(snapshot_path)
+      result = subprocess.run(
+        [sys.executable, "backtest_two_signal_strategy.py",
+         "--tickers", ",".join(panel.tickers), "--b", "20230101", "--e",
+         "20230601", "--initial_aum", "10000", "--strategy1_type", "M",
+         "--strategy2_type", "R", "--days1", "50", "--days2", "5",
+         "--top_pct", "50", "--panel", snapshot_path, "--export_dir",
+         export_dir, "--no_plots"],
+        cwd=parent_dir, capture_output=True, check=False)
+      self.assertEqual(result.returncode, 0, result.stderr)
+      last_date = load_results(export_dir, ["portfolio_performance"])\
+        ["portfolio_performance"][DATETIME].iloc[-1].strftime("%Y%m%d")
+    self.assertLessEqual(last_date, "20230601")
+    self.assertGreaterEqual(last_date, "20230525")
+
+  def test_run_backtest_on_snapshot(self):
+    """
+    Tests that a backtest on a memory-mapped snapshot matches a backtest
+    on the fetched dataframes.
+    """
+    args = [10000, "20230101", MOMENTUM, REVERSAL, 50, 5, 50]
+    expected = RunBacktest(self.stocks_data, *args)
+    expected.fill_up_portfolio_performance()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      snapshot_path = os.path.join(tmp_dir, "prices.panel")
+      build_price_panel(self.stocks_data).save(snapshot_path)
+      rbt = RunBacktest(load_price_panel(snapshot_path).to_stocks_data(),
+                        *args)
+      rbt.fill_up_portfolio_performance()
+    np.testing.assert_allclose(rbt.portfolio_performance[AUM],
+                               expected.portfolio_performance[AUM])
+    self.assertEqual(rbt.portfolio_record, expected.portfolio_record)
@@ -0,0 +1,125 @@
+"""
+This module is responsible for testing the batched model and the quantile
+analysis.
+"""
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.batch_model import BatchModel
+from src.panel_backtest import PanelBacktest, select_top
+from src.price_panel import build_price_panel
+from src.quantile_analysis import (SPREAD, TOTAL_RETURN, QuantileAnalysis,
+                                   get_buckets, get_holdings_tensor)
+from src.run_backtest import AUM, DATETIME, MOMENTUM, REVERSAL
+from src.synthetic_prices import generate_price_panel
+
+sys.path.append("/.../src")
+
+class TestQuantileAnalysis(unittest.TestCase):
+  """
+  Defines the TestQuantileAnalysis class which tests the BatchModel and
+  QuantileAnalysis classes.
+  """
+  tickers = ["AMZN", "NFLX", "SPY", "WMT"]
+  path = "./test/data/run_backtest/"
+  stocks_data = {}
+  for ticker in tickers:
+    stock_data = pd.read_csv(path + ticker + ".csv",
+                             parse_dates=["Date"],
+                             index_col="Date")
+    stock_data.index = stock_data.index.map(pd.Timestamp)
+    stocks_data[ticker] = stock_data
+  panel = build_price_panel(stocks_data)
+
+  def test_batch_model_matches_panel_backtest(self):
+    """
+    Tests that the batched fits and predictions match the panel backtest.
+    """
+    panel = generate_price_panel(60, "20180101", "20201231", seed=4)
+    parameters = ["20190101", MOMENTUM, REVERSAL, 50, 5]
+    for frequency in ["M", "W"]:
+      pbt = PanelBacktest(panel, 10000, *parameters, 20,
+                          rebalance_frequency=frequency)
+      pbt.fill_up_portfolio_performance()
+      model = BatchModel(panel, *parameters, rebalance_frequency=frequency)
+      statistics = pbt.get_model_statistics_record().to_numpy()
+      np.testing.assert_allclose(model.parameters[:, 1:], statistics[:, :2],
+                                 atol=1e-12)
+      np.testing.assert_allclose(model.t_values, statistics[:, 2:],
+                                 rtol=1e-9)
+      for portfolio, predicted_returns in zip(pbt.portfolio_record,
+                                              model.predicted_returns):
+        self.assertEqual(
+          [stock for stock, _ in portfolio],
+          [panel.tickers[position]
+           for position in select_top(predicted_returns, pbt.n_stocks)])
+
+  def test_get_buckets(self):
+    """
+    Tests the bucket assignment and the holdings tensor.
+    """
+    predicted_returns = np.array([[0.5, -1., np.nan, 2., 0.1],
+                                  [np.nan, np.nan, np.nan, np.nan, 1.]])
+    buckets = get_buckets(predicted_returns, 2)
+    np.testing.assert_array_equal(buckets, [[1, 0, -1, 1, 0],
+                                            [-1, -1, -1, -1, 0]])
+    holdings = get_holdings_tensor(buckets, 2)
+    np.testing.assert_allclose(holdings[0], [[0., .5, 0., 0., .5],
+                                             [.5, 0., 0., .5, 0.]])
+    np.testing.assert_allclose(holdings[1].sum(axis=1), [1., 0.])
+
+  def test_top_bucket_matches_backtest(self):
+    """
+    Tests that the top half of 4 stocks is the portfolio of a backtest
+    buying the top 50 percent.
+    """
+    parameters = ["20220301", REVERSAL, MOMENTUM, 10, 40]
+    pbt = PanelBacktest(self.panel, 10000, *parameters, 50)
+    pbt.fill_up_portfolio_performance()
+    analysis = QuantileAnalysis(BatchModel(self.panel, *parameters), 10000,
+                                "20220301", n_quantiles=2)
+    performance = analysis.get_performance()
+    np.testing.assert_allclose(performance["q2"],
+                               pbt.get_portfolio_performance()[AUM])
+    period_returns = analysis.get_period_returns()
+    np.testing.assert_allclose(period_returns[SPREAD],
+                               period_returns["q2"] - period_returns["q1"])
+    summary = analysis.get_summary()
+    self.assertEqual(list(summary.index), ["q1", "q2", SPREAD])
+    self.assertAlmostEqual(summary[TOTAL_RETURN]["q2"],
+                           performance["q2"].iloc[-1] / 10000 - 1)
+    with self.assertRaises(ValueError):
+      QuantileAnalysis(analysis.model, 10000, "20220301", n_quantiles=1)
+
+  def test_more_quantiles_than_stocks(self):
+    """
+    Tests that there cannot be more buckets than stocks.
+    """
+    panel = generate_price_panel(4, "20200101", "20221231", seed=2)
+    model = BatchModel(panel, "20220101", MOMENTUM, REVERSAL, 50, 5)
+    with self.assertRaises(ValueError):
+      QuantileAnalysis(model, 10000, "20220101", n_quantiles=10)
+    QuantileAnalysis(model, 10000, "20220101", n_quantiles=4)
+
+  def test_empty_buckets(self):
+    """
+    Tests that the buckets left without stocks, when the stocks with a
+    prediction drop below the number of buckets, keep their AUM.
+    """
+    panel = generate_price_panel(8, "20200101", "20221231", seed=2)
+    model = BatchModel(panel, "20210101", MOMENTUM, REVERSAL, 50, 5)
+    model.predicted_returns[4:6, :5] = np.nan
+    analysis = QuantileAnalysis(model, 10000, "20210101", n_quantiles=4)
+    period_returns = analysis.get_period_returns()
+    empty = period_returns.iloc[4:6][["q1", "q2", "q3", "q4"]]
+    self.assertEqual(int(empty.isna().sum().sum()), 2)
+    self.assertTrue(np.isfinite(period_returns.drop(index=[4, 5])
+                                .drop(columns=[DATETIME])).all().all())
+    self.assertTrue((analysis.get_performance()[analysis.columns] > 0)
+                    .all().all())
+    summary = analysis.get_summary()
+    self.assertTrue(np.isfinite(summary.to_numpy()).all())
+    self.assertGreater(summary[TOTAL_RETURN].min(), -1.)
@@ -0,0 +1,78 @@
+"""
+This module is responsible for testing the report generator of sweep
+results.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.report_generator import (CHARTS, MONTHLY_IC, NAME, PARAMETERS,
+                                  PORTFOLIO_PERFORMANCE, STATISTICS,
+                                  ReportGenerator, to_markdown_table)
+
+sys.path.append("/.../src")
+
+def make_result(name: str, drift: float) -> dict:
+  """
+  Creates a sweep result whose AUM grows with the given daily drift.
+  """
+  dates = pd.bdate_range("2020-01-01", periods=300)
+  generator = np.random.default_rng(len(name))
+  aum = 10000 * np.exp(np.cumsum(drift + 0.01 * generator.normal(size=300)))
+  month_ends = dates[np.r_[np.diff(dates.month) != 0, True]]
+  return {NAME: name,
+          PARAMETERS: {"days1": len(name), "top_pct": 10},
+          PORTFOLIO_PERFORMANCE: pd.DataFrame({"datetime": dates,
+                                               "aum": aum,
+                                               "dividends": 0.}),
+          MONTHLY_IC: pd.DataFrame({"datetime": month_ends,
+                                    "ic": np.arange(len(month_ends))})}
+
+class TestReportGenerator(unittest.TestCase):
+  """
+  Defines the TestReportGenerator class which tests the ReportGenerator
+  class.
+  """
+  results = [make_result(f"config{idx}", drift)
+             for idx, drift in enumerate([0.001, 0.003, -0.002, 0.002])]
+
+  def test_rank_results(self):
+    """
+    Tests that the top N results are kept best first.
+    """
+    ranked = ReportGenerator("unused", top_n=2,
+                             metric="total_return").rank_results(self.results)
+    self.assertEqual([result[NAME] for result in ranked],
+                     ["config1", "config3"])
+    self.assertGreater(ranked[0][STATISTICS]["total_return"],
+                       ranked[1][STATISTICS]["total_return"])
+
+  def test_generate(self):
+    """
+    Tests that the charts and index pages are written.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      generator = ReportGenerator(tmp_dir, top_n=3, metric="total_return",
+                                  n_workers=2, max_points=100)
+      html_path, markdown_path = generator.generate(self.results)
+      self.assertEqual(len([name for name in os.listdir(tmp_dir)
+                            if name.endswith(".png")]), 6)
+      with open(html_path, encoding="utf-8") as file:
+        page = file.read()
+      self.assertIn("config1", page)
+      self.assertIn("001_aum.png", page)
+      self.assertNotIn("config2", page)
+      with open(markdown_path, encoding="utf-8") as file:
+        self.assertIn("![ic](003_ic.png)", file.read())
+
+  def test_to_markdown_table(self):
+    """
+    Tests the Markdown table format.
+    """
+    table = pd.DataFrame({"name": ["a|b"], "value": [0.5]})
+    self.assertEqual(to_markdown_table(table),
+                     "| name | value |\n|---|---|\n| a\\|b | 0.50000 |")
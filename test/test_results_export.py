@@ -0,0 +1,97 @@
+"""
+This module is responsible for testing the export of backtest artifacts.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.results_export import (FORMAT_ARROW, FORMAT_NPZ, FORMAT_PARQUET,
+                                MODEL_STATISTICS_RECORD, MODEL_TRAINING_DATA,
+                                MONTHLY_IC, PORTFOLIO_PERFORMANCE,
+                                PORTFOLIO_RECORD, export_backtest,
+                                export_results, load_metrics, load_results, pa)
+from src.run_backtest import MOMENTUM, REVERSAL, RunBacktest
+
+sys.path.append("/.../src")
+
+class TestResultsExport(unittest.TestCase):
+  """
+  Defines the TestResultsExport class which tests the export and loading
+  of backtest artifacts.
+  """
+  tickers = ["AMZN", "NFLX", "SPY", "WMT"]
+  path = "./test/data/run_backtest/"
+  stocks_data = {}
+  for ticker in tickers:
+    stock_data = pd.read_csv(path + ticker + ".csv",
+                             parse_dates=["Date"],
+                             index_col="Date")
+    stock_data.index = stock_data.index.map(pd.Timestamp)
+    stocks_data[ticker] = stock_data
+  backtest = RunBacktest(stocks_data, 10000, "20230101", MOMENTUM, REVERSAL,
+                         50, 5, 50)
+  backtest.fill_up_portfolio_performance()
+  backtest.calc_ic()
+
+  def assert_round_trip(self, export_format: str) -> None:
+    """
+    Asserts that the exported tables and metrics are loaded back.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      export_backtest(tmp_dir, self.backtest, {"total_return": 0.5},
+                      export_format)
+      frames = load_results(tmp_dir)
+      self.assertEqual(load_metrics(tmp_dir), {"total_return": 0.5})
+
+    self.assertEqual(set(frames), {PORTFOLIO_PERFORMANCE, MONTHLY_IC,
+                                   MODEL_STATISTICS_RECORD, PORTFOLIO_RECORD,
+                                   MODEL_TRAINING_DATA})
+    performance = frames[PORTFOLIO_PERFORMANCE]
+    np.testing.assert_allclose(performance["aum"],
+                               self.backtest.portfolio_performance["aum"])
+    self.assertTrue((performance["datetime"]
+                     == self.backtest.portfolio_performance["datetime"])
+                    .all())
+    np.testing.assert_allclose(
+      frames[MODEL_STATISTICS_RECORD].to_numpy(),
+      self.backtest.model_statistics_record.to_numpy(dtype=float))
+    record = frames[PORTFOLIO_RECORD]
+    self.assertEqual(record["rebalance"].max() + 1,
+                     len(self.backtest.portfolio_record))
+    self.assertEqual(list(record["stock"][:2]),
+                     [stock for stock, _ in self.backtest.portfolio_record[0]])
+    self.assertEqual(list(frames[MODEL_TRAINING_DATA]["stock"]),
+                     list(self.backtest.model_training_data["stock"]))
+
+  def test_npz(self):
+    """
+    Tests the .npz export.
+    """
+    self.assert_round_trip(FORMAT_NPZ)
+
+  @unittest.skipIf(pa is None, "pyarrow is not installed")
+  def test_arrow(self):
+    """
+    Tests the Arrow IPC export.
+    """
+    self.assert_round_trip(FORMAT_ARROW)
+
+  @unittest.skipIf(pa is None, "pyarrow is not installed")
+  def test_parquet(self):
+    """
+    Tests the Parquet export.
+    """
+    self.assert_round_trip(FORMAT_PARQUET)
+
+  def test_invalid_format(self):
+    """
+    Tests that an unsupported format is rejected.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      with self.assertRaises(ValueError):
+        export_results(tmp_dir, {}, export_format="csv")
+      self.assertEqual(os.listdir(tmp_dir), [])
@@ -0,0 +1,86 @@
+"""
+This module is responsible for testing the SQLite results store.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.results_export import PORTFOLIO_PERFORMANCE, export_results
+from src.results_store import ResultsStore
+
+sys.path.append("/.../src")
+
+class TestResultsStore(unittest.TestCase):
+  """
+  Defines the TestResultsStore class which tests the storing and querying
+  of sweep results.
+  """
+  def add_sweep(self, store: ResultsStore) -> None:
+    """
+    Adds one run per days1 and top_pct combination, whose Sharpe ratio
+    grows with days1.
+    """
+    for days1 in [20, 40, 60, 80]:
+      for top_pct in [10, 50]:
+        store.add_run(f"run_{days1}_{top_pct}",
+                      {"tickers": ["AMZN", "WMT"],
+                       "days1": days1,
+                       "days2": 5,
+                       "top_pct": top_pct,
+                       "seed": 7},
+                      {"daily_sharpe_ratio": days1 / 100 + top_pct / 1000,
+                       "final_aum": 10000.})
+
+  def test_query(self):
+    """
+    Tests that buffered runs are written and queried by parameters.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      with ResultsStore(os.path.join(tmp_dir, "results.db"),
+                        batch_size=3) as store:
+        self.add_sweep(store)
+        self.assertEqual(store.count(), 8)
+        best = store.get_best_run(where="days1 < ? AND top_pct = ?",
+                                  parameters=(60, 10))
+        self.assertEqual(best["name"], "run_40_10")
+        self.assertEqual(best["tickers"], "AMZN,WMT")
+        self.assertEqual(best["extra_parameters"], '{"seed": 7}')
+
+        runs = store.query("top_pct = ?", (50,), order_by="days1",
+                           descending=False)
+        self.assertEqual(list(runs["days1"]), [20, 40, 60, 80])
+        self.assertTrue(runs["total_return"].isna().all())
+        self.assertIsNone(store.get_best_run(where="days1 > 100"))
+        with self.assertRaises(ValueError):
+          store.query(order_by="days1; DROP TABLE runs")
+
+      # the runs persist and the parameter columns are indexed
+      with ResultsStore(os.path.join(tmp_dir, "results.db")) as store:
+        self.assertEqual(store.count(), 8)
+        plan = store.connection.execute(
+          "EXPLAIN QUERY PLAN SELECT * FROM runs WHERE top_pct = 10")\
+          .fetchall()
+        self.assertIn("runs_top_pct", str(plan))
+
+  def test_load_curves(self):
+    """
+    Tests that the exported tables of a run are loaded from its pointer.
+    """
+    performance = pd.DataFrame({"aum": [10000., 10100.]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      export_dir = os.path.join(tmp_dir, "run")
+      export_results(export_dir, {PORTFOLIO_PERFORMANCE: performance},
+                     export_format="npz")
+      with ResultsStore(os.path.join(tmp_dir, "results.db")) as store:
+        store.add_run("run", {"days1": 50}, {}, export_dir, "npz")
+        store.add_run("no_export", {"days1": 60}, {})
+        runs = store.query(order_by="run_id", descending=False)
+        curves = store.load_curves(runs["run_id"][0])
+        np.testing.assert_allclose(curves[PORTFOLIO_PERFORMANCE]["aum"],
+                                   performance["aum"])
+        with self.assertRaises(ValueError):
+          store.load_curves(runs["run_id"][1])
@@ -0,0 +1,101 @@
+"""
+This module is responsible for testing the robustness analysis on
+bootstrapped price paths.
+"""
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_stats import (BacktestStats, get_batch_daily_returns,
+                                get_batch_summary_statistics)
+from src.panel_backtest import PanelBacktest
+from src.robustness import (ACTUAL, MEAN, RobustnessAnalysis,
+                            get_bootstrap_rows, get_chunk_paths)
+from src.run_backtest import AUM, DATETIME, DIVIDENDS_DF, IC, MOMENTUM, \
+  REVERSAL
+from src.synthetic_prices import generate_price_panel
+
+sys.path.append("/.../src")
+
+class TestRobustness(unittest.TestCase):
+  """
+  Defines the TestRobustness class which tests the RobustnessAnalysis
+  class and the batched statistics.
+  """
+  panel = generate_price_panel(30, "20180101", "20201231", seed=6)
+  parameters = [10000, "20190101", MOMENTUM, REVERSAL, 50, 5, 20]
+
+  def test_get_batch_summary_statistics(self):
+    """
+    Tests that the batched statistics match BacktestStats.
+    """
+    generator = np.random.default_rng(3)
+    aum = 10000 * np.cumprod(1 + generator.normal(0, 0.01, (3, 50)), axis=1)
+    dividends = np.cumsum(generator.random((3, 50)), axis=1)
+    dates = pd.date_range("2020-01-01", periods=50, freq="B")
+    statistics = get_batch_summary_statistics(
+      aum, dividends, (dates[-1] - dates[0]).days, np.array([1., 2., 3.]))
+    for path in range(3):
+      backtest_stats = BacktestStats(
+        pd.DataFrame({DATETIME: dates, AUM: aum[path],
+                      DIVIDENDS_DF: dividends[path]}),
+        pd.DataFrame({DATETIME: dates[:1], IC: [path + 1.]}),
+        pd.DataFrame([[0., 0., 0., 0.]]))
+      np.testing.assert_allclose(get_batch_daily_returns(aum[path]),
+                                 backtest_stats.get_daily_returns())
+      for key, value in backtest_stats.get_summary_statistics().items():
+        self.assertAlmostEqual(statistics[key][path], value)
+
+  def test_get_bootstrap_rows(self):
+    """
+    Tests that the bootstrap is made of blocks of consecutive rows.
+    """
+    rows = get_bootstrap_rows(np.random.default_rng(1), 4, 23, 5)
+    self.assertEqual(rows.shape, (4, 23))
+    self.assertTrue(((rows >= 0) & (rows < 23)).all())
+    blocks = rows[:, :20].reshape(4, 4, 5)
+    self.assertTrue((np.diff(blocks, axis=2) == 1).all())
+    np.testing.assert_array_equal(
+      get_bootstrap_rows(np.random.default_rng(1), 2, 10, 10),
+      np.tile(np.arange(10), (2, 1)))
+    self.assertEqual(get_chunk_paths(1000, 100, 1), 1)
+
+  def test_actual_statistics(self):
+    """
+    Tests that the batched backtest of the actual prices matches the
+    panel backtest.
+    """
+    pbt = PanelBacktest(self.panel, *self.parameters)
+    pbt.fill_up_portfolio_performance()
+    expected = BacktestStats(pbt.get_portfolio_performance(),
+                             pbt.get_monthly_ic(),
+                             pbt.get_model_statistics_record())\
+      .get_summary_statistics()
+    analysis = RobustnessAnalysis(self.panel, *self.parameters)
+    for key, value in expected.items():
+      self.assertAlmostEqual(analysis.actual_statistics[key], value,
+                             places=6)
+
+  def test_run(self):
+    """
+    Tests the distributions over chunks of paths, and that paths made of
+    a single block reproduce the actual prices.
+    """
+    analysis = RobustnessAnalysis(self.panel, *self.parameters, block_days=10,
+                                  memory_mb=1)
+    self.assertLess(analysis.chunk_paths, 7)
+    statistics = analysis.run(7)
+    self.assertEqual(len(statistics), 7)
+    self.assertTrue(np.isfinite(statistics.to_numpy()).all())
+    self.assertGreater(statistics.nunique().min(), 1)
+    summary = analysis.get_summary()
+    self.assertEqual(list(summary.index), list(statistics.columns))
+
+    analysis = RobustnessAnalysis(self.panel, *self.parameters,
+                                  block_days=len(self.panel.dates))
+    analysis.run(2)
+    summary = analysis.get_summary()
+    np.testing.assert_allclose(summary[MEAN], summary[ACTUAL], rtol=1e-8,
+                               atol=1e-10)
@@ -2,15 +2,24 @@
 This module is responsible for testing the functions that simulate
 the backtest
 """
+import os
 import sys
+import tempfile
 import unittest
 
+import numpy as np
 import pandas as pd
 
-from src.run_backtest import (DATE_FORMAT, IC, MOMENTUM, PREDICTED_RETURN,
-                              REVERSAL, STOCK, STRATEGY1_COEFF,
-                              STRATEGY1_RETURN, STRATEGY1_T, STRATEGY2_COEFF,
-                              STRATEGY2_RETURN, STRATEGY2_T, RunBacktest)
+from src.run_backtest import (CHECKPOINT_AUM, CHECKPOINT_DATE,
+                              CHECKPOINT_DIVIDENDS, CHECKPOINT_IC,
+                              CHECKPOINT_PARAMETERS, CHECKPOINT_PORTFOLIO,
+                              CHECKPOINT_REGRESSION, CHECKPOINT_VERSION_KEY,
+                              DATE_FORMAT, DATETIME, IC, MOMENTUM,
+                              PREDICTED_RETURN, REVERSAL, STOCK,
+                              STRATEGY1_COEFF, STRATEGY1_RETURN, STRATEGY1_T,
+                              STRATEGY2_COEFF, STRATEGY2_RETURN, STRATEGY2_T,
+                              RunBacktest, get_warmup_trading_days,
+                              read_checkpoint, read_checkpoint_date)
 
 sys.path.append("/.../src")
 
@@ -45,19 +54,20 @@ class TestRunBacktest(unittest.TestCase):
     stock_data.index = stock_data.index.map(pd.Timestamp)
     stocks_data[ticker] = stock_data
 
-  def init_run_backtest(self):
+  def init_run_backtest(self, stocks_data=None, checkpoint_path=None):
     """
     Tests the RunBacktest class instantiation.
     """
     return RunBacktest(
-      self.stocks_data,
+      self.stocks_data if stocks_data is None else stocks_data,
       self.initial_aum,
       self.start_str,
       self.strategy1,
       self.strategy2,
       self.days1,
       self.days2,
-      self.top_pct)
+      self.top_pct,
+      checkpoint_path)
 
   def test_get_month_end_indexes_from_b(self):
     """
@@ -71,6 +81,28 @@ class TestRunBacktest(unittest.TestCase):
       self.assertEqual(date_indexes[month_end_index].strftime(DATE_FORMAT),
                        expected[idx])
 
+  def test_get_warmup_trading_days(self):
+    """
+    Tests the get_warmup_trading_days function.
+    """
+    self.assertEqual(get_warmup_trading_days(MOMENTUM, 50, REVERSAL, 5), 93)
+    self.assertEqual(get_warmup_trading_days(REVERSAL, 5, REVERSAL, 10), 33)
+    self.assertEqual(get_warmup_trading_days(REVERSAL, 5, REVERSAL, 10, "W"),
+                     15)
+    self.assertEqual(get_warmup_trading_days(REVERSAL, 5, REVERSAL, 10,
+                                             "250"), 260)
+    with self.assertRaises(ValueError):
+      get_warmup_trading_days(REVERSAL, 5, REVERSAL, 10, "D")
+
+  def test_history_too_short(self):
+    """
+    Tests that a warning is raised when the history is too short.
+    """
+    short_data = {ticker: data.iloc[-100:]
+                  for ticker, data in self.stocks_data.items()}
+    with self.assertWarns(UserWarning):
+      self.init_run_backtest(short_data)
+
   def test_get_feature_m50(self):
     """
     Tests the get_feature method for momentum strategy.
@@ -247,3 +279,79 @@ class TestRunBacktest(unittest.TestCase):
     rbt.fill_up_portfolio_performance()
     rbt.calc_ic()
     self.assertEqual(rbt.monthly_ic.at[1, IC], 0)
+
+  def test_resume_from_checkpoint(self):
+    """
+    Tests that a run resumed from a checkpoint matches the end of a full
+    run, with the model fitted from the checkpointed regression
+    statistics instead of the training data.
+    """
+    full = self.init_run_backtest()
+    full.fill_up_portfolio_performance()
+    full.calc_ic()
+
+    checkpoint_end = pd.Timestamp("2023-03-15")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      checkpoint_path = os.path.join(tmp_dir, "backtest.ckpt")
+      truncated_data = {
+        ticker: data[data.index.map(lambda x: x.tz_localize(None))
+                     <= checkpoint_end]
+        for ticker, data in self.stocks_data.items()}
+      first = self.init_run_backtest(truncated_data, checkpoint_path)
+      first.fill_up_portfolio_performance()
+      self.assertEqual(read_checkpoint_date(checkpoint_path), "20230228")
+      checkpoint = read_checkpoint(checkpoint_path)
+      self.assertEqual(set(checkpoint),
+                       {CHECKPOINT_VERSION_KEY, CHECKPOINT_PARAMETERS,
+                        CHECKPOINT_DATE, CHECKPOINT_PORTFOLIO,
+                        CHECKPOINT_AUM, CHECKPOINT_DIVIDENDS, CHECKPOINT_IC,
+                        CHECKPOINT_REGRESSION})
+
+      # the resumed run only gets the lookback before the checkpoint
+      new_data = {ticker: data.iloc[-100:]
+                  for ticker, data in self.stocks_data.items()}
+      resumed = self.init_run_backtest(new_data, checkpoint_path)
+      self.assertEqual(len(resumed.month_end_indexes), 2)
+      resumed.fill_up_portfolio_performance()
+      resumed.calc_ic()
+      self.assertEqual(read_checkpoint_date(checkpoint_path), "20230331")
+
+    # only the training data of the new month is built
+    self.assertEqual(len(resumed.model_training_data), len(self.tickers))
+    for name in ["gram", "moment", "sum_squares", "n_samples"]:
+      self.assertTrue(np.array_equal(
+        getattr(resumed.regression_statistics, name),
+        getattr(full.regression_statistics, name)))
+    n_months = len(resumed.model_statistics_record)
+    pd.testing.assert_frame_equal(
+      resumed.model_statistics_record,
+      full.model_statistics_record[-n_months:].reset_index(drop=True))
+
+    checkpoint_date = resumed.portfolio_performance[DATETIME][0]
+    performance = full.portfolio_performance
+    pd.testing.assert_frame_equal(
+      resumed.portfolio_performance,
+      performance[performance[DATETIME] >= checkpoint_date]\
+        .reset_index(drop=True),
+      check_dtype=False)
+    pd.testing.assert_frame_equal(
+      resumed.monthly_ic,
+      full.monthly_ic[full.monthly_ic[DATETIME] >= checkpoint_date]\
+        .reset_index(drop=True),
+      check_dtype=False)
+    self.assertEqual(resumed.portfolio_record, full.portfolio_record[-2:])
+
+  def test_resume_from_checkpoint_different_parameters(self):
+    """
+    Tests that a checkpoint cannot be resumed with different parameters.
+    """
+    rbt = self.init_run_backtest()
+    rbt.fill_up_portfolio_performance()
+    rbt.calc_ic()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      checkpoint_path = os.path.join(tmp_dir, "backtest.ckpt")
+      rbt.save_checkpoint(checkpoint_path)
+      with self.assertRaises(ValueError):
+        RunBacktest(self.stocks_data, self.initial_aum, self.start_str,
+                    self.strategy1, self.strategy2, self.days1 + 1,
+                    self.days2, self.top_pct, checkpoint_path)
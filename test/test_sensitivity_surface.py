@@ -0,0 +1,87 @@
+"""
+This module is responsible for testing the sensitivity surface over the
+lookbacks of the two strategies.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.backtest_stats import BacktestStats, DAILY_SHARPE_RATIO
+from src.batch_model import get_feature_matrix
+from src.panel_backtest import PanelBacktest
+from src.run_backtest import MOMENTUM, REVERSAL
+from src.sensitivity_surface import (DAYS1, DAYS2, SensitivitySurface,
+                                     get_lookback_features)
+from src.synthetic_prices import generate_price_panel
+
+sys.path.append("/.../src")
+
+class TestSensitivitySurface(unittest.TestCase):
+  """
+  Defines the TestSensitivitySurface class which tests the
+  SensitivitySurface class.
+  """
+  panel = generate_price_panel(30, "20180101", "20201231", seed=6)
+  parameters = [10000, "20190101", MOMENTUM, REVERSAL, 20]
+
+  def test_get_lookback_features(self):
+    """
+    Tests that the returns from the log close prices match the feature
+    matrix.
+    """
+    close = np.asarray(self.panel.close, dtype=np.float64)
+    rows = np.array([100, 121, 142])
+    features = get_lookback_features(np.log(close), rows, MOMENTUM, [5, 50])
+    np.testing.assert_allclose(
+      features, get_feature_matrix(close, rows, MOMENTUM, 5, MOMENTUM, 50)
+      .transpose(2, 0, 1), rtol=1e-9)
+
+  def test_run(self):
+    """
+    Tests that every pair matches the panel backtest, with blocks of one
+    days1 value.
+    """
+    surface = SensitivitySurface(self.panel, *self.parameters,
+                                 days1=[5, 50], days2=[5, 20], memory_mb=0)
+    self.assertEqual(surface.block_days1, 1)
+    table = surface.run()
+    self.assertEqual(table[[DAYS1, DAYS2]].values.tolist(),
+                     [[5, 5], [5, 20], [50, 5], [50, 20]])
+    for _, row in table.iterrows():
+      pbt = PanelBacktest(self.panel, *self.parameters[:4], int(row[DAYS1]),
+                          int(row[DAYS2]), self.parameters[-1])
+      pbt.fill_up_portfolio_performance()
+      expected = BacktestStats(pbt.get_portfolio_performance(),
+                               pbt.get_monthly_ic(),
+                               pbt.get_model_statistics_record())\
+        .get_summary_statistics()
+      for key, value in expected.items():
+        self.assertAlmostEqual(row[key], value, places=6)
+
+  def test_identical_signals(self):
+    """
+    Tests that the pairs of two identical signals are skipped, and the
+    surface and its outputs.
+    """
+    surface = SensitivitySurface(self.panel, 10000, "20190101", REVERSAL,
+                                 REVERSAL, 20, days1=[5, 10], days2=[5, 10])
+    table = surface.run()
+    self.assertEqual(table[[DAYS1, DAYS2]].values.tolist(),
+                     [[5, 10], [10, 5]])
+    sharpe = surface.get_surface(DAILY_SHARPE_RATIO)
+    self.assertTrue(np.isnan(np.diag(sharpe.to_numpy())).all())
+    with tempfile.TemporaryDirectory() as directory:
+      surface.save_table(os.path.join(directory, "surface.csv"))
+      surface.plot(os.path.join(directory, "surface.png"))
+      self.assertEqual(sorted(os.listdir(directory)),
+                       ["surface.csv", "surface.png"])
+
+  def test_invalid_lookback(self):
+    """
+    Tests that the lookbacks must be allowed ones.
+    """
+    with self.assertRaises(ValueError):
+      SensitivitySurface(self.panel, *self.parameters, days1=[0, 5])
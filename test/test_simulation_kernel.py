@@ -0,0 +1,117 @@
+"""
+This module is responsible for testing the simulation kernels.
+"""
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src import simulation_kernel
+from src.panel_backtest import PanelBacktest
+from src.run_backtest import MOMENTUM, REVERSAL
+from src.simulation_kernel import (HAS_NUMBA, get_simulation_kernel,
+                                   simulate_kernel, simulate_vectorized)
+from src.synthetic_prices import generate_price_panel
+
+sys.path.append("/.../src")
+
+class TestSimulationKernel(unittest.TestCase):
+  """
+  Defines the TestSimulationKernel class which tests that the scalar and
+  vectorised kernels agree exactly.
+  """
+  generator = np.random.default_rng(3)
+  close = np.exp(np.cumsum(generator.normal(0, 0.02, (60, 8)), axis=0)) * 50
+  dividends = np.where(generator.random((60, 8)) < 0.05, 0.3, 0.)
+  rebalance_rows = np.array([0, 1, 2, 20, 41, 59], dtype=np.int64)
+  selections = generator.permuted(np.tile(np.arange(8), (6, 1)),
+                                  axis=1)[:, :3]
+  n_selected = np.array([3, 3, 0, 2, 3, 1], dtype=np.int64)
+
+  def run_kernel(self, kernel) -> tuple:
+    """
+    Runs a kernel from an initial portfolio of two stocks.
+    """
+    return kernel(self.close, self.dividends, self.rebalance_rows,
+                  self.selections, self.n_selected,
+                  np.array([4, 6], dtype=np.int64), np.array([10., 20.]),
+                  1500., 2.)
+
+  def assert_same_results(self, expected: tuple, actual: tuple) -> None:
+    """
+    Asserts that two kernels returned exactly the same results.
+    """
+    for expected_value, actual_value in zip(expected, actual):
+      np.testing.assert_array_equal(expected_value, actual_value)
+
+  def test_kernels_agree(self):
+    """
+    Tests that the scalar kernel run by Python matches the vectorised one.
+    """
+    expected = self.run_kernel(simulate_vectorized)
+    self.assert_same_results(expected, self.run_kernel(simulate_kernel))
+
+    aum, dividends, amounts_record, holdings, amounts, final_aum, _ = \
+      expected
+    np.testing.assert_allclose(aum[0], self.close[0, [4, 6]] @ [10., 20.])
+    # no stocks are held between the third and fourth rebalances
+    np.testing.assert_array_equal(aum[3:21], aum[2])
+    np.testing.assert_array_equal(amounts_record[2], 0.)
+    np.testing.assert_allclose(
+      amounts_record[3, :2] * self.close[20, self.selections[3, :2]],
+      aum[20] / 2)
+    self.assertEqual(holdings.tolist(), self.selections[5, :1].tolist())
+    self.assertEqual(final_aum, aum[-1])
+    self.assertEqual(amounts[0], amounts_record[5, 0])
+    self.assertTrue((np.diff(dividends) >= 0).all())
+
+  @unittest.skipIf(not HAS_NUMBA, "numba is not installed")
+  def test_compiled_kernel_agrees(self):
+    """
+    Tests that the compiled kernel matches the vectorised one.
+    """
+    self.assert_same_results(self.run_kernel(simulate_vectorized),
+                             self.run_kernel(get_simulation_kernel(True)))
+
+  @unittest.skipIf(not HAS_NUMBA, "numba is not installed")
+  def test_panel_backtest_kernels_agree(self):
+    """
+    Tests that the panel backtest gives the same results with both
+    kernels.
+    """
+    panel = generate_price_panel(20, "20190101", "20211231", seed=5)
+    parameters = [10000, "20200101", MOMENTUM, REVERSAL, 50, 5, 20]
+    results = []
+    for use_jit in [False, True]:
+      pbt = PanelBacktest(panel, *parameters, block_months=4,
+                          use_jit=use_jit)
+      pbt.fill_up_portfolio_performance()
+      results.append((pbt.get_portfolio_performance(), pbt.portfolio_record))
+    (expected, expected_record), (actual, actual_record) = results
+    self.assertTrue(expected.equals(actual))
+    self.assertEqual(expected_record, actual_record)
+
+  def test_missing_numba(self):
+    """
+    Tests the kernel selection without Numba.
+    """
+    with mock.patch.object(simulation_kernel, "HAS_NUMBA", False):
+      self.assertIs(get_simulation_kernel(), simulate_vectorized)
+      with self.assertRaises(ValueError):
+        get_simulation_kernel(True)
+    self.assertIs(get_simulation_kernel(False), simulate_vectorized)
+
+  def test_lazy_numba_import(self):
+    """
+    Tests that the panel backtest is imported without importing Numba.
+    """
+    script = ("import sys\n"
+              "import src.panel_backtest\n"
+              "assert 'numba' not in sys.modules\n")
+    parent_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+    result = subprocess.run([sys.executable, "-c", script], cwd=parent_dir,
+                            capture_output=True, check=False)
+    self.assertEqual(result.returncode, 0, result.stderr)
@@ -5,7 +5,12 @@ import sys
 import unittest
 from datetime import datetime
 
-from src.stocks_fetcher import DATE_FORMAT, StocksFetcher
+import pandas as pd
+
+from src.stocks_fetcher import (DATE_FORMAT, StocksFetcher,
+                                get_warmup_calendar_days,
+                                warn_if_warmup_too_short)
+from src.synthetic_prices import SyntheticPriceProvider
 
 sys.path.append("/.../src")
 
@@ -52,3 +57,35 @@ class TestStocksFetcher(unittest.TestCase):
     self.assertFalse(res[ticker_1].empty)
     self.assertFalse(res[ticker_2].empty)
     self.assertEqual(len(res), 2)
+
+  def test_fetch_stocks_data_local_provider(self):
+    """
+    Tests the fetch_stocks_data method with a local provider.
+    """
+    stocks_fetcher = StocksFetcher(provider=SyntheticPriceProvider())
+    res = stocks_fetcher.fetch_stocks_data(["AAPL", "MSFT"], "20230301",
+                                           "20230331")
+    self.assertEqual(len(res), 2)
+    self.assertEqual(res["AAPL"].index[-1].strftime(DATE_FORMAT), "20230331")
+    self.assertTrue(len(res["AAPL"].index) > 250)
+
+  def test_get_warmup_calendar_days(self):
+    """
+    Tests the get_warmup_calendar_days function.
+    """
+    self.assertEqual(get_warmup_calendar_days(0), 10)
+    self.assertEqual(get_warmup_calendar_days(28), 55)
+    self.assertEqual(get_warmup_calendar_days(252), 412)
+
+  def test_warn_if_warmup_too_short(self):
+    """
+    Tests that a warning is raised when the warm-up is too short.
+    """
+    stock_data = pd.DataFrame(
+      {"Close": range(10)},
+      index=pd.date_range("2023-01-02", periods=10, freq="B",
+                          tz="America/New_York"))
+    dt_beginning = datetime.strptime("20230109", DATE_FORMAT)
+    with self.assertWarns(UserWarning):
+      warn_if_warmup_too_short("AAPL", stock_data, dt_beginning, 6)
+    warn_if_warmup_too_short("AAPL", stock_data, dt_beginning, 5)
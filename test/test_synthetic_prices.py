@@ -0,0 +1,56 @@
+"""
+This module is responsible for testing the functions that generate
+synthetic stock prices.
+"""
+import sys
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from src.synthetic_prices import (DATE_FORMAT, SyntheticPriceProvider,
+                                  generate_price_panel, get_synthetic_tickers)
+
+sys.path.append("/.../src")
+
+class TestSyntheticPrices(unittest.TestCase):
+  """
+  Defines the TestSyntheticPrices class which tests the synthetic price
+  generator.
+  """
+  start = datetime.strptime("20220103", DATE_FORMAT)
+  end = datetime.strptime("20230103", DATE_FORMAT)
+
+  def test_get_synthetic_tickers(self):
+    """
+    Tests that the synthetic tickers are distinct five-letter symbols.
+    """
+    tickers = get_synthetic_tickers(1000)
+    self.assertEqual(tickers[:2], ["AAAAA", "AAAAB"])
+    self.assertEqual(len(set(tickers)), 1000)
+    self.assertTrue(all(len(ticker) == 5 and ticker.isalpha()
+                        for ticker in tickers))
+
+  def test_provider_deterministic(self):
+    """
+    Tests that the provider returns the same prices for the same seed and
+    different prices for different tickers.
+    """
+    first = SyntheticPriceProvider(1)("AAPL", self.start, self.end)
+    second = SyntheticPriceProvider(1)("AAPL", self.start, self.end)
+    other = SyntheticPriceProvider(1)("MSFT", self.start, self.end)
+    np.testing.assert_array_equal(first.to_numpy(), second.to_numpy())
+    self.assertFalse(np.array_equal(first["Close"], other["Close"]))
+    self.assertEqual(len(first), 261)
+    self.assertTrue((first["Close"] > 0).all())
+    self.assertTrue((first["Dividends"] >= 0).all())
+
+  def test_generate_price_panel(self):
+    """
+    Tests the shape and determinism of a generated panel.
+    """
+    panel = generate_price_panel(20, "20220103", "20230103", seed=3)
+    self.assertEqual(panel.close.shape, (262, 20))
+    np.testing.assert_array_equal(
+      panel.close, generate_price_panel(20, "20220103", "20230103", 3).close)
+    self.assertGreater((panel.dividends > 0).sum(), 0)
@@ -0,0 +1,82 @@
+"""
+This module is responsible for testing the rank and Pearson information
+coefficients over the whole universe.
+"""
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.batch_model import BatchModel
+from src.panel_backtest import PanelBacktest
+from src.run_backtest import DATETIME, IC, MOMENTUM, REVERSAL
+from src.synthetic_prices import generate_price_panel
+from src.universe_ic import (CUMULATIVE_RANK_IC, N_STOCKS, PEARSON_IC,
+                             RANK_IC, get_ranks, get_row_correlations,
+                             get_universe_ic, join_monthly_ic)
+
+sys.path.append("/.../src")
+
+class TestUniverseIC(unittest.TestCase):
+  """
+  Defines the TestUniverseIC class which tests the universe information
+  coefficients.
+  """
+  def test_get_ranks(self):
+    """
+    Tests the average ranks of the valid values of every row.
+    """
+    values = np.array([[3., 1., 3., np.nan, 2.],
+                       [5., 5., 5., 5., 0.]])
+    valid = np.isfinite(values)
+    valid[1, 1] = False
+    expected = np.array([[3.5, 1., 3.5, np.nan, 2.],
+                         [3., np.nan, 3., 3., 1.]])
+    np.testing.assert_array_equal(get_ranks(values, valid), expected)
+
+  def test_get_row_correlations(self):
+    """
+    Tests the row-wise correlations against pandas.
+    """
+    generator = np.random.default_rng(2)
+    x = generator.integers(0, 5, (20, 30)).astype(np.float64)
+    y = x + generator.normal(size=x.shape)
+    y[generator.random(y.shape) < 0.2] = np.nan
+    valid = np.isfinite(x) & np.isfinite(y)
+    pearson = get_row_correlations(x, y, valid)
+    spearman = get_row_correlations(get_ranks(x, valid), get_ranks(y, valid),
+                                    valid)
+    for row in range(len(x)):
+      pair = pd.DataFrame({"x": x[row], "y": y[row]}).dropna()
+      self.assertAlmostEqual(pearson[row], pair.corr().iloc[0, 1])
+      self.assertAlmostEqual(spearman[row],
+                             pair.corr(method="spearman").iloc[0, 1])
+    self.assertTrue(np.isnan(get_row_correlations(
+      np.ones((1, 3)), np.arange(3.)[None], np.ones((1, 3), dtype=bool))[0]))
+
+  def test_get_universe_ic(self):
+    """
+    Tests the universe ICs and their join with the monthly IC.
+    """
+    panel = generate_price_panel(40, "20180101", "20201231", seed=5)
+    parameters = ["20190101", REVERSAL, MOMENTUM, 20, 60]
+    model = BatchModel(panel, *parameters)
+    universe_ic = get_universe_ic(model)
+    self.assertEqual(len(universe_ic), len(model.indexes) - 2)
+    self.assertTrue((universe_ic[N_STOCKS] == 40).all())
+    realised_returns = model.realised_returns[2]
+    expected = pd.Series(model.predicted_returns[1])\
+      .corr(pd.Series(realised_returns), method="spearman")
+    self.assertAlmostEqual(universe_ic[RANK_IC].iloc[1], expected)
+    np.testing.assert_allclose(universe_ic[CUMULATIVE_RANK_IC],
+                               universe_ic[RANK_IC].cumsum())
+
+    pbt = PanelBacktest(panel, 10000, *parameters, 25)
+    pbt.fill_up_portfolio_performance()
+    monthly_ic = pbt.get_monthly_ic()
+    joined = join_monthly_ic(monthly_ic, universe_ic)
+    self.assertEqual(len(joined), len(monthly_ic))
+    pd.testing.assert_series_equal(joined[IC], monthly_ic[IC])
+    pd.testing.assert_series_equal(joined[DATETIME], monthly_ic[DATETIME])
+    np.testing.assert_allclose(joined[PEARSON_IC], universe_ic[PEARSON_IC])
@@ -0,0 +1,78 @@
+"""
+This module is responsible for testing the walk-forward evaluation.
+"""
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_stats import AUM, FINAL_AUM, TOTAL_STOCK_RETURN
+from src.run_backtest import MOMENTUM, REVERSAL, STRATEGY1_COEFF, \
+  STRATEGY2_COEFF
+from src.synthetic_prices import generate_price_panel
+from src.walk_forward import (TEST_END, TEST_START, TRAIN_START, WINDOW,
+                              WalkForward, get_windows)
+
+sys.path.append("/.../src")
+
+class TestWalkForward(unittest.TestCase):
+  """
+  Defines the TestWalkForward class which tests the WalkForward class.
+  """
+  panel = generate_price_panel(40, "20170101", "20201231", seed=7)
+  parameters = [10000, "20180101", MOMENTUM, REVERSAL, 50, 5, 25]
+
+  def test_get_windows(self):
+    """
+    Tests the training and test periods of rolling and anchored windows.
+    """
+    windows = get_windows(10, 4)
+    self.assertEqual([(window[TRAIN_START], window[TEST_START],
+                       window[TEST_END]) for window in windows],
+                     [(0, 4, 8), (4, 8, 10)])
+    self.assertEqual([window[WINDOW] for window in windows], [0, 1])
+    self.assertEqual([window[TRAIN_START]
+                      for window in get_windows(10, 4, anchored=True)],
+                     [0, 0])
+    self.assertEqual(get_windows(4, 4), [])
+
+  def test_run(self):
+    """
+    Tests the fit of each window and the pooled statistics.
+    """
+    walk_forward = WalkForward(self.panel, *self.parameters,
+                               window_periods=6, n_workers=1)
+    statistics = walk_forward.run()
+    self.assertEqual(len(statistics), len(walk_forward.windows))
+    self.assertTrue(statistics[TEST_START].is_monotonic_increasing)
+
+    model = walk_forward.model
+    for window, result in zip(walk_forward.windows, walk_forward.results):
+      features = model.features[window[TRAIN_START]:window[TEST_START]]
+      labels = model.realised_returns[window[TRAIN_START]:window[TEST_START]]
+      valid = np.isfinite(labels) & np.isfinite(features).all(axis=-1)
+      design = np.column_stack([np.ones(valid.sum()), features[valid]])
+      expected = np.linalg.lstsq(design, labels[valid], rcond=None)[0]
+      np.testing.assert_allclose(
+        statistics.loc[window[WINDOW], [STRATEGY1_COEFF, STRATEGY2_COEFF]]
+        .to_numpy(dtype=np.float64), expected[1:], rtol=1e-8)
+      self.assertEqual(result[AUM][0], 10000)
+
+    pooled_stats = walk_forward.get_pooled_stats()
+    self.assertAlmostEqual(pooled_stats.get_final_aum(),
+                           10000 * np.prod(1 + statistics[TOTAL_STOCK_RETURN]))
+    self.assertEqual(pooled_stats.beginning_trading_date,
+                     statistics[TEST_START].iloc[0])
+
+  def test_parallel_run(self):
+    """
+    Tests that the worker processes give the same results as a single
+    process.
+    """
+    expected = WalkForward(self.panel, *self.parameters, window_periods=6,
+                           anchored=True, n_workers=1).run()
+    actual = WalkForward(self.panel, *self.parameters, window_periods=6,
+                         anchored=True, n_workers=2).run()
+    pd.testing.assert_frame_equal(actual, expected)
+    self.assertGreater(expected[FINAL_AUM].min(), 0)
@@ -0,0 +1,187 @@
+"""
+This module is responsible for testing the distribution of a sweep through
+a spool directory.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from src.backtest_stats import BacktestStats, FINAL_AUM
+from src.results_store import ResultsStore
+from src.run_backtest import AUM, DATETIME, MOMENTUM, REVERSAL, RunBacktest
+from src.synthetic_prices import generate_price_panel
+from src.work_queue import (ATTEMPTS, DEFAULT_LEASE_SECONDS, FAILED,
+                            LEASES, RESULTS, TASKS, WORKER,
+                            SweepCoordinator, SweepWorker, WorkQueue)
+
+sys.path.append("/.../src")
+
+def run_worker(spool_dir: str, panel_path: str) -> None:
+  """
+  Runs a worker process until the queue is done.
+
+  Args:
+    spool_dir (str): The spool directory.
+    panel_path (str): The price panel snapshot.
+  """
+  SweepWorker(WorkQueue(spool_dir), panel_path, poll_seconds=0.05,
+              idle_seconds=0.).run()
+
+class TestWorkQueue(unittest.TestCase):
+  """
+  Defines the TestWorkQueue class which tests the WorkQueue, SweepWorker
+  and SweepCoordinator classes.
+  """
+  panel = generate_price_panel(8, "20180101", "20191231", seed=9)
+  configuration = {"tickers": list(panel.tickers), "initial_aum": 10000,
+                   "beginning_date": "20190101", "strategy1": MOMENTUM,
+                   "strategy2": REVERSAL, "days1": 50, "days2": 5,
+                   "top_pct": 25}
+
+  def setUp(self):
+    """
+    Creates a spool directory.
+    """
+    self.directory = tempfile.TemporaryDirectory()
+    self.spool_dir = os.path.join(self.directory.name, "spool")
+
+  def tearDown(self):
+    """
+    Removes the spool directory.
+    """
+    self.directory.cleanup()
+
+  def test_put_and_complete(self):
+    """
+    Tests that a configuration is queued once and keeps its first result.
+    """
+    queue = WorkQueue(self.spool_dir)
+    task_id = queue.put(self.configuration)
+    self.assertEqual(queue.put(dict(self.configuration)), task_id)
+    self.assertEqual(queue.get_status()[TASKS], 1)
+
+    task = queue.claim("worker1")
+    self.assertEqual(task[WORKER], "worker1")
+    self.assertIsNone(queue.claim("worker2"))
+    self.assertEqual(queue.get_status()[LEASES], 1)
+    self.assertTrue(queue.complete(task, "worker1", {FINAL_AUM: 1.}))
+    self.assertFalse(queue.complete(task, "worker2", {FINAL_AUM: 2.}))
+    self.assertTrue(queue.is_done())
+    self.assertEqual([result[WORKER] for result in queue.get_results()],
+                     ["worker1"])
+    queue.put(self.configuration)
+    self.assertEqual(queue.get_status()[TASKS], 0)
+
+  def test_retries(self):
+    """
+    Tests that a failing task is retried and then given up.
+    """
+    queue = WorkQueue(self.spool_dir, max_attempts=2)
+    queue.put(self.configuration)
+    self.assertTrue(queue.fail(queue.claim("worker1"), "worker1", "Error"))
+    task = queue.claim("worker1")
+    self.assertEqual(task[ATTEMPTS], 1)
+    self.assertFalse(queue.fail(task, "worker1", "Error"))
+    self.assertEqual(queue.get_status()[FAILED], 1)
+    self.assertTrue(queue.is_done())
+
+  def test_expired_lease(self):
+    """
+    Tests that an idle worker takes over an expired lease, and that the
+    late result of the first worker is dropped.
+    """
+    queue = WorkQueue(self.spool_dir, lease_seconds=0.1)
+    queue.put(self.configuration)
+    stalled = queue.claim("worker1")
+    time.sleep(0.2)
+    task = queue.claim("worker2")
+    self.assertEqual(task[ATTEMPTS], 1)
+    self.assertFalse(queue.renew(stalled, "worker1"))
+    self.assertFalse(queue.fail(stalled, "worker1", "Error"))
+    self.assertTrue(queue.complete(task, "worker2", {FINAL_AUM: 2.}))
+    self.assertFalse(queue.complete(stalled, "worker1", {FINAL_AUM: 1.}))
+    self.assertEqual(queue.get_status()[RESULTS], 1)
+    self.assertTrue(queue.is_done())
+
+  def test_spool_config(self):
+    """
+    Tests that the queues of the workers follow the config written by the
+    coordinator, unless they are given their own.
+    """
+    worker_queue = WorkQueue(self.spool_dir)
+    self.assertEqual(worker_queue.get_lease_seconds(), DEFAULT_LEASE_SECONDS)
+    SweepCoordinator(WorkQueue(self.spool_dir, lease_seconds=0.1,
+                               max_attempts=1))
+    self.assertEqual(worker_queue.get_lease_seconds(), 0.1)
+    self.assertEqual(worker_queue.get_max_attempts(), 1)
+    self.assertEqual(WorkQueue(self.spool_dir, max_attempts=5)
+                     .get_max_attempts(), 5)
+
+    worker_queue.put(self.configuration)
+    worker_queue.claim("worker1")
+    time.sleep(0.2)
+    self.assertEqual(worker_queue.reclaim_expired(), 1)
+    self.assertEqual(worker_queue.get_status()[FAILED], 1)
+
+  def test_ending_date(self):
+    """
+    Tests that a task with an ending date is run up to that date.
+    """
+    panel_path = os.path.join(self.directory.name, "prices.panel")
+    self.panel.save(panel_path)
+    worker = SweepWorker(WorkQueue(self.spool_dir), panel_path)
+    statistics = worker.run_backtest({**self.configuration,
+                                      "ending_date": "20190630"})
+    backtest = RunBacktest(self.panel.to_stocks_data(), 10000, "20190101",
+                           MOMENTUM, REVERSAL, 50, 5, 25)
+    backtest.fill_up_portfolio_performance()
+    performance = backtest.portfolio_performance
+    until_ending_date = performance[DATETIME].dt.strftime("%Y%m%d") \
+      <= "20190630"
+    self.assertAlmostEqual(statistics[FINAL_AUM],
+                           performance[AUM][until_ending_date].iloc[-1])
+    self.assertNotAlmostEqual(statistics[FINAL_AUM],
+                              performance[AUM].iloc[-1])
+
+  def test_sweep(self):
+    """
+    Tests a sweep run by several worker processes against the backtests
+    run directly.
+    """
+    panel_path = os.path.join(self.directory.name, "prices.panel")
+    self.panel.save(panel_path)
+    configurations = [{**self.configuration, "days1": days1, "days2": days2}
+                      for days1 in [20, 50] for days2 in [5, 10]]
+    coordinator = SweepCoordinator(WorkQueue(self.spool_dir),
+                                   poll_seconds=0.05)
+    self.assertEqual(len(coordinator.submit(configurations + [
+      configurations[0]])), 4)
+
+    workers = [multiprocessing.Process(target=run_worker,
+                                       args=(self.spool_dir, panel_path))
+               for _ in range(2)]
+    for worker in workers:
+      worker.start()
+    self.assertTrue(coordinator.wait(timeout=120))
+    for worker in workers:
+      worker.join()
+
+    results = coordinator.get_results().set_index(["days1", "days2"])
+    self.assertEqual(len(results), 4)
+    backtest = RunBacktest(self.panel.to_stocks_data(), 10000, "20190101",
+                           MOMENTUM, REVERSAL, 50, 10, 25)
+    backtest.fill_up_portfolio_performance()
+    backtest.calc_ic()
+    expected = BacktestStats(backtest.portfolio_performance,
+                             backtest.monthly_ic,
+                             backtest.model_statistics_record)\
+      .get_summary_statistics()
+    for key, value in expected.items():
+      self.assertAlmostEqual(results.loc[(50, 10), key], value)
+
+    with ResultsStore(os.path.join(self.directory.name, "runs.db")) as store:
+      self.assertEqual(coordinator.store_results(store), 4)
+      self.assertEqual(store.count(), 4)